@@ -1,15 +1,64 @@
+import asyncio
 import os
+import threading
 import pandas as pd
-from google.cloud import bigquery, storage
-import plotly.express as px
+from google.cloud import bigquery
 from io import BytesIO
 from .base_agent import BaseAgent
 from .base_agent_config import BaseAgentConfig
 from .events.event import Event
 from .invocation_context import InvocationContext
+from .chart_rendering import ChartRenderer
+from .query_templates import QueryTemplateRegistry
+
+try:  # Storage Read API streaming; falls back to the REST API when missing.
+    from google.cloud import bigquery_storage
+except ImportError:
+    bigquery_storage = None
 
 MAX_IN_MEMORY_ROWS = 10000  # You can tweak this per your requirements
 
+# One client per project, shared by every invocation: clients hold pooled
+# HTTP/gRPC connections and are thread-safe.
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+_READ_CLIENT = None
+
+
+def _bigquery_client(project_id: str) -> bigquery.Client:
+    with _CLIENTS_LOCK:
+        if project_id not in _CLIENTS:
+            _CLIENTS[project_id] = bigquery.Client(project=project_id)
+        return _CLIENTS[project_id]
+
+
+def _bigquery_read_client():
+    global _READ_CLIENT
+    if bigquery_storage is None:
+        return None
+    with _CLIENTS_LOCK:
+        if _READ_CLIENT is None:
+            _READ_CLIENT = bigquery_storage.BigQueryReadClient()
+        return _READ_CLIENT
+
+
+# Renders charts off the event loop and caches them by (query hash, chart type).
+_CHART_RENDERER = ChartRenderer()
+
+_REGISTRIES = {}
+_REGISTRIES_LOCK = threading.Lock()
+
+
+def _template_registry(project_id: str, dataset: str) -> QueryTemplateRegistry:
+    """Load the query templates for a dataset and dry-run them once per process."""
+    with _REGISTRIES_LOCK:
+        key = (project_id, dataset)
+        if key not in _REGISTRIES:
+            registry = QueryTemplateRegistry.from_yaml(dataset=dataset)
+            registry.validate(_bigquery_client(project_id))
+            _REGISTRIES[key] = registry
+        return _REGISTRIES[key]
+
 class BigQueryDataAnalyzerAgentConfig(BaseAgentConfig):
     project_id: str = os.getenv("GOOGLE_CLOUD_PROJECT") or os.getenv("DEFAULT_PROJECT_ID")
     default_dataset: str = os.getenv("BQ_DEFAULT_DATASET", "your_default_dataset")
@@ -31,19 +80,31 @@ class BigQueryDataAnalyzerAgent(BaseAgent):
     async def _run_async_impl(self, ctx: InvocationContext):
         user_query = ctx.latest_user_utterance
         
-        sql, viz_type = self._parse_user_query(user_query)
-        client = bigquery.Client(project=self.project_id)
-        df = client.query(sql).to_dataframe()
-        
-        # Large datasets: Use GCS to avoid OOM/row-limit
-        if len(df) > MAX_IN_MEMORY_ROWS:
-            report_url = self._export_bigquery_to_gcs(sql)
+        # The first call loads and dry-runs the templates; keep that blocking
+        # work off the event loop.
+        try:
+            query = await asyncio.to_thread(self._parse_user_query, user_query)
+        except ValueError as error:
+            yield Event(content=str(error), attachments=[])
+            return
+        sql, viz_type = query.sql, query.viz_type
+        client = _bigquery_client(self.project_id)
+        # Run the query once; total_rows is known before any row is downloaded.
+        job = client.query(sql, job_config=query.job_config())
+        rows = job.result()
+
+        # Large datasets: extract the job's destination table to GCS instead of
+        # materializing it, and chart a bounded sample of it.
+        if rows.total_rows > MAX_IN_MEMORY_ROWS and job.destination is not None:
+            report_url = self._export_table_to_gcs(job)
+            df = client.list_rows(job.destination, max_results=MAX_IN_MEMORY_ROWS).to_dataframe()
         else:
+            df = rows.to_dataframe(bqstorage_client=_bigquery_read_client())
             report_bytes = self._dataframe_to_csv_bytes(df)
             report_url = None
 
         # Visualization
-        fig_bytes = self._generate_visualization(df, viz_type) if viz_type else None
+        fig_bytes = await _CHART_RENDERER.render(sql, df, viz_type, query.values) if viz_type else None
         
         # Build Event with result(s)
         result_attachments = []
@@ -61,20 +122,8 @@ class BigQueryDataAnalyzerAgent(BaseAgent):
         )
 
     def _run_bigquery_sql(self, sql: str):
-        client = bigquery.Client(project=self.project_id)
-        return client.query(sql).to_dataframe()
-
-    def _generate_visualization(self, df: pd.DataFrame, viz_type: str) -> bytes:
-        if viz_type == "bar":
-            fig = px.bar(df)
-        elif viz_type == "line":
-            fig = px.line(df)
-        else:
-            fig = px.scatter(df)
-        buf = BytesIO()
-        fig.write_image(buf, format="png")
-        buf.seek(0)
-        return buf.read()
+        client = _bigquery_client(self.project_id)
+        return client.query(sql).result().to_dataframe(bqstorage_client=_bigquery_read_client())
 
     def _dataframe_to_csv_bytes(self, df: pd.DataFrame) -> bytes:
         buf = BytesIO()
@@ -82,22 +131,18 @@ class BigQueryDataAnalyzerAgent(BaseAgent):
         buf.seek(0)
         return buf.read()
 
-    def _export_bigquery_to_gcs(self, sql: str) -> str:
-        client = bigquery.Client(project=self.project_id)
+    def _export_table_to_gcs(self, job: bigquery.QueryJob) -> str:
+        """Extract a finished query's destination table; the SQL is not run again."""
+        client = _bigquery_client(self.project_id)
         bucket_name = self.storage_bucket
         destination_blob = f"bigquery-results/{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}_report.csv"
         gcs_uri = f"gs://{bucket_name}/{destination_blob}"
 
-        # Create or get a temp table
-        job = client.query(sql)
-        job.result()
-        temp_table = job.destination
-
-        # Extract to GCS
+        # Extract the table the query already wrote, in the job's own location
         extract_job = client.extract_table(
-            temp_table,
+            job.destination,
             gcs_uri,
-            location=self.google_cloud_location,
+            location=job.location or self.google_cloud_location,
         )
         extract_job.result()
 
@@ -105,17 +150,5 @@ class BigQueryDataAnalyzerAgent(BaseAgent):
         return f"https://storage.cloud.google.com/{bucket_name}/{destination_blob}"
 
     def _parse_user_query(self, user_query: str):
-        """ Naive parser – expand with NLP/LLM or templates as needed. """
-        q = user_query.lower()
-        if "sales by month" in q:
-            sql = f"SELECT month, SUM(sales) as total_sales FROM `{self.default_dataset}.sales` GROUP BY month ORDER BY month"
-            viz_type = "line"
-        elif "download all orders" in q:
-            sql = f"SELECT * FROM `{self.default_dataset}.orders`"
-            viz_type = None
-        elif "top customers" in q:
-            sql = f"SELECT customer_id, SUM(purchase) as total_purchase FROM `{self.default_dataset}.orders` GROUP BY customer_id ORDER BY total_purchase DESC LIMIT 20"
-            viz_type = "bar"
-        else:
-            raise ValueError("I couldn't understand your query. Please specify your analytics request.")
-        return sql, viz_type
\ No newline at end of file
+        """ Match the request to a query template; values are bound as query parameters. """
+        return _template_registry(self.project_id, self.default_dataset).match(user_query)
@@ -0,0 +1,202 @@
+"""Chart preparation and rendering for the BigQuery data analyzer agent.
+
+A chart cannot show more points than it has pixels, so data is reduced
+before it reaches Plotly:
+
+* line charts keep the points chosen by Largest-Triangle-Three-Buckets,
+  which preserves peaks and troughs;
+* bar charts keep the top N categories and fold the rest into "Other";
+* scatter plots with many points become a binned density plot.
+
+Only measure columns are ranked, summed or binned. Numeric columns named like
+identifiers (``customer_id``, ``order_key``, ...) label the data instead.
+
+Kaleido rendering is slow and blocking, so it runs in a worker pool, and
+rendered PNGs are cached by (query hash, chart type).
+"""
+
+import asyncio
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+MAX_LINE_POINTS = 2000
+MAX_BARS = 20
+MAX_SCATTER_POINTS = 5000
+SCATTER_BINS = 80
+RENDER_WORKERS = 2
+CHART_CACHE_ENTRIES = 64
+CHART_CACHE_TTL_SECONDS = 300
+
+_IDENTIFIER_COLUMN = re.compile(r"(?:^|_)(?:id|key|code|number|no)$", re.IGNORECASE)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Return the row positions LTTB keeps when reducing to ``threshold`` points."""
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    # Interior points are split into threshold - 2 buckets of roughly equal size.
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], max(edges[bucket + 1], edges[bucket] + 1)
+        if bucket + 2 < len(edges):
+            next_start, next_end = edges[bucket + 1], max(edges[bucket + 2], edges[bucket + 1] + 1)
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        # Keep the point that forms the largest triangle with the previous
+        # kept point and the average of the next bucket.
+        area = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def _measure_columns(df: pd.DataFrame) -> list:
+    """Numeric, non-boolean columns that are not named like identifiers."""
+    return [
+        column for column in df.columns
+        if pd.api.types.is_numeric_dtype(df[column])
+        and not pd.api.types.is_bool_dtype(df[column])
+        and not _IDENTIFIER_COLUMN.search(str(column))
+    ]
+
+
+def downsample_line(df: pd.DataFrame, max_points: int = MAX_LINE_POINTS) -> pd.DataFrame:
+    """Keep the rows LTTB selects for any measure series, in their original order."""
+    measures = _measure_columns(df)
+    if len(df) <= max_points or not measures:
+        return df
+    # Several series share the budget; each keeps its own shape.
+    per_series = max(3, max_points // len(measures))
+    positions = np.arange(len(df))
+    keep = set()
+    for column in measures:
+        values = df[column].to_numpy(dtype=float, na_value=np.nan)
+        values = np.nan_to_num(values, nan=np.nanmean(values) if np.isfinite(values).any() else 0.0)
+        keep.update(lttb_indices(positions, values, per_series).tolist())
+    return df.iloc[sorted(keep)]
+
+
+def top_n_with_other(df: pd.DataFrame, max_bars: int = MAX_BARS) -> pd.DataFrame:
+    """Keep the ``max_bars - 1`` largest categories and sum the rest into "Other".
+
+    Bars show the first measure column. The first other column, identifiers
+    included, labels them; without one the existing index does.
+    """
+    measures = _measure_columns(df)
+    if not measures:
+        return df
+    measure = measures[0]
+    labels = [column for column in df.columns if column not in measures]
+    frame = df.set_index(labels[0])[[measure]] if labels else df[[measure]]
+    if len(frame) <= max_bars:
+        return frame
+    ordered = frame.sort_values(measure, ascending=False)
+    top = ordered.iloc[: max_bars - 1]
+    # Labels become text so numeric identifiers sit beside "Other".
+    top.index = top.index.astype(str)
+    other = pd.DataFrame({measure: [ordered[measure].iloc[max_bars - 1:].sum()]}, index=["Other"])
+    return pd.concat([top, other])
+
+
+def binned_density(df: pd.DataFrame, bins: int = SCATTER_BINS) -> pd.DataFrame:
+    """Replace the first two measures' points with non-empty 2-D bin centres and counts."""
+    measures = _measure_columns(df)
+    if len(measures) < 2:
+        return df
+    x_name, y_name = measures[0], measures[1]
+    points = df[[x_name, y_name]].dropna().to_numpy(dtype=float)
+    counts, x_edges, y_edges = np.histogram2d(points[:, 0], points[:, 1], bins=bins)
+    x_centres = (x_edges[:-1] + x_edges[1:]) / 2
+    y_centres = (y_edges[:-1] + y_edges[1:]) / 2
+    x_index, y_index = np.nonzero(counts)
+    return pd.DataFrame({
+        x_name: x_centres[x_index],
+        y_name: y_centres[y_index],
+        "count": counts[x_index, y_index].astype(np.int64),
+    })
+
+
+def build_figure(df: pd.DataFrame, viz_type: str):
+    """Reduce ``df`` for the chart type and build the Plotly figure."""
+    if viz_type == "bar":
+        return px.bar(top_n_with_other(df))
+    if viz_type == "line":
+        return px.line(downsample_line(df))
+    if len(df) > MAX_SCATTER_POINTS and len(_measure_columns(df)) >= 2:
+        density = binned_density(df)
+        x_name, y_name = density.columns[:2]
+        return px.scatter(density, x=x_name, y=y_name, size="count", color="count")
+    return px.scatter(df)
+
+
+def render_png(df: pd.DataFrame, viz_type: str) -> bytes:
+    buf = BytesIO()
+    build_figure(df, viz_type).write_image(buf, format="png")
+    return buf.getvalue()
+
+
+def query_hash(sql: str, params=()) -> str:
+    text = " ".join(sql.split()) + "".join(f"\n@{name}={value!r}" for name, value in params)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ChartRenderer:
+    """Renders charts in a worker pool and caches the PNGs."""
+
+    def __init__(self, max_workers: int = RENDER_WORKERS, max_entries: int = CHART_CACHE_ENTRIES,
+                 ttl_seconds: float = CHART_CACHE_TTL_SECONDS, render=render_png):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chart-render")
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._render = render
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+    def _cached(self, key):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+                self._cache.pop(key, None)
+                return None
+            self._cache.move_to_end(key)
+            return entry[1]
+
+    def _store(self, key, png: bytes) -> None:
+        with self._lock:
+            self._cache[key] = (time.monotonic(), png)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    async def render(self, sql: str, df: pd.DataFrame, viz_type: str, params=()) -> bytes:
+        """Return the PNG for ``df``, rendering off the event loop on a cache miss.
+
+        ``params`` are the query's bound ``(name, value)`` pairs.
+        """
+        key = (query_hash(sql, params), viz_type)
+        png = self._cached(key)
+        if png is None:
+            loop = asyncio.get_running_loop()
+            png = await loop.run_in_executor(self._pool, self._render, df, viz_type)
+            self._store(key, png)
+        return png
@@ -0,0 +1,165 @@
+"""Registry of named, parameterized analytics queries.
+
+Templates are loaded from ``query_templates.yaml``. The dataset is filled in
+once at load time, and every value taken from the user's request is bound as a
+BigQuery query parameter rather than interpolated into the SQL. The same intent
+therefore always sends byte-identical SQL and can be served from BigQuery's
+24-hour result cache. :meth:`QueryTemplateRegistry.validate` dry-runs every
+template, so a broken template fails at start-up rather than mid-conversation.
+"""
+
+import datetime
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+import yaml
+from google.cloud import bigquery
+
+TEMPLATES_PATH = Path(__file__).with_name("query_templates.yaml")
+
+
+def _to_date(value: Any) -> datetime.date:
+    if isinstance(value, datetime.date):
+        return value
+    return pd.Timestamp(str(value)).date()
+
+
+_CONVERTERS = {
+    "INT64": int,
+    "FLOAT64": float,
+    "STRING": str,
+    "DATE": _to_date,
+}
+
+
+@dataclass(frozen=True)
+class QueryParameter:
+    name: str
+    type: str
+    default: Any = None
+    max: Optional[float] = None
+
+    def bind(self, raw: Optional[str]) -> Any:
+        """Convert a matched value to the parameter's type, or use the default."""
+        if raw is None:
+            return None if self.default is None else _CONVERTERS[self.type](self.default)
+        value = _CONVERTERS[self.type](raw.strip() if isinstance(raw, str) else raw)
+        if self.max is not None and value > self.max:
+            value = type(value)(self.max)
+        return value
+
+
+@dataclass(frozen=True)
+class QueryTemplate:
+    name: str
+    sql: str
+    pattern: "re.Pattern[str]"
+    viz_type: Optional[str] = None
+    parameters: Tuple[QueryParameter, ...] = ()
+
+    def match(self, user_query: str) -> Optional[Dict[str, Any]]:
+        """Bind the request's values, or return ``None`` if it does not fit.
+
+        A value that cannot be converted (for example an impossible date) is
+        treated as no match rather than an error.
+        """
+        found = self.pattern.search(user_query)
+        if found is None:
+            return None
+        groups = found.groupdict()
+        try:
+            return {parameter.name: parameter.bind(groups.get(parameter.name)) for parameter in self.parameters}
+        except (ValueError, TypeError, OverflowError):
+            return None
+
+
+@dataclass(frozen=True)
+class BoundQuery:
+    """A template with its parameter values; ``sql`` never contains user input."""
+
+    template: QueryTemplate
+    values: Tuple[Tuple[str, Any], ...] = ()
+
+    @property
+    def sql(self) -> str:
+        return self.template.sql
+
+    @property
+    def viz_type(self) -> Optional[str]:
+        return self.template.viz_type
+
+    def query_parameters(self) -> list:
+        types = {parameter.name: parameter.type for parameter in self.template.parameters}
+        return [bigquery.ScalarQueryParameter(name, types[name], value) for name, value in self.values]
+
+    def job_config(self, **kwargs: Any) -> bigquery.QueryJobConfig:
+        options = {"use_query_cache": True, **kwargs}
+        return bigquery.QueryJobConfig(query_parameters=self.query_parameters(), **options)
+
+
+class QueryTemplateRegistry:
+    def __init__(self, templates):
+        self.templates = {template.name: template for template in templates}
+
+    @classmethod
+    def from_yaml(cls, path: Path = TEMPLATES_PATH, *, dataset: str) -> "QueryTemplateRegistry":
+        with open(path, encoding="utf-8") as handle:
+            spec = yaml.safe_load(handle) or {}
+        templates = []
+        for name, entry in (spec.get("templates") or {}).items():
+            parameters = tuple(
+                QueryParameter(
+                    name=parameter_name,
+                    type=str(options.get("type", "STRING")).upper(),
+                    default=options.get("default"),
+                    max=options.get("max"),
+                )
+                for parameter_name, options in (entry.get("parameters") or {}).items()
+            )
+            unknown = [parameter.type for parameter in parameters if parameter.type not in _CONVERTERS]
+            if unknown:
+                raise ValueError(f"Template {name!r} uses unsupported parameter types: {unknown}")
+            templates.append(QueryTemplate(
+                name=name,
+                # Normalise whitespace so the text sent to BigQuery never varies.
+                sql=" ".join(entry["sql"].replace("{dataset}", dataset).split()),
+                pattern=re.compile(entry["pattern"], re.IGNORECASE),
+                viz_type=entry.get("viz_type"),
+                parameters=parameters,
+            ))
+        return cls(templates)
+
+    def match(self, user_query: str) -> BoundQuery:
+        normalized = " ".join(user_query.lower().split())
+        for template in self.templates.values():
+            values = template.match(normalized)
+            if values is not None:
+                return BoundQuery(template, tuple(sorted(values.items())))
+        raise ValueError("I couldn't understand your query. Please specify your analytics request.")
+
+    def defaults(self, name: str) -> BoundQuery:
+        template = self.templates[name]
+        return BoundQuery(template, tuple(sorted(
+            (parameter.name, parameter.bind(None)) for parameter in template.parameters
+        )))
+
+    def validate(self, client: bigquery.Client) -> Dict[str, int]:
+        """Dry-run every template with its defaults; return bytes each would scan.
+
+        Raises ``ValueError`` naming every template BigQuery rejects.
+        """
+        scanned, failures = {}, {}
+        for name in self.templates:
+            bound = self.defaults(name)
+            try:
+                job = client.query(bound.sql, job_config=bound.job_config(dry_run=True, use_query_cache=False))
+                scanned[name] = job.total_bytes_processed or 0
+            except Exception as error:  # BadRequest, NotFound, Forbidden, ...
+                failures[name] = str(error)
+        if failures:
+            details = "; ".join(f"{name}: {error}" for name, error in failures.items())
+            raise ValueError(f"Invalid query templates: {details}")
+        return scanned
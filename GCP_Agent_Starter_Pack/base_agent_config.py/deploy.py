@@ -31,7 +31,7 @@ def create(env_vars: dict[str, str]) -> None:
     remote_agent = agent_engines.create(
         app_instance,
         requirements="./requirements.txt",
-        extra_packages=["./agents/bigquery_data_analyzer_agent.py"],
+        extra_packages=["./agents"],
     )
     print(f"✅ Created remote agent: {remote_agent.resource_name}")
 
@@ -50,7 +50,7 @@ def update(env_vars: dict[str, str], resource_id: str) -> None:
         requirements="./requirements.txt",
         display_name="BigQuery Data Analyzer Agent",
         description="Agent for BigQuery analytics, dashboards, and reports.",
-        extra_packages=["./agents/bigquery_data_analyzer_agent.py"],
+        extra_packages=["./agents"],
     )
     print(f"✅ Updated remote agent: {resource_id}")
 
@@ -1,6 +1,10 @@
 #!/usr/bin/env python3
 """
 Build the winsights_agent package into a wheel.
+
+The shared data_analyst_agent_app package the agent imports (query guard,
+metadata digest, instruction cache) is built into its own wheel next to it, so
+the deploy scripts can install both by name instead of shipping a source path.
 """
 
 import subprocess
@@ -10,6 +14,26 @@ import sys
 
 ROOT = Path(__file__).resolve().parent
 DIST = ROOT / "dist"
+METADATA = ROOT / "winsights_agent" / "metadata"
+SHARED = ROOT.parent / "data_analyst_agent_app"
+SHARED_STAGE = ROOT / "build" / "shared"
+SHARED_PYPROJECT = """\
+[build-system]
+requires = ["setuptools", "wheel"]
+build-backend = "setuptools.build_meta"
+
+[project]
+name = "data_analyst_agent_app"
+version = "0.1.0"
+description = "Shared BigQuery helpers for the Winsights agent"
+requires-python = ">=3.10"
+
+[tool.setuptools]
+packages = ["data_analyst_agent_app"]
+
+[tool.setuptools.package-data]
+data_analyst_agent_app = ["*.json", "metadata/*.json"]
+"""
 
 def clean():
     for folder in ["build", "dist", "winsights_agent.egg-info"]:
@@ -18,6 +42,15 @@ def clean():
             shutil.rmtree(p)
             print(f"Removed {p}")
 
+def compile_metadata():
+    """Compile the metadata JSON into the compact digest the agent loads."""
+    result = subprocess.run(
+        [sys.executable, "-m", "data_analyst_agent_app.metadata_digest", "--metadata-dir", str(METADATA)],
+        cwd=ROOT.parent,
+    )
+    if result.returncode != 0:
+        raise SystemExit("Metadata digest build failed")
+
 def build():
     print("Building wheel using current python:", sys.executable)
     result = subprocess.run([sys.executable, "-m", "build", "--wheel", "--no-isolation"], cwd=ROOT)
@@ -29,6 +62,46 @@ def build():
     print("Built wheel:", wheels[-1])
     return wheels[-1]
 
+def build_shared(outdir=DIST):
+    """Build data_analyst_agent_app into a wheel in outdir from a staged copy."""
+    if SHARED_STAGE.exists():
+        shutil.rmtree(SHARED_STAGE)
+    shutil.copytree(
+        SHARED,
+        SHARED_STAGE / SHARED.name,
+        ignore=shutil.ignore_patterns("__pycache__", "*.pyc", "deploy-old"),
+    )
+    (SHARED_STAGE / "pyproject.toml").write_text(SHARED_PYPROJECT, encoding="utf-8")
+    result = subprocess.run(
+        [sys.executable, "-m", "build", "--wheel", "--no-isolation", "--outdir", str(outdir)],
+        cwd=SHARED_STAGE,
+    )
+    if result.returncode != 0:
+        raise SystemExit("Shared package build failed")
+    wheels = sorted(Path(outdir).glob("data_analyst_agent_app-*.whl"))
+    if not wheels:
+        raise SystemExit(f"No data_analyst_agent_app wheel found in {outdir}")
+    print("Built wheel:", wheels[-1])
+    return wheels[-1]
+
+def deploy_packages():
+    """Return (requirements, extra_packages) for agent_engines.create/update.
+
+    The wheels are uploaded with extra_packages and installed from the
+    requirements by the same dist/ path, so callers must run from ROOT.
+    """
+    wheels = []
+    for pattern in ("winsights_agent-*.whl", "data_analyst_agent_app-*.whl"):
+        found = sorted(DIST.glob(pattern))
+        if not found:
+            raise FileNotFoundError(f"No {pattern} in dist/. Run: python build_package.py")
+        wheels.append(found[-1].relative_to(ROOT).as_posix())
+    lines = (ROOT / "winsights_agent" / "requirements.txt").read_text(encoding="utf-8").splitlines()
+    requirements = [line.strip() for line in lines if line.strip() and not line.startswith("#")]
+    return requirements + wheels, wheels
+
 if __name__ == "__main__":
     clean()
+    compile_metadata()
     build()
+    build_shared()
@@ -11,6 +11,8 @@ import vertexai
 from vertexai import agent_engines
 from vertexai.preview.reasoning_engines import AdkApp
 
+from build_package import deploy_packages
+
 ROOT = Path(__file__).resolve().parent
 DIST = ROOT / "dist"
 PKG = ROOT / "winsights_agent"
@@ -38,22 +40,18 @@ def _collect_env_vars():
         env["BQ_AGENT_METADATA_DIR"] = str(PKG / "metadata")
     return env
 
-def _find_wheel():
-    wheels = sorted(DIST.glob("winsights_agent-*.whl"))
-    if not wheels:
-        raise FileNotFoundError("No wheel in dist/. Run: python build_package.py")
-    return wheels[-1]
-
 def create(env_vars):
-    wheel = _find_wheel()
+    # Both wheels (winsights_agent and the shared data_analyst_agent_app) are
+    # uploaded and installed from dist/, relative to ROOT.
+    requirements, wheels = deploy_packages()
     app_obj = AdkApp(agent=__import__("winsights_agent").root_agent, enable_tracing=True, env_vars=env_vars)
-    remote = agent_engines.create(app_obj, requirements=str(PKG / "requirements.txt"), extra_packages=[str(wheel)])
+    remote = agent_engines.create(app_obj, requirements=requirements, extra_packages=wheels)
     print("Created:", remote.resource_name)
 
 def update(env_vars, resource_id):
-    wheel = _find_wheel()
+    requirements, wheels = deploy_packages()
     app_obj = AdkApp(agent=__import__("winsights_agent").root_agent, enable_tracing=True, env_vars=env_vars)
-    agent_engines.update(resource_name=resource_id, agent_engine=app_obj, requirements=str(PKG / "requirements.txt"), extra_packages=[str(wheel)])
+    agent_engines.update(resource_name=resource_id, agent_engine=app_obj, requirements=requirements, extra_packages=wheels)
     print("Updated:", resource_id)
 
 def delete(resource_id):
@@ -77,6 +75,7 @@ def main(argv):
         print("Set GOOGLE_CLOUD_PROJECT, GOOGLE_CLOUD_LOCATION, and GOOGLE_CLOUD_STORAGE_BUCKET")
         return
     vertexai.init(project=project, location=location, staging_bucket=f"gs://{bucket}")
+    os.chdir(ROOT)
     if FLAGS.create:
         create(env_vars)
     elif FLAGS.update:
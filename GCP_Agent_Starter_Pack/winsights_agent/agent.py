@@ -9,7 +9,8 @@ which enables downloadable files for the end-user.
 """
 
 import os
-import json
+import functools
+from pathlib import Path
 import google.auth
 from dotenv import load_dotenv
 from google.adk.agents.llm_agent import Agent
@@ -17,6 +18,13 @@ from google.adk.tools.bigquery import BigQueryToolset
 from google.adk.tools.bigquery.config import BigQueryToolConfig, WriteMode
 from google.adk.tools.bigquery import BigQueryCredentialsConfig
 
+from data_analyst_agent_app.instruction_cache import (
+    StaticInstructionCache,
+    instruction_cache_enabled,
+)
+from data_analyst_agent_app.metadata_digest import DIGEST_FILENAME, SourceHashTracker, compile_digest, load_digest
+from data_analyst_agent_app.query_guard import DEFAULT_MAX_BYTES, QueryCostGuard
+
 # --------------------- CONFIG ---------------------
 load_dotenv()
 
@@ -39,7 +47,8 @@ if not OUTPUT_GCS_PATH: # <-- NEW
 # Read-only BigQuery mode + File Output Configuration
 tool_config = BigQueryToolConfig(
     write_mode=WriteMode.BLOCKED,
-    output_gcs_uri=OUTPUT_GCS_PATH  # <-- MODIFIED
+    output_gcs_uri=OUTPUT_GCS_PATH,  # <-- MODIFIED
+    maximum_bytes_billed=DEFAULT_MAX_BYTES,
 )
 
 # --------------------- AUTHENTICATION ---------------------
@@ -76,59 +85,105 @@ bigquery_toolset = BigQueryToolset(
     ],
 )
 
+# --------------------- QUERY COST GUARD ---------------------
+def _build_bigquery_client():
+    """Client used for dry runs and table lookups by the query guard."""
+    from google.cloud import bigquery
+
+    return bigquery.Client(credentials=credentials_config.credentials)
+
+# Dry-runs every execute_sql call; over-budget queries are limited to recent
+# partitions or rejected, and the estimate is returned to the model.
+query_guard = QueryCostGuard(tool_config, _build_bigquery_client)
+
 # --------------------- METADATA LOADER ---------------------
+METADATA_FOLDER = os.path.join(os.path.dirname(__file__), "metadata")
+METADATA_FILES = ("gt_wf_dataset_metadata.json", "ms_graph_dataset_metadata.json")
+
+
+def _metadata_paths():
+    return [Path(METADATA_FOLDER) / file_name for file_name in METADATA_FILES if os.path.exists(os.path.join(METADATA_FOLDER, file_name))]
+
+
+# Re-hashes the metadata files only when their mtime or size changes.
+metadata_hash = SourceHashTracker(_metadata_paths)
+
+
+def load_metadata_digest():
+    """Load the prebuilt metadata digest, or compile one if it is missing or stale."""
+    digest = load_digest(Path(METADATA_FOLDER) / DIGEST_FILENAME)
+    if digest is None or digest.source_hash != metadata_hash():
+        digest = compile_digest(_metadata_paths())
+    return digest
+
+
 def load_metadata_text():
-    """Load dataset metadata context from JSON files."""
-    metadata_folder = os.path.join(os.path.dirname(__file__), "metadata")
-    metadata_files = ["gt_wf_dataset_metadata.json", "ms_graph_dataset_metadata.json"]
-    metadata_context = []
-
-    for file_name in metadata_files:
-        file_path = os.path.join(metadata_folder, file_name)
-        if os.path.exists(file_path):
-            with open(file_path, "r", encoding="utf-8") as f:
-                meta = json.load(f)
-            dataset_name = file_name.replace("_dataset_metadata.json", "")
-            summary = json.dumps(meta, indent=2)
-            metadata_context.append(f"### Dataset: {dataset_name}\n```json\n{summary}\n```")
-
-    if not metadata_context:
+    """Load compact dataset metadata context: tables, columns, types, descriptions, row counts."""
+    if not _metadata_paths():
         return "No metadata context found."
+    return load_metadata_digest().to_text()
+
+# --------------------- INSTRUCTION ---------------------
+INSTRUCTION_TEMPLATE = """
+    🇬🇧 You are a British data analysis agent who uses BigQuery to answer questions about data.
+    Always respond in polished British English — clear, formal, and professional.
+    Use British spelling (analyse, colour, organise, optimise).
+    Format dates as DD Month YYYY (e.g., 31 October 2025).
+
+    **Core Directives**
+    - Your **primary capability** is to execute SQL queries using your tools.
+    - You **must not** claim you "cannot" create files. Your tools handle this for you.
+    - When a query result is large, the `execute_sql` tool will automatically save it to a file and provide a download link. Your *only* job is to present this file link to the user.
+    - **Never** say "I am an AI assistant and do not have the capability to create... files." This is incorrect. You DO have this capability via your tools.
+    - **Never** apologize for truncation or claim the tool has a "maximum number of rows." If a result is large, you must state that the full results are available in the file you are providing.
 
-    return "\n\n".join(metadata_context)
+    - Queries are dry-run against a scan budget. If `execute_sql` reports a `query_rewrite`, tell the user the results cover only recent partitions; if it rejects a query for cost, add partition filters or select fewer columns and retry.
 
-metadata_text = load_metadata_text()
+    **Capabilities**
+    - You can query BigQuery datasets the user has access to.
+    - You can describe dataset schemas and field meanings using metadata.
+    - You cannot modify or delete data (read-only mode).
+    - If a query produces many results, you **will** provide a downloadable file.
+
+    **Metadata Context**
+    This is contextual information about key datasets:
+
+    {metadata_text}
+    """
 
-# --------------------- AGENT INITIALIZATION ---------------------
-root_agent = Agent(
-    model="gemini-1.5-flash",
-    name="british_bigquery_agent",
-    description="A British BigQuery agent with read-only access and metadata awareness.",
-    instruction=f"""
-    🇬🇧 You are a British data analysis agent who uses BigQuery to answer questions about data.
-    Always respond in polished British English — clear, formal, and professional.
-    Use British spelling (analyse, colour, organise, optimise).
-    Format dates as DD Month YYYY (e.g., 31 October 2025).
-
-    **Core Directives**
-    - Your **primary capability** is to execute SQL queries using your tools.
-    - You **must not** claim you "cannot" create files. Your tools handle this for you.
-    - When a query result is large, the `execute_sql` tool will automatically save it to a file and provide a download link. Your *only* job is to present this file link to the user.
-    - **Never** say "I am an AI assistant and do not have the capability to create... files." This is incorrect. You DO have this capability via your tools.
-    - **Never** apologize for truncation or claim the tool has a "maximum number of rows." If a result is large, you must state that the full results are available in the file you are providing.
 
-    **Capabilities**
-    - You can query BigQuery datasets the user has access to.
-    - You can describe dataset schemas and field meanings using metadata.
-    - You cannot modify or delete data (read-only mode).
-    - If a query produces many results, you **will** provide a downloadable file.
+@functools.lru_cache(maxsize=4)
+def _instruction_for(metadata_version):
+    return INSTRUCTION_TEMPLATE.replace("{metadata_text}", load_metadata_text())
 
-    **Metadata Context**
-    This is contextual information about key datasets:
 
-    {metadata_text}
-    """,
-    tools=[bigquery_toolset],
+def build_instruction(_context=None):
+    """Instruction provider; rebuilt when the metadata files change."""
+    return _instruction_for(metadata_hash())
+
+# Opt-in (INSTRUCTION_CACHE=on): serve the instruction and tool declarations
+# from Gemini cached content, refreshed when the metadata hash changes.
+instruction_cache = (
+    StaticInstructionCache(
+        build_instruction,
+        content_hash=metadata_hash,
+        display_name="winsights-instruction",
+    )
+    if instruction_cache_enabled("INSTRUCTION_CACHE")
+    else None
+)
+
+# --------------------- AGENT INITIALIZATION ---------------------
+root_agent = Agent(
+    model="gemini-1.5-flash",
+    name="british_bigquery_agent",
+    description="A British BigQuery agent with read-only access and metadata awareness.",
+    instruction=build_instruction,
+    before_model_callback=instruction_cache.before_model_callback if instruction_cache else None,
+    after_model_callback=instruction_cache.after_model_callback if instruction_cache else None,
+    tools=[bigquery_toolset],
+    before_tool_callback=query_guard.before_tool_callback,
+    after_tool_callback=query_guard.after_tool_callback,
 )
 
 print("✅ British BigQuery Agent initialised successfully (ADC mode).")
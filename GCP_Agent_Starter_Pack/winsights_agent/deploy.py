@@ -1,6 +1,8 @@
 """Deployment script for Winsights (ADC-enabled)."""
 
 import os
+import sys
+from pathlib import Path
 from absl import app, flags
 from dotenv import load_dotenv
 import vertexai
@@ -8,6 +10,11 @@ from vertexai import agent_engines
 from vertexai.preview.reasoning_engines import AdkApp
 from Backup.agent import root_agent
 
+# GCP_Agent_Starter_Pack/, where build_package.py writes both wheels to dist/.
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+from build_package import deploy_packages
+
 FLAGS = flags.FLAGS
 flags.DEFINE_string("project_id", None, "GCP project ID.")
 flags.DEFINE_string("location", None, "GCP location.")
@@ -23,6 +30,7 @@ flags.mark_bool_flags_as_mutual_exclusive(["create", "delete", "update", "quickt
 def create(env_vars: dict[str, str]) -> None:
     """Creates a new deployment."""
     print("🚀 Creating new Vertex Agent Engine deployment...")
+    requirements, wheels = deploy_packages()
     app = AdkApp(
         agent=root_agent,
         enable_tracing=True,
@@ -30,8 +38,8 @@ def create(env_vars: dict[str, str]) -> None:
     )
     remote_agent = agent_engines.create(
         app,
-        requirements="./requirements.txt",
-        extra_packages=["./agent.py"],
+        requirements=requirements,
+        extra_packages=["winsights_agent/agent.py", *wheels],
     )
     print(f"✅ Created remote agent: {remote_agent.resource_name}")
 
@@ -39,6 +47,7 @@ def create(env_vars: dict[str, str]) -> None:
 def update(env_vars: dict[str, str], resource_id: str) -> None:
     """Updates an existing deployment."""
     print(f"🔄 Updating agent {resource_id} ...")
+    requirements, wheels = deploy_packages()
     app = AdkApp(
         agent=root_agent,
         enable_tracing=True,
@@ -47,10 +56,10 @@ def update(env_vars: dict[str, str], resource_id: str) -> None:
     agent_engines.update(
         resource_name=resource_id,
         agent_engine=app,
-        requirements="./requirements.txt",
+        requirements=requirements,
         display_name="Fresh Waste Agent",
         description="Agent generates waste insights",
-        extra_packages=["./agent.py"],
+        extra_packages=["winsights_agent/agent.py", *wheels],
     )
     print(f"✅ Updated remote agent: {resource_id}")
 
@@ -92,6 +101,8 @@ def main(argv: list[str]) -> None:
         location=location,
         staging_bucket=f"gs://{bucket}",
     )
+    # Packages are uploaded and installed by paths relative to ROOT.
+    os.chdir(ROOT)
 
     if FLAGS.create:
         create(env_vars)
@@ -2,60 +2,57 @@
 
 from __future__ import annotations
 
-import base64
-import builtins
-import contextlib
-import io
+import asyncio
+import functools
 import os
-import sys
+import re
 import textwrap
-import traceback
+import threading
+import uuid
+from pathlib import Path
 from typing import Any
 
-import google.auth
-import matplotlib.pyplot as plt
-import numpy as np
-import pandas as pd
 from dotenv import load_dotenv
 from google.adk.agents.llm_agent import Agent
 from google.adk.tools import FunctionTool
-from google.adk.tools.bigquery import BigQueryCredentialsConfig, BigQueryToolset
+from google.adk.tools.base_toolset import BaseToolset
 from google.adk.tools.bigquery.config import BigQueryToolConfig, WriteMode
+from google.adk.tools.tool_context import ToolContext
 
-<<<<<<< HEAD
-=======
-if __package__ is None:
-    from pathlib import Path
-
-    _current_dir = Path(__file__).resolve().parent
-    _package_root = _current_dir.parent
-    if str(_package_root) not in sys.path:
-        sys.path.insert(0, str(_package_root))
-
-try:
-    from data_analyst_agent_app.metadata_utils import (
-        create_dashboard_plan,
-        get_dataset_metadata,
-        get_table_metadata,
-        route_question_to_dataset,
-        summarise_metadata_for_prompt,
-    )
-except ModuleNotFoundError:  # pragma: no cover - fallback for script execution
-    from metadata_utils import (
-        create_dashboard_plan,
-        get_dataset_metadata,
-        get_table_metadata,
-        route_question_to_dataset,
-        summarise_metadata_for_prompt,
-    )
->>>>>>> 053d79e5652e52b720dbaa5a481f0243cfa6415c
+from data_analyst_agent_app.credentials import CredentialResolver
+from data_analyst_agent_app.dashboard_tiles import (
+    TileMaterializer,
+    TileStore,
+    dashboard_spec_from_plan,
+)
+from data_analyst_agent_app.dataset_router import route_question
+from data_analyst_agent_app.figure_store import (
+    ArtifactFigureStore,
+    LocalDiskFigureStore,
+    get_figure_publisher,
+)
+from data_analyst_agent_app.frame_registry import (
+    BigQueryArrowReader,
+    FrameRegistry,
+    get_session_registries,
+    session_key,
+)
+from data_analyst_agent_app.instruction_cache import (
+    StaticInstructionCache,
+    instruction_cache_enabled,
+)
 from data_analyst_agent_app.metadata_utils import (
     create_dashboard_plan,
+    get_catalog,
     get_dataset_metadata,
     get_table_metadata,
-    route_question_to_dataset,
     summarise_metadata_for_prompt,
 )
+from data_analyst_agent_app.prompt_slices import inject_metadata_slice
+from data_analyst_agent_app.query_guard import DEFAULT_MAX_BYTES, QueryCostGuard
+from data_analyst_agent_app.result_encoding import decode_cursor
+from data_analyst_agent_app.sandbox import get_default_executor
+from data_analyst_agent_app.sql_cache import BigQueryTableVersions, build_sql_cache
 
 load_dotenv()
 
@@ -63,184 +60,109 @@ CREDENTIALS_TYPE = os.getenv("CREDENTIALS_TYPE", "ADC").upper()
 DEFAULT_PROJECT_ID = os.getenv("DATA_ANALYST_PROJECT", "wmt-ade-agentspace-dev")
 DEFAULT_LOCATION = os.getenv("BIGQUERY_LOCATION", "us-central1")
 
+_FRAME_REFERENCE = re.compile(r"""frames\[\s*["']([^"']+)["']\s*\]""")
 
-def _build_safe_globals() -> dict[str, Any]:
-    """Construct a restricted globals dictionary for executing Python code."""
-
-    allowed_builtins = {
-        "abs",
-        "all",
-        "any",
-        "bool",
-        "dict",
-        "enumerate",
-        "float",
-        "int",
-        "len",
-        "list",
-        "max",
-        "min",
-        "pow",
-        "print",
-        "range",
-        "round",
-        "set",
-        "sorted",
-        "str",
-        "sum",
-        "tuple",
-        "zip",
-    }
-    safe_builtins = {name: getattr(builtins, name) for name in allowed_builtins}
-    return {"__builtins__": safe_builtins}
 
+def _adopt_spilled_result(
+    registry: FrameRegistry, handle: str, spill_path: Path, payload: dict[str, Any]
+) -> None:
+    """Register a truncated result written by the sandbox, or discard its file."""
 
-def run_python_analysis(code: str) -> dict[str, Any]:
+    result = payload.get("result")
+    spilled = result.pop("_spill", None) if isinstance(result, dict) else None
+    if spilled is None:
+        spill_path.unlink(missing_ok=True)
+        return
+    try:
+        registry.adopt(
+            handle,
+            Path(spilled["path"]),
+            nbytes=spilled["nbytes"],
+            num_rows=spilled["num_rows"],
+            columns=spilled["columns"],
+        )
+    except ValueError:
+        result.pop("next_cursor", None)
+        return
+    result["frame"] = handle
+
+
+async def run_python_analysis(code: str, tool_context: ToolContext) -> dict[str, Any]:
     """Execute ad-hoc Python for data exploration and dashboard creation.
 
-    The code is executed inside a sandboxed environment that exposes popular
+    The code is executed inside a sandboxed worker process that exposes popular
     data-analysis libraries. To share results with the user, assign any final
     table to a variable named ``result``. Matplotlib figures that remain open
-    after execution are captured and returned as base64-encoded PNG payloads so
-    the caller can render dashboards or charts.
+    after execution are rendered to PNG and saved as session artifacts; the
+    response lists their artifact names so the charts can be shown to the user
+    without resending image data. Each call is subject to a wall-clock and
+    memory limit; exceeding either returns an ``error``.
 
     Args:
         code: The Python code to execute. Prefer pure functions and declarative
             analysis steps. The helper variables ``pd`` (pandas), ``np``
             (NumPy), ``plt`` (Matplotlib) and ``px`` (Plotly Express, when
-            installed) are available by default.
+            installed) are available by default. Results loaded with
+            ``query_to_frame`` are available as ``frames["<handle>"]`` pandas
+            DataFrames.
 
     Returns:
-        A dictionary containing stdout, optional ``result`` payloads, and any
-        generated figures.
+        A dictionary containing stdout, optional ``result`` payloads, and
+        references to any generated figures. DataFrame results are columnar:
+        column names and types once, then one value array per column. Large
+        results are cut to a head/tail sample with a ``summary``; pass
+        ``next_cursor`` to ``fetch_result_page`` for more rows, or read the
+        full table in Python as ``frames[result["frame"]]``.
     """
 
-    safe_globals = _build_safe_globals()
-    sandbox_locals: dict[str, Any] = {
-        "pd": pd,
-        "pandas": pd,
-        "np": np,
-        "numpy": np,
-        "plt": plt,
-    }
-
-    try:
-        import plotly.express as px
-        import plotly.graph_objects as go
-        from plotly.subplots import make_subplots
-
-        sandbox_locals.update({
-            "px": px,
-            "plotly_express": px,
-            "go": go,
-            "plotly_graph_objects": go,
-        })
-
-        def compose_dashboard(
-            charts: list[dict[str, Any]],
-            *,
-            title: str | None = None,
-            rows: int | None = None,
-            cols: int | None = None,
-            shared_x: bool = False,
-            shared_y: bool = False,
-        ) -> "go.Figure":
-            """Create a Plotly dashboard from simple chart specifications.
-
-            Each chart specification should include a ``type`` that maps to a
-            ``plotly.express`` function (for example ``bar`` or ``line``), the
-            ``data`` to plot (either a pandas DataFrame or a mapping compatible
-            with ``pd.DataFrame``) and optional ``params`` with keyword
-            arguments passed to the plotting function. Custom placement can be
-            controlled with ``row`` and ``col`` indices.
-            """
-
-            if not charts:
-                raise ValueError("Please provide at least one chart specification.")
-
-            resolved_rows = rows or len(charts)
-            resolved_cols = cols or 1
-            subplot_titles = [chart.get("title") for chart in charts]
-            figure = make_subplots(
-                rows=resolved_rows,
-                cols=resolved_cols,
-                subplot_titles=subplot_titles if any(subplot_titles) else None,
-                shared_xaxes=shared_x,
-                shared_yaxes=shared_y,
-            )
-
-            for index, chart in enumerate(charts):
-                chart_type = chart.get("type", "bar")
-                plot_func = getattr(px, chart_type, None)
-                if plot_func is None:
-                    raise ValueError(f"Unknown chart type '{chart_type}'.")
-
-                data = chart.get("data")
-                if data is None:
-                    raise ValueError("Each chart specification requires a 'data' value.")
-                if isinstance(data, pd.DataFrame):
-                    frame = data
-                else:
-                    frame = pd.DataFrame(data)
-
-                params = dict(chart.get("params", {}))
-                params.setdefault("data_frame", frame)
-                chart_figure = plot_func(**params)
-
-                row = chart.get("row") or index // resolved_cols + 1
-                col = chart.get("col") or index % resolved_cols + 1
-                for trace in chart_figure.data:
-                    figure.add_trace(trace, row=row, col=col)
+    session_id = session_key(tool_context)
+    registry = get_session_registries().registry_for(session_id)
+    for handle in _FRAME_REFERENCE.findall(code):
+        registry.get(handle)
+    result_handle = f"result-{uuid.uuid4().hex[:8]}"
+    spill_path = registry.reserve_path(result_handle)
+    publisher = get_figure_publisher()
+    payload = await get_default_executor().run_async(
+        code,
+        frames=registry.paths(),
+        result_options={"cursor_handle": result_handle, "spill_path": str(spill_path)},
+        figure_options={"known": sorted(publisher.known(session_id))},
+    )
+    _adopt_spilled_result(registry, result_handle, spill_path, payload)
+    if payload.get("figures"):
+        store = ArtifactFigureStore(tool_context, fallback=LocalDiskFigureStore())
+        payload["figures"] = await publisher.publish(
+            session_id, store, payload["figures"]
+        )
+    return payload
 
-                xaxis = chart_figure.layout.xaxis
-                yaxis = chart_figure.layout.yaxis
-                figure.update_xaxes(xaxis, row=row, col=col)
-                figure.update_yaxes(yaxis, row=row, col=col)
 
-            if title:
-                figure.update_layout(title=title)
+async def fetch_result_page(cursor: str, tool_context: ToolContext) -> dict[str, Any]:
+    """Fetch the next rows of a truncated ``run_python_analysis`` result.
 
-            return figure
+    Args:
+        cursor: The ``next_cursor`` value from a previous result or page.
 
-        sandbox_locals["compose_dashboard"] = compose_dashboard
-    except Exception:  # pragma: no cover - optional dependency
-        pass
+    Returns:
+        A columnar page in the same format as ``run_python_analysis`` results,
+        with its own ``next_cursor`` while rows remain.
+    """
 
-    stdout_buffer = io.StringIO()
     try:
-        with contextlib.redirect_stdout(stdout_buffer):
-            exec(compile(code, "<data_analyst_python_tool>", "exec"), safe_globals, sandbox_locals)  # noqa: S102
-    except Exception:
-        return {
-            "stdout": stdout_buffer.getvalue(),
-            "error": traceback.format_exc(),
-        }
-
-    figures: list[str] = []
-    for figure_number in plt.get_fignums():
-        figure = plt.figure(figure_number)
-        buffer = io.BytesIO()
-        figure.savefig(buffer, format="png", bbox_inches="tight")
-        buffer.seek(0)
-        figures.append(base64.b64encode(buffer.read()).decode("utf-8"))
-    plt.close("all")
-
-    payload: dict[str, Any] = {"stdout": stdout_buffer.getvalue()}
-    if "result" in sandbox_locals:
-        result_obj = sandbox_locals["result"]
-        if isinstance(result_obj, pd.DataFrame):
-            payload["result"] = {
-                "type": "dataframe",
-                "columns": list(result_obj.columns),
-                "records": result_obj.to_dict(orient="records"),
-            }
-        else:
-            payload["result"] = repr(result_obj)
-
-    if figures:
-        payload["figures"] = figures
-
-    return payload
+        handle, offset = decode_cursor(cursor)
+    except ValueError as exc:
+        return {"error": str(exc)}
+    registry = get_session_registries().registry_for(session_key(tool_context))
+    if registry.get(handle) is None:
+        return {"error": f"Result '{handle}' has expired; re-run the analysis."}
+    payload = await get_default_executor().run_async(
+        f"result = frames[{handle!r}].iloc[{offset}:]",
+        frames={handle: registry.paths()[handle]},
+        result_options={"cursor_handle": handle, "offset": offset},
+    )
+    if "error" in payload:
+        return {"error": payload["error"]}
+    return payload["result"]
 
 
 tool_config = BigQueryToolConfig(
@@ -249,35 +171,146 @@ tool_config = BigQueryToolConfig(
     location=DEFAULT_LOCATION,
     application_name="wmt-data-analyst-agent",
     max_query_result_rows=5000,
+    maximum_bytes_billed=DEFAULT_MAX_BYTES,
 )
 
-if CREDENTIALS_TYPE == "OAUTH2":
-    credentials_config = BigQueryCredentialsConfig(
-        client_id=os.getenv("OAUTH_CLIENT_ID"),
-        client_secret=os.getenv("OAUTH_CLIENT_SECRET"),
-    )
-elif CREDENTIALS_TYPE == "SERVICE_ACCOUNT":
-    creds, _ = google.auth.load_credentials_from_file("service_account_key.json")
-    credentials_config = BigQueryCredentialsConfig(credentials=creds)
-else:
-    application_default_credentials, _ = google.auth.default()
-    credentials_config = BigQueryCredentialsConfig(
-        credentials=application_default_credentials
+_credentials = CredentialResolver(CREDENTIALS_TYPE)
+_BIGQUERY_TOOLS = [
+    "list_dataset_ids",
+    "get_dataset_info",
+    "list_table_ids",
+    "get_table_info",
+    "execute_sql",
+]
+
+
+class _LazyBigQueryToolset(BaseToolset):
+    """Build the BigQuery toolset, and resolve its credentials, on first use.
+
+    Importing the toolset pulls in ``google.cloud.bigquery`` and resolving
+    credentials may call the metadata server; neither should happen at
+    module import, which every replica cold start and ``adk web`` reload pays.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._toolset: BaseToolset | None = None
+        self._lock = threading.Lock()
+
+    def _build(self) -> BaseToolset:
+        with self._lock:
+            if self._toolset is None:
+                from google.adk.tools.bigquery import BigQueryToolset
+
+                self._toolset = BigQueryToolset(
+                    credentials_config=_credentials.credentials_config(),
+                    bigquery_tool_config=tool_config,
+                    tool_filter=_BIGQUERY_TOOLS,
+                )
+            return self._toolset
+
+    async def get_tools(self, readonly_context: Any = None) -> list[Any]:
+        toolset = self._toolset or await asyncio.to_thread(self._build)
+        return await toolset.get_tools(readonly_context)
+
+    async def close(self) -> None:
+        if self._toolset is not None:
+            await self._toolset.close()
+
+
+bigquery_toolset = _LazyBigQueryToolset()
+
+
+@functools.cache
+def _build_bigquery_client() -> Any:
+    from google.cloud import bigquery
+
+    return bigquery.Client(
+        project=DEFAULT_PROJECT_ID,
+        location=DEFAULT_LOCATION,
+        credentials=_credentials.get(),
     )
 
-bigquery_toolset = BigQueryToolset(
-    credentials_config=credentials_config,
-    bigquery_tool_config=tool_config,
-    tool_filter=[
-        "list_dataset_ids",
-        "get_dataset_info",
-        "list_table_ids",
-        "get_table_info",
-        "execute_sql",
-    ],
+
+_arrow_reader = BigQueryArrowReader(
+    _build_bigquery_client,
+    maximum_bytes_billed=tool_config.maximum_bytes_billed,
+    labels=getattr(tool_config, "job_labels", None),
+)
+# Under OAUTH2 each user queries with their own permissions, so cached
+# results are scoped to the user who produced them.
+_sql_cache = build_sql_cache(
+    BigQueryTableVersions(_build_bigquery_client),
+    per_user=not _credentials.shared,
 )
+_query_guard = QueryCostGuard(tool_config, _build_bigquery_client)
+
+# The guard runs first so the cache only ever sees the SQL that executes;
+# after-callbacks stop at the first non-None result, so the cache (which
+# returns None) must come before the guard (which annotates the response).
+_before_tool_callbacks: list[Any] = [_query_guard.before_tool_callback]
+_after_tool_callbacks: list[Any] = []
+if _sql_cache is not None:
+    _before_tool_callbacks.append(_sql_cache.before_tool_callback)
+    _after_tool_callbacks.append(_sql_cache.after_tool_callback)
+_after_tool_callbacks.append(_query_guard.after_tool_callback)
+
+
+async def query_to_frame(
+    sql: str, handle: str, tool_context: ToolContext
+) -> dict[str, Any]:
+    """Run a read-only SQL query and keep the full result for Python analysis.
+
+    Use this instead of ``execute_sql`` when the rows will be analysed or
+    charted with ``run_python_analysis``. The result is never returned to you;
+    only its shape is. Refer to it in Python code as ``frames["<handle>"]``.
+
+    Args:
+        sql: A BigQuery Standard SQL ``SELECT`` statement.
+        handle: Short name for the result (letters, digits, ``_`` or ``-``).
+            Reusing a handle replaces the previous frame.
+
+    Returns:
+        The handle, row count, byte size and column schema of the stored frame,
+        plus the other frames currently available in this session.
+    """
+
+    if not _credentials.shared:
+        return {
+            "status": "ERROR",
+            "error_details": (
+                "query_to_frame is unavailable when users sign in with their own "
+                "credentials; use execute_sql instead."
+            ),
+        }
+    decision = await asyncio.to_thread(_query_guard.check, sql, DEFAULT_PROJECT_ID)
+    if decision.action == "reject":
+        return {
+            "status": "ERROR",
+            "error_details": decision.message,
+            "cost_estimate": decision.estimate.as_dict() if decision.estimate else None,
+        }
+    table = await asyncio.to_thread(_arrow_reader.read, decision.sql)
+    registry = get_session_registries().registry_for(session_key(tool_context))
+    entry = registry.put(handle, table, sql=decision.sql)
+    response: dict[str, Any] = {
+        "frame": entry.describe(),
+        "available_frames": [item["handle"] for item in registry.describe()],
+    }
+    if decision.estimate is not None:
+        response["cost_estimate"] = decision.estimate.as_dict()
+    if decision.action == "rewrite":
+        response["query_rewrite"] = {
+            "reason": decision.message,
+            "executed_query": decision.sql,
+            "partition_filters": list(decision.predicates),
+        }
+    return response
+
 
 python_tool = FunctionTool(func=run_python_analysis)
+result_page_tool = FunctionTool(func=fetch_result_page)
+frame_tool = FunctionTool(func=query_to_frame)
 
 
 def fetch_metadata(dataset_id: str, table_id: str | None = None) -> dict[str, Any]:
@@ -297,10 +330,30 @@ def fetch_metadata(dataset_id: str, table_id: str | None = None) -> dict[str, An
 
 
 def recommend_dataset(question: str) -> dict[str, Any]:
-    """Suggest the most relevant dataset for an incoming user query."""
+    """Suggest the most relevant datasets and tables for an incoming user query."""
+
+    routing = route_question(question, limit=5)
+    return {
+        "dataset": routing.best_dataset,
+        "reason": routing.reason(),
+        "ranked_datasets": [match.as_dict() for match in routing.datasets],
+        "ranked_tables": [match.as_dict() for match in routing.tables],
+    }
+
 
-    dataset_id, reason = route_question_to_dataset(question)
-    return {"dataset": dataset_id, "reason": reason}
+_tile_store = TileStore()
+
+
+def _read_tile(sql: str) -> Any:
+    decision = _query_guard.check(sql, DEFAULT_PROJECT_ID)
+    if decision.action == "reject":
+        raise ValueError(decision.message)
+    return _arrow_reader.read(decision.sql)
+
+
+_tile_materializer = TileMaterializer(
+    _tile_store, _read_tile, BigQueryTableVersions(_build_bigquery_client)
+)
 
 
 def plan_dashboard(
@@ -308,17 +361,122 @@ def plan_dashboard(
     question: str | None = None,
     focus_tables: list[str] | None = None,
 ) -> dict[str, Any]:
-    """Draft a dashboard plan rooted in curated metadata."""
+    """Draft a dashboard plan rooted in curated metadata.
 
-    return create_dashboard_plan(objective=objective, question=question, focus_tables=focus_tables)
+    The plan is saved as a reusable dashboard spec; pass its ``dashboard_id``
+    to ``render_dashboard`` to compute or reuse the tiles.
+    """
+
+    plan = create_dashboard_plan(
+        objective=objective, question=question, focus_tables=focus_tables
+    )
+    spec = dashboard_spec_from_plan(plan, DEFAULT_PROJECT_ID)
+    if spec.tiles and _credentials.shared:
+        _tile_store.save_spec(spec)
+        plan["dashboard_id"] = spec.dashboard_id
+        plan["tiles"] = [tile.as_dict() for tile in spec.tiles]
+    return plan
+
+
+async def render_dashboard(
+    dashboard_id: str, tool_context: ToolContext, refresh: bool = False
+) -> dict[str, Any]:
+    """Render a planned dashboard from materialized, pre-aggregated tiles.
+
+    Tiles are reused until their source table changes, so rendering a
+    dashboard again is cheap. Each tile is also loaded as the frame
+    ``tile_<tile_id>`` for charting with ``run_python_analysis``.
+
+    Args:
+        dashboard_id: The ``dashboard_id`` returned by ``plan_dashboard``.
+        refresh: Recompute every tile even when its source is unchanged.
+
+    Returns:
+        Per-tile summaries with a short preview, where each tile was served
+        from, and the frame handle holding its full result.
+    """
+
+    if not _credentials.shared:
+        # Tiles are read with the agent's identity and shared by every user.
+        return {
+            "status": "ERROR",
+            "error_details": (
+                "render_dashboard is unavailable when users sign in with their "
+                "own credentials; use execute_sql instead."
+            ),
+        }
+    spec = _tile_store.load_spec(dashboard_id)
+    if spec is None:
+        return {
+            "status": "ERROR",
+            "error_details": f"Unknown dashboard '{dashboard_id}'; call plan_dashboard.",
+        }
+    results = await asyncio.to_thread(_tile_materializer.render, spec, refresh=refresh)
+    registry = get_session_registries().registry_for(session_key(tool_context))
+    tiles: list[dict[str, Any]] = []
+    for result in results:
+        handle = f"tile_{result.tile.tile_id}"
+        if result.error is None:
+            try:
+                registry.put(handle, result.table, sql=result.tile.sql())
+            except ValueError as exc:
+                result.error = str(exc)
+        summary = result.describe()
+        if result.error is None:
+            summary["frame"] = handle
+        tiles.append(summary)
+    return {
+        "dashboard_id": dashboard_id,
+        "objective": spec.objective,
+        "tiles": tiles,
+    }
 
 
 metadata_tool = FunctionTool(func=fetch_metadata)
 dataset_router_tool = FunctionTool(func=recommend_dataset)
 dashboard_planner_tool = FunctionTool(func=plan_dashboard)
+dashboard_render_tool = FunctionTool(func=render_dashboard)
+
+
+# "slice" (default) injects only the metadata relevant to each question via a
+# before-model callback; "full" embeds the whole overview in the instruction.
+METADATA_PROMPT_MODE = os.getenv("DATA_ANALYST_METADATA_PROMPT_MODE", "slice").lower()
+
+_METADATA_CALLBACK = None if METADATA_PROMPT_MODE == "full" else inject_metadata_slice
+
+
+def _metadata_prompt() -> str:
+    if METADATA_PROMPT_MODE == "full":
+        return "Dataset metadata overview:\n" + textwrap.indent(
+            summarise_metadata_for_prompt(), "  "
+        )
+    return (
+        "Metadata for the tables most relevant to each question is appended "
+        "below; call ``fetch_metadata`` for anything else."
+    )
 
 
-_METADATA_PROMPT = summarise_metadata_for_prompt()
+# query_to_frame and render_dashboard read with the agent's identity, so they
+# are only offered when every user shares that identity (ADC or
+# SERVICE_ACCOUNT).
+_FRAME_GUIDANCE = (
+    """
+When rows need to be analysed or charted in Python, load them with
+``query_to_frame`` and read them inside ``run_python_analysis`` as
+``frames["<handle>"]`` rather than copying query results into code.
+"""
+    if _credentials.shared
+    else ""
+)
+_TILE_GUIDANCE = (
+    """
+``render_dashboard`` computes a planned dashboard's tiles once and reuses
+them until the source tables change, so prefer it when a dashboard is
+requested again.
+"""
+    if _credentials.shared
+    else ""
+)
 
 _BASE_INSTRUCTION = f"""
 You are a meticulous British data analyst supporting the `{DEFAULT_PROJECT_ID}`
@@ -332,16 +490,56 @@ questions, and pivot to ``gt_wf`` when analysing workforce, employment,
 attrition, or hiring matters. When metadata is inconclusive, call the
 ``recommend_dataset`` tool to document your routing decision.
 
+Every query is dry-run against a scan budget first. Responses carry a
+``cost_estimate``; an over-budget query is either limited to recent
+partitions (reported under ``query_rewrite``, which you must mention to the
+user) or rejected, in which case add partition filters or select fewer
+columns and try again.
+{_FRAME_GUIDANCE}
 When crafting visuals, consider combining multiple related charts into a
 dashboard using the ``compose_dashboard`` helper inside ``run_python_analysis``
 or the ``plan_dashboard`` function tool to sketch a layout before rendering
-with Python. Always narrate your analytical steps, reference the metadata
-you relied upon, and explain how stakeholders might interpret the results.
-
-Dataset metadata overview:
-{textwrap.indent(_METADATA_PROMPT, '  ')}
+with Python. Always narrate your analytical steps, reference the metadata you
+relied upon, and explain how stakeholders might interpret the results.
+{_TILE_GUIDANCE}
 """
 
+
+def _metadata_version() -> str:
+    return get_catalog().content_hash if METADATA_PROMPT_MODE == "full" else ""
+
+
+@functools.lru_cache(maxsize=4)
+def _instruction_for(metadata_version: str) -> str:
+    return f"{_BASE_INSTRUCTION}{_metadata_prompt()}\n"
+
+
+def build_instruction(_context: Any = None) -> str:
+    """Instruction provider; ``full`` mode follows edits to the metadata files."""
+
+    return _instruction_for(_metadata_version())
+
+
+# Opt-in: serve the static instruction and tool declarations from Gemini
+# cached content, refreshed whenever the instruction or metadata changes.
+_instruction_cache = (
+    StaticInstructionCache(
+        build_instruction,
+        content_hash=_metadata_version,
+        display_name="wmt-data-analyst-instruction",
+    )
+    if instruction_cache_enabled()
+    else None
+)
+_before_model_callbacks: list[Any] = [
+    callback
+    for callback in (
+        _METADATA_CALLBACK,
+        _instruction_cache.before_model_callback if _instruction_cache else None,
+    )
+    if callback is not None
+]
+
 root_agent = Agent(
     model="gemini-2.5-pro",
     name="wmt_data_analyst_agent",
@@ -349,12 +547,21 @@ root_agent = Agent(
         "British-flavoured analyst for the "
         f"{DEFAULT_PROJECT_ID} BigQuery project with rich metadata awareness."
     ),
-    instruction=_BASE_INSTRUCTION,
+    instruction=build_instruction,
+    before_model_callback=_before_model_callbacks or None,
+    after_model_callback=(
+        _instruction_cache.after_model_callback if _instruction_cache else None
+    ),
+    before_tool_callback=_before_tool_callbacks,
+    after_tool_callback=_after_tool_callbacks,
     tools=[
         dataset_router_tool,
         metadata_tool,
         dashboard_planner_tool,
+        *([dashboard_render_tool] if _credentials.shared else []),
         bigquery_toolset,
+        *([frame_tool] if _credentials.shared else []),
         python_tool,
+        result_page_tool,
     ],
 )
@@ -0,0 +1,107 @@
+"""Deferred credential resolution for the agent's BigQuery access.
+
+Resolving Application Default Credentials can mean a metadata-server round
+trip, and ``google.auth`` itself is not free to import. Doing that at module
+import made every Agent Engine replica cold start and every ``adk web`` reload
+pay for it, even when the first turn never touched BigQuery.
+:class:`CredentialResolver` defers both until credentials are first needed,
+then caches the result for the life of the process.
+"""
+
+from __future__ import annotations
+
+import functools
+import os
+import threading
+from collections.abc import Callable
+from typing import Any
+
+CREDENTIAL_TYPES = ("ADC", "SERVICE_ACCOUNT", "OAUTH2")
+DEFAULT_SERVICE_ACCOUNT_KEY = os.getenv(
+    "DATA_ANALYST_SERVICE_ACCOUNT_KEY", "service_account_key.json"
+)
+
+
+def _load_adc() -> Any:
+    import google.auth
+
+    credentials, _ = google.auth.default()
+    return credentials
+
+
+def _load_service_account(path: str) -> Any:
+    import google.auth
+
+    credentials, _ = google.auth.load_credentials_from_file(path)
+    return credentials
+
+
+class CredentialResolver:
+    """Resolve credentials for ``credentials_type`` once, on first use.
+
+    ``OAUTH2`` has nothing to resolve: end users sign in through the
+    toolset's OAuth flow, so :meth:`get` returns ``None`` and the toolset is
+    configured with the client id and secret instead. Unrecognised types fall
+    back to ``ADC``.
+    """
+
+    def __init__(
+        self,
+        credentials_type: str = "ADC",
+        *,
+        key_path: str = DEFAULT_SERVICE_ACCOUNT_KEY,
+        loader: Callable[[], Any] | None = None,
+    ) -> None:
+        credentials_type = credentials_type.upper()
+        if credentials_type not in CREDENTIAL_TYPES:
+            # Anything unrecognised has always meant Application Default
+            # Credentials.
+            credentials_type = "ADC"
+        self.credentials_type = credentials_type
+        self.key_path = key_path
+        if loader is None:
+            if credentials_type == "SERVICE_ACCOUNT":
+                loader = functools.partial(_load_service_account, key_path)
+            elif credentials_type == "ADC":
+                loader = _load_adc
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._credentials: Any = None
+        self._resolved = False
+
+    @property
+    def resolved(self) -> bool:
+        return self._resolved
+
+    @property
+    def shared(self) -> bool:
+        """Whether every user reaches BigQuery with the same identity.
+
+        Under ``OAUTH2`` each user's own permissions apply, so nothing read
+        with the agent's identity may be handed to them.
+        """
+
+        return self.credentials_type != "OAUTH2"
+
+    def get(self) -> Any | None:
+        """Return the credentials, resolving them on the first call."""
+
+        if self._resolved:
+            return self._credentials
+        with self._lock:
+            if not self._resolved:
+                self._credentials = self._loader() if self._loader else None
+                self._resolved = True
+        return self._credentials
+
+    def credentials_config(self) -> Any:
+        """Build the ADK ``BigQueryCredentialsConfig`` for this credential type."""
+
+        from google.adk.tools.bigquery import BigQueryCredentialsConfig
+
+        if self.credentials_type == "OAUTH2":
+            return BigQueryCredentialsConfig(
+                client_id=os.getenv("OAUTH_CLIENT_ID"),
+                client_secret=os.getenv("OAUTH_CLIENT_SECRET"),
+            )
+        return BigQueryCredentialsConfig(credentials=self.get())
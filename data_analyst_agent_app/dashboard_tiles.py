@@ -0,0 +1,422 @@
+"""Reusable dashboard specs with pre-aggregated, materialized tiles.
+
+``plan_dashboard`` used to describe charts in prose, so each time a
+stakeholder asked for the dashboard again, every chart was recomputed with
+ad-hoc SQL. This module makes the plan concrete:
+
+* :class:`TileSpec` is one chart's aggregate query: a metric, optionally
+  grouped by a dimension, over one table. :class:`DashboardSpec` is an
+  ordered set of tiles. Both have content-derived ids, so the same plan
+  always maps to the same dashboard.
+* :class:`TileStore` keeps dashboard specs as JSON and each tile's result as
+  a small Parquet file. A JSON sidecar records the source table's
+  ``lastModifiedTime`` at materialization.
+* :class:`TileMaterializer` renders a dashboard. A tile is served from its
+  Parquet file while the source table is unchanged. Views and external
+  tables have no version, so their tiles are served within a TTL. Stale or
+  missing tiles are queried concurrently and written back.
+
+Re-rendering a known dashboard therefore costs one (memoised) table lookup
+per tile and a local Parquet read, instead of a BigQuery query per chart.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from data_analyst_agent_app.sql_cache import TableVersionProvider
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_TILE_DIR = Path(
+    os.getenv(
+        "DATA_ANALYST_TILE_DIR",
+        Path(tempfile.gettempdir()) / "data-analyst-tiles",
+    )
+)
+# Tiles over views and external tables have no version to compare against.
+DEFAULT_UNVERSIONED_TTL_SECONDS = float(
+    os.getenv("DATA_ANALYST_TILE_TTL_SECONDS", "900")
+)
+# How long a table's lastModifiedTime is trusted before it is fetched again.
+DEFAULT_VERSION_TTL_SECONDS = float(
+    os.getenv("DATA_ANALYST_TILE_VERSION_TTL_SECONDS", "15")
+)
+DEFAULT_MAX_GROUPS = 50
+DEFAULT_MAX_WORKERS = 4
+
+_AGGREGATES = {"SUM", "AVG", "MIN", "MAX", "COUNT"}
+
+
+def _quote(identifier: str) -> str:
+    return f"`{identifier.replace('`', '')}`"
+
+
+def _digest(payload: Any) -> str:
+    encoded = json.dumps(payload, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+@dataclass(frozen=True)
+class TileSpec:
+    """One dashboard chart as an aggregate query over a single table."""
+
+    table_id: str
+    metric: str
+    dimension: str | None = None
+    aggregate: str = "SUM"
+    limit: int = DEFAULT_MAX_GROUPS
+    title: str = ""
+
+    def __post_init__(self) -> None:
+        if self.aggregate.upper() not in _AGGREGATES:
+            raise ValueError(f"Unsupported aggregate '{self.aggregate}'.")
+        if self.table_id.count(".") != 2:
+            raise ValueError(
+                f"Tile tables must be project.dataset.table, got '{self.table_id}'."
+            )
+
+    @property
+    def chart_type(self) -> str:
+        return "bar" if self.dimension else "indicator"
+
+    @property
+    def tile_id(self) -> str:
+        return _digest(
+            [
+                self.table_id,
+                self.metric,
+                self.dimension,
+                self.aggregate.upper(),
+                self.limit,
+            ]
+        )
+
+    def sql(self) -> str:
+        value = f"{self.aggregate.upper()}({_quote(self.metric)}) AS value"
+        source = _quote(self.table_id)
+        if self.dimension is None:
+            return f"SELECT {value}, COUNT(*) AS row_count FROM {source}"
+        return (
+            f"SELECT {_quote(self.dimension)} AS dimension, {value} FROM {source} "
+            f"GROUP BY dimension ORDER BY value DESC LIMIT {int(self.limit)}"
+        )
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "tile_id": self.tile_id,
+            "title": self.title,
+            "chart_type": self.chart_type,
+            "table_id": self.table_id,
+            "metric": self.metric,
+            "dimension": self.dimension,
+            "aggregate": self.aggregate.upper(),
+            "limit": self.limit,
+            "sql": self.sql(),
+        }
+
+    @classmethod
+    def from_dict(cls, payload: dict[str, Any]) -> TileSpec:
+        return cls(
+            table_id=payload["table_id"],
+            metric=payload["metric"],
+            dimension=payload.get("dimension"),
+            aggregate=payload.get("aggregate", "SUM"),
+            limit=int(payload.get("limit", DEFAULT_MAX_GROUPS)),
+            title=payload.get("title", ""),
+        )
+
+
+@dataclass(frozen=True)
+class DashboardSpec:
+    """An ordered set of tiles; the id depends only on the tiles."""
+
+    objective: str
+    tiles: tuple[TileSpec, ...]
+
+    @property
+    def dashboard_id(self) -> str:
+        return _digest([tile.tile_id for tile in self.tiles])
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "dashboard_id": self.dashboard_id,
+            "objective": self.objective,
+            "tiles": [tile.as_dict() for tile in self.tiles],
+        }
+
+    @classmethod
+    def from_dict(cls, payload: dict[str, Any]) -> DashboardSpec:
+        return cls(
+            objective=payload.get("objective", ""),
+            tiles=tuple(TileSpec.from_dict(tile) for tile in payload.get("tiles", [])),
+        )
+
+
+def dashboard_spec_from_plan(plan: dict[str, Any], project_id: str) -> DashboardSpec:
+    """Turn a :func:`create_dashboard_plan` result into a dashboard spec."""
+
+    dataset_id = plan.get("recommended_dataset")
+    tiles: list[TileSpec] = []
+    for visual in plan.get("visualisations", []) if dataset_id else []:
+        tiles.append(
+            TileSpec(
+                table_id=f"{project_id}.{dataset_id}.{visual['table']}",
+                metric=visual["metric"],
+                dimension=visual.get("dimension"),
+                title=visual.get("description", ""),
+            )
+        )
+    return DashboardSpec(objective=plan.get("objective", ""), tiles=tuple(tiles))
+
+
+class TileStore:
+    """Dashboard specs as JSON and tile results as Parquet, under one directory."""
+
+    def __init__(self, directory: Path | str = DEFAULT_TILE_DIR) -> None:
+        self.directory = Path(directory)
+
+    def _write_atomic(self, path: Path, write: Callable[[str], None]) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        handle, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        os.close(handle)
+        try:
+            write(tmp_name)
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+    def save_spec(self, spec: DashboardSpec) -> None:
+        encoded = json.dumps(spec.as_dict(), sort_keys=True)
+        self._write_atomic(
+            self.directory / "specs" / f"{spec.dashboard_id}.json",
+            lambda name: Path(name).write_text(encoded, encoding="utf-8"),
+        )
+
+    def load_spec(self, dashboard_id: str) -> DashboardSpec | None:
+        path = self.directory / "specs" / f"{Path(dashboard_id).name}.json"
+        try:
+            return DashboardSpec.from_dict(json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, json.JSONDecodeError, KeyError, ValueError):
+            return None
+
+    def read(self, tile_id: str) -> tuple[Any, dict[str, Any]] | None:
+        """Return a tile and its sidecar, or ``None`` if missing or unreadable."""
+
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        tile_dir = self.directory / "tiles"
+        try:
+            meta = json.loads(
+                (tile_dir / f"{tile_id}.json").read_text(encoding="utf-8")
+            )
+            table = pq.read_table(tile_dir / f"{tile_id}.parquet")
+        except (OSError, json.JSONDecodeError):
+            return None
+        except pa.ArrowInvalid as error:
+            # A corrupt file is re-materialized rather than failing the render.
+            LOGGER.warning("Discarding unreadable tile %s: %s", tile_id, error)
+            return None
+        return table, meta
+
+    def write(self, tile_id: str, table: Any, meta: dict[str, Any]) -> None:
+        import pyarrow.parquet as pq
+
+        tile_dir = self.directory / "tiles"
+        # Parquet first: a sidecar never describes a file that is not there.
+        self._write_atomic(
+            tile_dir / f"{tile_id}.parquet", lambda name: pq.write_table(table, name)
+        )
+        encoded = json.dumps(meta, sort_keys=True)
+        self._write_atomic(
+            tile_dir / f"{tile_id}.json",
+            lambda name: Path(name).write_text(encoded, encoding="utf-8"),
+        )
+
+
+@dataclass
+class TileResult:
+    """A rendered tile and where it came from."""
+
+    tile: TileSpec
+    table: Any = None
+    source: str = "bigquery"
+    materialized_at: float = 0.0
+    elapsed_ms: float = 0.0
+    error: str | None = None
+
+    def describe(self, preview_rows: int = 10) -> dict[str, Any]:
+        payload: dict[str, Any] = {
+            "tile_id": self.tile.tile_id,
+            "title": self.tile.title,
+            "chart_type": self.tile.chart_type,
+            "served_from": self.source,
+            "elapsed_ms": round(self.elapsed_ms, 2),
+        }
+        if self.error is not None:
+            payload["error"] = self.error
+            return payload
+        payload["rows"] = self.table.num_rows
+        payload["preview"] = self.table.slice(0, preview_rows).to_pylist()
+        return payload
+
+
+@dataclass
+class _TileStats:
+    renders: int = 0
+    cache_hits: int = 0
+    queries: int = 0
+    failures: int = 0
+    version_checks: int = 0
+
+
+@dataclass
+class _VersionMemo:
+    versions: dict[str, tuple[str | None, float]] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class TileMaterializer:
+    """Render dashboards from materialized tiles, querying only stale ones.
+
+    ``reader`` runs a SQL statement and returns a ``pyarrow.Table``; the
+    agent passes the cost-guarded Storage Read API reader.
+    """
+
+    def __init__(
+        self,
+        store: TileStore,
+        reader: Callable[[str], Any],
+        versions: TableVersionProvider,
+        *,
+        unversioned_ttl_seconds: float = DEFAULT_UNVERSIONED_TTL_SECONDS,
+        version_ttl_seconds: float = DEFAULT_VERSION_TTL_SECONDS,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.store = store
+        self._reader = reader
+        self._versions = versions
+        self.unversioned_ttl_seconds = unversioned_ttl_seconds
+        self.version_ttl_seconds = version_ttl_seconds
+        self.max_workers = max(1, max_workers)
+        self._clock = clock
+        self._memo = _VersionMemo()
+        self._stats = _TileStats()
+        self._stats_lock = threading.Lock()
+
+    def stats(self) -> dict[str, int]:
+        with self._stats_lock:
+            return dict(self._stats.__dict__)
+
+    def _count(self, **deltas: int) -> None:
+        with self._stats_lock:
+            for name, delta in deltas.items():
+                setattr(self._stats, name, getattr(self._stats, name) + delta)
+
+    def _table_version(self, table_id: str) -> str | None:
+        now = self._clock()
+        with self._memo.lock:
+            memo = self._memo.versions.get(table_id)
+        if memo is not None and now - memo[1] < self.version_ttl_seconds:
+            return memo[0]
+        self._count(version_checks=1)
+        try:
+            version = self._versions.table_version(table_id)
+        except Exception as error:
+            LOGGER.warning("Could not fetch the version of %s: %s", table_id, error)
+            version = None
+        with self._memo.lock:
+            self._memo.versions[table_id] = (version, now)
+        return version
+
+    def _is_fresh(self, meta: dict[str, Any], version: str | None) -> bool:
+        if version is not None:
+            return meta.get("version") == version
+        age = self._clock() - float(meta.get("materialized_at", 0))
+        return meta.get("version") is None and age < self.unversioned_ttl_seconds
+
+    def render_tile(self, tile: TileSpec, *, refresh: bool = False) -> TileResult:
+        started = time.perf_counter()
+        version = self._table_version(tile.table_id)
+        cached = None if refresh else self.store.read(tile.tile_id)
+        if cached is not None and self._is_fresh(cached[1], version):
+            self._count(cache_hits=1)
+            return TileResult(
+                tile,
+                cached[0],
+                source="cache",
+                materialized_at=float(cached[1].get("materialized_at", 0)),
+                elapsed_ms=(time.perf_counter() - started) * 1000,
+            )
+
+        self._count(queries=1)
+        try:
+            table = self._reader(tile.sql())
+        except Exception as error:
+            self._count(failures=1)
+            LOGGER.warning("Tile %s failed: %s", tile.tile_id, error)
+            return TileResult(
+                tile,
+                error=str(error),
+                elapsed_ms=(time.perf_counter() - started) * 1000,
+            )
+        materialized_at = self._clock()
+        try:
+            self.store.write(
+                tile.tile_id,
+                table,
+                {
+                    "table_id": tile.table_id,
+                    "version": version,
+                    "materialized_at": materialized_at,
+                    "sql": tile.sql(),
+                },
+            )
+        except Exception as error:
+            # The result is still good; it is just not reused next time.
+            LOGGER.warning("Could not store tile %s: %s", tile.tile_id, error)
+        return TileResult(
+            tile,
+            table,
+            source="bigquery",
+            materialized_at=materialized_at,
+            elapsed_ms=(time.perf_counter() - started) * 1000,
+        )
+
+    def render(self, spec: DashboardSpec, *, refresh: bool = False) -> list[TileResult]:
+        """Render every tile of ``spec`` concurrently, in spec order."""
+
+        self._count(renders=1)
+        tiles: Iterable[TileSpec] = spec.tiles
+        if len(spec.tiles) <= 1:
+            return [self.render_tile(tile, refresh=refresh) for tile in tiles]
+        with ThreadPoolExecutor(
+            max_workers=min(self.max_workers, len(spec.tiles))
+        ) as pool:
+            return list(
+                pool.map(lambda tile: self.render_tile(tile, refresh=refresh), tiles)
+            )
+
+
+__all__ = [
+    "DashboardSpec",
+    "TileMaterializer",
+    "TileResult",
+    "TileSpec",
+    "TileStore",
+    "dashboard_spec_from_plan",
+]
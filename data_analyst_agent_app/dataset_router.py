@@ -0,0 +1,316 @@
+"""BM25 dataset and table router compiled from the metadata catalog.
+
+The original router matched substrings from two hard-coded keyword sets, so it
+only knew ``ms_graph`` and ``gt_wf`` and could not say which table a question
+was about. :class:`DatasetRouter` instead indexes every catalogued dataset and
+table — identifiers split into words, descriptions, column names and any
+``synonyms``/``keywords``/``labels`` found in the metadata files — in an
+inverted index whose postings carry precomputed BM25 weights. Routing a
+question is then a handful of dictionary lookups and additions, and the index
+is rebuilt only when the catalog's content hash changes.
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from data_analyst_agent_app.metadata_utils import (
+    _M365_KEYWORDS,
+    _WORKFORCE_KEYWORDS,
+    DatasetInfo,
+    MetadataCatalog,
+    TableInfo,
+    get_catalog,
+)
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+_STOP_WORDS = frozenset(
+    "a an and are as at be by did do does for from how in is it last many me "
+    "much of on or over per show than that the this to was were what when "
+    "which who why with".split()
+)
+
+# Built-in synonyms for the datasets this agent has always routed to; metadata
+# files can extend them through ``synonyms``, ``keywords`` or ``labels``.
+_BUILTIN_SYNONYMS: dict[str, frozenset[str]] = {
+    "ms_graph": frozenset(_M365_KEYWORDS),
+    "gt_wf": frozenset(_WORKFORCE_KEYWORDS),
+}
+
+# Term repetitions per field, a cheap stand-in for BM25F field weights.
+_NAME_WEIGHT = 3
+_SYNONYM_WEIGHT = 2
+_COLUMN_WEIGHT = 2
+_TEXT_WEIGHT = 1
+
+_K1 = 1.2
+_B = 0.75
+
+
+def tokenise(text: str) -> list[str]:
+    """Split prose and identifiers (snake_case, camelCase, dotted) into terms."""
+
+    return _TOKEN_PATTERN.findall(_CAMEL_BOUNDARY.sub(" ", text).lower())
+
+
+def _stem(term: str) -> str:
+    if len(term) > 4 and term.endswith("ies"):
+        return term[:-3] + "y"
+    if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+        return term[:-1]
+    return term
+
+
+def index_terms(text: str) -> list[str]:
+    """Tokenise, drop stop words and fold plurals, as used for indexing."""
+
+    return [_stem(term) for term in tokenise(text) if term not in _STOP_WORDS]
+
+
+def _metadata_terms(metadata: dict[str, Any]) -> list[str]:
+    terms: list[str] = []
+    for key in ("synonyms", "keywords", "labels", "aliases"):
+        value = metadata.get(key)
+        if isinstance(value, dict):
+            values: Iterable[Any] = [*value.keys(), *value.values()]
+        elif isinstance(value, (list, tuple, set)):
+            values = value
+        elif isinstance(value, str):
+            values = [value]
+        else:
+            continue
+        for item in values:
+            terms.extend(index_terms(str(item)))
+    return terms
+
+
+def _dataset_document(dataset: DatasetInfo) -> list[str]:
+    synonyms = [
+        term
+        for phrase in _BUILTIN_SYNONYMS.get(dataset.dataset_id, ())
+        for term in index_terms(phrase)
+    ]
+    synonyms.extend(_metadata_terms(dataset.metadata))
+    return (
+        index_terms(dataset.dataset_id) * _NAME_WEIGHT
+        + synonyms * _SYNONYM_WEIGHT
+        + index_terms(dataset.description) * _TEXT_WEIGHT
+    )
+
+
+def _table_document(table: TableInfo) -> list[str]:
+    terms = index_terms(table.name) * _NAME_WEIGHT
+    terms += _metadata_terms(table.metadata) * _SYNONYM_WEIGHT
+    terms += index_terms(table.description or "") * _TEXT_WEIGHT
+    for column in table.columns.values():
+        terms += index_terms(column.name) * _COLUMN_WEIGHT
+        terms += index_terms(column.description) * _TEXT_WEIGHT
+    return terms
+
+
+@dataclass(frozen=True)
+class RouteMatch:
+    """A dataset (``table`` is ``None``) or table scored against a question."""
+
+    dataset_id: str
+    table: str | None
+    score: float
+    matched_terms: tuple[str, ...]
+
+    def as_dict(self) -> dict[str, Any]:
+        payload: dict[str, Any] = {"dataset": self.dataset_id}
+        if self.table is not None:
+            payload["table"] = self.table
+        payload["score"] = round(self.score, 3)
+        payload["matched_terms"] = list(self.matched_terms)
+        return payload
+
+
+@dataclass(frozen=True)
+class RoutingResult:
+    """Ranked datasets and tables for one question, best first."""
+
+    datasets: tuple[RouteMatch, ...]
+    tables: tuple[RouteMatch, ...]
+
+    @property
+    def best_dataset(self) -> str | None:
+        return self.datasets[0].dataset_id if self.datasets else None
+
+    def reason(self) -> str:
+        if not self.datasets:
+            return "No metadata terms matched the question; fall back to general reasoning."
+        best = self.datasets[0]
+        reason = (
+            f"Ranked `{best.dataset_id}` first (BM25 score {best.score:.2f}) on terms: "
+            f"{', '.join(best.matched_terms)}."
+        )
+        top_tables = [
+            match.table for match in self.tables if match.dataset_id == best.dataset_id
+        ]
+        if top_tables:
+            reason += f" Most relevant tables: {', '.join(top_tables[:3])}."
+        return reason
+
+
+class _InvertedIndex:
+    """Inverted index whose postings hold each term's BM25 weight per document."""
+
+    def __init__(self, documents: list[list[str]]) -> None:
+        lengths = [len(document) for document in documents]
+        average = sum(lengths) / len(lengths) if lengths else 0.0
+        frequencies: dict[str, list[tuple[int, int]]] = defaultdict(list)
+        for doc_id, document in enumerate(documents):
+            for term, count in Counter(document).items():
+                frequencies[term].append((doc_id, count))
+        self.terms = [frozenset(document) for document in documents]
+
+        total = len(documents)
+        self.postings: dict[str, tuple[tuple[int, float], ...]] = {}
+        for term, entries in frequencies.items():
+            idf = math.log(1 + (total - len(entries) + 0.5) / (len(entries) + 0.5))
+            weighted = []
+            for doc_id, count in entries:
+                norm = (
+                    _K1 * (1 - _B + _B * lengths[doc_id] / average) if average else _K1
+                )
+                weighted.append((doc_id, idf * count * (_K1 + 1) / (count + norm)))
+            self.postings[term] = tuple(weighted)
+
+    def search(self, terms: Iterable[str]) -> dict[int, float]:
+        scores: dict[int, float] = defaultdict(float)
+        for term in terms:
+            for doc_id, weight in self.postings.get(term, ()):
+                scores[doc_id] += weight
+        return scores
+
+    def matched_terms(self, doc_id: int, terms: list[str]) -> tuple[str, ...]:
+        document = self.terms[doc_id]
+        return tuple(term for term in terms if term in document)
+
+
+def _top(scores: dict[int, float], limit: int | None) -> list[tuple[int, float]]:
+    """Return ``(doc_id, score)`` pairs by descending score, ties by doc id."""
+
+    if limit is None or limit >= len(scores):
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    return heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+class DatasetRouter:
+    """Rank datasets and tables in a :class:`MetadataCatalog` for a question."""
+
+    def __init__(self, catalog: MetadataCatalog) -> None:
+        self.content_hash = catalog.content_hash
+        self._datasets: list[str] = []
+        self._tables: list[tuple[int, str]] = []
+        dataset_documents: list[list[str]] = []
+        table_documents: list[list[str]] = []
+        for dataset_id in sorted(catalog.datasets):
+            dataset = catalog.datasets[dataset_id]
+            dataset_doc = len(self._datasets)
+            self._datasets.append(dataset_id)
+            dataset_documents.append(_dataset_document(dataset))
+            for table in dataset.tables.values():
+                self._tables.append((dataset_doc, table.name))
+                table_documents.append(_table_document(table))
+        self._dataset_index = _InvertedIndex(dataset_documents)
+        self._table_index = _InvertedIndex(table_documents)
+
+    def route(self, question: str, *, limit: int | None = 10) -> RoutingResult:
+        """Return up to ``limit`` ranked datasets and tables (all when ``None``)."""
+
+        terms = list(dict.fromkeys(index_terms(question)))
+        table_scores = self._table_index.search(terms)
+
+        # A dataset scores its own document plus its best-matching table.
+        dataset_scores = self._dataset_index.search(terms)
+        best_tables: dict[int, int] = {}
+        for table_doc, score in table_scores.items():
+            dataset_doc = self._tables[table_doc][0]
+            best = best_tables.get(dataset_doc)
+            if best is None or score > table_scores[best]:
+                best_tables[dataset_doc] = table_doc
+        combined = dict(dataset_scores)
+        for dataset_doc, table_doc in best_tables.items():
+            combined[dataset_doc] = (
+                combined.get(dataset_doc, 0.0) + table_scores[table_doc]
+            )
+
+        datasets = []
+        for dataset_doc, score in _top(combined, limit):
+            matched = list(self._dataset_index.matched_terms(dataset_doc, terms))
+            if dataset_doc in best_tables:
+                for term in self._table_index.matched_terms(
+                    best_tables[dataset_doc], terms
+                ):
+                    if term not in matched:
+                        matched.append(term)
+            datasets.append(
+                RouteMatch(self._datasets[dataset_doc], None, score, tuple(matched))
+            )
+
+        tables = [
+            RouteMatch(
+                self._datasets[self._tables[table_doc][0]],
+                self._tables[table_doc][1],
+                score,
+                self._table_index.matched_terms(table_doc, terms),
+            )
+            for table_doc, score in _top(table_scores, limit)
+        ]
+        return RoutingResult(tuple(datasets), tuple(tables))
+
+
+class _RouterCache:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._router: DatasetRouter | None = None
+
+    def get(self) -> DatasetRouter:
+        catalog = get_catalog()
+        router = self._router
+        if router is not None and router.content_hash == catalog.content_hash:
+            return router
+        with self._lock:
+            if (
+                self._router is None
+                or self._router.content_hash != catalog.content_hash
+            ):
+                self._router = DatasetRouter(catalog)
+            return self._router
+
+
+_ROUTER_CACHE = _RouterCache()
+
+
+def get_router() -> DatasetRouter:
+    """Return a router for the current catalog, rebuilding it after changes."""
+
+    return _ROUTER_CACHE.get()
+
+
+def route_question(question: str, *, limit: int | None = 10) -> RoutingResult:
+    """Rank catalogued datasets and tables for ``question``."""
+
+    return get_router().route(question, limit=limit)
+
+
+__all__ = [
+    "DatasetRouter",
+    "RouteMatch",
+    "RoutingResult",
+    "get_router",
+    "index_terms",
+    "route_question",
+    "tokenise",
+]
@@ -3,35 +3,16 @@
 from __future__ import annotations
 
 import os
-<<<<<<< HEAD
 from pathlib import Path
 from typing import Dict, Sequence
-=======
-import sys
-from pathlib import Path
-from typing import Dict, List, Sequence
->>>>>>> 053d79e5652e52b720dbaa5a481f0243cfa6415c
 
 from absl import app, flags
 from dotenv import load_dotenv
 
-<<<<<<< HEAD
 try:
     from data_analyst_agent_app.agent import root_agent
 except ModuleNotFoundError:  # fallback for script execution
     from data_analyst_agent_app.agent import root_agent
-=======
-if __package__ is None:
-    _current_dir = Path(__file__).resolve().parent
-    _package_root = _current_dir.parent
-    if str(_package_root) not in sys.path:
-        sys.path.insert(0, str(_package_root))
-
-try:
-    from data_analyst_agent_app.agent import root_agent
-except ModuleNotFoundError:  # pragma: no cover - fallback for script execution
-    from agent import root_agent
->>>>>>> 053d79e5652e52b720dbaa5a481f0243cfa6415c
 
 import vertexai
 from vertexai import agent_engines
@@ -41,20 +22,24 @@ from vertexai.preview.reasoning_engines import AdkApp
 _APP_ROOT = Path(__file__).resolve().parent
 
 
-<<<<<<< HEAD
 def _default_extra_packages() -> list[str]:
     """Return the files that must ship with the remote deployment."""
 
     package_paths: list[Path] = [
-=======
-def _default_extra_packages() -> List[str]:
-    """Return the files that must ship with the remote deployment."""
-
-    package_paths: List[Path] = [
->>>>>>> 053d79e5652e52b720dbaa5a481f0243cfa6415c
         _APP_ROOT / "__init__.py",
         _APP_ROOT / "agent.py",
+        _APP_ROOT / "credentials.py",
+        _APP_ROOT / "dashboard_tiles.py",
+        _APP_ROOT / "dataset_router.py",
+        _APP_ROOT / "figure_store.py",
+        _APP_ROOT / "frame_registry.py",
+        _APP_ROOT / "instruction_cache.py",
         _APP_ROOT / "metadata_utils.py",
+        _APP_ROOT / "prompt_slices.py",
+        _APP_ROOT / "query_guard.py",
+        _APP_ROOT / "result_encoding.py",
+        _APP_ROOT / "sandbox.py",
+        _APP_ROOT / "sql_cache.py",
     ]
 
     metadata_dir = _APP_ROOT / "metadata"
@@ -66,19 +51,12 @@ def _default_extra_packages() -> List[str]:
 
 def _requirements_path() -> str:
     """Return the path to the requirements file for the deployment."""
-<<<<<<< HEAD
     return str(_APP_ROOT / "requirements.txt")
 
 
 # ----------------------------------------------------------------------
 # Flag Definitions
 # ----------------------------------------------------------------------
-=======
-
-    requirements_path = _APP_ROOT / "requirements.txt"
-    return str(requirements_path)
-
->>>>>>> 053d79e5652e52b720dbaa5a481f0243cfa6415c
 FLAGS = flags.FLAGS
 flags.DEFINE_string("project_id", None, "GCP project ID.")
 flags.DEFINE_string("location", None, "GCP location.")
@@ -97,7 +75,6 @@ flags.DEFINE_string(
 )
 
 
-<<<<<<< HEAD
 # ----------------------------------------------------------------------
 # Environment & Deployment Logic
 # ----------------------------------------------------------------------
@@ -105,11 +82,6 @@ def _resolve_env_vars() -> Dict[str, str]:
     """Populate deployment environment variables for the remote agent."""
 
     env_vars: Dict[str, str] = {}
-=======
-def _resolve_env_vars() -> Dict[str, str]:
-    """Populate deployment environment variables for the remote agent."""
-
->>>>>>> 053d79e5652e52b720dbaa5a481f0243cfa6415c
     project_scope = os.getenv("DATA_ANALYST_PROJECT", "wmt-ade-agentspace-dev")
     location = os.getenv("BIGQUERY_LOCATION", "us")
     return {
@@ -253,25 +225,16 @@ def send_message(resource_id: str, message: str) -> None:
     """Send a message to the deployed agent."""
 
     remote_agent = agent_engines.get(resource_id)
-<<<<<<< HEAD
     session = remote_agent.create_session(user_id="data-analyst-user")
     session_id = _resolve_session_id(session)
 
     print(f"🔍 Trying remote agent: {resource_id}")
-=======
-    session = remote_agent.create_session(
-        user_id="data-analyst-user",
-    )
-    session_id = _resolve_session_id(session)
-    print(f"Trying remote agent: {resource_id}")
->>>>>>> 053d79e5652e52b720dbaa5a481f0243cfa6415c
     for event in remote_agent.stream_query(
         user_id="data-analyst-user",
         session_id=session_id,
         message=message,
     ):
         _print_event(event)
-<<<<<<< HEAD
 
     print("✅ Done.")
 
@@ -279,11 +242,6 @@ def send_message(resource_id: str, message: str) -> None:
 # ----------------------------------------------------------------------
 # Main Entrypoint
 # ----------------------------------------------------------------------
-=======
-    print("Done.")
-
-
->>>>>>> 053d79e5652e52b720dbaa5a481f0243cfa6415c
 def main(argv: Sequence[str]) -> None:
     del argv
 
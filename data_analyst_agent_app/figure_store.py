@@ -0,0 +1,254 @@
+"""Content-addressed figure pipeline for ``run_python_analysis``.
+
+Figures used to be inlined in the tool response as base64 PNG strings, so a
+dashboard with a handful of subplots produced a multi-megabyte payload that
+was re-sent to the model on every later turn. Instead, sandbox workers render
+each open Matplotlib figure once under a DPI and byte cap and name it by the
+SHA-256 of its PNG bytes. The agent process then saves figures through the
+ADK artifact service (or a local-disk stand-in) and returns only artifact
+references. Hashes already stored for a session are passed back to the
+workers, so an identical chart is neither shipped across the pipe nor
+uploaded a second time.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import struct
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Iterable, Protocol
+
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_MAX_DPI = int(os.getenv("DATA_ANALYST_FIGURE_MAX_DPI", "110"))
+DEFAULT_MAX_BYTES = int(os.getenv("DATA_ANALYST_FIGURE_MAX_BYTES", str(400 * 1024)))
+_MIN_DPI = 40
+_MAX_RENDER_ATTEMPTS = 3
+
+
+def figure_filename(digest: str) -> str:
+    """Return the artifact name used for a figure with the given SHA-256."""
+
+    return f"figure-{digest[:16]}.png"
+
+
+def _png_size(data: bytes) -> tuple[int, int]:
+    """Read the width and height from a PNG's IHDR chunk."""
+
+    if len(data) < 24 or data[:8] != b"\x89PNG\r\n\x1a\n":
+        return 0, 0
+    width, height = struct.unpack(">II", data[16:24])
+    return width, height
+
+
+# ----------------------------------------------------------------------
+# Worker side
+# ----------------------------------------------------------------------
+def render_figure(figure: Any, *, max_dpi: int, max_bytes: int) -> bytes:
+    """Render ``figure`` to PNG, lowering the DPI until it fits ``max_bytes``."""
+
+    dpi = float(min(figure.dpi, max_dpi))
+    data = b""
+    for _ in range(_MAX_RENDER_ATTEMPTS):
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format="png", dpi=dpi, bbox_inches="tight")
+        data = buffer.getvalue()
+        if len(data) <= max_bytes or dpi <= _MIN_DPI:
+            break
+        # PNG size grows roughly with pixel count, i.e. with the square of DPI.
+        dpi = max(_MIN_DPI, dpi * (max_bytes / len(data)) ** 0.5 * 0.9)
+    return data
+
+
+def render_open_figures(
+    plt: Any,
+    *,
+    max_dpi: int = DEFAULT_MAX_DPI,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    known: Iterable[str] = (),
+) -> list[dict[str, Any]]:
+    """Render every open pyplot figure into a content-addressed record.
+
+    Records for hashes listed in ``known`` omit the PNG bytes, since the
+    caller has already stored them.
+    """
+
+    known_hashes = set(known)
+    seen: set[str] = set()
+    records: list[dict[str, Any]] = []
+    for figure_number in plt.get_fignums():
+        data = render_figure(
+            plt.figure(figure_number), max_dpi=max_dpi, max_bytes=max_bytes
+        )
+        digest = hashlib.sha256(data).hexdigest()
+        if digest in seen:
+            continue
+        seen.add(digest)
+        width, height = _png_size(data)
+        records.append({
+            "sha256": digest,
+            "width": width,
+            "height": height,
+            "bytes": len(data),
+            "data": None if digest in known_hashes else data,
+        })
+    return records
+
+
+# ----------------------------------------------------------------------
+# Agent side
+# ----------------------------------------------------------------------
+class FigureStore(Protocol):
+    """Destination for rendered figures."""
+
+    async def save(self, filename: str, data: bytes) -> None:  # pragma: no cover
+        ...
+
+
+class LocalDiskFigureStore:
+    """Stand-in store that writes figures to a directory on local disk."""
+
+    def __init__(self, root: Path | None = None) -> None:
+        self.root = root or Path(
+            os.getenv(
+                "DATA_ANALYST_FIGURE_DIR",
+                Path(tempfile.gettempdir()) / "data-analyst-figures",
+            )
+        )
+
+    async def save(self, filename: str, data: bytes) -> None:
+        path = self.root / filename
+        if path.exists():
+            return
+        await asyncio.to_thread(self._write, path, data)
+
+    @staticmethod
+    def _write(path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_suffix(".tmp")
+        temporary.write_bytes(data)
+        temporary.replace(path)
+
+
+class ArtifactFigureStore:
+    """Save figures through the ADK artifact service of the current session.
+
+    Falls back to ``fallback`` when the runner was started without an
+    artifact service, which ADK reports as a ``ValueError``.
+    """
+
+    def __init__(self, tool_context: Any, fallback: FigureStore | None = None) -> None:
+        self._tool_context = tool_context
+        self._fallback = fallback
+
+    async def save(self, filename: str, data: bytes) -> None:
+        from google.genai import types
+
+        part = types.Part.from_bytes(data=data, mime_type="image/png")
+        try:
+            await self._tool_context.save_artifact(filename, part)
+        except ValueError:
+            if self._fallback is None:
+                raise
+            LOGGER.warning("No artifact service configured; storing %s locally.", filename)
+            await self._fallback.save(filename, data)
+
+
+class FigurePublisher:
+    """Remember which figure hashes each session has stored, and store new ones."""
+
+    def __init__(self, max_sessions: int = 256) -> None:
+        self._max_sessions = max_sessions
+        self._known: OrderedDict[str, set[str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def known(self, session_id: str) -> set[str]:
+        with self._lock:
+            hashes = self._known.get(session_id)
+            if hashes is None:
+                return set()
+            self._known.move_to_end(session_id)
+            return set(hashes)
+
+    def _remember(self, session_id: str, digests: Iterable[str]) -> None:
+        with self._lock:
+            hashes = self._known.setdefault(session_id, set())
+            hashes.update(digests)
+            self._known.move_to_end(session_id)
+            while len(self._known) > self._max_sessions:
+                self._known.popitem(last=False)
+
+    async def publish(
+        self, session_id: str, store: FigureStore, records: list[dict[str, Any]]
+    ) -> list[dict[str, Any]]:
+        """Store records carrying PNG bytes concurrently; return references only."""
+
+        known = self.known(session_id)
+        pending = {
+            record["sha256"]: record
+            for record in records
+            if record.get("data") is not None and record["sha256"] not in known
+        }
+        results = await asyncio.gather(
+            *(
+                store.save(figure_filename(digest), record["data"])
+                for digest, record in pending.items()
+            ),
+            return_exceptions=True,
+        )
+
+        stored: list[str] = []
+        failed: dict[str, str] = {}
+        for digest, outcome in zip(pending, results):
+            if isinstance(outcome, BaseException):
+                LOGGER.error("Failed to store figure %s: %s", digest[:16], outcome)
+                failed[digest] = str(outcome)
+            else:
+                stored.append(digest)
+        self._remember(session_id, stored)
+
+        references: list[dict[str, Any]] = []
+        for record in records:
+            digest = record["sha256"]
+            reference = {
+                "artifact": figure_filename(digest),
+                "mime_type": "image/png",
+                "sha256": digest,
+                "width": record["width"],
+                "height": record["height"],
+                "bytes": record["bytes"],
+                "reused": digest not in pending,
+            }
+            if digest in failed:
+                reference["error"] = failed[digest]
+            references.append(reference)
+        return references
+
+
+_DEFAULT_PUBLISHER = FigurePublisher()
+
+
+def get_figure_publisher() -> FigurePublisher:
+    """Return the process-wide figure publisher."""
+
+    return _DEFAULT_PUBLISHER
+
+
+__all__ = [
+    "ArtifactFigureStore",
+    "FigurePublisher",
+    "FigureStore",
+    "LocalDiskFigureStore",
+    "figure_filename",
+    "get_figure_publisher",
+    "render_figure",
+    "render_open_figures",
+]
@@ -0,0 +1,366 @@
+"""Session-scoped registry of query results shared with the Python sandbox.
+
+A SQL result fetched for analysis should not travel through the prompt: the
+model would have to paste rows back into generated code, paying tokens and
+losing precision. Instead the ``query_to_frame`` tool fetches the result once
+as Apache Arrow (via the BigQuery Storage Read API when available) and stores
+it here under a short handle. Each frame is written as an Arrow IPC file into
+a spill directory (``/dev/shm`` by default) so sandbox workers can memory-map
+it and expose it as ``frames["<handle>"]`` without copying the buffers again.
+
+Each session owns a registry bounded by a byte budget; the least recently used
+frames are evicted (and their files removed) once the budget is exceeded.
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Protocol
+
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_SESSION_BUDGET_BYTES = (
+    int(os.getenv("DATA_ANALYST_FRAME_BUDGET_MB", "256")) * 1024 * 1024
+)
+DEFAULT_MAX_SESSIONS = int(os.getenv("DATA_ANALYST_FRAME_MAX_SESSIONS", "64"))
+
+_HANDLE_PATTERN = re.compile(r"^[A-Za-z0-9_\-]{1,64}$")
+
+
+def _default_spill_root() -> Path:
+    configured = os.getenv("DATA_ANALYST_FRAME_DIR")
+    if configured:
+        return Path(configured)
+    shm = Path("/dev/shm")
+    if shm.is_dir() and os.access(shm, os.W_OK):
+        return shm
+    return Path(tempfile.gettempdir())
+
+
+class ArrowReader(Protocol):
+    """Anything that can turn a SQL statement into a ``pyarrow.Table``."""
+
+    def read(self, sql: str) -> Any:  # pragma: no cover - protocol
+        ...
+
+
+class BigQueryArrowReader:
+    """Fetch read-only query results as Arrow through the Storage Read API.
+
+    The statement is dry-run first so that only ``SELECT`` queries are
+    executed, mirroring the ``WriteMode.BLOCKED`` behaviour of the BigQuery
+    toolset. The query job carries ``maximum_bytes_billed`` and ``labels`` so
+    BigQuery enforces the same budget as the toolset. When
+    ``google-cloud-bigquery-storage`` is not installed the client library
+    transparently falls back to the REST ``tabledata`` API.
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable[[], Any],
+        *,
+        maximum_bytes_billed: int | None = None,
+        labels: dict[str, str] | None = None,
+    ) -> None:
+        self._client_factory = client_factory
+        self._maximum_bytes_billed = maximum_bytes_billed
+        self._labels = dict(labels or {})
+        self._client: Any = None
+        self._lock = threading.Lock()
+
+    def _get_client(self) -> Any:
+        with self._lock:
+            if self._client is None:
+                self._client = self._client_factory()
+            return self._client
+
+    def read(self, sql: str) -> Any:
+        from google.cloud import bigquery
+
+        client = self._get_client()
+        dry_run = client.query(
+            sql,
+            job_config=bigquery.QueryJobConfig(
+                dry_run=True, use_query_cache=False, labels=self._labels
+            ),
+        )
+        if dry_run.statement_type != "SELECT":
+            raise ValueError(
+                f"Only SELECT statements can be loaded into frames, got "
+                f"{dry_run.statement_type}."
+            )
+        job_config = bigquery.QueryJobConfig(
+            maximum_bytes_billed=self._maximum_bytes_billed, labels=self._labels
+        )
+        return (
+            client.query(sql, job_config=job_config)
+            .result()
+            .to_arrow(create_bqstorage_client=True)
+        )
+
+
+@dataclass
+class FrameEntry:
+    """Metadata describing a frame held in a :class:`FrameRegistry`."""
+
+    handle: str
+    path: Path
+    nbytes: int
+    num_rows: int
+    columns: list[dict[str, str]] = field(default_factory=list)
+    sql: str | None = None
+
+    def describe(self) -> dict[str, Any]:
+        return {
+            "handle": self.handle,
+            "rows": self.num_rows,
+            "bytes": self.nbytes,
+            "columns": self.columns,
+        }
+
+
+class FrameRegistry:
+    """LRU store of Arrow tables for a single session, bounded by bytes."""
+
+    def __init__(self, spill_dir: Path, max_bytes: int = DEFAULT_SESSION_BUDGET_BYTES) -> None:
+        self._spill_dir = spill_dir
+        self._max_bytes = max_bytes
+        self._entries: OrderedDict[str, FrameEntry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(entry.nbytes for entry in self._entries.values())
+
+    def put(self, handle: str, table: Any, *, sql: str | None = None) -> FrameEntry:
+        """Persist ``table`` under ``handle``, evicting older frames if needed."""
+
+        import pyarrow as pa
+
+        if not _HANDLE_PATTERN.match(handle):
+            raise ValueError(
+                "Frame handles may only contain letters, digits, '_' or '-' "
+                "(max 64 characters)."
+            )
+        if table.nbytes > self._max_bytes:
+            raise ValueError(
+                f"Result is {table.nbytes:,} bytes, above the session frame budget "
+                f"of {self._max_bytes:,} bytes. Aggregate or filter in SQL first."
+            )
+
+        path = self.reserve_path(handle)
+        with pa.OSFile(str(path), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+        return self.adopt(
+            handle,
+            path,
+            nbytes=table.nbytes,
+            num_rows=table.num_rows,
+            columns=[
+                {"name": column.name, "type": str(column.type)}
+                for column in table.schema
+            ],
+            sql=sql,
+        )
+
+    def reserve_path(self, handle: str) -> Path:
+        """Return a fresh file path in this session's spill directory."""
+
+        self._spill_dir.mkdir(parents=True, exist_ok=True)
+        return self._spill_dir / f"{handle}-{uuid.uuid4().hex[:8]}.arrow"
+
+    def adopt(
+        self,
+        handle: str,
+        path: Path,
+        *,
+        nbytes: int,
+        num_rows: int,
+        columns: list[dict[str, str]],
+        sql: str | None = None,
+    ) -> FrameEntry:
+        """Register an Arrow IPC file that was written by someone else.
+
+        Sandbox workers use this to hand over results too large to return
+        inline, so they can be paged later without re-running the code.
+        """
+
+        if nbytes > self._max_bytes:
+            path.unlink(missing_ok=True)
+            raise ValueError(
+                f"Frame is {nbytes:,} bytes, above the session frame budget of "
+                f"{self._max_bytes:,} bytes."
+            )
+
+        entry = FrameEntry(
+            handle=handle,
+            path=path,
+            nbytes=nbytes,
+            num_rows=num_rows,
+            columns=columns,
+            sql=sql,
+        )
+
+        with self._lock:
+            previous = self._entries.pop(handle, None)
+            self._entries[handle] = entry
+            evicted = self._evict_locked()
+        if previous is not None:
+            evicted.append(previous)
+        for stale in evicted:
+            stale.path.unlink(missing_ok=True)
+            if stale.handle != handle:
+                LOGGER.info("Evicted frame '%s' (%d bytes).", stale.handle, stale.nbytes)
+        return entry
+
+    def _evict_locked(self) -> list[FrameEntry]:
+        evicted: list[FrameEntry] = []
+        total = sum(entry.nbytes for entry in self._entries.values())
+        while total > self._max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            total -= entry.nbytes
+            evicted.append(entry)
+        return evicted
+
+    def get(self, handle: str) -> FrameEntry | None:
+        """Return the entry for ``handle`` and mark it as recently used."""
+
+        with self._lock:
+            entry = self._entries.get(handle)
+            if entry is not None:
+                self._entries.move_to_end(handle)
+            return entry
+
+    def paths(self) -> dict[str, str]:
+        """Map every handle in the session to its Arrow IPC file."""
+
+        with self._lock:
+            return {handle: str(entry.path) for handle, entry in self._entries.items()}
+
+    def describe(self) -> list[dict[str, Any]]:
+        with self._lock:
+            return [entry.describe() for entry in self._entries.values()]
+
+    def drop(self, handle: str) -> bool:
+        with self._lock:
+            entry = self._entries.pop(handle, None)
+        if entry is None:
+            return False
+        entry.path.unlink(missing_ok=True)
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            entry.path.unlink(missing_ok=True)
+        shutil.rmtree(self._spill_dir, ignore_errors=True)
+
+
+class SessionFrameRegistries:
+    """Hand out one :class:`FrameRegistry` per session, evicting idle sessions."""
+
+    def __init__(
+        self,
+        *,
+        spill_root: Path | None = None,
+        session_budget_bytes: int = DEFAULT_SESSION_BUDGET_BYTES,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+    ) -> None:
+        root = spill_root or _default_spill_root()
+        self._spill_root = root / f"data-analyst-frames-{os.getpid()}"
+        self._session_budget_bytes = session_budget_bytes
+        self._max_sessions = max_sessions
+        self._registries: OrderedDict[str, FrameRegistry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def registry_for(self, session_id: str) -> FrameRegistry:
+        with self._lock:
+            registry = self._registries.get(session_id)
+            if registry is not None:
+                self._registries.move_to_end(session_id)
+                return registry
+            safe_name = re.sub(r"[^A-Za-z0-9_\-]", "_", session_id)[:96]
+            registry = FrameRegistry(
+                self._spill_root / f"{safe_name}-{uuid.uuid4().hex[:6]}",
+                max_bytes=self._session_budget_bytes,
+            )
+            self._registries[session_id] = registry
+            stale = []
+            while len(self._registries) > self._max_sessions:
+                stale.append(self._registries.popitem(last=False)[1])
+        for old in stale:
+            old.clear()
+        return registry
+
+    def clear(self) -> None:
+        with self._lock:
+            registries = list(self._registries.values())
+            self._registries.clear()
+        for registry in registries:
+            registry.clear()
+        shutil.rmtree(self._spill_root, ignore_errors=True)
+
+
+def session_key(tool_context: Any) -> str:
+    """Return a stable identifier for the session behind an ADK tool context.
+
+    A context without a session is keyed on its invocation id, so its frames
+    are never shared with another caller. ``ValueError`` is raised when
+    neither is available.
+    """
+
+    invocation = getattr(tool_context, "_invocation_context", None)
+    session = getattr(tool_context, "session", None) or getattr(
+        invocation, "session", None
+    )
+    session_id = getattr(session, "id", None)
+    if session_id:
+        return str(session_id)
+    invocation_id = getattr(tool_context, "invocation_id", None) or getattr(
+        invocation, "invocation_id", None
+    )
+    if invocation_id:
+        return f"invocation-{invocation_id}"
+    raise ValueError("Tool context has neither a session nor an invocation id.")
+
+
+_DEFAULT_REGISTRIES: SessionFrameRegistries | None = None
+_DEFAULT_REGISTRIES_LOCK = threading.Lock()
+
+
+def get_session_registries() -> SessionFrameRegistries:
+    """Return the process-wide registries, creating them on first use."""
+
+    global _DEFAULT_REGISTRIES
+    with _DEFAULT_REGISTRIES_LOCK:
+        if _DEFAULT_REGISTRIES is None:
+            _DEFAULT_REGISTRIES = SessionFrameRegistries()
+            atexit.register(_DEFAULT_REGISTRIES.clear)
+        return _DEFAULT_REGISTRIES
+
+
+__all__ = [
+    "ArrowReader",
+    "BigQueryArrowReader",
+    "FrameEntry",
+    "FrameRegistry",
+    "SessionFrameRegistries",
+    "get_session_registries",
+    "session_key",
+]
@@ -0,0 +1,287 @@
+"""Gemini context caching for an agent's static instruction.
+
+The analyst persona, tool guidance and (in ``full`` metadata mode) the
+metadata digest are identical on every model call, yet each request resends
+them together with every tool declaration. :class:`StaticInstructionCache`
+registers that static prefix once as Gemini cached content with a TTL, and
+requests reference it instead:
+
+* As an ADK ``before_model_callback``, it fingerprints the model, the static
+  instruction, the tool declarations and the caller's metadata content hash.
+  When a live cache has the same fingerprint, the request's
+  ``system_instruction``, ``tools`` and ``tool_config`` are dropped and
+  ``cached_content`` points at the cache.
+* A new cache is created when the fingerprint changes, for example because
+  the metadata files were edited, or shortly before the TTL runs out. The
+  previous cache is then deleted.
+* Anything appended after the static prefix, such as the per-question
+  metadata slice, cannot live in the cache. It is moved into the request
+  contents, ahead of the latest turn.
+* As an ``after_model_callback``, it records the prompt and cached token
+  counts Gemini reports, so :meth:`StaticInstructionCache.stats` shows the
+  real saving.
+
+Caching is opt-in, and any failure falls back to sending the full
+instruction. Prefixes below Gemini's minimum cacheable size are sent
+uncached.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = int(
+    os.getenv("DATA_ANALYST_INSTRUCTION_CACHE_TTL_SECONDS", "3600")
+)
+# Gemini 2.5 models refuse to cache fewer tokens than this.
+DEFAULT_MIN_TOKENS = int(os.getenv("DATA_ANALYST_INSTRUCTION_CACHE_MIN_TOKENS", "2048"))
+# Caches are replaced this long before they expire, so no request references
+# a cache that disappears mid-flight.
+REFRESH_MARGIN_SECONDS = 60
+
+_CHARS_PER_TOKEN = 4
+_TRUE_VALUES = {"1", "true", "yes", "on"}
+
+
+def instruction_cache_enabled(env_var: str = "DATA_ANALYST_INSTRUCTION_CACHE") -> bool:
+    """Return whether the opt-in instruction cache is switched on."""
+
+    return os.getenv(env_var, "off").strip().lower() in _TRUE_VALUES
+
+
+def _default_client() -> Any:
+    from google import genai
+
+    return genai.Client()
+
+
+def _dump(value: Any) -> Any:
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json", exclude_none=True)
+    return value
+
+
+@dataclass
+class _CacheEntry:
+    name: str
+    fingerprint: str
+    expires_at: float
+    tokens: int
+
+
+@dataclass
+class InstructionCacheStats:
+    """Counters for the instruction cache."""
+
+    requests: int = 0
+    hits: int = 0
+    creations: int = 0
+    refreshes: int = 0
+    bypassed: int = 0
+    failures: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "hits": self.hits,
+            "creations": self.creations,
+            "refreshes": self.refreshes,
+            "bypassed": self.bypassed,
+            "failures": self.failures,
+            "hit_rate": self.hits / self.requests if self.requests else 0.0,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cached_token_share": (
+                self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+            ),
+        }
+
+
+class StaticInstructionCache:
+    """Serve an agent's static instruction and tools from Gemini cached content.
+
+    ``static_instruction`` returns the current static instruction text.
+    ``content_hash`` returns a version of the data it was built from, such as
+    the metadata catalog's content hash. ``client_factory`` builds a
+    ``google.genai.Client``; it is only called once caching is first needed.
+    """
+
+    def __init__(
+        self,
+        static_instruction: Callable[[], str],
+        *,
+        content_hash: Callable[[], str] = lambda: "",
+        client_factory: Callable[[], Any] = _default_client,
+        ttl_seconds: int = DEFAULT_TTL_SECONDS,
+        min_tokens: int = DEFAULT_MIN_TOKENS,
+        display_name: str = "agent-static-instruction",
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._static_instruction = static_instruction
+        self._content_hash = content_hash
+        self._client_factory = client_factory
+        self._client: Any = None
+        self.ttl_seconds = ttl_seconds
+        self.min_tokens = min_tokens
+        self.display_name = display_name
+        self._clock = clock
+        self._entries: dict[str, _CacheEntry] = {}
+        self._lock = asyncio.Lock()
+        self._stats = InstructionCacheStats()
+
+    def stats(self) -> dict[str, Any]:
+        return self._stats.as_dict()
+
+    def _get_client(self) -> Any:
+        if self._client is None:
+            self._client = self._client_factory()
+        return self._client
+
+    def _fingerprint(self, model: str, static: str, config: Any) -> str:
+        payload = {
+            "model": model,
+            "instruction": static,
+            "tools": [_dump(tool) for tool in getattr(config, "tools", None) or []],
+            "tool_config": _dump(getattr(config, "tool_config", None)),
+            "content_hash": self._content_hash(),
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _estimate_tokens(self, static: str, config: Any) -> int:
+        tools = [_dump(tool) for tool in getattr(config, "tools", None) or []]
+        characters = len(static) + len(json.dumps(tools, default=str))
+        return characters // _CHARS_PER_TOKEN
+
+    async def _cache_for(
+        self, model: str, static: str, config: Any, fingerprint: str
+    ) -> str:
+        async with self._lock:
+            now = self._clock()
+            entry = self._entries.get(model)
+            if (
+                entry is not None
+                and entry.fingerprint == fingerprint
+                and entry.expires_at - REFRESH_MARGIN_SECONDS > now
+            ):
+                self._stats.hits += 1
+                return entry.name
+
+            client = self._get_client()
+            cached = await client.aio.caches.create(
+                model=model,
+                config={
+                    "display_name": self.display_name,
+                    "system_instruction": static,
+                    "tools": getattr(config, "tools", None) or None,
+                    "tool_config": getattr(config, "tool_config", None),
+                    "ttl": f"{self.ttl_seconds}s",
+                },
+            )
+            self._entries[model] = _CacheEntry(
+                name=cached.name,
+                fingerprint=fingerprint,
+                expires_at=now + self.ttl_seconds,
+                tokens=self._estimate_tokens(static, config),
+            )
+            self._stats.creations += 1
+            if entry is not None:
+                self._stats.refreshes += 1
+                try:
+                    await client.aio.caches.delete(name=entry.name)
+                except Exception as error:
+                    LOGGER.debug("Could not delete cache %s: %s", entry.name, error)
+            LOGGER.info("Created instruction cache %s for %s.", cached.name, model)
+            return cached.name
+
+    @staticmethod
+    def _move_to_contents(llm_request: Any, text: str) -> None:
+        from google.genai import types
+
+        part = types.Part(text=text)
+        contents = llm_request.contents
+        if contents and contents[-1].role == "user":
+            last = contents[-1]
+            contents[-1] = types.Content(role="user", parts=[part, *(last.parts or [])])
+        else:
+            contents.append(types.Content(role="user", parts=[part]))
+
+    async def before_model_callback(
+        self, callback_context: Any, llm_request: Any
+    ) -> None:
+        """Point ``llm_request`` at the cached static instruction."""
+
+        self._stats.requests += 1
+        config = llm_request.config
+        system = getattr(config, "system_instruction", None)
+        static = self._static_instruction()
+        if not isinstance(system, str) or not static or not system.startswith(static):
+            self._stats.bypassed += 1
+            return None
+        if self._estimate_tokens(static, config) < self.min_tokens:
+            self._stats.bypassed += 1
+            return None
+
+        model = llm_request.model
+        try:
+            name = await self._cache_for(
+                model, static, config, self._fingerprint(model, static, config)
+            )
+        except Exception as error:
+            self._stats.failures += 1
+            LOGGER.warning("Instruction cache unavailable, sending in full: %s", error)
+            return None
+
+        remainder = system[len(static) :].strip()
+        if remainder:
+            self._move_to_contents(llm_request, remainder)
+        config.system_instruction = None
+        config.tools = None
+        config.tool_config = None
+        config.cached_content = name
+        return None
+
+    async def after_model_callback(
+        self, callback_context: Any, llm_response: Any
+    ) -> None:
+        """Record the prompt and cached token counts Gemini reports."""
+
+        usage = getattr(llm_response, "usage_metadata", None)
+        if usage is not None:
+            self._stats.prompt_tokens += getattr(usage, "prompt_token_count", 0) or 0
+            self._stats.cached_tokens += (
+                getattr(usage, "cached_content_token_count", 0) or 0
+            )
+        return None
+
+    async def close(self) -> None:
+        """Delete every cache this instance created."""
+
+        async with self._lock:
+            entries, self._entries = list(self._entries.values()), {}
+            for entry in entries:
+                try:
+                    await self._get_client().aio.caches.delete(name=entry.name)
+                except Exception as error:
+                    LOGGER.debug("Could not delete cache %s: %s", entry.name, error)
+
+
+__all__ = [
+    "DEFAULT_MIN_TOKENS",
+    "DEFAULT_TTL_SECONDS",
+    "InstructionCacheStats",
+    "StaticInstructionCache",
+    "instruction_cache_enabled",
+]
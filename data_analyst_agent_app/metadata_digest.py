@@ -0,0 +1,322 @@
+"""Compile metadata files into a compact, content-hashed binary digest.
+
+Agents that paste ``json.dumps(metadata, indent=2)`` into their instruction pay
+on every model call for indentation, etags, self links and ACL entries that
+carry no analytical value. :func:`compile_digest` keeps only what helps write
+SQL: datasets, tables, columns, types, descriptions and row counts. The table
+and column parsing is shared with :mod:`data_analyst_agent_app.metadata_utils`.
+
+The digest is stored as a small binary file:
+
+* a magic header;
+* the SHA-256 of the source metadata files, so a stale digest is detected;
+* the SHA-256 of the payload, which is checked on load;
+* the payload itself, zlib-compressed compact JSON.
+
+Loading one is a decompress and a ``json.loads`` of a few kilobytes, which
+takes microseconds. Build it before packaging an agent:
+
+    python -m data_analyst_agent_app.metadata_digest \
+        --metadata-dir GCP_Agent_Starter_Pack/winsights_agent/metadata
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import zlib
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from data_analyst_agent_app.metadata_utils import (
+    _DEFAULT_METADATA_DIR,
+    _normalise_identifier,
+    compile_catalog,
+)
+
+DIGEST_FILENAME = "metadata.digest"
+_MAGIC = b"MDDIGEST\x01"
+_HASH_BYTES = 32
+_HEADER_BYTES = len(_MAGIC) + 2 * _HASH_BYTES
+_FILE_SUFFIXES = ("_dataset_metadata", "_metadata", "-metadata")
+
+
+def metadata_files(directory: Path | str) -> list[Path]:
+    """Return the JSON metadata files in ``directory``, sorted by name."""
+
+    directory = Path(directory)
+    return sorted(directory.glob("*.json")) if directory.is_dir() else []
+
+
+def source_hash(paths: Iterable[Path]) -> str:
+    """Hash file names and contents; any edit to the sources changes it."""
+
+    digest = hashlib.sha256()
+    for path in paths:
+        try:
+            raw = Path(path).read_bytes()
+        except OSError:
+            continue
+        digest.update(Path(path).name.encode("utf-8"))
+        digest.update(raw)
+    return digest.hexdigest()
+
+
+class SourceHashTracker:
+    """Return :func:`source_hash` of ``paths()``, re-hashing only on change.
+
+    Instruction providers ask for the hash on every model call. The files are
+    only re-read when one of them appears, disappears or changes its mtime or
+    size, the same signature the catalog loader uses.
+    """
+
+    def __init__(self, paths: Callable[[], Iterable[Path]]) -> None:
+        self._paths = paths
+        self._lock = threading.Lock()
+        self._signature: tuple[tuple[str, int, int], ...] | None = None
+        self._hash = ""
+
+    @staticmethod
+    def _signature_of(paths: list[Path]) -> tuple[tuple[str, int, int], ...]:
+        entries = []
+        for path in paths:
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((str(path), stat.st_mtime_ns, stat.st_size))
+        return tuple(entries)
+
+    def __call__(self) -> str:
+        paths = [Path(path) for path in self._paths()]
+        signature = self._signature_of(paths)
+        with self._lock:
+            if signature != self._signature:
+                self._hash = source_hash(paths)
+                self._signature = signature
+            return self._hash
+
+
+def _dataset_id(path: Path, payload: dict[str, Any]) -> str:
+    reference = payload.get("datasetReference")
+    dataset_id = payload.get("dataset") or payload.get("dataset_id")
+    if not isinstance(dataset_id, str) and isinstance(reference, dict):
+        dataset_id = reference.get("datasetId")
+    if not isinstance(dataset_id, str):
+        dataset_id = path.stem
+        for suffix in _FILE_SUFFIXES:
+            dataset_id = dataset_id.removesuffix(suffix)
+    return _normalise_identifier(dataset_id)
+
+
+@dataclass(frozen=True)
+class MetadataDigest:
+    """Datasets as ``[id, description, tables]``.
+
+    Each table is ``[name, description, row_count, columns]`` and each column
+    is ``[name, type, description]``. Lists rather than objects keep the
+    payload small.
+    """
+
+    datasets: list[list[Any]]
+    source_hash: str
+
+    def payload(self) -> bytes:
+        return json.dumps(
+            self.datasets, separators=(",", ":"), ensure_ascii=False
+        ).encode("utf-8")
+
+    @property
+    def content_hash(self) -> str:
+        return hashlib.sha256(self.payload()).hexdigest()
+
+    def to_bytes(self) -> bytes:
+        payload = self.payload()
+        return (
+            _MAGIC
+            + bytes.fromhex(self.source_hash)
+            + hashlib.sha256(payload).digest()
+            + zlib.compress(payload, 9)
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> MetadataDigest:
+        if len(data) < _HEADER_BYTES or not data.startswith(_MAGIC):
+            raise ValueError("Not a metadata digest.")
+        offset = len(_MAGIC)
+        sources = data[offset : offset + _HASH_BYTES].hex()
+        expected = data[offset + _HASH_BYTES : _HEADER_BYTES]
+        try:
+            payload = zlib.decompress(data[_HEADER_BYTES:])
+        except zlib.error as exc:
+            raise ValueError("Metadata digest payload is corrupt.") from exc
+        if hashlib.sha256(payload).digest() != expected:
+            raise ValueError("Metadata digest payload does not match its hash.")
+        return cls(datasets=json.loads(payload), source_hash=sources)
+
+    def to_text(self) -> str:
+        """Render the digest as compact instruction text."""
+
+        lines: list[str] = []
+        for dataset_id, description, tables in self.datasets:
+            lines.append(
+                f"Dataset {dataset_id}: {description}"
+                if description
+                else f"Dataset {dataset_id}"
+            )
+            if not tables:
+                lines.append("  (no table metadata)")
+            for name, table_description, row_count, columns in tables:
+                rows = f" [{row_count:,} rows]" if isinstance(row_count, int) else ""
+                headline = f"  {name}{rows}"
+                lines.append(
+                    f"{headline}: {table_description}"
+                    if table_description
+                    else headline
+                )
+                if columns:
+                    rendered = [
+                        f"{column} {data_type}".rstrip()
+                        + (f" ({column_description})" if column_description else "")
+                        for column, data_type, column_description in columns
+                    ]
+                    lines.append(f"    {', '.join(rendered)}")
+        return "\n".join(lines)
+
+
+def compile_digest(paths: Iterable[Path]) -> MetadataDigest:
+    """Compile metadata files into a :class:`MetadataDigest`."""
+
+    paths = [Path(path) for path in paths]
+    datasets: dict[str, Any] = {}
+    for path in paths:
+        try:
+            payload = json.loads(path.read_bytes())
+        except (OSError, json.JSONDecodeError):
+            continue
+        if isinstance(payload, dict):
+            datasets.setdefault(_dataset_id(path, payload), payload)
+
+    compiled = []
+    catalog = compile_catalog(datasets)
+    for dataset_id in sorted(catalog.datasets):
+        dataset = catalog.datasets[dataset_id]
+        tables = []
+        for table in dataset.tables.values():
+            row_count = table.row_count
+            if isinstance(row_count, str) and row_count.isdigit():
+                row_count = int(row_count)
+            tables.append(
+                [
+                    table.name,
+                    table.description or "",
+                    row_count if isinstance(row_count, int) else None,
+                    [
+                        [column.name, column.data_type.upper(), column.description]
+                        for column in table.columns.values()
+                    ],
+                ]
+            )
+        compiled.append([dataset_id, dataset.description, tables])
+    return MetadataDigest(datasets=compiled, source_hash=source_hash(paths))
+
+
+def write_digest(digest: MetadataDigest, path: Path | str) -> Path:
+    """Write ``digest`` to ``path`` atomically."""
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handle, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as stream:
+            stream.write(digest.to_bytes())
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+    return path
+
+
+def load_digest(path: Path | str) -> MetadataDigest | None:
+    """Load a digest, or return ``None`` if it is missing or unreadable."""
+
+    try:
+        return MetadataDigest.from_bytes(Path(path).read_bytes())
+    except (OSError, ValueError):
+        return None
+
+
+def legacy_instruction_text(paths: Iterable[Path]) -> str:
+    """The pretty-printed JSON block per file that instructions used to embed."""
+
+    blocks = []
+    for path in paths:
+        try:
+            meta = json.loads(Path(path).read_bytes())
+        except (OSError, json.JSONDecodeError):
+            continue
+        name = Path(path).name.replace("_dataset_metadata.json", "")
+        blocks.append(
+            f"### Dataset: {name}\n```json\n{json.dumps(meta, indent=2)}\n```"
+        )
+    return "\n\n".join(blocks)
+
+
+def size_report(paths: list[Path], digest: MetadataDigest) -> dict[str, Any]:
+    """Compare the legacy instruction text with the digest's text."""
+
+    legacy = legacy_instruction_text(paths)
+    text = digest.to_text()
+    encoded = digest.to_bytes()
+    started = time.perf_counter()
+    rounds = 1000
+    for _ in range(rounds):
+        MetadataDigest.from_bytes(encoded)
+    load_us = (time.perf_counter() - started) / rounds * 1e6
+    return {
+        "files": len(paths),
+        "legacy_instruction_chars": len(legacy),
+        "digest_instruction_chars": len(text),
+        "reduction_percent": round(100 * (1 - len(text) / len(legacy)), 1)
+        if legacy
+        else 0.0,
+        "digest_bytes": len(encoded),
+        "load_microseconds": round(load_us, 1),
+        "source_hash": digest.source_hash,
+        "content_hash": digest.content_hash,
+    }
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--metadata-dir",
+        default=str(_DEFAULT_METADATA_DIR),
+        help="Directory holding the *.json metadata files.",
+    )
+    parser.add_argument(
+        "--output",
+        help=f"Digest file to write (default: <metadata-dir>/{DIGEST_FILENAME}).",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    paths = metadata_files(args.metadata_dir)
+    digest = compile_digest(paths)
+    output = write_digest(
+        digest, args.output or Path(args.metadata_dir) / DIGEST_FILENAME
+    )
+    print(json.dumps({"output": str(output), **size_report(paths, digest)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,529 @@
+"""Harvest BigQuery table and column metadata into catalog files.
+
+The files shipped under ``metadata/`` used to be raw dataset resources (etag,
+access list) with no tables or columns, which left the router and the prompt
+summary almost nothing to work with. :class:`MetadataHarvester` builds real
+catalog entries in the format :mod:`data_analyst_agent_app.metadata_utils`
+reads:
+
+* Tables, descriptions and types come from ``INFORMATION_SCHEMA.TABLES`` and
+  ``TABLE_OPTIONS``. Row counts, sizes and ``last_modified_time`` come from
+  the ``__TABLES__`` meta-table.
+* Columns, descriptions, partitioning and clustering come from
+  ``INFORMATION_SCHEMA.COLUMNS`` and ``COLUMN_FIELD_PATHS``.
+* Column profiles are optional: approximate distinct counts, null fractions
+  and min/max. They are computed with one aggregate query per base table,
+  sampled with ``TABLESAMPLE`` above a size threshold and capped by
+  ``maximum_bytes_billed``.
+
+The metadata queries for all datasets run concurrently, and so do the
+profile queries. Refreshes are incremental. A table whose
+``last_modified_time`` matches the previous harvest keeps its previous entry,
+so it is not profiled again, unless that entry was written without profiles
+(``--no-profile``) and this run profiles. Files are written atomically, and only when
+their content changes, so the catalog loader's hot reload picks them up.
+
+Usage:
+    python -m data_analyst_agent_app.metadata_harvester --project-id PROJECT \
+        [--dataset ms_graph --dataset gt_wf] [--full] [--no-profile]
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import decimal
+import json
+import logging
+import os
+import re
+import tempfile
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from data_analyst_agent_app.metadata_utils import _DEFAULT_METADATA_DIR
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = int(os.getenv("DATA_ANALYST_HARVEST_MAX_WORKERS", "8"))
+DEFAULT_SAMPLE_PERCENT = float(os.getenv("DATA_ANALYST_HARVEST_SAMPLE_PERCENT", "10"))
+# Tables larger than this are profiled from a TABLESAMPLE instead of in full.
+DEFAULT_SAMPLE_THRESHOLD_BYTES = (
+    int(os.getenv("DATA_ANALYST_HARVEST_SAMPLE_THRESHOLD_MB", "1024")) * 1024**2
+)
+DEFAULT_PROFILE_MAX_BYTES = (
+    int(os.getenv("DATA_ANALYST_HARVEST_PROFILE_MAX_GB", "10")) * 1024**3
+)
+DEFAULT_MAX_PROFILE_COLUMNS = 64
+
+# __TABLES__.type codes.
+_TABLE_TYPES = {1: "BASE TABLE", 2: "VIEW", 3: "EXTERNAL"}
+_UNPROFILED_TYPES = {"ARRAY", "STRUCT", "RECORD", "JSON", "GEOGRAPHY", "BYTES", "RANGE"}
+_UNORDERED_TYPES = {"BOOL", "BOOLEAN", "INTERVAL"}
+
+_FILE_SUFFIX = "_dataset_metadata.json"
+
+
+def _quote(identifier: str) -> str:
+    return f"`{identifier.replace('`', '')}`"
+
+
+def _base_type(data_type: str) -> str:
+    """``NUMERIC(10, 2)`` → ``NUMERIC``; ``ARRAY<STRING>`` → ``ARRAY``."""
+
+    return re.split(r"[<(]", data_type, maxsplit=1)[0].strip().upper()
+
+
+def _option_string(value: Any) -> str | None:
+    """Decode a ``TABLE_OPTIONS.option_value`` string literal."""
+
+    if not isinstance(value, str):
+        return None
+    try:
+        decoded = json.loads(value)
+    except json.JSONDecodeError:
+        return value.strip("'\"") or None
+    return decoded if isinstance(decoded, str) and decoded else None
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, (dt.datetime, dt.date, dt.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, bytes):
+        return value.hex()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def _rows(job: Any) -> list[dict[str, Any]]:
+    return [dict(row.items()) for row in job.result()]
+
+
+@dataclass
+class HarvestReport:
+    """What a harvest run did, per table and per file."""
+
+    datasets: int = 0
+    tables: int = 0
+    profiled: int = 0
+    reused: int = 0
+    written: list[str] = field(default_factory=list)
+    unchanged: list[str] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "datasets": self.datasets,
+            "tables": self.tables,
+            "profiled": self.profiled,
+            "reused": self.reused,
+            "written": list(self.written),
+            "unchanged": list(self.unchanged),
+            "errors": list(self.errors),
+        }
+
+
+@dataclass(eq=False)
+class _DatasetSnapshot:
+    dataset_id: str
+    payload: dict[str, Any]
+    tables: dict[str, dict[str, Any]]
+    pending_profiles: list[str]
+    reused: int
+
+
+class MetadataHarvester:
+    """Build catalog files for BigQuery datasets from ``INFORMATION_SCHEMA``.
+
+    ``client`` is a ``google.cloud.bigquery.Client`` or anything with the
+    same ``query``, ``get_dataset`` and ``list_datasets`` methods.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        project_id: str,
+        *,
+        output_dir: Path | str | None = None,
+        location: str | None = None,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        profile: bool = True,
+        sample_percent: float = DEFAULT_SAMPLE_PERCENT,
+        sample_threshold_bytes: int = DEFAULT_SAMPLE_THRESHOLD_BYTES,
+        profile_max_bytes: int = DEFAULT_PROFILE_MAX_BYTES,
+        max_profile_columns: int = DEFAULT_MAX_PROFILE_COLUMNS,
+        job_config_factory: Callable[[int], Any] | None = None,
+    ) -> None:
+        self.client = client
+        self.project_id = project_id
+        self.output_dir = Path(output_dir or _DEFAULT_METADATA_DIR)
+        self.location = location
+        self.max_workers = max(1, max_workers)
+        self.profile = profile
+        self.sample_percent = sample_percent
+        self.sample_threshold_bytes = sample_threshold_bytes
+        self.profile_max_bytes = profile_max_bytes
+        self.max_profile_columns = max_profile_columns
+        self._job_config_factory = job_config_factory or _profile_job_config
+
+    # -- files -------------------------------------------------------------
+
+    def path_for(self, dataset_id: str) -> Path:
+        return self.output_dir / f"{dataset_id}{_FILE_SUFFIX}"
+
+    def _previous_tables(self, dataset_id: str) -> dict[str, dict[str, Any]]:
+        try:
+            payload = json.loads(self.path_for(dataset_id).read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return {}
+        tables = payload.get("tables") if isinstance(payload, dict) else None
+        if not isinstance(tables, list):
+            return {}
+        return {
+            entry["table"]: entry
+            for entry in tables
+            if isinstance(entry, dict) and isinstance(entry.get("table"), str)
+        }
+
+    def _write(self, dataset_id: str, payload: dict[str, Any]) -> bool:
+        """Atomically write ``payload``; return ``False`` if nothing changed."""
+
+        path = self.path_for(dataset_id)
+        encoded = json.dumps(
+            payload, separators=(",", ":"), sort_keys=True, ensure_ascii=False
+        )
+        try:
+            if path.read_text(encoding="utf-8") == encoded:
+                return False
+        except OSError:
+            pass
+        path.parent.mkdir(parents=True, exist_ok=True)
+        handle, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "w", encoding="utf-8") as stream:
+                stream.write(encoded)
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        return True
+
+    # -- queries -----------------------------------------------------------
+
+    def _query(self, sql: str, job_config: Any = None) -> list[dict[str, Any]]:
+        return _rows(
+            self.client.query(sql, job_config=job_config, location=self.location)
+        )
+
+    def _describe_dataset(self, dataset_id: str) -> dict[str, Any]:
+        """Run the metadata-only queries for one dataset (no bytes billed)."""
+
+        prefix = f"{self.project_id}.{dataset_id}"
+        schema = _quote(f"{prefix}.INFORMATION_SCHEMA")
+        dataset = self.client.get_dataset(prefix)
+        tables = self._query(
+            "SELECT t.table_name, t.table_type, o.option_value AS description "
+            f"FROM {schema}.TABLES AS t LEFT JOIN {schema}.TABLE_OPTIONS AS o "
+            "ON o.table_name = t.table_name AND o.option_name = 'description'"
+        )
+        storage = self._query(
+            "SELECT table_id, type, row_count, size_bytes, last_modified_time "
+            f"FROM {_quote(f'{prefix}.__TABLES__')}"
+        )
+        columns = self._query(
+            "SELECT c.table_name, c.column_name, c.data_type, "
+            "c.is_partitioning_column, c.clustering_ordinal_position, f.description "
+            f"FROM {schema}.COLUMNS AS c LEFT JOIN {schema}.COLUMN_FIELD_PATHS AS f "
+            "ON f.table_name = c.table_name AND f.field_path = c.column_name "
+            "ORDER BY c.table_name, c.ordinal_position"
+        )
+        return {
+            "dataset": dataset,
+            "tables": tables,
+            "storage": {row["table_id"]: row for row in storage},
+            "columns": columns,
+        }
+
+    def _profile_sql(self, table_id: str, table: dict[str, Any]) -> str | None:
+        selects = ["COUNT(*) AS _rows"]
+        for index, column in enumerate(table["columns"][: self.max_profile_columns]):
+            if column["type"] in _UNPROFILED_TYPES:
+                continue
+            name = _quote(column["name"])
+            selects.append(f"APPROX_COUNT_DISTINCT({name}) AS d{index}")
+            selects.append(f"COUNTIF({name} IS NULL) AS n{index}")
+            if column["type"] not in _UNORDERED_TYPES:
+                selects.append(f"MIN({name}) AS lo{index}, MAX({name}) AS hi{index}")
+        if len(selects) == 1:
+            return None
+        source = _quote(table_id)
+        if (table.get("size_bytes") or 0) > self.sample_threshold_bytes:
+            source += f" TABLESAMPLE SYSTEM ({self.sample_percent:g} PERCENT)"
+        return f"SELECT {', '.join(selects)} FROM {source}"
+
+    def _profile_table(self, dataset_id: str, table: dict[str, Any]) -> None:
+        """Add ``profile`` entries to ``table``'s columns in place."""
+
+        table_id = f"{self.project_id}.{dataset_id}.{table['table']}"
+        sql = self._profile_sql(table_id, table)
+        if sql is None:
+            return
+        rows = self._query(
+            sql, job_config=self._job_config_factory(self.profile_max_bytes)
+        )
+        if not rows:
+            return
+        row = rows[0]
+        sampled = " TABLESAMPLE " in sql
+        total = row.get("_rows") or 0
+        for index, column in enumerate(table["columns"]):
+            if f"d{index}" not in row:
+                continue
+            profile: dict[str, Any] = {"approx_distinct": row[f"d{index}"]}
+            if total:
+                profile["null_fraction"] = round((row[f"n{index}"] or 0) / total, 4)
+            if f"lo{index}" in row:
+                profile["min"] = _jsonable(row[f"lo{index}"])
+                profile["max"] = _jsonable(row[f"hi{index}"])
+            if sampled:
+                profile["sample_percent"] = self.sample_percent
+            column["profile"] = profile
+
+    def _wants_profile(self, entry: dict[str, Any]) -> bool:
+        return bool(
+            self.profile
+            and entry.get("type") == "BASE TABLE"
+            and entry.get("row_count")
+        )
+
+    # -- assembly ----------------------------------------------------------
+
+    def _snapshot(
+        self, dataset_id: str, described: dict[str, Any], full: bool
+    ) -> _DatasetSnapshot:
+        previous = {} if full else self._previous_tables(dataset_id)
+        columns_by_table: dict[str, list[dict[str, Any]]] = {}
+        for row in described["columns"]:
+            data_type = str(row.get("data_type") or "")
+            column: dict[str, Any] = {
+                "name": row["column_name"],
+                "type": _base_type(data_type),
+            }
+            if data_type.upper() != column["type"]:
+                column["declared_type"] = data_type
+            if row.get("description"):
+                column["description"] = row["description"]
+            if str(row.get("is_partitioning_column") or "").upper() == "YES":
+                column["partitioning"] = True
+            if row.get("clustering_ordinal_position"):
+                column["clustering"] = int(row["clustering_ordinal_position"])
+            columns_by_table.setdefault(row["table_name"], []).append(column)
+
+        tables: dict[str, dict[str, Any]] = {}
+        pending: list[str] = []
+        reused = 0
+        for row in described["tables"]:
+            name = row["table_name"]
+            storage = described["storage"].get(name, {})
+            last_modified = storage.get("last_modified_time")
+            prior = previous.get(name)
+            if (
+                prior is not None
+                and last_modified
+                and prior.get("last_modified") == last_modified
+                # An entry written by a --no-profile run is profiled now.
+                and (prior.get("profiled") or not self._wants_profile(prior))
+            ):
+                tables[name] = prior
+                reused += 1
+                continue
+            columns = columns_by_table.get(name, [])
+            entry: dict[str, Any] = {
+                "table": name,
+                "type": row.get("table_type")
+                or _TABLE_TYPES.get(storage.get("type"), "BASE TABLE"),
+                "columns": columns,
+            }
+            description = _option_string(row.get("description"))
+            if description:
+                entry["description"] = description
+            for key in ("row_count", "size_bytes"):
+                if storage.get(key) is not None:
+                    entry[key] = int(storage[key])
+            if last_modified:
+                entry["last_modified"] = int(last_modified)
+            partition = [
+                column["name"] for column in columns if column.get("partitioning")
+            ]
+            if partition:
+                entry["partition_column"] = partition[0]
+            clustering = sorted(
+                (column for column in columns if column.get("clustering")),
+                key=lambda column: column["clustering"],
+            )
+            if clustering:
+                entry["clustering_columns"] = [column["name"] for column in clustering]
+            tables[name] = entry
+            if self._wants_profile(entry):
+                pending.append(name)
+
+        dataset = described["dataset"]
+        payload: dict[str, Any] = {"dataset": dataset_id, "project": self.project_id}
+        if getattr(dataset, "description", None):
+            payload["description"] = dataset.description
+        if getattr(dataset, "location", None):
+            payload["location"] = dataset.location
+        if getattr(dataset, "labels", None):
+            payload["labels"] = dict(dataset.labels)
+        return _DatasetSnapshot(dataset_id, payload, tables, pending, reused)
+
+    def list_datasets(self) -> list[str]:
+        return sorted(
+            dataset.dataset_id for dataset in self.client.list_datasets(self.project_id)
+        )
+
+    def harvest(
+        self, dataset_ids: Iterable[str] | None = None, *, full: bool = False
+    ) -> HarvestReport:
+        """Harvest ``dataset_ids`` (all datasets when omitted) and write files.
+
+        With ``full=False`` tables unchanged since the previous harvest keep
+        their previous entries and are not profiled again.
+        """
+
+        datasets = sorted(dataset_ids) if dataset_ids else self.list_datasets()
+        report = HarvestReport()
+        snapshots: list[_DatasetSnapshot] = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            described = {
+                dataset_id: pool.submit(self._describe_dataset, dataset_id)
+                for dataset_id in datasets
+            }
+            for dataset_id, future in described.items():
+                try:
+                    snapshots.append(self._snapshot(dataset_id, future.result(), full))
+                except Exception as error:
+                    LOGGER.warning(
+                        "Could not describe dataset %s: %s", dataset_id, error
+                    )
+                    report.errors.append(f"{dataset_id}: {error}")
+
+            profiles = {
+                (snapshot, name): pool.submit(
+                    self._profile_table, snapshot.dataset_id, snapshot.tables[name]
+                )
+                for snapshot in snapshots
+                for name in snapshot.pending_profiles
+            }
+            for (snapshot, name), future in profiles.items():
+                try:
+                    future.result()
+                    snapshot.tables[name]["profiled"] = True
+                    report.profiled += 1
+                except Exception as error:
+                    LOGGER.warning(
+                        "Could not profile %s.%s: %s", snapshot.dataset_id, name, error
+                    )
+                    report.errors.append(f"{snapshot.dataset_id}.{name}: {error}")
+                    # Without a version the next incremental run retries it.
+                    snapshot.tables[name].pop("last_modified", None)
+
+        for snapshot in snapshots:
+            report.datasets += 1
+            report.tables += len(snapshot.tables)
+            report.reused += snapshot.reused
+            payload = dict(snapshot.payload)
+            payload["tables"] = [
+                snapshot.tables[name] for name in sorted(snapshot.tables)
+            ]
+            path = self.path_for(snapshot.dataset_id)
+            if self._write(snapshot.dataset_id, payload):
+                report.written.append(str(path))
+            else:
+                report.unchanged.append(str(path))
+        return report
+
+
+def _profile_job_config(max_bytes: int) -> Any:
+    from google.cloud import bigquery
+
+    return bigquery.QueryJobConfig(
+        maximum_bytes_billed=max_bytes, labels={"purpose": "metadata_harvest"}
+    )
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--project-id",
+        default=os.getenv("DATA_ANALYST_PROJECT", "wmt-ade-agentspace-dev"),
+        help="Project that owns the datasets (default: $DATA_ANALYST_PROJECT).",
+    )
+    parser.add_argument(
+        "--dataset",
+        action="append",
+        dest="datasets",
+        help="Dataset to harvest; repeat for several (default: every dataset).",
+    )
+    parser.add_argument(
+        "--output-dir",
+        default=str(_DEFAULT_METADATA_DIR),
+        help="Directory the catalog files are written to.",
+    )
+    parser.add_argument(
+        "--location",
+        default=os.getenv("BIGQUERY_LOCATION"),
+        help="BigQuery job location (default: $BIGQUERY_LOCATION).",
+    )
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help=f"Concurrent BigQuery requests (default: {DEFAULT_MAX_WORKERS}).",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Re-harvest every table instead of only those modified since the last run.",
+    )
+    parser.add_argument(
+        "--no-profile",
+        dest="profile",
+        action="store_false",
+        help="Skip the column profile queries (metadata queries only, no bytes billed).",
+    )
+    parser.add_argument(
+        "--log-level", default="INFO", help="Logging level (default: INFO)."
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    logging.basicConfig(
+        level=args.log_level.upper(), format="%(levelname)s %(message)s"
+    )
+
+    from google.cloud import bigquery
+
+    harvester = MetadataHarvester(
+        bigquery.Client(project=args.project_id),
+        args.project_id,
+        output_dir=args.output_dir,
+        location=args.location,
+        max_workers=args.max_workers,
+        profile=args.profile,
+    )
+    print(
+        json.dumps(harvester.harvest(args.datasets, full=args.full).as_dict(), indent=2)
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -3,15 +3,18 @@
 The data analyst agent can consult rich metadata supplied as JSON files to
 answer exploratory questions without repeatedly scanning BigQuery tables.
 The helper functions in this module load those files, expose convenient
-lookups, and provide lightweight heuristics for routing incoming requests to
-the correct dataset.
+lookups, and route incoming requests to the correct dataset through the BM25
+index in :mod:`data_analyst_agent_app.dataset_router`.
 """
 
 from __future__ import annotations
 
+import hashlib
 import json
 import os
-from functools import lru_cache
+import threading
+import time
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any, Iterable
 
@@ -74,6 +77,10 @@ _NUMERIC_TYPES = {
     "number",
 }
 
+# Minimum number of seconds between checks of the metadata directory for
+# changed files. Lookups in between are served from the compiled catalog.
+_RELOAD_INTERVAL_SECONDS = float(os.getenv("DATA_ANALYST_METADATA_RELOAD_SECONDS", "2"))
+
 
 def _normalise_identifier(value: str) -> str:
     """Return a case-folded identifier without project or dataset prefixes."""
@@ -88,32 +95,30 @@ def _iter_metadata_files() -> Iterable[Path]:
     return sorted(_DEFAULT_METADATA_DIR.glob("*.json"))
 
 
-@lru_cache(maxsize=1)
-def _load_all_metadata() -> dict[str, Any]:
+def _read_metadata_files(paths: Iterable[Path]) -> tuple[dict[str, Any], str]:
+    """Parse every metadata file, returning payloads and a combined content hash."""
+
+    digest = hashlib.sha256()
     datasets: dict[str, Any] = {}
-    for path in _iter_metadata_files():
+    for path in paths:
+        try:
+            raw = path.read_bytes()
+        except OSError:
+            continue
+        digest.update(path.name.encode("utf-8"))
+        digest.update(raw)
         try:
-            payload = json.loads(path.read_text())
+            payload = json.loads(raw)
         except json.JSONDecodeError:
             continue
+        if not isinstance(payload, dict):
+            continue
         dataset_id = payload.get("dataset") or payload.get("dataset_id")
         if not isinstance(dataset_id, str):
             dataset_id = path.stem.replace("_metadata", "").replace("-metadata", "")
         dataset_key = _normalise_identifier(dataset_id)
         datasets[dataset_key] = payload
-    return datasets
-
-
-def get_all_metadata() -> dict[str, Any]:
-    """Return the metadata for all datasets keyed by dataset ID."""
-
-    return _load_all_metadata().copy()
-
-
-def get_dataset_metadata(dataset_id: str) -> dict[str, Any] | None:
-    """Look up metadata for a specific dataset."""
-
-    return _load_all_metadata().get(_normalise_identifier(dataset_id))
+    return datasets, digest.hexdigest()
 
 
 def _iter_table_entries(dataset_meta: dict[str, Any]) -> Iterable[tuple[str, dict[str, Any]]]:
@@ -131,83 +136,240 @@ def _iter_table_entries(dataset_meta: dict[str, Any]) -> Iterable[tuple[str, dic
                 yield _normalise_identifier(name), entry
 
 
+def _iter_column_entries(table_meta: dict[str, Any]) -> Iterable[tuple[str, dict[str, Any]]]:
+    column_info = table_meta.get("columns")
+    if isinstance(column_info, dict):
+        for name, info in column_info.items():
+            yield str(name), info if isinstance(info, dict) else {}
+    elif isinstance(column_info, list):
+        for column in column_info:
+            if isinstance(column, dict):
+                name = column.get("name") or column.get("column")
+                if name:
+                    yield str(name), column
+            elif isinstance(column, str):
+                yield column, {}
+
+
+@dataclass(frozen=True)
+class ColumnInfo:
+    """A column of a catalogued table."""
+
+    name: str
+    data_type: str
+    description: str
+    is_numeric: bool
+
+
+@dataclass(frozen=True)
+class TableInfo:
+    """A catalogued table with its columns indexed by normalised name."""
+
+    name: str
+    description: str | None
+    row_count: Any
+    columns: dict[str, ColumnInfo]
+    numeric_columns: tuple[str, ...]
+    categorical_columns: tuple[str, ...]
+    metadata: dict[str, Any]
+
+
+@dataclass(frozen=True)
+class DatasetInfo:
+    """A catalogued dataset with its tables indexed by normalised name."""
+
+    dataset_id: str
+    description: str
+    tables: dict[str, TableInfo]
+    metadata: dict[str, Any]
+
+
+@dataclass(frozen=True)
+class MetadataCatalog:
+    """Compiled, lookup-friendly view of every metadata file."""
+
+    datasets: dict[str, DatasetInfo] = field(default_factory=dict)
+    content_hash: str = ""
+
+    def table(self, dataset_id: str, table_id: str) -> TableInfo | None:
+        dataset = self.datasets.get(_normalise_identifier(dataset_id))
+        if dataset is None:
+            return None
+        return dataset.tables.get(_normalise_identifier(table_id))
+
+
+def _compile_table(name: str, info: dict[str, Any]) -> TableInfo:
+    columns: dict[str, ColumnInfo] = {}
+    numeric: list[str] = []
+    categorical: list[str] = []
+    for column_name, column_meta in _iter_column_entries(info):
+        dtype = str(column_meta.get("type") or column_meta.get("data_type") or "").lower()
+        is_numeric = dtype in _NUMERIC_TYPES
+        (numeric if is_numeric else categorical).append(column_name)
+        columns.setdefault(
+            column_name.lower(),
+            ColumnInfo(
+                name=column_name,
+                data_type=dtype,
+                description=str(column_meta.get("description") or ""),
+                is_numeric=is_numeric,
+            ),
+        )
+    return TableInfo(
+        name=name,
+        description=info.get("description") or info.get("summary"),
+        row_count=info.get("row_count") or info.get("rows"),
+        columns=columns,
+        numeric_columns=tuple(numeric),
+        categorical_columns=tuple(categorical),
+        metadata=info,
+    )
+
+
+def compile_catalog(datasets: dict[str, Any], content_hash: str = "") -> MetadataCatalog:
+    """Build the dataset → table → column indexes for raw metadata payloads."""
+
+    compiled: dict[str, DatasetInfo] = {}
+    for dataset_id, dataset_meta in datasets.items():
+        tables: dict[str, TableInfo] = {}
+        for table_name, info in _iter_table_entries(dataset_meta):
+            tables.setdefault(table_name, _compile_table(table_name, info))
+        compiled[dataset_id] = DatasetInfo(
+            dataset_id=dataset_id,
+            description=dataset_meta.get("description") or dataset_meta.get("summary") or "",
+            tables=tables,
+            metadata=dataset_meta,
+        )
+    return MetadataCatalog(datasets=compiled, content_hash=content_hash)
+
+
+class _CatalogLoader:
+    """Keep the compiled catalog in sync with the files on disk.
+
+    The directory is re-stat'ed at most once per ``_RELOAD_INTERVAL_SECONDS``.
+    A change in any file's mtime or size triggers a re-read, and the catalog
+    is only recompiled when the combined content hash actually differs.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._catalog = MetadataCatalog()
+        self._signature: tuple[tuple[str, int, int], ...] | None = None
+        self._checked_at = float("-inf")
+
+    def _signature_of(self, paths: list[Path]) -> tuple[tuple[str, int, int], ...]:
+        entries = []
+        for path in paths:
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((str(path), stat.st_mtime_ns, stat.st_size))
+        return tuple(entries)
+
+    def get(self) -> MetadataCatalog:
+        now = time.monotonic()
+        if now - self._checked_at < _RELOAD_INTERVAL_SECONDS:
+            return self._catalog
+        with self._lock:
+            if now - self._checked_at < _RELOAD_INTERVAL_SECONDS:
+                return self._catalog
+            paths = list(_iter_metadata_files())
+            signature = self._signature_of(paths)
+            if signature != self._signature:
+                datasets, content_hash = _read_metadata_files(paths)
+                if content_hash != self._catalog.content_hash:
+                    self._catalog = compile_catalog(datasets, content_hash)
+                self._signature = signature
+            self._checked_at = time.monotonic()
+            return self._catalog
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._signature = None
+            self._checked_at = float("-inf")
+
+
+_CATALOG_LOADER = _CatalogLoader()
+
+
+def get_catalog() -> MetadataCatalog:
+    """Return the compiled catalog, reloading it if metadata files changed."""
+
+    return _CATALOG_LOADER.get()
+
+
+def reload_catalog() -> MetadataCatalog:
+    """Force a re-check of the metadata directory and return the catalog."""
+
+    _CATALOG_LOADER.invalidate()
+    return _CATALOG_LOADER.get()
+
+
+def _load_all_metadata() -> dict[str, Any]:
+    return {
+        dataset_id: dataset.metadata
+        for dataset_id, dataset in get_catalog().datasets.items()
+    }
+
+
+def get_all_metadata() -> dict[str, Any]:
+    """Return the metadata for all datasets keyed by dataset ID."""
+
+    return _load_all_metadata()
+
+
+def get_dataset_metadata(dataset_id: str) -> dict[str, Any] | None:
+    """Look up metadata for a specific dataset."""
+
+    dataset = get_catalog().datasets.get(_normalise_identifier(dataset_id))
+    return dataset.metadata if dataset else None
+
+
 def get_table_metadata(dataset_id: str, table_id: str) -> dict[str, Any] | None:
     """Return metadata for a specific table within a dataset, if available."""
 
-    dataset_meta = get_dataset_metadata(dataset_id)
-    if not dataset_meta:
-        return None
-    target = _normalise_identifier(table_id)
-    for table_name, info in _iter_table_entries(dataset_meta):
-        if table_name == target:
-            return info
-    return None
+    table = get_catalog().table(dataset_id, table_id)
+    return table.metadata if table else None
 
 
 def route_question_to_dataset(question: str) -> tuple[str | None, str]:
-    """Choose the most relevant dataset for a natural-language question."""
-
-    text = question.lower()
-    m365_matches = sorted({word for word in _M365_KEYWORDS if word in text})
-    wf_matches = sorted({word for word in _WORKFORCE_KEYWORDS if word in text})
-
-    if m365_matches and not wf_matches:
-        return "ms_graph", f"Matched Microsoft 365 keywords: {', '.join(m365_matches)}."
-    if wf_matches and not m365_matches:
-        return "gt_wf", f"Matched workforce keywords: {', '.join(wf_matches)}."
-    if m365_matches and wf_matches:
-        return (
-            "ms_graph",
-            "Matched both keyword groups; prioritising Microsoft 365 context by default.",
-        )
-    return None, "No routing keywords detected; fall back to general reasoning."
+    """Choose the most relevant dataset for a natural-language question.
+
+    Delegates to the BM25 router in :mod:`data_analyst_agent_app.dataset_router`,
+    which is built from the metadata files and the legacy keyword sets.
+    """
+
+    from data_analyst_agent_app.dataset_router import route_question
+
+    result = route_question(question, limit=3)
+    return result.best_dataset, result.reason()
 
 
 def summarise_metadata_for_prompt() -> str:
     """Create a compact, human-readable summary of all dataset metadata."""
 
-    metadata = _load_all_metadata()
-    if not metadata:
+    catalog = get_catalog()
+    if not catalog.datasets:
         return "(No metadata files were found; rely on exploratory analysis.)"
 
     lines: list[str] = []
-    for dataset_id in sorted(metadata):
-        dataset_meta = metadata[dataset_id]
-        description = dataset_meta.get("description") or dataset_meta.get("summary") or ""
+    for dataset_id in sorted(catalog.datasets):
+        dataset = catalog.datasets[dataset_id]
         headline = f"- Dataset `{dataset_id}`"
-        if description:
-            headline += f": {description}"
+        if dataset.description:
+            headline += f": {dataset.description}"
         lines.append(headline)
-        table_lines: list[str] = []
-        for table_name, info in _iter_table_entries(dataset_meta):
-            table_desc = info.get("description") or info.get("summary") or ""
-            row_count = info.get("row_count") or info.get("rows")
-            column_info = info.get("columns")
-            if isinstance(column_info, dict):
-                notable_columns = list(column_info.keys())[:5]
-            elif isinstance(column_info, list):
-                notable_columns = []
-                for column in column_info:
-                    if isinstance(column, dict):
-                        name = column.get("name") or column.get("column")
-                        if name:
-                            notable_columns.append(name)
-                    elif isinstance(column, str):
-                        notable_columns.append(column)
-                    if len(notable_columns) >= 5:
-                        break
-            else:
-                notable_columns = []
+        for table in dataset.tables.values():
+            notable_columns = [column.name for column in list(table.columns.values())[:5]]
             column_text = (
                 f" Key fields: {', '.join(notable_columns)}."
                 if notable_columns
                 else ""
             )
-            row_text = f" Rows: {row_count}." if row_count else ""
-            detail = f"    • {table_name}: {table_desc}{row_text}{column_text}".rstrip()
-            table_lines.append(detail)
-        if table_lines:
-            lines.extend(table_lines)
+            row_text = f" Rows: {table.row_count}." if table.row_count else ""
+            detail = f"    • {table.name}: {table.description or ''}{row_text}{column_text}".rstrip()
+            lines.append(detail)
     return "\n".join(lines)
 
 
@@ -218,52 +380,37 @@ def create_dashboard_plan(
 ) -> dict[str, Any]:
     """Generate a lightweight dashboard plan using available metadata."""
 
-    dataset_id, reason = route_question_to_dataset(question or objective)
-    dataset_meta = get_dataset_metadata(dataset_id) if dataset_id else None
+    from data_analyst_agent_app.dataset_router import route_question
+
+    routing = route_question(question or objective, limit=20)
+    dataset_id, reason = routing.best_dataset, routing.reason()
+    dataset = get_catalog().datasets.get(dataset_id) if dataset_id else None
     tables: list[dict[str, Any]] = []
-    if dataset_meta:
-        table_entries = list(_iter_table_entries(dataset_meta))
+    if dataset:
         requested = [
             _normalise_identifier(name)
             for name in focus_tables or []
         ]
-        for name, info in table_entries:
-            if requested and name not in requested:
-                continue
-            entry = {
-                "table": name,
-                "description": info.get("description") or info.get("summary"),
-            }
-            column_info = info.get("columns")
-            numeric_columns: list[str] = []
-            categorical_columns: list[str] = []
-            if isinstance(column_info, dict):
-                for column_name, column_meta in column_info.items():
-                    if not isinstance(column_meta, dict):
-                        continue
-                    dtype = str(column_meta.get("type") or column_meta.get("data_type") or "").lower()
-                    if dtype in _NUMERIC_TYPES:
-                        numeric_columns.append(column_name)
-                    else:
-                        categorical_columns.append(column_name)
-            elif isinstance(column_info, list):
-                for column_meta in column_info:
-                    if isinstance(column_meta, dict):
-                        name = column_meta.get("name") or column_meta.get("column")
-                        dtype = str(column_meta.get("type") or column_meta.get("data_type") or "").lower()
-                        if not name:
-                            continue
-                        if dtype in _NUMERIC_TYPES:
-                            numeric_columns.append(name)
-                        else:
-                            categorical_columns.append(name)
-                    elif isinstance(column_meta, str):
-                        categorical_columns.append(column_meta)
-            entry["numeric_columns"] = numeric_columns
-            entry["categorical_columns"] = categorical_columns
-            tables.append(entry)
-            if not requested and len(tables) >= 4:
-                break
+        if requested:
+            candidates = [dataset.tables[name] for name in requested if name in dataset.tables]
+        else:
+            ranked = [
+                dataset.tables[match.table]
+                for match in routing.tables
+                if match.dataset_id == dataset_id and match.table in dataset.tables
+            ]
+            ranked_names = {table.name for table in ranked}
+            remaining = [
+                table for table in dataset.tables.values() if table.name not in ranked_names
+            ]
+            candidates = (ranked + remaining)[:4]
+        for table in candidates:
+            tables.append({
+                "table": table.name,
+                "description": table.description,
+                "numeric_columns": list(table.numeric_columns),
+                "categorical_columns": list(table.categorical_columns),
+            })
 
     visualisations: list[dict[str, Any]] = []
     for table in tables:
@@ -294,10 +441,17 @@ def create_dashboard_plan(
 
 
 __all__ = [
+    "ColumnInfo",
+    "DatasetInfo",
+    "MetadataCatalog",
+    "TableInfo",
+    "compile_catalog",
     "create_dashboard_plan",
     "get_all_metadata",
+    "get_catalog",
     "get_dataset_metadata",
     "get_table_metadata",
+    "reload_catalog",
     "route_question_to_dataset",
     "summarise_metadata_for_prompt",
 ]
@@ -0,0 +1,307 @@
+"""Question-conditioned slices of the dataset metadata for the system prompt.
+
+Embedding :func:`summarise_metadata_for_prompt` in the agent instruction means
+every model call pays for every dataset, table and key field, even when the
+question concerns a single table. This module ranks catalogued tables and
+columns against the user's latest question and renders only the best matches
+within a token budget. :func:`inject_metadata_slice` is an ADK
+``before_model_callback`` that appends the slice to the system instruction of
+each request. Slices are cached per question and catalog version, and
+:func:`get_slice_stats` reports the prompt tokens saved against the full
+summary.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+from data_analyst_agent_app.dataset_router import (
+    DatasetRouter,
+    get_router,
+    index_terms,
+    tokenise,
+)
+from data_analyst_agent_app.metadata_utils import (
+    MetadataCatalog,
+    TableInfo,
+    get_catalog,
+    summarise_metadata_for_prompt,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_TOKEN_BUDGET = int(os.getenv("DATA_ANALYST_METADATA_TOKEN_BUDGET", "800"))
+_CACHE_SIZE = int(os.getenv("DATA_ANALYST_METADATA_SLICE_CACHE_SIZE", "256"))
+_MAX_COLUMNS_PER_TABLE = 8
+
+# Rough characters-per-token ratio for Gemini on English and identifiers.
+_CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheaply approximate the number of model tokens in ``text``."""
+
+    return (len(text) + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN
+
+
+@dataclass(frozen=True)
+class RankedTable:
+    """A table scored against a question, with the columns that matched."""
+
+    dataset_id: str
+    table: TableInfo
+    score: float
+    matched_columns: tuple[str, ...]
+
+
+def rank_tables(question: str, catalog: MetadataCatalog) -> list[RankedTable]:
+    """Rank catalogued tables for ``question`` with the BM25 dataset router."""
+
+    router = get_router()
+    if router.content_hash != catalog.content_hash:
+        router = DatasetRouter(catalog)
+    terms = set(index_terms(question))
+    ranked: list[RankedTable] = []
+    for match in router.route(question, limit=None).tables:
+        table = catalog.table(match.dataset_id, match.table or "")
+        if table is None:
+            continue
+        matched = tuple(
+            column.name
+            for column in table.columns.values()
+            if terms.intersection(index_terms(f"{column.name} {column.description}"))
+        )
+        ranked.append(RankedTable(match.dataset_id, table, match.score, matched))
+    return ranked
+
+
+def _render_table(ranked: RankedTable) -> str:
+    table = ranked.table
+    columns: list[str] = list(ranked.matched_columns)
+    for column in table.columns.values():
+        if len(columns) >= _MAX_COLUMNS_PER_TABLE:
+            break
+        if column.name not in columns:
+            columns.append(column.name)
+    rendered_columns = []
+    for name in columns[:_MAX_COLUMNS_PER_TABLE]:
+        column = table.columns.get(name.lower())
+        dtype = column.data_type.upper() if column and column.data_type else ""
+        rendered_columns.append(f"{name} ({dtype})" if dtype else name)
+    row_text = f" Rows: {table.row_count}." if table.row_count else ""
+    column_text = (
+        f" Key fields: {', '.join(rendered_columns)}." if rendered_columns else ""
+    )
+    return (
+        f"    • {table.name}: {table.description or ''}{row_text}{column_text}".rstrip()
+    )
+
+
+@dataclass(frozen=True)
+class MetadataSlice:
+    """Rendered metadata for one question plus its token accounting."""
+
+    text: str
+    tokens: int
+    full_tokens: int
+    tables: tuple[str, ...]
+
+    @property
+    def saved_tokens(self) -> int:
+        return max(0, self.full_tokens - self.tokens)
+
+
+def render_metadata_slice(
+    question: str,
+    catalog: MetadataCatalog,
+    *,
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+    full_tokens: int = 0,
+) -> MetadataSlice:
+    """Render the best-matching tables for ``question`` within ``token_budget``."""
+
+    if not catalog.datasets:
+        text = "(No metadata files were found; rely on exploratory analysis.)"
+        return MetadataSlice(text, estimate_tokens(text), full_tokens, ())
+
+    total_tables = sum(len(dataset.tables) for dataset in catalog.datasets.values())
+    header = "Metadata most relevant to the current question"
+    lines: list[str] = []
+    used = estimate_tokens(header) + 16
+    shown: list[str] = []
+    current_dataset: str | None = None
+
+    for ranked in rank_tables(question, catalog):
+        block: list[str] = []
+        if ranked.dataset_id != current_dataset:
+            dataset = catalog.datasets[ranked.dataset_id]
+            headline = f"- Dataset `{ranked.dataset_id}`"
+            if dataset.description:
+                headline += f": {dataset.description}"
+            block.append(headline)
+        block.append(_render_table(ranked))
+        cost = sum(estimate_tokens(line) + 1 for line in block)
+        if used + cost > token_budget:
+            break
+        lines.extend(block)
+        used += cost
+        shown.append(f"{ranked.dataset_id}.{ranked.table.name}")
+        current_dataset = ranked.dataset_id
+
+    if not shown:
+        # Nothing matched (or the budget is tiny): list the datasets so the
+        # model still knows where to start, and let it call fetch_metadata.
+        for dataset_id in sorted(catalog.datasets):
+            dataset = catalog.datasets[dataset_id]
+            line = f"- Dataset `{dataset_id}`"
+            if dataset.description:
+                line += f": {dataset.description}"
+            if used + estimate_tokens(line) + 1 > token_budget:
+                break
+            lines.append(line)
+            used += estimate_tokens(line) + 1
+
+    header += (
+        f" ({len(shown)} of {total_tables} tables; call ``fetch_metadata`` for "
+        "anything not listed):"
+    )
+    text = "\n".join([header, *lines])
+    return MetadataSlice(text, estimate_tokens(text), full_tokens, tuple(shown))
+
+
+@dataclass
+class SliceStats:
+    """Running counters describing metadata slice usage."""
+
+    requests: int = 0
+    cache_hits: int = 0
+    slice_tokens: int = 0
+    full_tokens: int = 0
+
+    def as_dict(self) -> dict[str, Any]:
+        saved = max(0, self.full_tokens - self.slice_tokens)
+        return {
+            "requests": self.requests,
+            "cache_hits": self.cache_hits,
+            "slice_tokens": self.slice_tokens,
+            "full_summary_tokens": self.full_tokens,
+            "saved_tokens": saved,
+            "saved_ratio": saved / self.full_tokens if self.full_tokens else 0.0,
+        }
+
+
+class MetadataSlicer:
+    """Cache question slices per catalog version and track token savings."""
+
+    def __init__(
+        self, *, token_budget: int = DEFAULT_TOKEN_BUDGET, cache_size: int = _CACHE_SIZE
+    ) -> None:
+        self.token_budget = token_budget
+        self._cache_size = cache_size
+        self._cache: OrderedDict[tuple[str, str], MetadataSlice] = OrderedDict()
+        self._full: tuple[str, str, int] = ("", "", 0)
+        self._stats = SliceStats()
+        self._lock = threading.Lock()
+
+    def _full_summary(self, catalog: MetadataCatalog) -> tuple[str, int]:
+        content_hash, text, tokens = self._full
+        if content_hash != catalog.content_hash or not text:
+            text = summarise_metadata_for_prompt()
+            tokens = estimate_tokens(text)
+            self._full = (catalog.content_hash, text, tokens)
+        return text, tokens
+
+    def slice_for(self, question: str) -> MetadataSlice:
+        catalog = get_catalog()
+        key = (catalog.content_hash, " ".join(tokenise(question)))
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self._record(cached, hit=True)
+                return cached
+
+        full_text, full_tokens = self._full_summary(catalog)
+        if full_tokens <= self.token_budget:
+            # Small catalogs fit whole; ranking would only add overhead.
+            metadata_slice = MetadataSlice(full_text, full_tokens, full_tokens, ())
+        else:
+            metadata_slice = render_metadata_slice(
+                question,
+                catalog,
+                token_budget=self.token_budget,
+                full_tokens=full_tokens,
+            )
+        with self._lock:
+            self._cache[key] = metadata_slice
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+            self._record(metadata_slice, hit=False)
+        return metadata_slice
+
+    def _record(self, metadata_slice: MetadataSlice, *, hit: bool) -> None:
+        self._stats.requests += 1
+        self._stats.cache_hits += int(hit)
+        self._stats.slice_tokens += metadata_slice.tokens
+        self._stats.full_tokens += metadata_slice.full_tokens
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return self._stats.as_dict()
+
+
+_DEFAULT_SLICER = MetadataSlicer()
+
+
+def get_slice_stats() -> dict[str, Any]:
+    """Return cumulative slice counters, including prompt tokens saved."""
+
+    return _DEFAULT_SLICER.stats()
+
+
+def _latest_user_text(callback_context: Any, llm_request: Any) -> str:
+    content = getattr(callback_context, "user_content", None)
+    candidates = [content] if content is not None else []
+    candidates.extend(reversed(getattr(llm_request, "contents", None) or []))
+    for candidate in candidates:
+        if getattr(candidate, "role", "user") != "user":
+            continue
+        texts = [
+            part.text for part in candidate.parts or [] if getattr(part, "text", None)
+        ]
+        if texts:
+            return " ".join(texts)
+    return ""
+
+
+def inject_metadata_slice(callback_context: Any, llm_request: Any) -> None:
+    """ADK ``before_model_callback`` that appends the question's metadata slice."""
+
+    question = _latest_user_text(callback_context, llm_request)
+    metadata_slice = _DEFAULT_SLICER.slice_for(question)
+    llm_request.append_instructions([metadata_slice.text])
+    LOGGER.debug(
+        "Injected metadata slice: %d tokens (full summary %d, saved %d).",
+        metadata_slice.tokens,
+        metadata_slice.full_tokens,
+        metadata_slice.saved_tokens,
+    )
+    return None
+
+
+__all__ = [
+    "MetadataSlice",
+    "MetadataSlicer",
+    "RankedTable",
+    "estimate_tokens",
+    "get_slice_stats",
+    "inject_metadata_slice",
+    "rank_tables",
+    "render_metadata_slice",
+    "tokenise",
+]
@@ -0,0 +1,393 @@
+"""Dry-run cost guard for SQL that an agent sends to ``execute_sql``.
+
+Agents otherwise run whatever SQL the model writes. Missing a partition
+filter on a large ``ms_graph`` audit table is enough to scan terabytes.
+:class:`QueryCostGuard` wraps a ``BigQueryToolConfig`` and hooks into an
+agent's tool callbacks:
+
+* Every ``execute_sql`` call is dry-run first, and the estimated bytes
+  processed are recorded.
+* A query over the budget (``maximum_bytes_billed`` on the tool config, unless
+  overridden) is rewritten when possible. Each time-partitioned table that the
+  query reads without mentioning its partition column becomes a subquery
+  limited to the most recent ``partition_lookback_days``.
+* If the rewritten query fits, it runs in place of the original. Otherwise
+  the call is rejected with guidance instead of executing.
+* The estimate, and any rewrite, is attached to the tool response so the
+  model can explain or refine the query.
+
+``LIMIT`` is deliberately not used as a rewrite. BigQuery bills the bytes it
+scans, and a ``LIMIT`` does not reduce them.
+
+The module only needs the BigQuery client library, so the data analyst and
+winsights agents can share one implementation.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = int(os.getenv("BIGQUERY_QUERY_BUDGET_GB", "50")) * 1024**3
+DEFAULT_PARTITION_LOOKBACK_DAYS = int(
+    os.getenv("BIGQUERY_PARTITION_LOOKBACK_DAYS", "30")
+)
+# On-demand analysis price, used only to give the model a sense of scale.
+DEFAULT_PRICE_PER_TIB_USD = float(os.getenv("BIGQUERY_PRICE_PER_TIB_USD", "6.25"))
+
+_TOOL_NAME = "execute_sql"
+
+_ALIAS_STOP_WORDS = frozenset(
+    """
+    cross full group having inner join left limit natural on order qualify
+    right union using where window except intersect tablesample for
+    """.split()
+)
+
+_PARTITION_PREDICATES = {
+    "DATE": "{column} >= DATE_SUB(CURRENT_DATE(), INTERVAL {days} DAY)",
+    "TIMESTAMP": "{column} >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL {days} DAY)",
+    "DATETIME": "{column} >= DATETIME_SUB(CURRENT_DATETIME(), INTERVAL {days} DAY)",
+}
+
+
+def _format_bytes(value: int) -> str:
+    size = float(value)
+    for unit in ("B", "KiB", "MiB", "GiB", "TiB"):
+        if size < 1024 or unit == "TiB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{int(size)} B"
+        size /= 1024
+    return f"{size:.1f} PiB"  # pragma: no cover
+
+
+@dataclass(frozen=True)
+class CostEstimate:
+    """Dry-run estimate for one statement."""
+
+    bytes_processed: int
+    budget_bytes: int
+    referenced_tables: tuple[str, ...] = ()
+    price_per_tib_usd: float = DEFAULT_PRICE_PER_TIB_USD
+
+    @property
+    def within_budget(self) -> bool:
+        return self.bytes_processed <= self.budget_bytes
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "estimated_bytes_processed": self.bytes_processed,
+            "estimated_size": _format_bytes(self.bytes_processed),
+            "estimated_cost_usd": round(
+                self.bytes_processed / 1024**4 * self.price_per_tib_usd, 4
+            ),
+            "budget_bytes": self.budget_bytes,
+            "budget_size": _format_bytes(self.budget_bytes),
+            "within_budget": self.within_budget,
+        }
+
+
+@dataclass(frozen=True)
+class GuardDecision:
+    """Outcome of :meth:`QueryCostGuard.check`: ``allow``, ``rewrite`` or ``reject``."""
+
+    action: str
+    sql: str
+    estimate: CostEstimate | None
+    original_estimate: CostEstimate | None = None
+    message: str = ""
+    predicates: tuple[str, ...] = field(default=())
+
+
+@dataclass(frozen=True)
+class PartitionInfo:
+    """Time partitioning of a table, as needed to build a pruning predicate."""
+
+    table_id: str
+    column: str
+    column_type: str
+
+
+class QueryCostGuard:
+    """Dry-run, budget-check and optionally rewrite ``execute_sql`` queries."""
+
+    def __init__(
+        self,
+        tool_config: Any,
+        client_factory: Callable[[], Any],
+        *,
+        max_bytes: int | None = None,
+        partition_lookback_days: int = DEFAULT_PARTITION_LOOKBACK_DAYS,
+        price_per_tib_usd: float = DEFAULT_PRICE_PER_TIB_USD,
+    ) -> None:
+        self.tool_config = tool_config
+        self.max_bytes = (
+            max_bytes
+            or getattr(tool_config, "maximum_bytes_billed", None)
+            or DEFAULT_MAX_BYTES
+        )
+        self.partition_lookback_days = partition_lookback_days
+        self.price_per_tib_usd = price_per_tib_usd
+        self._client_factory = client_factory
+        self._client: Any = None
+        self._lock = threading.Lock()
+        self._partitions: dict[str, PartitionInfo | None] = {}
+        self._pending: OrderedDict[str, GuardDecision] = OrderedDict()
+
+    def _get_client(self) -> Any:
+        with self._lock:
+            if self._client is None:
+                self._client = self._client_factory()
+            return self._client
+
+    # -- estimation ------------------------------------------------------
+    def estimate(self, sql: str, project_id: str | None = None) -> CostEstimate:
+        """Dry-run ``sql`` and return its estimated bytes processed."""
+
+        from google.cloud import bigquery
+
+        job_config = bigquery.QueryJobConfig(
+            dry_run=True,
+            labels=getattr(self.tool_config, "job_labels", None) or {},
+        )
+        job = self._get_client().query(
+            sql,
+            project=project_id or None,
+            job_config=job_config,
+            location=getattr(self.tool_config, "location", None),
+        )
+        tables = tuple(
+            f"{table.project}.{table.dataset_id}.{table.table_id}"
+            for table in job.referenced_tables or ()
+        )
+        return CostEstimate(
+            bytes_processed=int(job.total_bytes_processed or 0),
+            budget_bytes=self.max_bytes,
+            referenced_tables=tables,
+            price_per_tib_usd=self.price_per_tib_usd,
+        )
+
+    def partition_info(self, table_id: str) -> PartitionInfo | None:
+        """Return the time-partitioning column of ``table_id``, if any."""
+
+        if table_id in self._partitions:
+            return self._partitions[table_id]
+        info: PartitionInfo | None = None
+        table = self._get_client().get_table(table_id)
+        partitioning = getattr(table, "time_partitioning", None)
+        if partitioning is not None:
+            column = partitioning.field
+            if column is None:
+                info = PartitionInfo(table_id, "_PARTITIONTIME", "TIMESTAMP")
+            else:
+                types = {item.name.lower(): item.field_type for item in table.schema}
+                column_type = (types.get(column.lower()) or "").upper()
+                if column_type in _PARTITION_PREDICATES:
+                    info = PartitionInfo(table_id, column, column_type)
+        self._partitions[table_id] = info
+        return info
+
+    # -- rewriting -------------------------------------------------------
+    def _reference_pattern(
+        self, table_id: str, project_id: str | None
+    ) -> re.Pattern[str]:
+        project, dataset, table = table_id.split(".")
+        names = [
+            rf"`{re.escape(table_id)}`",
+            rf"`{re.escape(project)}`\.`{re.escape(dataset)}`\.`{re.escape(table)}`",
+            rf"`{re.escape(project)}`\.{re.escape(dataset)}\.{re.escape(table)}",
+            rf"{re.escape(table_id)}",
+        ]
+        if project_id in {None, "", project}:
+            names += [
+                rf"`{re.escape(dataset)}\.{re.escape(table)}`",
+                rf"{re.escape(dataset)}\.{re.escape(table)}",
+            ]
+        return re.compile(
+            rf"(?P<keyword>\b(?:FROM|JOIN)\s+)(?P<reference>{'|'.join(names)})(?![\w.`])"
+            rf"(?P<alias>\s+(?:AS\s+)?(?P<alias_name>[A-Za-z_]\w*))?",
+            re.IGNORECASE,
+        )
+
+    def rewrite_with_partition_filters(
+        self, sql: str, tables: tuple[str, ...], project_id: str | None = None
+    ) -> tuple[str, tuple[str, ...]]:
+        """Restrict unfiltered partitioned tables to the lookback window.
+
+        Returns the rewritten SQL and the predicates that were applied (empty
+        when nothing could be rewritten).
+        """
+
+        predicates: list[str] = []
+        for table_id in tables:
+            try:
+                info = self.partition_info(table_id)
+            except Exception as exc:
+                LOGGER.debug("Could not read partitioning of %s: %s", table_id, exc)
+                continue
+            if info is None or re.search(
+                rf"\b{re.escape(info.column)}\b", sql, re.IGNORECASE
+            ):
+                continue
+            predicate = _PARTITION_PREDICATES[info.column_type].format(
+                column=info.column, days=self.partition_lookback_days
+            )
+
+            def _substitute(
+                match: re.Match[str],
+                table_id: str = table_id,
+                predicate: str = predicate,
+            ) -> str:
+                reference = match.group("reference")
+                alias = match.group("alias_name")
+                if alias and alias.lower() not in _ALIAS_STOP_WORDS:
+                    suffix = match.group("alias")
+                else:
+                    suffix = f" AS {table_id.rsplit('.', 1)[1]}"
+                    if alias:
+                        suffix += match.group("alias")
+                return (
+                    f"{match.group('keyword')}(SELECT * FROM {reference} "
+                    f"WHERE {predicate}){suffix}"
+                )
+
+            rewritten, count = self._reference_pattern(table_id, project_id).subn(
+                _substitute, sql
+            )
+            if count:
+                sql = rewritten
+                predicates.append(f"{table_id}: {predicate}")
+        return sql, tuple(predicates)
+
+    # -- decisions -------------------------------------------------------
+    def check(self, sql: str, project_id: str | None = None) -> GuardDecision:
+        """Dry-run ``sql`` and decide whether to run, rewrite or reject it."""
+
+        estimate = self.estimate(sql, project_id)
+        if estimate.within_budget:
+            return GuardDecision("allow", sql, estimate)
+
+        rewritten, predicates = self.rewrite_with_partition_filters(
+            sql, estimate.referenced_tables, project_id
+        )
+        if predicates:
+            try:
+                rewritten_estimate = self.estimate(rewritten, project_id)
+            except Exception as exc:
+                LOGGER.debug("Rewritten query failed its dry run: %s", exc)
+            else:
+                if rewritten_estimate.within_budget:
+                    return GuardDecision(
+                        "rewrite",
+                        rewritten,
+                        rewritten_estimate,
+                        original_estimate=estimate,
+                        message=(
+                            f"The original query would scan {_format_bytes(estimate.bytes_processed)}, "
+                            f"over the {_format_bytes(self.max_bytes)} budget, so it was limited "
+                            f"to the last {self.partition_lookback_days} days of partitions. "
+                            "Tell the user about this window and ask before widening it."
+                        ),
+                        predicates=predicates,
+                    )
+
+        return GuardDecision(
+            "reject",
+            sql,
+            estimate,
+            message=(
+                f"Query rejected before execution: it would scan "
+                f"{_format_bytes(estimate.bytes_processed)}, over the "
+                f"{_format_bytes(self.max_bytes)} budget. Filter on the tables' "
+                "partition or clustering columns, select only the columns you "
+                "need, or aggregate over a narrower window, then try again."
+            ),
+        )
+
+    # -- ADK callbacks ---------------------------------------------------
+    @staticmethod
+    def _call_id(args: dict[str, Any], tool_context: Any) -> str:
+        return str(getattr(tool_context, "function_call_id", None) or id(args))
+
+    async def before_tool_callback(
+        self, tool: Any, args: dict[str, Any], tool_context: Any
+    ) -> dict[str, Any] | None:
+        """Reject over-budget ``execute_sql`` calls or swap in a cheaper query."""
+
+        if getattr(tool, "name", None) != _TOOL_NAME or args.get("dry_run"):
+            return None
+        sql = str(args.get("query", ""))
+        try:
+            decision = await asyncio.to_thread(self.check, sql, args.get("project_id"))
+        except Exception as exc:
+            LOGGER.debug("Dry run failed; deferring to execute_sql: %s", exc)
+            return None
+
+        LOGGER.info(
+            "Query guard %s: %s estimated.",
+            decision.action,
+            _format_bytes(decision.estimate.bytes_processed)
+            if decision.estimate
+            else "?",
+        )
+        if decision.action == "reject":
+            return {
+                "status": "ERROR",
+                "error_details": decision.message,
+                "cost_estimate": decision.estimate.as_dict()
+                if decision.estimate
+                else None,
+            }
+        if decision.action == "rewrite":
+            args["query"] = decision.sql
+        with self._lock:
+            self._pending[self._call_id(args, tool_context)] = decision
+            while len(self._pending) > 512:
+                self._pending.popitem(last=False)
+        return None
+
+    async def after_tool_callback(
+        self,
+        tool: Any,
+        args: dict[str, Any],
+        tool_context: Any,
+        tool_response: dict[str, Any],
+    ) -> dict[str, Any] | None:
+        """Attach the cost estimate and any rewrite to the tool response."""
+
+        if getattr(tool, "name", None) != _TOOL_NAME:
+            return None
+        with self._lock:
+            decision = self._pending.pop(self._call_id(args, tool_context), None)
+        if (
+            decision is None
+            or decision.estimate is None
+            or not isinstance(tool_response, dict)
+        ):
+            return None
+        response = dict(tool_response)
+        response["cost_estimate"] = decision.estimate.as_dict()
+        if decision.action == "rewrite" and decision.original_estimate is not None:
+            response["query_rewrite"] = {
+                "reason": decision.message,
+                "executed_query": decision.sql,
+                "partition_filters": list(decision.predicates),
+                "original_cost_estimate": decision.original_estimate.as_dict(),
+            }
+        return response
+
+
+__all__ = [
+    "CostEstimate",
+    "GuardDecision",
+    "PartitionInfo",
+    "QueryCostGuard",
+]
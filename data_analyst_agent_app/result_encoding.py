@@ -0,0 +1,262 @@
+"""Columnar, size-bounded encoding for ``run_python_analysis`` results.
+
+``DataFrame.to_dict(orient="records")`` repeats every column name on every row
+and has no size cap, so a wide or long ``result`` can swamp both the worker's
+memory and the model's context. The encoder in this module emits each column
+once with its values as a plain array, dictionary-encodes low-cardinality
+text columns, and keeps the payload inside a row and byte budget. When a
+result does not fit, the payload carries the first and last rows, a per-column
+summary and an opaque cursor that the ``fetch_result_page`` tool accepts to
+page through the remainder.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+import os
+from typing import Any
+
+
+DEFAULT_MAX_ROWS = int(os.getenv("DATA_ANALYST_RESULT_MAX_ROWS", "200"))
+DEFAULT_MAX_BYTES = int(os.getenv("DATA_ANALYST_RESULT_MAX_BYTES", str(64 * 1024)))
+DEFAULT_MAX_COLUMNS = int(os.getenv("DATA_ANALYST_RESULT_MAX_COLUMNS", "60"))
+
+# Text columns whose distinct values make up at most this share of the rows
+# are sent as a dictionary plus integer codes.
+_DICTIONARY_RATIO = 0.5
+
+# Rows per column serialised when estimating payload size against the budget.
+_SIZE_SAMPLE_ROWS = 64
+
+
+def encode_cursor(handle: str, offset: int) -> str:
+    """Return an opaque token pointing at ``offset`` within a stored frame."""
+
+    raw = json.dumps({"f": handle, "o": offset}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, int]:
+    """Invert :func:`encode_cursor`, raising ``ValueError`` for bad tokens."""
+
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return str(data["f"]), int(data["o"])
+    except (ValueError, KeyError, TypeError) as exc:
+        raise ValueError("Invalid result cursor.") from exc
+
+
+def _plain_values(series: Any) -> list[Any]:
+    import pandas as pd
+
+    kind = series.dtype.kind
+    if kind in "iufb" and not series.hasnans:
+        return series.tolist()
+    if kind == "f":
+        return series.astype(object).where(series.notna(), None).tolist()
+    if kind in "mM" or isinstance(series.dtype, pd.DatetimeTZDtype):
+        return [None if pd.isna(value) else value.isoformat() for value in series]
+    return [_json_scalar(value) for value in series.tolist()]
+
+
+def _json_scalar(value: Any) -> Any:
+    import pandas as pd
+
+    if value is None or isinstance(value, (bool, int, float, str)):
+        if isinstance(value, float) and value != value:
+            return None
+        return value
+    if pd.api.types.is_scalar(value) and pd.isna(value):
+        return None
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def _encode_column(series: Any) -> Any:
+    """Return a column's values, or a dictionary/codes pair for repetitive text."""
+
+    import pandas as pd
+
+    is_categorical = isinstance(series.dtype, pd.CategoricalDtype)
+    is_text = series.dtype == object or pd.api.types.is_string_dtype(series.dtype)
+    if is_categorical or (is_text and len(series) > 1):
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        if is_categorical or len(uniques) <= len(series) * _DICTIONARY_RATIO:
+            return {
+                "dictionary": [_json_scalar(value) for value in uniques],
+                "codes": codes.tolist(),
+            }
+    return _plain_values(series)
+
+
+def _summarise(frame: Any) -> dict[str, Any]:
+    summary: dict[str, Any] = {}
+    for name in frame.columns:
+        series = frame[name]
+        stats: dict[str, Any] = {"non_null": int(series.count())}
+        if series.dtype.kind in "iuf" and stats["non_null"]:
+            stats.update({
+                "min": _json_scalar(series.min()),
+                "max": _json_scalar(series.max()),
+                "mean": _json_scalar(float(series.mean())),
+            })
+        elif series.dtype.kind not in "mMb":
+            counts = series.value_counts(dropna=True)
+            stats["distinct"] = int(len(counts))
+            if len(counts):
+                stats["top"] = _json_scalar(counts.index[0])
+                stats["top_count"] = int(counts.iloc[0])
+        summary[str(name)] = stats
+    return summary
+
+
+def _encode_rows(frame: Any, start: int) -> dict[str, Any]:
+    return {
+        "start": start,
+        "stop": start + len(frame),
+        "values": [_encode_column(frame.iloc[:, index]) for index in range(frame.shape[1])],
+    }
+
+
+def _unique_names(columns: Any) -> list[str]:
+    names: list[str] = []
+    seen: dict[str, int] = {}
+    for column in columns:
+        name = str(column)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _size(payload: Any) -> int:
+    return len(json.dumps(payload, separators=(",", ":"), default=str))
+
+
+def _estimate_block_size(block: dict[str, Any]) -> int:
+    """Extrapolate a row block's JSON size from a sample of each column."""
+
+    rows = block["stop"] - block["start"]
+    scale = rows / max(1, min(rows, _SIZE_SAMPLE_ROWS))
+    total = 0.0
+    for column in block["values"]:
+        if isinstance(column, dict):
+            total += _size(column["dictionary"])
+            total += _size(column["codes"][:_SIZE_SAMPLE_ROWS]) * scale
+        else:
+            total += _size(column[:_SIZE_SAMPLE_ROWS]) * scale
+    return int(total)
+
+
+def encode_dataframe(
+    frame: Any,
+    *,
+    max_rows: int = DEFAULT_MAX_ROWS,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    max_columns: int = DEFAULT_MAX_COLUMNS,
+    offset: int = 0,
+    cursor_handle: str | None = None,
+) -> dict[str, Any]:
+    """Encode ``frame`` columnar-ly within a row and byte budget.
+
+    Args:
+        frame: The pandas DataFrame to encode.
+        max_rows: Maximum number of rows included in the payload.
+        max_bytes: Approximate upper bound on the JSON size of the payload.
+        max_columns: Columns beyond this count are omitted from the payload
+            (but kept in the stored frame for paging).
+        offset: Position of ``frame``'s first row in the stored result. A
+            non-zero offset means the caller is paging, so a contiguous window
+            is returned instead of a head/tail sample.
+        cursor_handle: Frame handle to embed in continuation cursors. Without
+            one, truncated payloads cannot be paged.
+
+    Returns:
+        A ``{"type": "dataframe", "format": "columnar", ...}`` payload. Row
+        blocks appear under ``"head"`` (and ``"tail"`` when sampling), with
+        ``"truncated"``, ``"summary"`` and ``"next_cursor"`` set when rows were
+        left out.
+    """
+
+    payload: dict[str, Any] = {
+        "type": "dataframe",
+        "format": "columnar",
+        "total_rows": offset + len(frame),
+    }
+    if frame.shape[1] > max_columns:
+        payload["total_columns"] = frame.shape[1]
+        payload["truncated"] = True
+        frame = frame.iloc[:, :max_columns]
+    payload["columns"] = [
+        {"name": name, "type": str(dtype)}
+        for name, dtype in zip(_unique_names(frame.columns), frame.dtypes)
+    ]
+
+    paging = offset > 0
+    row_budget = max(1, max_rows)
+    while True:
+        if len(frame) <= row_budget:
+            head, tail = frame, None
+        elif paging:
+            head, tail = frame.iloc[:row_budget], None
+        else:
+            head_rows = (row_budget + 1) // 2
+            head = frame.iloc[:head_rows]
+            tail = frame.iloc[len(frame) - (row_budget - head_rows):]
+
+        blocks: dict[str, Any] = {"head": _encode_rows(head, offset)}
+        if tail is not None and len(tail):
+            blocks["tail"] = _encode_rows(tail, offset + len(frame) - len(tail))
+        size = sum(_estimate_block_size(block) for block in blocks.values())
+        if row_budget == 1 or size <= max_bytes:
+            break
+        # Shrink proportionally to the overshoot rather than bisecting, so
+        # very wide frames are re-encoded at most a couple of times.
+        row_budget = max(1, min(row_budget - 1, int(row_budget * max_bytes * 0.9 / size)))
+
+    payload.update(blocks)
+    shown = len(head) + (len(tail) if tail is not None else 0)
+    if shown < len(frame):
+        payload["truncated"] = True
+        if not paging:
+            summary_frame = frame.copy(deep=False)
+            summary_frame.columns = [column["name"] for column in payload["columns"]]
+            summary = _summarise(summary_frame)
+            if _size(payload) + _size(summary) <= max_bytes:
+                payload["summary"] = summary
+        if cursor_handle:
+            payload["next_cursor"] = encode_cursor(cursor_handle, offset + len(head))
+    return payload
+
+
+def records_from_columnar(payload: dict[str, Any], block: str = "head") -> list[dict[str, Any]]:
+    """Expand one row block of an encoded payload back into row dictionaries."""
+
+    decoded: list[list[Any]] = []
+    for column in payload[block]["values"]:
+        if isinstance(column, dict):
+            dictionary = column["dictionary"]
+            decoded.append([dictionary[code] if code >= 0 else None for code in column["codes"]])
+        else:
+            decoded.append(column)
+    names = [column["name"] for column in payload["columns"]]
+    return [dict(zip(names, row)) for row in zip(*decoded)]
+
+
+__all__ = [
+    "DEFAULT_MAX_BYTES",
+    "DEFAULT_MAX_COLUMNS",
+    "DEFAULT_MAX_ROWS",
+    "decode_cursor",
+    "encode_cursor",
+    "encode_dataframe",
+    "records_from_columnar",
+]
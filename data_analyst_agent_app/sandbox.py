@@ -0,0 +1,618 @@
+"""Pre-warmed process pool that executes ``run_python_analysis`` code.
+
+Executing model-written Python inside the agent process blocks the event loop
+and lets a single slow pandas job stall every other session served by the
+same replica. This module keeps a small pool of long-lived worker processes
+that import pandas, NumPy, Matplotlib and Plotly once at start-up, then run
+each snippet under a wall-clock timeout and an address-space limit. A worker
+that overruns either limit is terminated and replaced, so the pool always
+returns to its configured size.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import builtins
+import contextlib
+import io
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import traceback
+from collections.abc import Mapping
+from typing import Any, Iterator
+
+from data_analyst_agent_app.figure_store import (
+    DEFAULT_MAX_BYTES as DEFAULT_MAX_FIGURE_BYTES,
+    DEFAULT_MAX_DPI,
+    render_open_figures,
+)
+from data_analyst_agent_app.result_encoding import (
+    DEFAULT_MAX_BYTES,
+    encode_dataframe,
+)
+
+try:  # pragma: no cover - not available on Windows
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore[assignment]
+
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = int(
+    os.getenv("DATA_ANALYST_SANDBOX_WORKERS", str(min(4, os.cpu_count() or 1)))
+)
+DEFAULT_TIMEOUT_SECONDS = float(os.getenv("DATA_ANALYST_SANDBOX_TIMEOUT_SECONDS", "60"))
+DEFAULT_MEMORY_LIMIT_MB = int(os.getenv("DATA_ANALYST_SANDBOX_MEMORY_MB", "2048"))
+_STARTUP_TIMEOUT_SECONDS = float(
+    os.getenv("DATA_ANALYST_SANDBOX_STARTUP_TIMEOUT_SECONDS", "120")
+)
+
+# Modules imported once by the fork server so that replacement workers start
+# with the heavy libraries already resident.
+_PRELOAD_MODULES = ["numpy", "pandas", "pyarrow", "matplotlib", "plotly.express"]
+
+_ALLOWED_BUILTINS = {
+    "abs",
+    "all",
+    "any",
+    "bool",
+    "dict",
+    "enumerate",
+    "float",
+    "int",
+    "len",
+    "list",
+    "max",
+    "min",
+    "pow",
+    "print",
+    "range",
+    "round",
+    "set",
+    "sorted",
+    "str",
+    "sum",
+    "tuple",
+    "zip",
+}
+
+# Populated inside each worker by ``_warm_up``; never touched by the parent.
+_SANDBOX_LIBRARIES: dict[str, Any] = {}
+
+
+def _build_safe_globals() -> dict[str, Any]:
+    """Construct a restricted globals dictionary for executing Python code."""
+
+    safe_builtins = {name: getattr(builtins, name) for name in _ALLOWED_BUILTINS}
+    return {"__builtins__": safe_builtins}
+
+
+def compose_dashboard(
+    charts: list[dict[str, Any]],
+    *,
+    title: str | None = None,
+    rows: int | None = None,
+    cols: int | None = None,
+    shared_x: bool = False,
+    shared_y: bool = False,
+) -> Any:
+    """Create a Plotly dashboard from simple chart specifications.
+
+    Each chart specification should include a ``type`` that maps to a
+    ``plotly.express`` function (for example ``bar`` or ``line``), the
+    ``data`` to plot (either a pandas DataFrame or a mapping compatible
+    with ``pd.DataFrame``) and optional ``params`` with keyword
+    arguments passed to the plotting function. Custom placement can be
+    controlled with ``row`` and ``col`` indices.
+    """
+
+    import pandas as pd
+    import plotly.express as px
+    from plotly.subplots import make_subplots
+
+    if not charts:
+        raise ValueError("Please provide at least one chart specification.")
+
+    resolved_rows = rows or len(charts)
+    resolved_cols = cols or 1
+    subplot_titles = [chart.get("title") for chart in charts]
+    figure = make_subplots(
+        rows=resolved_rows,
+        cols=resolved_cols,
+        subplot_titles=subplot_titles if any(subplot_titles) else None,
+        shared_xaxes=shared_x,
+        shared_yaxes=shared_y,
+    )
+
+    for index, chart in enumerate(charts):
+        chart_type = chart.get("type", "bar")
+        plot_func = getattr(px, chart_type, None)
+        if plot_func is None:
+            raise ValueError(f"Unknown chart type '{chart_type}'.")
+
+        data = chart.get("data")
+        if data is None:
+            raise ValueError("Each chart specification requires a 'data' value.")
+        if isinstance(data, pd.DataFrame):
+            frame = data
+        else:
+            frame = pd.DataFrame(data)
+
+        params = dict(chart.get("params", {}))
+        params.setdefault("data_frame", frame)
+        chart_figure = plot_func(**params)
+
+        row = chart.get("row") or index // resolved_cols + 1
+        col = chart.get("col") or index % resolved_cols + 1
+        for trace in chart_figure.data:
+            figure.add_trace(trace, row=row, col=col)
+
+        xaxis = chart_figure.layout.xaxis
+        yaxis = chart_figure.layout.yaxis
+        figure.update_xaxes(xaxis, row=row, col=col)
+        figure.update_yaxes(yaxis, row=row, col=col)
+
+    if title:
+        figure.update_layout(title=title)
+
+    return figure
+
+
+# ----------------------------------------------------------------------
+# Worker side
+# ----------------------------------------------------------------------
+def _warm_up() -> None:
+    """Import the analysis libraries once so individual calls start instantly."""
+
+    import matplotlib
+
+    matplotlib.use("Agg")
+
+    import matplotlib.pyplot as plt
+    import numpy as np
+    import pandas as pd
+
+    _SANDBOX_LIBRARIES.update({
+        "pd": pd,
+        "pandas": pd,
+        "np": np,
+        "numpy": np,
+        "plt": plt,
+    })
+
+    try:
+        import plotly.express as px
+        import plotly.graph_objects as go
+    except Exception:  # pragma: no cover - optional dependency
+        return
+
+    _SANDBOX_LIBRARIES.update({
+        "px": px,
+        "plotly_express": px,
+        "go": go,
+        "plotly_graph_objects": go,
+        "compose_dashboard": compose_dashboard,
+    })
+
+
+class _FrameMapping(Mapping):
+    """Read-only ``frames`` mapping that memory-maps Arrow files on access.
+
+    Columns without nulls are converted to pandas without copying the mapped
+    buffers, so large registry frames cost almost nothing until touched.
+    """
+
+    def __init__(self, paths: dict[str, str]) -> None:
+        self._paths = paths
+        self._loaded: dict[str, Any] = {}
+
+    def __getitem__(self, handle: str) -> Any:
+        if handle not in self._loaded:
+            if handle not in self._paths:
+                available = ", ".join(sorted(self._paths)) or "none"
+                raise KeyError(f"Unknown frame '{handle}'. Available frames: {available}.")
+            import pyarrow as pa
+
+            source = pa.memory_map(self._paths[handle], "r")
+            table = pa.ipc.open_file(source).read_all()
+            self._loaded[handle] = table.to_pandas(split_blocks=True)
+        return self._loaded[handle]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._paths)
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+
+def _current_address_space() -> int:
+    """Return the virtual memory size of the current process in bytes."""
+
+    try:
+        with open("/proc/self/statm", encoding="utf-8") as handle:
+            pages = int(handle.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return 0
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+@contextlib.contextmanager
+def _memory_limit(limit_bytes: int):
+    """Cap additional address space available to the code run in this block."""
+
+    baseline = _current_address_space()
+    if resource is None or not limit_bytes or not baseline:
+        yield
+        return
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+    target = baseline + limit_bytes
+    if hard != resource.RLIM_INFINITY:
+        target = min(target, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (target, hard))
+    try:
+        yield
+    finally:
+        resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+
+
+def _truncate_text(text: str, max_bytes: int) -> str:
+    if len(text) <= max_bytes:
+        return text
+    return text[:max_bytes] + f"\n... [truncated {len(text) - max_bytes:,} characters]"
+
+
+def _spill_result(frame: Any, path: str) -> dict[str, Any]:
+    """Write ``frame`` as an Arrow IPC file so the parent can page through it."""
+
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    with pa.OSFile(path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return {
+        "path": path,
+        "num_rows": table.num_rows,
+        "nbytes": table.nbytes,
+        "columns": [
+            {"name": column.name, "type": str(column.type)} for column in table.schema
+        ],
+    }
+
+
+def _serialise_result(result_obj: Any, options: dict[str, Any]) -> Any:
+    """Encode ``result`` within the configured budget.
+
+    ``options`` may carry ``max_rows``/``max_bytes``/``max_columns`` limits,
+    an ``offset`` and ``cursor_handle`` when paging a stored frame, and a
+    ``spill_path`` where truncated DataFrames are written for later paging.
+    """
+
+    pd = _SANDBOX_LIBRARIES["pd"]
+    max_bytes = options.get("max_bytes", DEFAULT_MAX_BYTES)
+    if not isinstance(result_obj, pd.DataFrame):
+        return _truncate_text(repr(result_obj), max_bytes)
+
+    limits = {
+        key: options[key]
+        for key in ("max_rows", "max_bytes", "max_columns", "offset", "cursor_handle")
+        if options.get(key) is not None
+    }
+    payload = encode_dataframe(result_obj, **limits)
+    spill_path = options.get("spill_path")
+    if payload.get("truncated") and spill_path:
+        try:
+            payload["_spill"] = _spill_result(result_obj, spill_path)
+        except Exception:  # pragma: no cover - unsupported column types
+            LOGGER.exception("Could not store truncated result for paging.")
+            payload.pop("next_cursor", None)
+    return payload
+
+
+def _run_code(request: dict[str, Any], memory_limit_bytes: int) -> dict[str, Any]:
+    """Execute one request inside the warmed worker and build the tool payload."""
+
+    safe_globals = _build_safe_globals()
+    sandbox_locals: dict[str, Any] = dict(_SANDBOX_LIBRARIES)
+    sandbox_locals["frames"] = _FrameMapping(request.get("frames") or {})
+    plt = _SANDBOX_LIBRARIES["plt"]
+
+    stdout_buffer = io.StringIO()
+    try:
+        with _memory_limit(memory_limit_bytes):
+            with contextlib.redirect_stdout(stdout_buffer):
+                exec(  # noqa: S102
+                    compile(request["code"], "<data_analyst_python_tool>", "exec"),
+                    safe_globals,
+                    sandbox_locals,
+                )
+            figure_options = request.get("figures") or {}
+            figures = render_open_figures(
+                plt,
+                max_dpi=figure_options.get("max_dpi", DEFAULT_MAX_DPI),
+                max_bytes=figure_options.get("max_bytes", DEFAULT_MAX_FIGURE_BYTES),
+                known=figure_options.get("known", ()),
+            )
+            result_options = request.get("result") or {}
+            payload: dict[str, Any] = {
+                "stdout": _truncate_text(
+                    stdout_buffer.getvalue(),
+                    result_options.get("max_bytes", DEFAULT_MAX_BYTES),
+                )
+            }
+            if "result" in sandbox_locals:
+                payload["result"] = _serialise_result(
+                    sandbox_locals["result"], result_options
+                )
+    except BaseException:
+        return {
+            "stdout": stdout_buffer.getvalue(),
+            "error": traceback.format_exc(),
+        }
+    finally:
+        plt.close("all")
+
+    if figures:
+        payload["figures"] = figures
+
+    return payload
+
+
+def _worker_main(conn: Any, memory_limit_bytes: int) -> None:
+    """Entry point of a sandbox worker process."""
+
+    try:
+        _warm_up()
+    except Exception:
+        conn.send(("failed", traceback.format_exc()))
+        return
+    conn.send(("ready", None))
+
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if request is None:
+            break
+        conn.send(("done", _run_code(request, memory_limit_bytes)))
+
+
+# ----------------------------------------------------------------------
+# Parent side
+# ----------------------------------------------------------------------
+class _Worker:
+    """Handle to a single sandbox process and its control pipe."""
+
+    def __init__(self, context: Any, memory_limit_bytes: int) -> None:
+        parent_conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, memory_limit_bytes),
+            name="data-analyst-sandbox",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        self.ready = False
+
+    def wait_ready(self, timeout: float) -> None:
+        if self.ready:
+            return
+        if not self.conn.poll(timeout):
+            raise TimeoutError("Sandbox worker did not finish warming up in time.")
+        status, detail = self.conn.recv()
+        if status != "ready":
+            raise RuntimeError(f"Sandbox worker failed to start:\n{detail}")
+        self.ready = True
+
+    def kill(self) -> None:
+        with contextlib.suppress(Exception):
+            self.conn.close()
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+
+    def stop(self) -> None:
+        with contextlib.suppress(Exception):
+            self.conn.send(None)
+        self.process.join(timeout=2)
+        self.kill()
+
+
+class SandboxExecutor:
+    """Run analysis snippets concurrently on a pool of pre-warmed processes.
+
+    Args:
+        max_workers: Number of worker processes, and therefore the number of
+            snippets that can execute at the same time.
+        timeout_seconds: Wall-clock budget for a single call. Workers that
+            exceed it are terminated and replaced.
+        memory_limit_mb: Additional address space a single call may allocate
+            on top of the warmed worker's baseline footprint.
+        start_method: ``multiprocessing`` start method. Defaults to
+            ``forkserver`` where available so replacement workers are forked
+            from a server that has already imported the analysis libraries.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS,
+        memory_limit_mb: int = DEFAULT_MEMORY_LIMIT_MB,
+        start_method: str | None = None,
+    ) -> None:
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1.")
+        self.max_workers = max_workers
+        self.timeout_seconds = timeout_seconds
+        self.memory_limit_bytes = max(0, memory_limit_mb) * 1024 * 1024
+
+        available = multiprocessing.get_all_start_methods()
+        if start_method is None:
+            start_method = "forkserver" if "forkserver" in available else "spawn"
+        self._context = multiprocessing.get_context(start_method)
+        if start_method == "forkserver":
+            self._context.set_forkserver_preload(_PRELOAD_MODULES)
+
+        self._idle: queue.Queue[_Worker] = queue.Queue()
+        self._workers: set[_Worker] = set()
+        self._lock = threading.Lock()
+        self._started = False
+        self._closed = False
+
+    def start(self) -> None:
+        """Launch the worker processes. Called implicitly on first use."""
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("SandboxExecutor has been shut down.")
+            if self._started:
+                return
+            for _ in range(self.max_workers):
+                self._idle.put(self._spawn_locked())
+            self._started = True
+
+    def _spawn_locked(self) -> _Worker:
+        worker = _Worker(self._context, self.memory_limit_bytes)
+        self._workers.add(worker)
+        return worker
+
+    def _replace(self, worker: _Worker) -> None:
+        worker.kill()
+        with self._lock:
+            self._workers.discard(worker)
+            if not self._closed:
+                self._idle.put(self._spawn_locked())
+
+    def run(
+        self,
+        code: str,
+        *,
+        frames: dict[str, str] | None = None,
+        result_options: dict[str, Any] | None = None,
+        figure_options: dict[str, Any] | None = None,
+        timeout_seconds: float | None = None,
+    ) -> dict[str, Any]:
+        """Execute ``code`` on an idle worker, blocking until it completes.
+
+        Args:
+            code: Python source to execute.
+            frames: Mapping of frame handle to Arrow IPC file, exposed to the
+                code as ``frames["<handle>"]`` pandas DataFrames.
+            result_options: Encoding budget and paging options for
+                ``result``; see :func:`_serialise_result`.
+            figure_options: ``max_dpi``/``max_bytes`` caps for rendered
+                figures and the ``known`` hashes whose PNG bytes need not be
+                returned.
+            timeout_seconds: Overrides the executor's wall-clock limit.
+        """
+
+        request = {
+            "code": code,
+            "frames": frames or {},
+            "result": result_options or {},
+            "figures": figure_options or {},
+        }
+        return self._submit(request, timeout_seconds)
+
+    async def run_async(
+        self,
+        code: str,
+        *,
+        frames: dict[str, str] | None = None,
+        result_options: dict[str, Any] | None = None,
+        figure_options: dict[str, Any] | None = None,
+        timeout_seconds: float | None = None,
+    ) -> dict[str, Any]:
+        """Awaitable variant of :meth:`run` that never blocks the event loop."""
+
+        return await asyncio.to_thread(
+            self.run,
+            code,
+            frames=frames,
+            result_options=result_options,
+            figure_options=figure_options,
+            timeout_seconds=timeout_seconds,
+        )
+
+    def _submit(
+        self, request: dict[str, Any], timeout_seconds: float | None
+    ) -> dict[str, Any]:
+        self.start()
+        timeout = self.timeout_seconds if timeout_seconds is None else timeout_seconds
+        worker = self._idle.get()
+
+        try:
+            worker.wait_ready(_STARTUP_TIMEOUT_SECONDS)
+        except (TimeoutError, RuntimeError, EOFError, OSError) as exc:
+            LOGGER.error("Sandbox worker unavailable: %s", exc)
+            self._replace(worker)
+            return {"stdout": "", "error": f"Sandbox worker unavailable: {exc}"}
+
+        try:
+            worker.conn.send(request)
+            if not worker.conn.poll(timeout):
+                LOGGER.warning("Sandbox call exceeded %.1fs; restarting worker.", timeout)
+                self._replace(worker)
+                return {
+                    "stdout": "",
+                    "error": (
+                        f"Execution exceeded the {timeout:g}s wall-clock limit and "
+                        "was terminated."
+                    ),
+                }
+            _, payload = worker.conn.recv()
+        except (EOFError, OSError):
+            exitcode = worker.process.exitcode
+            self._replace(worker)
+            return {
+                "stdout": "",
+                "error": (
+                    f"The sandbox worker exited unexpectedly (exit code {exitcode}); "
+                    "the analysis may have exceeded the memory limit."
+                ),
+            }
+
+        self._idle.put(worker)
+        return payload
+
+    def shutdown(self) -> None:
+        """Stop every worker process."""
+
+        with self._lock:
+            self._closed = True
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            worker.stop()
+
+
+_DEFAULT_EXECUTOR: SandboxExecutor | None = None
+_DEFAULT_EXECUTOR_LOCK = threading.Lock()
+
+
+def get_default_executor() -> SandboxExecutor:
+    """Return the process-wide executor, creating it on first use."""
+
+    global _DEFAULT_EXECUTOR
+    with _DEFAULT_EXECUTOR_LOCK:
+        if _DEFAULT_EXECUTOR is None:
+            _DEFAULT_EXECUTOR = SandboxExecutor()
+            atexit.register(_DEFAULT_EXECUTOR.shutdown)
+        return _DEFAULT_EXECUTOR
+
+
+__all__ = [
+    "SandboxExecutor",
+    "compose_dashboard",
+    "get_default_executor",
+]
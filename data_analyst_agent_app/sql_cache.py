@@ -0,0 +1,678 @@
+"""Result cache in front of the BigQuery toolset's ``execute_sql`` tool.
+
+Analysts often ask the same question again, within a session or across
+sessions, and the model re-issues identical or trivially different SQL each
+time. :class:`SqlResultCache` plugs into the agent's ``before_tool_callback``
+and ``after_tool_callback`` hooks and works as follows:
+
+* Keys are the project plus normalised SQL. Comments and redundant whitespace
+  are dropped, keywords are upper-cased, and literal ``IN (...)`` lists are
+  sorted.
+* With ``per_user`` the key also carries the caller's user id, so one user's
+  results are never served to another. Use it whenever users query with their
+  own credentials (``CREDENTIALS_TYPE=OAUTH2``). Table versions are still read
+  with the agent's identity; they only decide when an entry is discarded.
+* Each entry records the ``lastModifiedTime`` of every table the query reads.
+  These are snapshotted before the query runs, and the entry is discarded as
+  soon as any of them changes.
+* Entries expire after a TTL. The backend bounds their number: in-process
+  LRU, a local directory, or any Redis-compatible client.
+* :meth:`SqlResultCache.stats` reports hits, misses, invalidations and the
+  BigQuery time the hits saved.
+
+Statements other than ``SELECT``, queries that call non-deterministic
+functions, and queries over views or external tables are never cached.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Protocol
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = float(os.getenv("DATA_ANALYST_SQL_CACHE_TTL_SECONDS", "3600"))
+DEFAULT_MAX_ENTRIES = int(os.getenv("DATA_ANALYST_SQL_CACHE_MAX_ENTRIES", "512"))
+DEFAULT_MAX_ENTRY_BYTES = (
+    int(os.getenv("DATA_ANALYST_SQL_CACHE_MAX_ENTRY_KB", "2048")) * 1024
+)
+# How long a table's lastModifiedTime is trusted before it is fetched again.
+DEFAULT_VERSION_TTL_SECONDS = float(
+    os.getenv("DATA_ANALYST_SQL_CACHE_VERSION_TTL_SECONDS", "15")
+)
+
+_TOOL_NAME = "execute_sql"
+
+_SQL_TOKEN = re.compile(
+    r"""
+    (?P<comment>--[^\n]*|\#[^\n]*|/\*.*?\*/)
+    | (?P<string>[rRbB]{0,2}(?:'''.*?'''|\"\"\".*?\"\"\"|'(?:\\.|[^'\\])*'|"(?:\\.|[^"\\])*"))
+    | (?P<quoted>`[^`]*`)
+    | (?P<number>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?)
+    | (?P<word>[A-Za-z_][A-Za-z0-9_]*)
+    | (?P<space>\s+)
+    | (?P<symbol>.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+_KEYWORDS = frozenset(
+    """
+    all and any array as asc between by case cast cross current date datetime
+    desc distinct else end except exists extract false filter first following
+    for from full group having if ignore in inner interval intersect is join
+    last left like limit not null nulls offset on or order outer over
+    partition preceding qualify range right rows safe_cast select struct
+    table tablesample then timestamp true unbounded union unnest using when
+    where window with
+    """.split()
+)
+
+# Symbols written without surrounding spaces in the normalised text.
+_TIGHT_SYMBOLS = frozenset("(),.[]")
+
+_NON_DETERMINISTIC = re.compile(
+    r"\b(CURRENT_(DATE|DATETIME|TIME|TIMESTAMP)|RAND|GENERATE_UUID|SESSION_USER)\b",
+    re.IGNORECASE,
+)
+
+
+def _tokens(sql: str) -> list[tuple[str, str]]:
+    return [
+        (match.lastgroup or "symbol", match.group())
+        for match in _SQL_TOKEN.finditer(sql)
+        if match.lastgroup not in {"comment", "space"}
+    ]
+
+
+def _sort_in_lists(tokens: list[tuple[str, str]]) -> list[tuple[str, str]]:
+    """Sort ``IN (literal, ...)`` lists so their order does not affect keys."""
+
+    result: list[tuple[str, str]] = []
+    index = 0
+    while index < len(tokens):
+        kind, value = tokens[index]
+        result.append((kind, value))
+        index += 1
+        if kind != "word" or value.upper() != "IN":
+            continue
+        if index >= len(tokens) or tokens[index][1] != "(":
+            continue
+        literals: list[tuple[str, str]] = []
+        cursor = index + 1
+        while cursor < len(tokens):
+            literal_kind, literal = tokens[cursor]
+            if literal_kind not in {"string", "number"}:
+                break
+            literals.append((literal_kind, literal))
+            separator = tokens[cursor + 1][1] if cursor + 1 < len(tokens) else ""
+            cursor += 2
+            if separator == ")":
+                break
+            if separator != ",":
+                literals = []
+                break
+        else:
+            literals = []
+        if not literals or tokens[cursor - 1][1] != ")":
+            continue
+        ordered = sorted(set(literals), key=lambda item: (item[0], item[1]))
+        result.append(("symbol", "("))
+        for position, literal in enumerate(ordered):
+            if position:
+                result.append(("symbol", ","))
+            result.append(literal)
+        result.append(("symbol", ")"))
+        index = cursor
+    return result
+
+
+def normalise_sql(sql: str) -> str:
+    """Return a canonical form of ``sql`` for use in cache keys.
+
+    Identifiers keep their case because BigQuery dataset and table names are
+    case-sensitive; only keywords are folded.
+    """
+
+    parts: list[str] = []
+    previous_tight = True
+    for kind, value in _sort_in_lists(_tokens(sql)):
+        if kind == "word" and value.lower() in _KEYWORDS:
+            value = value.upper()
+        tight = kind == "symbol" and value in _TIGHT_SYMBOLS
+        if parts and not tight and not previous_tight:
+            parts.append(" ")
+        parts.append(value)
+        previous_tight = tight
+    return "".join(parts).rstrip("; ")
+
+
+def is_cacheable_sql(normalised: str) -> bool:
+    """Return whether a normalised query may be served from the cache."""
+
+    if not normalised.startswith(("SELECT", "WITH", "(")):
+        return False
+    return _NON_DETERMINISTIC.search(normalised) is None
+
+
+def cache_key(normalised: str, project_id: str, user_key: str = "") -> str:
+    return hashlib.sha256(
+        f"{user_key}\n{project_id}\n{normalised}".encode()
+    ).hexdigest()
+
+
+# ----------------------------------------------------------------------
+# Table versions
+# ----------------------------------------------------------------------
+class TableVersionProvider(Protocol):
+    """Resolve the tables a query reads and their current versions."""
+
+    def referenced_tables(self, sql: str, project_id: str) -> list[str] | None:
+        """Return fully-qualified table IDs, or ``None`` if not cacheable."""
+        ...  # pragma: no cover
+
+    def table_version(self, table_id: str) -> str | None:
+        """Return the table's ``lastModifiedTime``, or ``None`` if unknown."""
+        ...  # pragma: no cover
+
+
+class BigQueryTableVersions:
+    """Resolve tables with a dry run and versions with ``tables.get``."""
+
+    def __init__(self, client_factory: Callable[[], Any]) -> None:
+        self._client_factory = client_factory
+        self._client: Any = None
+        self._lock = threading.Lock()
+
+    def _get_client(self) -> Any:
+        with self._lock:
+            if self._client is None:
+                self._client = self._client_factory()
+            return self._client
+
+    def referenced_tables(self, sql: str, project_id: str) -> list[str] | None:
+        from google.cloud import bigquery
+
+        job = self._get_client().query(
+            sql,
+            project=project_id,
+            job_config=bigquery.QueryJobConfig(dry_run=True, use_query_cache=False),
+        )
+        if job.statement_type != "SELECT":
+            return None
+        return sorted(
+            f"{table.project}.{table.dataset_id}.{table.table_id}"
+            for table in job.referenced_tables
+        )
+
+    def table_version(self, table_id: str) -> str | None:
+        from google.api_core.exceptions import NotFound
+
+        try:
+            table = self._get_client().get_table(table_id)
+        except NotFound:
+            return None
+        if table.table_type != "TABLE" or table.modified is None:
+            return None
+        return table.modified.isoformat()
+
+
+# ----------------------------------------------------------------------
+# Backends
+# ----------------------------------------------------------------------
+class CacheBackend(Protocol):
+    """Key/value store for cache entries (JSON-serialisable dictionaries)."""
+
+    def get(self, key: str) -> dict[str, Any] | None: ...  # pragma: no cover
+
+    def set(self, key: str, entry: dict[str, Any]) -> None: ...  # pragma: no cover
+
+    def delete(self, key: str) -> None: ...  # pragma: no cover
+
+    def clear(self) -> None: ...  # pragma: no cover
+
+
+class InProcessBackend:
+    """Bounded LRU dictionary local to this process."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskBackend:
+    """One JSON file per entry; the least recently read files are pruned."""
+
+    def __init__(
+        self, root: Path | None = None, max_entries: int = DEFAULT_MAX_ENTRIES
+    ) -> None:
+        self.root = root or Path(
+            os.getenv(
+                "DATA_ANALYST_SQL_CACHE_DIR",
+                Path(tempfile.gettempdir()) / "data-analyst-sql-cache",
+            )
+        )
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.json"
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def set(self, key: str, entry: dict[str, Any]) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        temporary = path.with_suffix(f".{threading.get_ident()}.tmp")
+        temporary.write_text(json.dumps(entry, default=str), encoding="utf-8")
+        temporary.replace(path)
+        self._prune()
+
+    def _prune(self) -> None:
+        with self._lock:
+            files = list(self.root.glob("*.json"))
+            if len(files) <= self.max_entries:
+                return
+            stats = []
+            for path in files:
+                try:
+                    stats.append((path.stat().st_mtime_ns, path))
+                except OSError:
+                    continue
+            stats.sort()
+            for _, path in stats[: len(stats) - self.max_entries]:
+                path.unlink(missing_ok=True)
+
+    def delete(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        for path in self.root.glob("*.json"):
+            path.unlink(missing_ok=True)
+
+
+class RedisBackend:
+    """Store entries in Redis or any client exposing ``get``/``set``/``delete``.
+
+    Size bounds are left to the server's ``maxmemory-policy`` (for example
+    ``allkeys-lru``); keys also carry the cache TTL as their expiry.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        *,
+        prefix: str = "data-analyst:sql:",
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+    ) -> None:
+        self._client = client
+        self._prefix = prefix
+        self._ttl_seconds = ttl_seconds
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        raw = self._client.get(self._prefix + key)
+        if raw is None:
+            return None
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return None
+
+    def set(self, key: str, entry: dict[str, Any]) -> None:
+        self._client.set(
+            self._prefix + key,
+            json.dumps(entry, default=str),
+            ex=max(1, int(self._ttl_seconds)),
+        )
+
+    def delete(self, key: str) -> None:
+        self._client.delete(self._prefix + key)
+
+    def clear(self) -> None:
+        for name in self._client.scan_iter(match=self._prefix + "*"):
+            self._client.delete(name)
+
+
+# ----------------------------------------------------------------------
+# Cache
+# ----------------------------------------------------------------------
+@dataclass
+class CacheStats:
+    """Counters describing cache effectiveness."""
+
+    lookups: int = 0
+    hits: int = 0
+    misses: int = 0
+    invalidations: int = 0
+    expirations: int = 0
+    uncacheable: int = 0
+    stores: int = 0
+    saved_ms: float = 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+            "invalidations": self.invalidations,
+            "expirations": self.expirations,
+            "uncacheable": self.uncacheable,
+            "stores": self.stores,
+            "saved_bigquery_ms": round(self.saved_ms, 1),
+        }
+
+
+@dataclass
+class _PendingQuery:
+    key: str
+    normalised: str
+    versions: dict[str, str]
+    started: float
+    user_key: str = ""
+
+
+class SqlResultCache:
+    """Serve repeated ``execute_sql`` calls while their source tables are unchanged."""
+
+    def __init__(
+        self,
+        backend: CacheBackend,
+        versions: TableVersionProvider,
+        *,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_entry_bytes: int = DEFAULT_MAX_ENTRY_BYTES,
+        version_ttl_seconds: float = DEFAULT_VERSION_TTL_SECONDS,
+        clock: Callable[[], float] = time.time,
+        per_user: bool = False,
+    ) -> None:
+        self.backend = backend
+        self.per_user = per_user
+        self._versions = versions
+        self._ttl_seconds = ttl_seconds
+        self._max_entry_bytes = max_entry_bytes
+        self._version_ttl_seconds = version_ttl_seconds
+        self._clock = clock
+        self._stats = CacheStats()
+        self._lock = threading.Lock()
+        self._tables: OrderedDict[str, list[str] | None] = OrderedDict()
+        self._table_versions: dict[str, tuple[str | None, float]] = {}
+        self._pending: OrderedDict[str, _PendingQuery] = OrderedDict()
+
+    # -- version helpers -------------------------------------------------
+    def _referenced_tables(
+        self, key: str, sql: str, project_id: str
+    ) -> list[str] | None:
+        with self._lock:
+            if key in self._tables:
+                self._tables.move_to_end(key)
+                return self._tables[key]
+        try:
+            tables = self._versions.referenced_tables(sql, project_id)
+        except Exception as exc:
+            LOGGER.debug("Could not resolve tables for cached SQL: %s", exc)
+            return None
+        with self._lock:
+            self._tables[key] = tables
+            while len(self._tables) > DEFAULT_MAX_ENTRIES * 4:
+                self._tables.popitem(last=False)
+        return tables
+
+    def _current_versions(self, tables: Iterable[str]) -> dict[str, str | None]:
+        now = self._clock()
+        versions: dict[str, str | None] = {}
+        for table in tables:
+            with self._lock:
+                memo = self._table_versions.get(table)
+            if memo is not None and now - memo[1] < self._version_ttl_seconds:
+                versions[table] = memo[0]
+                continue
+            try:
+                version = self._versions.table_version(table)
+            except Exception as exc:
+                LOGGER.debug("Could not read version of %s: %s", table, exc)
+                version = None
+            with self._lock:
+                self._table_versions[table] = (version, now)
+            versions[table] = version
+        return versions
+
+    def invalidate_table(self, table_id: str) -> None:
+        """Forget the remembered version of ``table_id`` so it is re-read."""
+
+        with self._lock:
+            self._table_versions.pop(table_id, None)
+
+    # -- lookups ---------------------------------------------------------
+    def lookup(
+        self, sql: str, project_id: str, user_key: str = ""
+    ) -> dict[str, Any] | None:
+        """Return a cached response for ``sql`` if it is still fresh."""
+
+        normalised = normalise_sql(sql)
+        with self._lock:
+            self._stats.lookups += 1
+        if not is_cacheable_sql(normalised):
+            self._count("uncacheable")
+            self._count("misses")
+            return None
+
+        key = cache_key(normalised, project_id, user_key)
+        entry = self.backend.get(key)
+        if (
+            entry is None
+            or entry.get("sql") != normalised
+            or entry.get("user", "") != user_key
+        ):
+            self._count("misses")
+            return None
+        age = self._clock() - entry["stored_at"]
+        if age > self._ttl_seconds:
+            self.backend.delete(key)
+            self._count("expirations")
+            self._count("misses")
+            return None
+        current = self._current_versions(entry["versions"])
+        if current != entry["versions"]:
+            self.backend.delete(key)
+            self._count("invalidations")
+            self._count("misses")
+            return None
+
+        with self._lock:
+            self._stats.hits += 1
+            self._stats.saved_ms += entry.get("elapsed_ms", 0.0)
+        response = dict(entry["response"])
+        response["cache"] = {"hit": True, "age_seconds": round(age, 1)}
+        return response
+
+    def snapshot(
+        self, sql: str, project_id: str, user_key: str = ""
+    ) -> _PendingQuery | None:
+        """Capture table versions before ``sql`` runs, or ``None`` if uncacheable."""
+
+        normalised = normalise_sql(sql)
+        if not is_cacheable_sql(normalised):
+            return None
+        key = cache_key(normalised, project_id, user_key)
+        tables = self._referenced_tables(key, sql, project_id)
+        if tables is None:
+            self._count("uncacheable")
+            return None
+        versions = self._current_versions(tables)
+        if any(version is None for version in versions.values()):
+            self._count("uncacheable")
+            return None
+        return _PendingQuery(key, normalised, versions, time.perf_counter(), user_key)
+
+    def store(self, pending: _PendingQuery, response: dict[str, Any]) -> bool:
+        """Cache a successful response captured after :meth:`snapshot`."""
+
+        if not isinstance(response, dict) or response.get("status") != "SUCCESS":
+            return False
+        entry = {
+            "sql": pending.normalised,
+            "user": pending.user_key,
+            "versions": pending.versions,
+            "response": response,
+            "stored_at": self._clock(),
+            "elapsed_ms": (time.perf_counter() - pending.started) * 1000,
+        }
+        if len(json.dumps(entry, default=str)) > self._max_entry_bytes:
+            self._count("uncacheable")
+            return False
+        self.backend.set(pending.key, entry)
+        self._count("stores")
+        return True
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self._stats, name, getattr(self._stats, name) + 1)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return self._stats.as_dict()
+
+    # -- ADK callbacks ---------------------------------------------------
+    @staticmethod
+    def _call_id(args: dict[str, Any], tool_context: Any) -> str:
+        return str(getattr(tool_context, "function_call_id", None) or id(args))
+
+    @staticmethod
+    def _user_id(tool_context: Any) -> str | None:
+        invocation = getattr(tool_context, "_invocation_context", None)
+        user_id = getattr(tool_context, "user_id", None) or getattr(
+            invocation, "user_id", None
+        )
+        return str(user_id) if user_id else None
+
+    async def before_tool_callback(
+        self, tool: Any, args: dict[str, Any], tool_context: Any
+    ) -> dict[str, Any] | None:
+        """Answer ``execute_sql`` from the cache, or snapshot versions for a miss."""
+
+        if getattr(tool, "name", None) != _TOOL_NAME or args.get("dry_run"):
+            return None
+        user_key = ""
+        if self.per_user:
+            user_key = self._user_id(tool_context) or ""
+            if not user_key:
+                # Without a user id there is no safe key to share under.
+                return None
+        sql, project_id = str(args.get("query", "")), str(args.get("project_id", ""))
+        cached = await asyncio.to_thread(self.lookup, sql, project_id, user_key)
+        if cached is not None:
+            LOGGER.info("SQL cache hit (%s).", self.stats())
+            return cached
+        pending = await asyncio.to_thread(self.snapshot, sql, project_id, user_key)
+        if pending is not None:
+            with self._lock:
+                self._pending[self._call_id(args, tool_context)] = pending
+                while len(self._pending) > DEFAULT_MAX_ENTRIES:
+                    self._pending.popitem(last=False)
+        return None
+
+    async def after_tool_callback(
+        self,
+        tool: Any,
+        args: dict[str, Any],
+        tool_context: Any,
+        tool_response: dict[str, Any],
+    ) -> dict[str, Any] | None:
+        """Store successful ``execute_sql`` responses captured by the before hook."""
+
+        if getattr(tool, "name", None) != _TOOL_NAME:
+            return None
+        with self._lock:
+            pending = self._pending.pop(self._call_id(args, tool_context), None)
+        if pending is not None:
+            await asyncio.to_thread(self.store, pending, tool_response)
+        return None
+
+
+def build_sql_cache(
+    versions: TableVersionProvider, *, per_user: bool = False
+) -> SqlResultCache | None:
+    """Create the cache selected by ``DATA_ANALYST_SQL_CACHE``.
+
+    ``memory`` (default), ``disk`` and ``redis`` pick the backend; ``off``
+    disables caching. The Redis backend reads ``DATA_ANALYST_SQL_CACHE_REDIS_URL``
+    and needs the optional ``redis`` package. Pass ``per_user`` when users
+    query with their own credentials.
+    """
+
+    mode = os.getenv("DATA_ANALYST_SQL_CACHE", "memory").lower()
+    if mode in {"off", "none", "0", "false"}:
+        return None
+    backend: CacheBackend
+    if mode == "disk":
+        backend = DiskBackend()
+    elif mode == "redis":
+        import redis
+
+        backend = RedisBackend(
+            redis.Redis.from_url(os.environ["DATA_ANALYST_SQL_CACHE_REDIS_URL"])
+        )
+    else:
+        backend = InProcessBackend()
+    return SqlResultCache(backend, versions, per_user=per_user)
+
+
+__all__ = [
+    "BigQueryTableVersions",
+    "CacheBackend",
+    "DiskBackend",
+    "InProcessBackend",
+    "RedisBackend",
+    "SqlResultCache",
+    "TableVersionProvider",
+    "build_sql_cache",
+    "cache_key",
+    "is_cacheable_sql",
+    "normalise_sql",
+]
@@ -0,0 +1,159 @@
+"""Offline accuracy and latency benchmark for the BM25 dataset router.
+
+Builds a synthetic catalog of ``--datasets`` domains, each with a handful of
+tables whose names, descriptions and columns come from a domain vocabulary,
+then asks questions phrased from a randomly chosen table's columns. The report
+compares :class:`data_analyst_agent_app.dataset_router.DatasetRouter` with the
+legacy two-keyword-set substring router on top-1 dataset accuracy, and gives
+the router's top-1/top-3 table accuracy and per-question latency.
+
+Usage:
+    python scripts/benchmark_dataset_router.py [--datasets 40] [--questions 2000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from data_analyst_agent_app.dataset_router import DatasetRouter
+from data_analyst_agent_app.metadata_utils import (
+    _M365_KEYWORDS,
+    _WORKFORCE_KEYWORDS,
+    compile_catalog,
+)
+
+_VOCABULARY = (
+    "revenue margin invoice supplier shipment warehouse pallet carrier store "
+    "basket promotion coupon loyalty member churn ticket incident outage alert "
+    "latency deployment release license mailbox meeting channel device patch "
+    "vulnerability badge shift roster overtime payroll bonus headcount attrition "
+    "requisition candidate interview offer training course certificate survey "
+    "sentiment forecast budget capex opex vendor contract renewal asset lease "
+    "energy emission carbon waste recycling inventory shrink markdown price "
+    "competitor region market segment campaign impression click conversion"
+).split()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--datasets",
+        type=int,
+        default=40,
+        help="Number of synthetic datasets to index (default: 40).",
+    )
+    parser.add_argument(
+        "--questions",
+        type=int,
+        default=2000,
+        help="Number of labelled questions to route (default: 2000).",
+    )
+    parser.add_argument("--seed", type=int, default=7, help="Random seed (default: 7).")
+    return parser.parse_args()
+
+
+def build_catalog(rng: random.Random, datasets: int) -> dict[str, dict]:
+    raw: dict[str, dict] = {}
+    for index in range(datasets):
+        topic = rng.sample(_VOCABULARY, 6)
+        dataset_id = f"{topic[0]}_{topic[1]}_{index}"
+        tables = []
+        for table_index in range(6):
+            words = rng.sample(topic, 2) + rng.sample(_VOCABULARY, 1)
+            columns = [
+                {
+                    "name": f"{rng.choice(topic)}_{rng.choice(_VOCABULARY)}",
+                    "type": "STRING",
+                }
+                for _ in range(8)
+            ]
+            tables.append(
+                {
+                    "table": f"{words[0]}_{words[1]}_{table_index}",
+                    "description": f"{words[0].title()} {words[1]} by {words[2]}",
+                    "columns": columns,
+                }
+            )
+        raw[dataset_id] = {"description": " ".join(topic), "tables": tables}
+    return raw
+
+
+def build_questions(
+    rng: random.Random, raw: dict[str, dict], count: int
+) -> list[tuple[str, str, str]]:
+    questions = []
+    for _ in range(count):
+        dataset_id = rng.choice(list(raw))
+        table = rng.choice(raw[dataset_id]["tables"])
+        columns = [
+            column["name"].replace("_", " ")
+            for column in rng.sample(table["columns"], 2)
+        ]
+        questions.append(
+            (
+                f"What is the {columns[0]} broken down by {columns[1]} "
+                f"for {table['description'].lower()}?",
+                dataset_id,
+                table["table"],
+            )
+        )
+    return questions
+
+
+def legacy_route(question: str) -> str | None:
+    text = question.lower()
+    m365 = any(word in text for word in _M365_KEYWORDS)
+    workforce = any(word in text for word in _WORKFORCE_KEYWORDS)
+    if m365:
+        return "ms_graph"
+    if workforce:
+        return "gt_wf"
+    return None
+
+
+def main() -> None:
+    args = parse_args()
+    rng = random.Random(args.seed)
+    raw = build_catalog(rng, args.datasets)
+    questions = build_questions(rng, raw, args.questions)
+
+    started = time.perf_counter()
+    router = DatasetRouter(compile_catalog(raw, content_hash="benchmark"))
+    build_ms = (time.perf_counter() - started) * 1000
+
+    latencies: list[float] = []
+    dataset_hits = table_hits = table_top3 = legacy_hits = 0
+    for question, dataset_id, table in questions:
+        started = time.perf_counter()
+        result = router.route(question, limit=3)
+        latencies.append((time.perf_counter() - started) * 1e6)
+        dataset_hits += result.best_dataset == dataset_id
+        ranked_tables = [(match.dataset_id, match.table) for match in result.tables]
+        table_hits += bool(ranked_tables) and ranked_tables[0] == (dataset_id, table)
+        table_top3 += (dataset_id, table) in ranked_tables
+        legacy_hits += legacy_route(question) == dataset_id
+
+    total = len(questions)
+    table_count = sum(len(dataset["tables"]) for dataset in raw.values())
+    latencies.sort()
+    print(f"Indexed {len(raw)} datasets / {table_count} tables in {build_ms:.1f} ms")
+    print(f"Questions routed:          {total}")
+    print(f"Legacy top-1 dataset:      {legacy_hits / total:.1%}")
+    print(f"BM25 top-1 dataset:        {dataset_hits / total:.1%}")
+    print(f"BM25 top-1 table:          {table_hits / total:.1%}")
+    print(f"BM25 top-3 table:          {table_top3 / total:.1%}")
+    print(
+        f"Latency p50 / p95 (µs):    {statistics.median(latencies):.1f} / "
+        f"{latencies[int(len(latencies) * 0.95) - 1]:.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""Measure instruction-cache token and latency savings against a local stand-in.
+
+Replays ``--turns`` model calls of a data analyst session through
+:class:`data_analyst_agent_app.instruction_cache.StaticInstructionCache`.
+Each call carries the full-mode instruction (persona plus the metadata
+summary), a set of tool declarations and a per-question metadata slice. A
+local stand-in for Gemini implements ``caches.create``/``delete`` and prices
+each call by its prompt tokens. Uncached tokens pay the full prefill time and
+cached tokens pay ``--cached-cost`` of it. The report compares uncached and
+cached runs on prompt tokens sent, billable input tokens and simulated
+time-to-first-token. It also includes the callback's own overhead.
+
+Usage:
+    python scripts/benchmark_instruction_cache.py [--turns 50] [--metadata-kb 40]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from google.genai import types
+
+from data_analyst_agent_app.instruction_cache import StaticInstructionCache
+
+_CHARS_PER_TOKEN = 4
+_TOOL_NAMES = (
+    "recommend_dataset",
+    "fetch_metadata",
+    "plan_dashboard",
+    "list_dataset_ids",
+    "get_dataset_info",
+    "list_table_ids",
+    "get_table_info",
+    "execute_sql",
+    "query_to_frame",
+    "run_python_analysis",
+    "fetch_result_page",
+)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--turns", type=int, default=50, help="Model calls (default: 50)."
+    )
+    parser.add_argument(
+        "--metadata-kb",
+        type=int,
+        default=40,
+        help="Size of the metadata digest in the instruction (default: 40 KB).",
+    )
+    parser.add_argument(
+        "--prefill-tokens-per-second",
+        type=float,
+        default=8000.0,
+        help="Stand-in prefill throughput for uncached tokens (default: 8000).",
+    )
+    parser.add_argument(
+        "--cached-cost",
+        type=float,
+        default=0.25,
+        help="Cost of a cached token relative to an uncached one (default: 0.25).",
+    )
+    return parser.parse_args()
+
+
+def _tokens(text: str) -> int:
+    return len(text) // _CHARS_PER_TOKEN
+
+
+class LocalModelStandIn:
+    """Gemini stand-in: a cached-content store plus a prefill-time model."""
+
+    def __init__(self, prefill_rate: float, cached_cost: float) -> None:
+        self.prefill_rate = prefill_rate
+        self.cached_cost = cached_cost
+        self.store: dict[str, int] = {}
+        self.aio = SimpleNamespace(caches=self)
+
+    async def create(self, model: str, config: dict[str, Any]) -> Any:
+        name = f"cachedContents/{len(self.store) + 1}"
+        tools = json.dumps(config.get("tools") or [])
+        self.store[name] = _tokens(config["system_instruction"]) + _tokens(tools)
+        return SimpleNamespace(name=name)
+
+    async def delete(self, name: str) -> None:
+        self.store.pop(name, None)
+
+    def generate(self, request: Any) -> tuple[int, int, float]:
+        """Return prompt tokens, cached tokens and simulated TTFT in seconds."""
+
+        config = request.config
+        prompt = _tokens(config.system_instruction or "")
+        prompt += _tokens(json.dumps(config.tools or []))
+        prompt += sum(
+            _tokens(part.text or "")
+            for content in request.contents
+            for part in content.parts or []
+        )
+        cached = self.store.get(config.cached_content or "", 0)
+        effective = prompt + cached * self.cached_cost
+        return prompt + cached, cached, effective / self.prefill_rate
+
+
+def build_instruction(metadata_kb: int) -> str:
+    persona = (
+        "You are a meticulous British data analyst. Consult the curated "
+        "metadata before issuing SQL, narrate your analytical steps and "
+        "explain how stakeholders might interpret the results.\n\n"
+    )
+    row = "    • table_{0}: Daily usage facts. Rows: 120000. Key fields: a, b, c.\n"
+    lines = ["Dataset metadata overview:\n"]
+    index = 0
+    while sum(map(len, lines)) < metadata_kb * 1024:
+        lines.append(row.format(index))
+        index += 1
+    return persona + "".join(lines)
+
+
+def build_tools() -> list[dict[str, Any]]:
+    return [
+        {
+            "function_declarations": [
+                {
+                    "name": name,
+                    "description": f"{name.replace('_', ' ').capitalize()}. " * 20,
+                    "parameters": {
+                        "type": "OBJECT",
+                        "properties": {"query": {"type": "STRING"}},
+                    },
+                }
+            ]
+        }
+        for name in _TOOL_NAMES
+    ]
+
+
+def make_request(instruction: str, tools: list[dict[str, Any]], turn: int) -> Any:
+    metadata_slice = f"Relevant tables: table_{turn}, table_{turn + 1}."
+    history = [
+        types.Content(
+            role="user" if i % 2 == 0 else "model",
+            parts=[types.Part(text=f"Turn {i}.")],
+        )
+        for i in range(turn % 6)
+    ]
+    history.append(
+        types.Content(
+            role="user", parts=[types.Part(text=f"What changed in week {turn}?")]
+        )
+    )
+    return SimpleNamespace(
+        model="gemini-2.5-pro",
+        config=SimpleNamespace(
+            system_instruction=f"{instruction}\n\n{metadata_slice}",
+            tools=list(tools),
+            tool_config=None,
+            cached_content=None,
+        ),
+        contents=history,
+    )
+
+
+def run(args: argparse.Namespace, cached: bool) -> dict[str, float]:
+    instruction = build_instruction(args.metadata_kb)
+    tools = build_tools()
+    model = LocalModelStandIn(args.prefill_tokens_per_second, args.cached_cost)
+    cache = StaticInstructionCache(
+        lambda: instruction, client_factory=lambda: model, min_tokens=1024
+    )
+    prompt_tokens = cached_tokens = 0
+    billable = 0.0
+    latencies: list[float] = []
+    overheads: list[float] = []
+    for turn in range(args.turns):
+        request = make_request(instruction, tools, turn)
+        if cached:
+            started = time.perf_counter()
+            asyncio.run(cache.before_model_callback(None, request))
+            overheads.append(time.perf_counter() - started)
+        prompt, from_cache, ttft = model.generate(request)
+        prompt_tokens += prompt
+        cached_tokens += from_cache
+        billable += prompt - from_cache * (1 - args.cached_cost)
+        latencies.append(ttft + (overheads[-1] if overheads else 0.0))
+    return {
+        "prompt_tokens": prompt_tokens,
+        "cached_tokens": cached_tokens,
+        "billable_tokens": billable,
+        "ttft_p50_ms": statistics.median(latencies) * 1000,
+        "overhead_p50_ms": statistics.median(overheads) * 1000 if overheads else 0.0,
+    }
+
+
+def main() -> None:
+    args = parse_args()
+    baseline = run(args, cached=False)
+    cached = run(args, cached=True)
+    print(f"Turns: {args.turns}; metadata digest: {args.metadata_kb} KB")
+    print(f"{'':<26} {'uncached':>12} {'cached':>12}")
+    for key, label in (
+        ("prompt_tokens", "Prompt tokens"),
+        ("cached_tokens", "  of which from cache"),
+        ("billable_tokens", "Billable input tokens"),
+        ("ttft_p50_ms", "TTFT p50 (ms, simulated)"),
+        ("overhead_p50_ms", "Callback overhead p50 (ms)"),
+    ):
+        print(f"{label:<26} {baseline[key]:>12,.1f} {cached[key]:>12,.1f}")
+    saving = 1 - cached["billable_tokens"] / baseline["billable_tokens"]
+    print(f"Billable input token saving: {saving:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""Measure BigQuery result-cache hits for repeated analytics intents.
+
+Replays ``--requests`` analyzer requests drawn from a few intents ("sales by
+month since <date>", "top <n> customers", "download all orders"). Each intent
+is phrased in several ways, for example with dates written as ``2024-01-01``,
+``2024/01/01`` or ``jan 1, 2024``. Two ways of building the SQL are compared:
+
+* interpolated: the matched text is pasted into the SQL as the old f-string
+  parser did, so the same intent can produce different query text;
+* templates: the ``QueryTemplateRegistry`` binds typed query parameters, so
+  the same intent always sends the same SQL and parameter values.
+
+Requests are spread evenly over ``--days``. A local stand-in for BigQuery
+keeps a 24-hour result cache keyed, as BigQuery does, on the exact query text
+and parameter values. Misses cost ``--miss-ms`` and hits ``--hit-ms`` of
+simulated latency. The report gives the hit rate, the
+number of distinct cache keys, the simulated latency and the time spent
+matching requests to templates.
+
+Usage:
+    python scripts/benchmark_query_templates.py [--requests 2000] [--days 7]
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import random
+import statistics
+import time
+from pathlib import Path
+from typing import Any
+
+ROOT = Path(__file__).resolve().parent.parent
+AGENTS = ROOT / "GCP_Agent_Starter_Pack" / "base_agent_config.py" / "agents"
+
+
+def _load_query_templates() -> Any:
+    # The agents package imports ADK base classes on import; load the module
+    # on its own.
+    spec = importlib.util.spec_from_file_location(
+        "query_templates", AGENTS / "query_templates.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+query_templates = _load_query_templates()
+
+_DATASET = "analytics"
+_DATES = ("2024-01-01", "2024-04-01", "2024-07-01", "2024-10-01")
+_MONTHS = ("jan", "apr", "jul", "oct")
+_LIMITS = (5, 10, 20)
+_RESULT_CACHE_SECONDS = 24 * 3600
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--requests", type=int, default=2000, help="Requests (default: 2000)."
+    )
+    parser.add_argument(
+        "--miss-ms",
+        type=float,
+        default=1500.0,
+        help="Simulated latency of an uncached query (default: 1500 ms).",
+    )
+    parser.add_argument(
+        "--hit-ms",
+        type=float,
+        default=120.0,
+        help="Simulated latency of a cached result (default: 120 ms).",
+    )
+    parser.add_argument(
+        "--days", type=float, default=7.0, help="Days covered (default: 7)."
+    )
+    parser.add_argument("--seed", type=int, default=7, help="Random seed.")
+    return parser.parse_args()
+
+
+def _date_phrasings(index: int) -> list[str]:
+    year, month, day = _DATES[index].split("-")
+    return [
+        _DATES[index],
+        f"{year}/{month}/{day}",
+        f"{_MONTHS[index]} {int(day)}, {year}",
+        f"{_MONTHS[index]} {int(day)} {year}",
+    ]
+
+
+def build_workload(count: int, rng: random.Random) -> list[str]:
+    requests = []
+    for _ in range(count):
+        intent = rng.random()
+        if intent < 0.45:
+            since = rng.choice(_date_phrasings(rng.randrange(len(_DATES))))
+            requests.append(
+                rng.choice(
+                    (
+                        f"Sales by month since {since}",
+                        f"show me sales by month since {since}",
+                    )
+                )
+            )
+        elif intent < 0.9:
+            limit = rng.choice(_LIMITS)
+            requests.append(
+                rng.choice(
+                    (f"Top {limit} customers", f"who are the top {limit} customers?")
+                )
+            )
+        else:
+            requests.append("Download all orders")
+    return requests
+
+
+def interpolated(request: str, registry: Any) -> tuple[str, tuple]:
+    """Paste the matched text into the SQL, as f-string SQL building does."""
+
+    normalized = " ".join(request.lower().split())
+    for template in registry.templates.values():
+        found = template.pattern.search(normalized)
+        if found is None:
+            continue
+        sql = template.sql
+        for parameter in template.parameters:
+            raw = found.group(parameter.name)
+            if raw is None:
+                literal = (
+                    "NULL" if parameter.default is None else str(parameter.default)
+                )
+            elif parameter.type == "INT64":
+                literal = raw
+            else:
+                literal = f"'{raw}'"
+            sql = sql.replace(f"@{parameter.name}", literal)
+        return sql, ()
+    raise ValueError(request)
+
+
+def templated(request: str, registry: Any) -> tuple[str, tuple]:
+    bound = registry.match(request)
+    return bound.sql, bound.values
+
+
+class BigQueryStandIn:
+    """Result cache keyed on exact query text and parameter values."""
+
+    def __init__(self, miss_ms: float, hit_ms: float) -> None:
+        self.miss_ms = miss_ms
+        self.hit_ms = hit_ms
+        self.cache: dict[tuple[str, tuple], float] = {}
+        self.keys: set[tuple[str, tuple]] = set()
+
+    def query(self, sql: str, params: tuple, now: float) -> tuple[bool, float]:
+        key = (sql, params)
+        self.keys.add(key)
+        # Cached results expire 24 hours after they were computed.
+        if now - self.cache.get(key, -_RESULT_CACHE_SECONDS) < _RESULT_CACHE_SECONDS:
+            return True, self.hit_ms
+        self.cache[key] = now
+        return False, self.miss_ms
+
+
+def run(args: argparse.Namespace, build: Any) -> dict[str, float]:
+    registry = query_templates.QueryTemplateRegistry.from_yaml(dataset=_DATASET)
+    workload = build_workload(args.requests, random.Random(args.seed))
+    bigquery = BigQueryStandIn(args.miss_ms, args.hit_ms)
+    hits = 0
+    latencies: list[float] = []
+    overheads: list[float] = []
+    spacing = args.days * 86400 / len(workload)
+    for index, request in enumerate(workload):
+        started = time.perf_counter()
+        sql, params = build(request, registry)
+        overheads.append(time.perf_counter() - started)
+        hit, latency = bigquery.query(sql, params, index * spacing)
+        hits += hit
+        latencies.append(latency)
+    return {
+        "hit_rate": hits / len(workload) * 100,
+        "cache_keys": len(bigquery.keys),
+        "latency_mean_ms": statistics.fmean(latencies),
+        "latency_p95_ms": statistics.quantiles(latencies, n=20)[-1],
+        "match_p50_us": statistics.median(overheads) * 1e6,
+    }
+
+
+def main() -> None:
+    args = parse_args()
+    baseline = run(args, interpolated)
+    templates = run(args, templated)
+    print(f"Requests: {args.requests} over {args.days:g} days")
+    print(f"{'':<28} {'interpolated':>13} {'templates':>13}")
+    for key, label in (
+        ("hit_rate", "Result-cache hit rate (%)"),
+        ("cache_keys", "Distinct cache keys"),
+        ("latency_mean_ms", "Mean latency (ms, sim.)"),
+        ("latency_p95_ms", "p95 latency (ms, sim.)"),
+        ("match_p50_us", "SQL build p50 (us)"),
+    ):
+        print(f"{label:<28} {baseline[key]:>13,.1f} {templates[key]:>13,.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Compare the columnar result encoding with the legacy records format.
+
+``run_python_analysis`` used to return DataFrames as
+``DataFrame.to_dict(orient="records")``. This script builds a few synthetic
+result shapes and reports, for each, the JSON payload size and encode time of
+the records format against :func:`data_analyst_agent_app.result_encoding.encode_dataframe`
+both without limits (same rows, different layout) and with the default budget
+the agent applies.
+
+Usage:
+    python scripts/benchmark_result_encoding.py [--rows 5000] [--repeat 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from data_analyst_agent_app.result_encoding import encode_dataframe  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--rows",
+        type=int,
+        default=5000,
+        help="Row count of the long result shapes (default: 5000).",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="Timing repetitions per encoder; the best run is reported (default: 5).",
+    )
+    return parser.parse_args()
+
+
+def build_frames(rows: int) -> dict[str, pd.DataFrame]:
+    rng = np.random.default_rng(7)
+    regions = np.array(["EMEA", "AMER", "APAC", "LATAM"])
+    departments = np.array([f"dept_{index:02d}" for index in range(40)])
+    long_frame = pd.DataFrame({
+        "employee_id": np.arange(rows),
+        "region": regions[rng.integers(0, len(regions), rows)],
+        "department": departments[rng.integers(0, len(departments), rows)],
+        "tenure_years": rng.gamma(2.0, 3.0, rows).round(2),
+        "salary": rng.normal(65_000, 12_000, rows).round(0),
+        "hired_on": pd.Timestamp("2015-01-01")
+        + pd.to_timedelta(rng.integers(0, 3_600, rows), unit="D"),
+    })
+    wide_frame = pd.DataFrame(
+        rng.random((max(1, rows // 10), 120)),
+        columns=[f"metric_{index:03d}" for index in range(120)],
+    )
+    return {
+        f"long ({rows}x6)": long_frame,
+        f"wide ({len(wide_frame)}x120)": wide_frame,
+        "small (25x6)": long_frame.head(25),
+    }
+
+
+def measure(encoder: Callable[[pd.DataFrame], Any], frame: pd.DataFrame, repeat: int) -> tuple[int, float]:
+    best = float("inf")
+    size = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        payload = encoder(frame)
+        text = json.dumps(payload, default=str, separators=(",", ":"))
+        best = min(best, time.perf_counter() - started)
+        size = len(text)
+    return size, best * 1000
+
+
+def main() -> None:
+    args = parse_args()
+    encoders: dict[str, Callable[[pd.DataFrame], Any]] = {
+        "records": lambda frame: {
+            "type": "dataframe",
+            "columns": list(frame.columns),
+            "records": frame.to_dict(orient="records"),
+        },
+        "columnar (unbounded)": lambda frame: encode_dataframe(
+            frame, max_rows=len(frame), max_bytes=sys.maxsize, max_columns=frame.shape[1]
+        ),
+        "columnar (default budget)": encode_dataframe,
+    }
+
+    header = f"{'shape':<18} {'encoder':<26} {'bytes':>12} {'vs records':>11} {'ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for shape, frame in build_frames(args.rows).items():
+        baseline_size = None
+        for name, encoder in encoders.items():
+            size, elapsed_ms = measure(encoder, frame, args.repeat)
+            baseline_size = baseline_size or size
+            ratio = size / baseline_size
+            print(f"{shape:<18} {name:<26} {size:>12,} {ratio:>10.1%} {elapsed_ms:>9.2f}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
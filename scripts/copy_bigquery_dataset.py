@@ -5,8 +5,13 @@ destination dataset, potentially across projects. Native BigQuery views are
 materialized into destination tables with the same name, allowing the
 resulting dataset to contain only tables.
 
+Copy and materialization jobs run concurrently: up to ``--max-in-flight``
+jobs are submitted at once and polled together. Progress and throughput are
+logged as each job finishes. A failed table does not stop the others; failures
+are listed at the end and the script exits with status 1.
+
 Usage:
-    python scripts/copy_bigquery_dataset.py [--overwrite]
+    python scripts/copy_bigquery_dataset.py [--overwrite] [--max-in-flight 8]
 
 By default, the script copies the ``ade_ms_api_vw`` dataset from the
 ``wmt-ebs-ade-prod`` project into the ``ms_graph`` dataset in the
@@ -22,6 +27,8 @@ from __future__ import annotations
 
 import argparse
 import logging
+import time
+from dataclasses import dataclass
 from typing import Iterable
 
 from google.api_core.exceptions import NotFound
@@ -75,13 +82,28 @@ def parse_args() -> argparse.Namespace:
             " existing tables are left untouched."
         ),
     )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=8,
+        help="Maximum number of copy/query jobs running at once (default: 8).",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=2.0,
+        help="Seconds between job status checks (default: 2).",
+    )
     parser.add_argument(
         "--log-level",
         default="INFO",
         choices=["CRITICAL", "ERROR", "WARNING", "INFO", "DEBUG"],
         help="Set the logging verbosity (default: INFO).",
     )
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.max_in_flight < 1:
+        parser.error("--max-in-flight must be at least 1")
+    return args
 
 
 def ensure_destination_dataset(
@@ -126,8 +148,8 @@ def copy_table(
     destination_client: bigquery.Client,
     destination_table_id: str,
     overwrite: bool,
-) -> None:
-    """Trigger a table-to-table copy job and wait for completion."""
+) -> bigquery.CopyJob:
+    """Submit a table-to-table copy job without waiting for it."""
     LOGGER.info("Copying %s -> %s", source_table_id, destination_table_id)
 
     job_config = CopyJobConfig()
@@ -136,13 +158,11 @@ def copy_table(
     else:
         job_config.write_disposition = bigquery.WriteDisposition.WRITE_EMPTY
 
-    copy_job = source_client.copy_table(
+    return source_client.copy_table(
         source_table_id,
         destination_table_id,
         job_config=job_config,
     )
-    copy_job.result()
-    LOGGER.info("Finished copying %s", source_table_id)
 
 
 def materialize_view(
@@ -150,8 +170,8 @@ def materialize_view(
     source_table_id: str,
     destination_table_id: str,
     overwrite: bool,
-) -> None:
-    """Create a table in the destination dataset with the view contents."""
+) -> bigquery.QueryJob:
+    """Submit a query job that writes the view contents to a destination table."""
 
     LOGGER.info(
         "Materializing view %s into table %s", source_table_id, destination_table_id
@@ -167,10 +187,134 @@ def materialize_view(
     )
 
     query = f"SELECT * FROM `{source_table_id}`"
-    query_job = destination_client.query(query, job_config=job_config)
-    query_job.result()
+    return destination_client.query(query, job_config=job_config)
+
+
+@dataclass
+class CopyTask:
+    """One table or view to bring into the destination dataset."""
+
+    source_table_id: str
+    destination_table_id: str
+    is_view: bool
+    job: bigquery.CopyJob | bigquery.QueryJob | None = None
+    started: float = 0.0
 
-    LOGGER.info("Finished materializing view %s", source_table_id)
+    @property
+    def action(self) -> str:
+        return "materialize view" if self.is_view else "copy table"
+
+
+def submit_task(
+    task: CopyTask,
+    source_client: bigquery.Client,
+    destination_client: bigquery.Client,
+    overwrite: bool,
+) -> None:
+    if task.is_view:
+        task.job = materialize_view(
+            destination_client,
+            task.source_table_id,
+            task.destination_table_id,
+            overwrite=overwrite,
+        )
+    else:
+        task.job = copy_table(
+            source_client,
+            task.source_table_id,
+            destination_client,
+            task.destination_table_id,
+            overwrite=overwrite,
+        )
+    task.started = time.monotonic()
+
+
+def run_tasks(
+    tasks: list[CopyTask],
+    source_client: bigquery.Client,
+    destination_client: bigquery.Client,
+    overwrite: bool,
+    max_in_flight: int,
+    poll_interval: float,
+) -> dict[str, str]:
+    """Run ``tasks`` with at most ``max_in_flight`` jobs at once.
+
+    Returns the failures as ``{source_table_id: error}``.
+    """
+
+    pending = list(reversed(tasks))
+    running: list[CopyTask] = []
+    failures: dict[str, str] = {}
+    finished = 0
+    bytes_processed = 0
+    started = time.monotonic()
+
+    def record(task: CopyTask, error: Exception | None) -> None:
+        nonlocal finished
+        finished += 1
+        elapsed = time.monotonic() - started
+        if error is not None:
+            failures[task.source_table_id] = str(error)
+            LOGGER.error(
+                "Failed to %s %s to %s: %s",
+                task.action,
+                task.source_table_id,
+                task.destination_table_id,
+                error,
+            )
+        else:
+            LOGGER.info(
+                "Finished %s %s in %.1fs",
+                task.action,
+                task.source_table_id,
+                time.monotonic() - task.started,
+            )
+        LOGGER.info(
+            "Progress: %d/%d done, %d running, %d failed; %.2f tables/min, "
+            "%.1f MiB processed by views, %.0fs elapsed",
+            finished,
+            len(tasks),
+            len(running),
+            len(failures),
+            finished / elapsed * 60 if elapsed else 0.0,
+            bytes_processed / 2**20,
+            elapsed,
+        )
+
+    while pending or running:
+        while pending and len(running) < max_in_flight:
+            task = pending.pop()
+            try:
+                submit_task(task, source_client, destination_client, overwrite)
+            except Exception as exc:  # pylint: disable=broad-except
+                record(task, exc)
+                continue
+            running.append(task)
+
+        # ``done()`` reloads the job and retries transient API errors itself;
+        # anything it or ``result()`` still raises fails that table only.
+        completed: list[tuple[CopyTask, Exception | None]] = []
+        still_running: list[CopyTask] = []
+        for task in running:
+            try:
+                if not task.job.done():
+                    still_running.append(task)
+                    continue
+                task.job.result()
+            except Exception as exc:  # pylint: disable=broad-except
+                completed.append((task, exc))
+                continue
+            completed.append((task, None))
+        running = still_running
+        for task, error in completed:
+            if error is None:
+                bytes_processed += getattr(task.job, "total_bytes_processed", None) or 0
+            record(task, error)
+
+        if running and not completed:
+            time.sleep(poll_interval)
+
+    return failures
 
 
 def main() -> None:
@@ -196,47 +340,35 @@ def main() -> None:
         destination_client, destination_dataset_ref, source_dataset.location
     )
 
-    for table in list_tables(source_client, source_dataset_ref):
-        source_table_id = f"{source_dataset_ref}.{table.table_id}"
-        destination_table_id = f"{destination_dataset_ref}.{table.table_id}"
-
-        table_type = getattr(table, "table_type", "TABLE")
-        if table_type.upper() == "VIEW":
-            try:
-                materialize_view(
-                    destination_client,
-                    source_table_id,
-                    destination_table_id,
-                    overwrite=args.overwrite,
-                )
-            except Exception as exc:  # pylint: disable=broad-except
-                LOGGER.error(
-                    "Failed to materialize view %s to %s: %s",
-                    source_table_id,
-                    destination_table_id,
-                    exc,
-                )
-                raise
-            continue
-        try:
-            copy_table(
-                source_client,
-                source_table_id,
-                destination_client,
-                destination_table_id,
-                overwrite=args.overwrite,
-            )
-        except Exception as exc:  # pylint: disable=broad-except
-            LOGGER.error(
-                "Failed to copy table %s to %s: %s",
-                source_table_id,
-                destination_table_id,
-                exc,
-            )
-            raise
+    tasks = [
+        CopyTask(
+            source_table_id=f"{source_dataset_ref}.{table.table_id}",
+            destination_table_id=f"{destination_dataset_ref}.{table.table_id}",
+            is_view=getattr(table, "table_type", "TABLE").upper() == "VIEW",
+        )
+        for table in list_tables(source_client, source_dataset_ref)
+    ]
+
+    started = time.monotonic()
+    failures = run_tasks(
+        tasks,
+        source_client,
+        destination_client,
+        overwrite=args.overwrite,
+        max_in_flight=args.max_in_flight,
+        poll_interval=args.poll_interval,
+    )
+    elapsed = time.monotonic() - started
 
-    LOGGER.info("All tables copied successfully")
+    if failures:
+        LOGGER.error(
+            "%d of %d tables failed after %.0fs:", len(failures), len(tasks), elapsed
+        )
+        for source_table_id, error in failures.items():
+            LOGGER.error("  %s: %s", source_table_id, error)
+        raise SystemExit(1)
+    LOGGER.info("All %d tables copied successfully in %.0fs", len(tasks), elapsed)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
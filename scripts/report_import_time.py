@@ -0,0 +1,102 @@
+"""Report where a module's import time goes.
+
+Imports ``--module`` in a fresh interpreter under ``python -X importtime``
+and prints the wall-clock import time, the slowest top-level packages by
+cumulative time, and whether any of the heavy analysis libraries the agent
+should only load on first tool use (pandas, NumPy, Matplotlib, PyArrow,
+``google.auth``, ``google.cloud.bigquery``) were imported eagerly.
+
+Usage:
+    python scripts/report_import_time.py [--module data_analyst_agent_app.agent]
+"""
+
+from __future__ import annotations
+
+import argparse
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+DEFERRED_MODULES = (
+    "pandas",
+    "numpy",
+    "matplotlib",
+    "pyarrow",
+    "google.auth",
+    "google.cloud.bigquery",
+)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--module",
+        default="data_analyst_agent_app.agent",
+        help="Module to import (default: data_analyst_agent_app.agent).",
+    )
+    parser.add_argument(
+        "--top", type=int, default=15, help="Packages to list (default: 15)."
+    )
+    return parser.parse_args()
+
+
+def measure(module: str) -> tuple[float, str]:
+    """Import ``module`` in a subprocess; return wall seconds and the trace."""
+
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    elapsed = time.perf_counter() - started
+    if completed.returncode != 0:
+        tail = completed.stderr.strip().splitlines()[-1:]
+        raise SystemExit(f"Importing {module} failed: {' '.join(tail)}")
+    return elapsed, completed.stderr
+
+
+def cumulative_by_package(trace: str) -> dict[str, int]:
+    """Sum ``-X importtime`` cumulative microseconds of top-level imports."""
+
+    totals: dict[str, int] = defaultdict(int)
+    for line in trace.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[12:].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        # Only count outermost imports; -X importtime indents nested ones by
+        # two spaces per level after the separator's single space.
+        name = name[1:]
+        if not name.startswith(" "):
+            totals[name.split(".")[0].strip()] += int(cumulative)
+    return dict(totals)
+
+
+def main() -> None:
+    args = parse_args()
+    elapsed, trace = measure(args.module)
+    totals = cumulative_by_package(trace)
+    imported = {
+        line.split("|")[-1].strip()
+        for line in trace.splitlines()
+        if line.startswith("import time:")
+    }
+
+    print(f"import {args.module}: {elapsed:.2f} s wall (including interpreter start)")
+    print(f"{'package':<32} {'cumulative ms':>14}")
+    for name, micros in sorted(totals.items(), key=lambda item: -item[1])[: args.top]:
+        print(f"{name:<32} {micros / 1000:>14.1f}")
+    eager = [name for name in DEFERRED_MODULES if name in imported]
+    print("Deferred libraries imported eagerly:", ", ".join(eager) or "none")
+
+
+if __name__ == "__main__":
+    main()
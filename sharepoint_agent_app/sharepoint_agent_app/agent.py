@@ -8,20 +8,45 @@ keyword searches scoped to a SharePoint site.
 
 from __future__ import annotations
 
+import asyncio
+import atexit
+import json
 import os
 import pathlib
+import threading
+import time
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
 
 import msal
-import requests
 from dotenv import load_dotenv
 from google.adk.agents.llm_agent import Agent
 from google.adk.tools.function_tool import FunctionTool
+from google.adk.tools.tool_context import ToolContext
+
+from .content_mirror import ContentMirror, MirrorSyncer, configured_sites
+from .document_passages import DocumentReader, DocumentRef
+from .graph_http import GraphHttpClient, get_graph_client
+from .result_cache import SearchResultCache, normalize_query, normalize_site
+from .token_cache import DEFAULT_USER_KEY, GraphTokenCache, user_key_for
 
 load_dotenv()
 
 DEFAULT_SCOPES = [scope.strip() for scope in os.getenv("GRAPH_SCOPES", "Sites.Read.All Files.Read.All").split() if scope.strip()]
+# "shared": every user of the agent signs in as the first cached account (the
+# local, single-user setup). "per_user": each ADK user gets their own account.
+GRAPH_ACCOUNT_MODE = os.getenv("GRAPH_ACCOUNT_MODE", "shared").strip().lower()
+# The MSAL cache is written at most this often; pending changes are flushed on exit.
+TOKEN_CACHE_PERSIST_SECONDS = float(os.getenv("GRAPH_TOKEN_CACHE_PERSIST_SECONDS", "30"))
+# Reciprocal rank fusion constant for merging hits across batched searches.
+RRF_K = 60
+# Graph search pages hold at most this many hits; deeper results need paging.
+SEARCH_PAGE_SIZE = 25
+MAX_SEARCH_RESULTS = int(os.getenv("GRAPH_SEARCH_MAX_RESULTS", "200"))
+RESULT_FIELDS = ("name", "url", "summary", "last_modified", "resource_type")
+# Search fields needed to locate the driveItem behind a hit.
+DOCUMENT_FIELDS = ["id", "name", "webUrl", "parentReference", "file", "folder"]
+MAX_PASSAGE_DOCUMENTS = int(os.getenv("GRAPH_PASSAGE_MAX_DOCUMENTS", "10"))
 
 
 @dataclass(slots=True)
@@ -53,6 +78,8 @@ class DelegatedGraphAuthenticator:
       tenant_id: str,
       scopes: Optional[List[str]] = None,
       cache_path: Optional[pathlib.Path] = None,
+      account_mode: str = GRAPH_ACCOUNT_MODE,
+      persist_interval_seconds: float = TOKEN_CACHE_PERSIST_SECONDS,
   ) -> None:
     if not client_id or not tenant_id:
       raise ValueError("GRAPH_CLIENT_ID and GRAPH_TENANT_ID must be configured.")
@@ -61,6 +88,13 @@ class DelegatedGraphAuthenticator:
     self._scopes = scopes or DEFAULT_SCOPES
     self._cache = msal.SerializableTokenCache()
     self._cache_path = cache_path or pathlib.Path(os.getenv("GRAPH_TOKEN_CACHE", "~/.graph_sharepoint_cache.json")).expanduser()
+    self._accounts_path = self._cache_path.with_name(f"{self._cache_path.name}.accounts")
+    self._per_user = account_mode == "per_user"
+    self._persist_interval = persist_interval_seconds
+    self._persist_lock = threading.Lock()
+    self._last_persist = 0.0
+    self._user_accounts: Dict[str, str] = {}
+    self._accounts_changed = False
 
     if self._cache_path.exists():
       try:
@@ -69,25 +103,71 @@ class DelegatedGraphAuthenticator:
         # Corrupt cache – delete and continue with a clean one.
         self._cache = msal.SerializableTokenCache()
         self._cache_path.unlink(missing_ok=True)
+    if self._per_user and self._accounts_path.exists():
+      try:
+        self._user_accounts = json.loads(self._accounts_path.read_text(encoding="utf-8"))
+      except (OSError, ValueError):
+        self._user_accounts = {}
 
     self._app = msal.PublicClientApplication(
         client_id=client_id,
         authority=self._authority,
         token_cache=self._cache,
     )
+    atexit.register(self._persist_cache, force=True)
+
+  def _persist_cache(self, force: bool = False) -> None:
+    """Write the MSAL cache if it changed, at most once per persist interval."""
 
-  def _persist_cache(self) -> None:
-    if self._cache.has_state_changed:
+    with self._persist_lock:
+      if not (self._cache.has_state_changed or self._accounts_changed):
+        return
+      now = time.monotonic()
+      if not force and now - self._last_persist < self._persist_interval:
+        return
       self._cache_path.parent.mkdir(parents=True, exist_ok=True)
       self._cache_path.write_text(self._cache.serialize(), encoding="utf-8")
+      if self._accounts_changed:
+        self._accounts_path.write_text(json.dumps(self._user_accounts), encoding="utf-8")
+        self._accounts_changed = False
+      self._last_persist = now
 
-  def acquire_token(self) -> str:
+  def _accounts_for(self, user_key: str) -> List[Dict[str, Any]]:
     accounts = self._app.get_accounts()
+    if not self._per_user:
+      return accounts
+    account_id = self._user_accounts.get(user_key)
+    return [account for account in accounts if account.get("home_account_id") == account_id]
+
+  def _remember_account(self, user_key: str, result: Dict[str, Any]) -> None:
+    claims = result.get("id_token_claims") or {}
+    if self._per_user and claims.get("oid") and claims.get("tid"):
+      self._user_accounts[user_key] = f"{claims['oid']}.{claims['tid']}"
+      self._accounts_changed = True
+
+  def acquire_token_for(
+      self,
+      user_key: str = DEFAULT_USER_KEY,
+      *,
+      force_refresh: bool = False,
+      interactive: bool = True,
+  ) -> Dict[str, Any]:
+    """Return an MSAL token result, including ``expires_in``, for ``user_key``.
+
+    With ``interactive=False`` no device-code sign-in is started; a user
+    without a cached account raises ``RuntimeError`` instead.
+    """
+
+    accounts = self._accounts_for(user_key)
     if accounts:
-      result = self._app.acquire_token_silent(self._scopes, account=accounts[0])
+      result = self._app.acquire_token_silent(
+          self._scopes, account=accounts[0], force_refresh=force_refresh
+      )
       if result and "access_token" in result:
         self._persist_cache()
-        return result["access_token"]
+        return result
+    if not interactive:
+      raise RuntimeError(f"No cached Microsoft Graph account can be refreshed for {user_key}.")
 
     flow = self._app.initiate_device_flow(scopes=self._scopes)
     if "user_code" not in flow:
@@ -99,76 +179,117 @@ class DelegatedGraphAuthenticator:
       error_detail = result.get("error_description") or result
       raise RuntimeError(f"Failed to acquire delegated Microsoft Graph token: {error_detail}")
 
+    self._remember_account(user_key, result)
     self._persist_cache()
-    return result["access_token"]
+    return result
+
+  def acquire_token(self, user_key: str = DEFAULT_USER_KEY) -> str:
+    return self.acquire_token_for(user_key)["access_token"]
 
 
 class SharePointSearchClient:
   """Thin wrapper around the Microsoft Graph search endpoint for SharePoint."""
 
-  def __init__(self, authenticator: DelegatedGraphAuthenticator) -> None:
+  def __init__(
+      self,
+      authenticator: DelegatedGraphAuthenticator,
+      http_client: Optional[GraphHttpClient] = None,
+      token_cache: Optional[GraphTokenCache] = None,
+  ) -> None:
     self._authenticator = authenticator
+    self._http = http_client or get_graph_client()
+    self._tokens = token_cache or GraphTokenCache(authenticator.acquire_token_for)
 
-  def search(
-      self,
-      site_hostname: str,
-      query_text: str,
-      *,
-      site_path: str = "",
-      top: int = 5,
-      fields: Optional[List[str]] = None,
-  ) -> Dict[str, Any]:
+  @staticmethod
+  def _query_string(site_hostname: str, query_text: str, site_path: str = "") -> str:
     if not site_hostname:
       raise ValueError("site_hostname is required.")
     if not query_text:
       raise ValueError("query_text is required.")
-
-    access_token = self._authenticator.acquire_token()
-    endpoint = "https://graph.microsoft.com/v1.0/search/query"
-    entity_types = ["driveItem", "listItem", "list", "site"]
-
     if site_path:
-      query_string = f"site:\"{site_hostname}:{site_path.lstrip('/')}\" {query_text}".strip()
-    else:
-      query_string = f"site:\"{site_hostname}\" {query_text}".strip()
+      return f"site:\"{site_hostname}:{site_path.lstrip('/')}\" {query_text}".strip()
+    return f"site:\"{site_hostname}\" {query_text}".strip()
 
-    request_body: Dict[str, Any] = {
+  @staticmethod
+  def _request_body(
+      query_string: str, top: int, fields: Optional[List[str]], offset: int = 0
+  ) -> Dict[str, Any]:
+    entity_types = ["driveItem", "listItem", "list", "site"]
+    return {
         "requests": [
             {
                 "entityTypes": entity_types,
                 "query": {"queryString": query_string},
-                "from": 0,
-                "size": max(1, min(top, 25)),
+                "from": offset,
+                "size": max(1, min(top, SEARCH_PAGE_SIZE)),
                 "fields": fields or ["name", "webUrl", "lastModifiedDateTime", "fileExtension"],
             }
         ]
     }
 
-    response = requests.post(
-        endpoint,
-        headers={"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"},
-        json=request_body,
-        timeout=float(os.getenv("GRAPH_HTTP_TIMEOUT", "30")),
+  @staticmethod
+  def _hits(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    hits_containers = (payload.get("value") or [{}])[0].get("hitsContainers", [])
+    return hits_containers[0].get("hits", []) if hits_containers else []
+
+  @staticmethod
+  def _more_results(payload: Dict[str, Any]) -> bool:
+    hits_containers = (payload.get("value") or [{}])[0].get("hitsContainers", [])
+    return bool(hits_containers and hits_containers[0].get("moreResultsAvailable"))
+
+  @staticmethod
+  def _project(result: Dict[str, Any], result_fields: Optional[List[str]]) -> Dict[str, Any]:
+    """Keep only the requested fields and drop empty ones."""
+
+    wanted = set(result_fields or RESULT_FIELDS)
+    return {key: value for key, value in result.items() if key in wanted and value is not None}
+
+  def access_token(self, user_key: str = DEFAULT_USER_KEY) -> str:
+    return self._tokens.get(user_key)
+
+  @staticmethod
+  def _result(hit: Dict[str, Any]) -> SharePointSearchResult:
+    resource = hit.get("resource", {})
+    return SharePointSearchResult(
+        name=resource.get("name") or resource.get("title"),
+        url=resource.get("webUrl"),
+        summary=hit.get("summary"),
+        last_modified=resource.get("lastModifiedDateTime"),
+        resource_type=resource.get("resourceVisualization", {}).get("type"),
     )
-    response.raise_for_status()
-
-    payload = response.json()
-    hits_containers = payload.get("value", [{}])[0].get("hitsContainers", [])
-    hits = hits_containers[0].get("hits", []) if hits_containers else []
-
-    results: List[SharePointSearchResult] = []
-    for hit in hits:
-      resource = hit.get("resource", {})
-      results.append(
-          SharePointSearchResult(
-              name=resource.get("name") or resource.get("title"),
-              url=resource.get("webUrl"),
-              summary=hit.get("summary"),
-              last_modified=resource.get("lastModifiedDateTime"),
-              resource_type=resource.get("resourceVisualization", {}).get("type"),
-          )
-      )
 
+  def search(
+      self,
+      site_hostname: str,
+      query_text: str,
+      *,
+      site_path: str = "",
+      top: int = 5,
+      fields: Optional[List[str]] = None,
+      user_key: str = DEFAULT_USER_KEY,
+      compact: bool = False,
+      result_fields: Optional[List[str]] = None,
+  ) -> Dict[str, Any]:
+    """Return the first page of hits.
+
+    With ``compact=True`` the raw Graph hits are left out and each result
+    keeps only ``result_fields`` (default: all normalized fields).
+    """
+
+    query_string = self._query_string(site_hostname, query_text, site_path)
+    access_token = self._tokens.get(user_key)
+    request_body = self._request_body(query_string, top, fields)
+
+    payload = self._http.post_json("search/query", request_body, token=access_token)
+    hits = self._hits(payload)
+    results = [self._result(hit) for hit in hits]
+
+    if compact:
+      return {
+          "query": query_string,
+          "count": len(results),
+          "results": [self._project(result.as_dict(), result_fields) for result in results],
+      }
     return {
         "query": query_string,
         "count": len(results),
@@ -176,6 +297,173 @@ class SharePointSearchClient:
         "raw_response": hits,
     }
 
+  async def iter_hits(
+      self,
+      site_hostname: str,
+      query_text: str,
+      *,
+      site_path: str = "",
+      page_size: int = SEARCH_PAGE_SIZE,
+      max_results: int = MAX_SEARCH_RESULTS,
+      fields: Optional[List[str]] = None,
+      user_key: str = DEFAULT_USER_KEY,
+  ) -> AsyncIterator[Dict[str, Any]]:
+    """Yield raw Graph hits, fetching the next page only when it is needed.
+
+    Paging stops when Graph reports no ``moreResultsAvailable``, after
+    ``max_results`` hits, or as soon as the caller stops iterating.
+    """
+
+    query_string = self._query_string(site_hostname, query_text, site_path)
+    offset = 0
+    while offset < max_results:
+      size = min(page_size, SEARCH_PAGE_SIZE, max_results - offset)
+      access_token = await asyncio.to_thread(self._tokens.get, user_key)
+      payload = await asyncio.to_thread(
+          self._http.post_json,
+          "search/query",
+          self._request_body(query_string, size, fields, offset),
+          token=access_token,
+      )
+      hits = self._hits(payload)
+      for hit in hits:
+        yield hit
+      offset += len(hits)
+      if not hits or not self._more_results(payload):
+        return
+
+  async def search_pages(
+      self,
+      site_hostname: str,
+      query_text: str,
+      *,
+      site_path: str = "",
+      top: int = 5,
+      result_fields: Optional[List[str]] = None,
+      user_key: str = DEFAULT_USER_KEY,
+  ) -> Dict[str, Any]:
+    """Collect ``top`` distinct results across as many pages as needed."""
+
+    top = max(1, min(top, MAX_SEARCH_RESULTS))
+    results: List[Dict[str, Any]] = []
+    seen: Set[Optional[str]] = set()
+    pages = self.iter_hits(
+        site_hostname,
+        query_text,
+        site_path=site_path,
+        page_size=min(top, SEARCH_PAGE_SIZE),
+        user_key=user_key,
+    )
+    try:
+      async for hit in pages:
+        result = self._result(hit)
+        key = result.url or result.name
+        if key in seen:
+          continue
+        seen.add(key)
+        results.append(self._project(result.as_dict(), result_fields))
+        if len(results) >= top:
+          break
+    finally:
+      await pages.aclose()
+    return {
+        "query": self._query_string(site_hostname, query_text, site_path),
+        "count": len(results),
+        "results": results,
+    }
+
+  def search_many(
+      self,
+      searches: List[Dict[str, str]],
+      *,
+      top: int = 5,
+      limit: int = 20,
+      fields: Optional[List[str]] = None,
+      user_key: str = DEFAULT_USER_KEY,
+  ) -> Dict[str, Any]:
+    """Run several (site, query) searches through Graph JSON batching.
+
+    Hits are deduplicated by URL and ranked across every search with
+    reciprocal rank fusion, so a document that several sites or query
+    reformulations agree on rises to the top.
+    """
+
+    if not searches:
+      raise ValueError("At least one search is required.")
+    query_strings = [
+        self._query_string(item.get("site_hostname", ""), item.get("query_text", ""), item.get("site_path", ""))
+        for item in searches
+    ]
+    access_token = self._tokens.get(user_key)
+    responses = self._http.batch(
+        [
+            {"method": "POST", "url": "/search/query", "body": self._request_body(query, top, fields)}
+            for query in query_strings
+        ],
+        token=access_token,
+    )
+
+    fused: Dict[str, Dict[str, Any]] = {}
+    summaries: List[Dict[str, Any]] = []
+    for item, query_string, response in zip(searches, query_strings, responses):
+      summary: Dict[str, Any] = {"site_hostname": item["site_hostname"], "query": query_string}
+      status = response.get("status", 500)
+      if status >= 400:
+        error = (response.get("body") or {}).get("error") or {}
+        summary["error"] = f"HTTP {status}: {error.get('code', 'unknown')}"
+        summaries.append(summary)
+        continue
+      hits = self._hits(response.get("body") or {})
+      summary["count"] = len(hits)
+      summaries.append(summary)
+      for position, hit in enumerate(hits):
+        result = self._result(hit)
+        key = result.url or f"{item['site_hostname']}:{result.name}"
+        entry = fused.setdefault(key, {**result.as_dict(), "sites": [], "matched_queries": [], "score": 0.0})
+        rank = hit.get("rank") or position + 1
+        entry["score"] += 1.0 / (RRF_K + rank)
+        if item["site_hostname"] not in entry["sites"]:
+          entry["sites"].append(item["site_hostname"])
+        entry["matched_queries"].append(item["query_text"])
+
+    ranked = sorted(fused.values(), key=lambda entry: entry["score"], reverse=True)[: max(1, limit)]
+    for entry in ranked:
+      entry["score"] = round(entry["score"], 5)
+    return {"searches": summaries, "count": len(ranked), "results": ranked}
+
+  async def find_documents(
+      self,
+      site_hostname: str,
+      query_text: str,
+      *,
+      site_path: str = "",
+      top: int = 3,
+      user_key: str = DEFAULT_USER_KEY,
+  ) -> List[DocumentRef]:
+    """Return the driveItems behind the first ``top`` file hits."""
+
+    top = max(1, min(top, MAX_PASSAGE_DOCUMENTS))
+    refs: List[DocumentRef] = []
+    pages = self.iter_hits(
+        site_hostname,
+        query_text,
+        site_path=site_path,
+        page_size=top * 2,
+        max_results=top * 4,
+        fields=DOCUMENT_FIELDS,
+        user_key=user_key,
+    )
+    try:
+      async for hit in pages:
+        ref = DocumentRef.from_hit(hit)
+        if ref is not None and ref not in refs:
+          refs.append(ref)
+          if len(refs) >= top:
+            break
+    finally:
+      await pages.aclose()
+    return refs
+
 
 _AUTHENTICATOR: Optional[DelegatedGraphAuthenticator] = None
 
@@ -200,12 +488,67 @@ def _get_authenticator() -> DelegatedGraphAuthenticator:
   return _AUTHENTICATOR
 
 
+_SEARCH_CLIENT: Optional[SharePointSearchClient] = None
+_SEARCH_CLIENT_LOCK = threading.Lock()
+
+
+def _get_search_client() -> SharePointSearchClient:
+  global _SEARCH_CLIENT
+  if _SEARCH_CLIENT is None:
+    with _SEARCH_CLIENT_LOCK:
+      if _SEARCH_CLIENT is None:
+        _SEARCH_CLIENT = SharePointSearchClient(_get_authenticator())
+  return _SEARCH_CLIENT
+
+
+# Keyed per user, so cached results never cross Graph's permission trimming.
+_RESULT_CACHE = SearchResultCache()
+
+_MIRROR: Optional[ContentMirror] = None
+_MIRROR_LOCK = threading.Lock()
+
+
+def _get_mirror() -> Optional[ContentMirror]:
+  """Return the local content mirror, starting its sync thread on first use.
+
+  The mirror is only used in the shared account mode: it holds what the
+  syncing account can read and must not answer for anyone else.
+  """
+
+  global _MIRROR
+  sites = configured_sites()
+  if not sites or GRAPH_ACCOUNT_MODE != "shared":
+    return None
+  if _MIRROR is None:
+    with _MIRROR_LOCK:
+      if _MIRROR is None:
+        mirror = ContentMirror(get_graph_client())
+        MirrorSyncer(mirror, sites, _get_search_client().access_token).start()
+        _MIRROR = mirror
+  return _MIRROR
+
+
+_DOCUMENT_READER: Optional[DocumentReader] = None
+
+
+def _get_document_reader() -> DocumentReader:
+  global _DOCUMENT_READER
+  if _DOCUMENT_READER is None:
+    with _SEARCH_CLIENT_LOCK:
+      if _DOCUMENT_READER is None:
+        _DOCUMENT_READER = DocumentReader(get_graph_client())
+  return _DOCUMENT_READER
+
+
 def _build_sharepoint_tool() -> FunctionTool:
-  def query_sharepoint(
+  async def query_sharepoint(
       site_hostname: str,
       query_text: str,
       site_path: str = "",
       top: int = 5,
+      fields: Optional[List[str]] = None,
+      include_raw: bool = False,
+      tool_context: Optional[ToolContext] = None,
   ) -> Dict[str, Any]:
     """Run a keyword search against a SharePoint Online site using Microsoft Graph.
 
@@ -213,24 +556,148 @@ def _build_sharepoint_tool() -> FunctionTool:
       site_hostname: The hostname of the SharePoint site (e.g. "contoso.sharepoint.com").
       query_text: The keywords or KQL expression to search for.
       site_path: Optional path segment for the site (e.g. "sites/Finance").
-      top: Maximum number of results to return (1-25).
+      top: Maximum number of results to return (1-200); more than 25 pages deeper.
+      fields: Result fields to return, from "name", "url", "summary",
+        "last_modified" and "resource_type". Defaults to all of them.
+      include_raw: Also return the raw Graph hits (first page only). Rarely needed.
 
     Returns:
-      A dictionary containing the normalized results and the raw Graph hits payload.
+      A dictionary containing the normalized results, and the raw Graph hits
+      payload when requested. Sites mirrored locally (and synced recently) are
+      answered from the mirror's index and marked ``"source": "mirror"``.
     """
 
-    client = SharePointSearchClient(_get_authenticator())
-    return client.search(
-        site_hostname=site_hostname,
-        site_path=site_path,
-        query_text=query_text,
-        top=top,
+    client = _get_search_client()
+    user_key = user_key_for(tool_context)
+    mirror = _get_mirror()
+    if mirror is not None and not include_raw and mirror.is_synced(site_hostname, site_path):
+      local = await asyncio.to_thread(
+          mirror.search, site_hostname, query_text, site_path=site_path, limit=top
+      )
+      if local:
+        return {
+            "query": query_text,
+            "source": "mirror",
+            "count": len(local),
+            "results": [client._project(result, fields) for result in local],
+        }
+
+    async def live_search() -> Dict[str, Any]:
+      if include_raw:
+        return await asyncio.to_thread(
+            client.search,
+            site_hostname=site_hostname,
+            site_path=site_path,
+            query_text=query_text,
+            top=top,
+            user_key=user_key,
+        )
+      return await client.search_pages(
+          site_hostname=site_hostname,
+          site_path=site_path,
+          query_text=query_text,
+          top=top,
+          result_fields=fields,
+          user_key=user_key,
+      )
+
+    key = _RESULT_CACHE.make_key(
+        user_key, site_hostname, query_text, site_path, top=top, fields=fields, include_raw=include_raw
     )
+    result, _ = await _RESULT_CACHE.get_or_fetch(key, live_search)
+    return dict(result)
 
   return FunctionTool(query_sharepoint)
 
 
+def _build_multi_site_tool() -> FunctionTool:
+  async def query_sharepoint_sites(
+      searches: List[Dict[str, str]],
+      top: int = 5,
+      limit: int = 20,
+      tool_context: Optional[ToolContext] = None,
+  ) -> Dict[str, Any]:
+    """Run several SharePoint searches at once and merge the results.
+
+    Use this when a question spans several sites or benefits from a few
+    reformulations of the query, instead of calling query_sharepoint repeatedly.
+
+    Args:
+      searches: Searches to run, each with "site_hostname", "query_text" and an
+        optional "site_path".
+      top: Maximum number of hits per search (1-25).
+      limit: Maximum number of merged results to return.
+
+    Returns:
+      Per-search hit counts or errors, and results deduplicated across searches and
+      ranked by how highly and how often each document was found.
+    """
+
+    user_key = user_key_for(tool_context)
+
+    async def live_search() -> Dict[str, Any]:
+      return await asyncio.to_thread(
+          _get_search_client().search_many, searches, top=top, limit=limit, user_key=user_key
+      )
+
+    normalized = [
+        (
+            normalize_site(item.get("site_hostname", ""), item.get("site_path", "")),
+            normalize_query(item.get("query_text", "")),
+        )
+        for item in searches
+    ]
+    key = _RESULT_CACHE.make_key(user_key, "", "", searches=normalized, top=top, limit=limit)
+    result, _ = await _RESULT_CACHE.get_or_fetch(key, live_search)
+    return dict(result)
+
+  return FunctionTool(query_sharepoint_sites)
+
+
+def _build_passages_tool() -> FunctionTool:
+  async def read_sharepoint_passages(
+      site_hostname: str,
+      query_text: str,
+      question: str,
+      site_path: str = "",
+      documents: int = 3,
+      passages: int = 5,
+      tool_context: Optional[ToolContext] = None,
+  ) -> Dict[str, Any]:
+    """Search a SharePoint site, read the top documents and return the passages that answer a question.
+
+    Use this when search summaries are not enough to answer. Documents are
+    downloaded and cached until they change, so repeated reads are cheap.
+
+    Args:
+      site_hostname: The hostname of the SharePoint site (e.g. "contoso.sharepoint.com").
+      query_text: The keywords or KQL expression used to find documents.
+      question: The question the passages should answer, used to rank them.
+      site_path: Optional path segment for the site (e.g. "sites/Finance").
+      documents: How many of the top file hits to read (1-10).
+      passages: Maximum number of passages to return.
+
+    Returns:
+      The documents read, each with a status, and the best passages with the
+      name and URL of the document they come from.
+    """
+
+    client = _get_search_client()
+    user_key = user_key_for(tool_context)
+    refs = await client.find_documents(
+        site_hostname, query_text, site_path=site_path, top=documents, user_key=user_key
+    )
+    access_token = await asyncio.to_thread(client.access_token, user_key)
+    return await asyncio.to_thread(
+        _get_document_reader().read, refs, question, token=access_token, limit=passages
+    )
+
+  return FunctionTool(read_sharepoint_passages)
+
+
 sharepoint_tool = _build_sharepoint_tool()
+multi_site_tool = _build_multi_site_tool()
+passages_tool = _build_passages_tool()
 
 root_agent = Agent(
     model=os.getenv("AGENT_MODEL", "gemini-2.5-flash"),
@@ -242,9 +709,12 @@ root_agent = Agent(
     instruction="""
 You are a knowledge assistant that finds answers inside the organization's SharePoint
 Online sites. Always invoke the query_sharepoint tool to gather factual evidence before
-responding. Combine the retrieved SharePoint documents with your reasoning to craft
+responding. When a question spans several sites or needs a few phrasings of the query,
+make one query_sharepoint_sites call with all of the searches instead. When the search
+summaries do not contain the answer, call read_sharepoint_passages to read the top documents
+and quote the passages it returns. Combine the retrieved SharePoint documents with your reasoning to craft
 helpful, citation-rich answers. If a search returns no results, ask the user to clarify or
 narrow the request.
 """,
-    tools=[sharepoint_tool],
+    tools=[sharepoint_tool, multi_site_tool, passages_tool],
 )
\ No newline at end of file
@@ -0,0 +1,425 @@
+"""Local, delta-synced mirror of SharePoint document libraries.
+
+For frequently queried sites, every question used to cost a Graph search
+round trip. :class:`ContentMirror` keeps a SQLite FTS5 index of the driveItems
+in each configured site's default document library, so ``query_sharepoint``
+can answer from memory-speed local search:
+
+* :meth:`ContentMirror.sync` walks ``/drive/root/delta``. The first run
+  enumerates everything; later runs only fetch what changed. Each
+  ``@odata.nextLink`` is stored as it is reached and the final
+  ``@odata.deltaLink`` replaces it, so an interrupted sync resumes where it
+  stopped. When Graph answers a stored link with 410 Gone
+  (``resyncRequired``), the site's items are dropped and enumerated again.
+* File metadata is always indexed. Small text files also have their content
+  downloaded and indexed, but only when their ``cTag`` (content version)
+  changes.
+* :meth:`ContentMirror.search` ranks matches with BM25 and returns hits in
+  the same shape as live search, with ``<c0>`` highlighted snippets.
+
+The mirror holds whatever the syncing account can read, so it must only
+answer for that account. The agent enables it only in the shared account
+mode. Sites that have not completed a first sync, or whose last completed
+sync is older than ``GRAPH_MIRROR_MAX_STALENESS_SECONDS``, are searched live.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import pathlib
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .graph_http import GraphHttpError
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_MIRROR_PATH = pathlib.Path(
+    os.getenv("GRAPH_MIRROR_PATH", "~/.graph_sharepoint_mirror.db")
+).expanduser()
+DEFAULT_SYNC_INTERVAL_SECONDS = float(os.getenv("GRAPH_MIRROR_SYNC_SECONDS", "300"))
+# A mirror that has not completed a sync for a few intervals is not trusted.
+DEFAULT_MAX_STALENESS_SECONDS = float(
+    os.getenv("GRAPH_MIRROR_MAX_STALENESS_SECONDS", str(3 * DEFAULT_SYNC_INTERVAL_SECONDS))
+)
+DEFAULT_MAX_TEXT_BYTES = int(os.getenv("GRAPH_MIRROR_MAX_TEXT_BYTES", str(1024 * 1024)))
+
+TEXT_EXTENSIONS = frozenset({".txt", ".md", ".csv", ".json", ".html", ".htm", ".xml", ".log"})
+_DELTA_SELECT = "id,name,webUrl,lastModifiedDateTime,file,folder,deleted,cTag,size,parentReference"
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+# KQL operators and property filters have no FTS equivalent; they are dropped.
+_KQL_NOISE = re.compile(r"\b(?:AND|OR|NOT|NEAR)\b|\w+:(?:\"[^\"]*\"|\S+)")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sites (
+  site_key TEXT PRIMARY KEY,
+  site_id TEXT,
+  delta_link TEXT,
+  next_link TEXT,
+  synced_at REAL
+);
+CREATE TABLE IF NOT EXISTS items (
+  rowid INTEGER PRIMARY KEY,
+  site_key TEXT NOT NULL,
+  item_id TEXT NOT NULL,
+  name TEXT,
+  web_url TEXT,
+  last_modified TEXT,
+  extension TEXT,
+  ctag TEXT,
+  UNIQUE (site_key, item_id)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(name, body, tokenize = 'unicode61');
+"""
+
+
+def site_key(site_hostname: str, site_path: str = "") -> str:
+  """Return the mirror's key for a site, e.g. ``contoso.sharepoint.com/sites/hr``."""
+
+  path = site_path.strip("/")
+  return f"{site_hostname.lower()}/{path}" if path else site_hostname.lower()
+
+
+def configured_sites(value: Optional[str] = None) -> List[Tuple[str, str]]:
+  """Parse ``GRAPH_MIRROR_SITES``: comma-separated ``host`` or ``host:/path`` entries."""
+
+  raw = os.getenv("GRAPH_MIRROR_SITES", "") if value is None else value
+  sites: List[Tuple[str, str]] = []
+  for entry in raw.split(","):
+    entry = entry.strip()
+    if entry:
+      hostname, _, path = entry.partition(":")
+      sites.append((hostname.strip(), path.strip()))
+  return sites
+
+
+def extract_plain_text(name: str, data: bytes) -> Optional[str]:
+  """Decode text-like files; other formats are indexed by metadata only."""
+
+  if pathlib.PurePosixPath(name).suffix.lower() not in TEXT_EXTENSIONS:
+    return None
+  text = data.decode("utf-8", errors="replace")
+  if name.lower().endswith((".html", ".htm", ".xml")):
+    text = re.sub(r"<[^>]+>", " ", text)
+  return text
+
+
+def fts_query(query_text: str) -> str:
+  """Turn free text or simple KQL into an FTS5 query of quoted terms."""
+
+  terms = _TOKEN.findall(_KQL_NOISE.sub(" ", query_text))
+  return " ".join(f'"{term}"' for term in terms)
+
+
+@dataclass
+class SyncReport:
+  """Outcome of one delta sync of one site."""
+
+  site_key: str
+  pages: int = 0
+  upserted: int = 0
+  deleted: int = 0
+  text_indexed: int = 0
+  resumed: bool = False
+  resynced: bool = False
+  complete: bool = False
+
+  def as_dict(self) -> Dict[str, Any]:
+    return dict(self.__dict__)
+
+
+class ContentMirror:
+  """SQLite FTS5 mirror of SharePoint document libraries kept current by delta sync.
+
+  ``http`` is a :class:`~.graph_http.GraphHttpClient`; ``text_extractor``
+  turns downloaded file bytes into indexable text, or ``None`` to skip.
+  """
+
+  def __init__(
+      self,
+      http: Any,
+      path: pathlib.Path | str = DEFAULT_MIRROR_PATH,
+      *,
+      text_extractor: Callable[[str, bytes], Optional[str]] = extract_plain_text,
+      max_text_bytes: int = DEFAULT_MAX_TEXT_BYTES,
+  ) -> None:
+    self._http = http
+    self._extract = text_extractor
+    self.max_text_bytes = max_text_bytes
+    self.path = pathlib.Path(path)
+    if str(path) != ":memory:":
+      self.path.parent.mkdir(parents=True, exist_ok=True)
+    self._db = sqlite3.connect(str(path), check_same_thread=False)
+    self._db.executescript(_SCHEMA)
+    self._lock = threading.RLock()
+    self._sync_locks: Dict[str, threading.Lock] = {}
+
+  def close(self) -> None:
+    with self._lock:
+      self._db.close()
+
+  # -- state ---------------------------------------------------------------
+
+  def _site_row(
+      self, key: str
+  ) -> Optional[Tuple[Optional[str], Optional[str], Optional[str], Optional[float]]]:
+    with self._lock:
+      return self._db.execute(
+          "SELECT site_id, delta_link, next_link, synced_at FROM sites WHERE site_key = ?", (key,)
+      ).fetchone()
+
+  def is_synced(
+      self,
+      site_hostname: str,
+      site_path: str = "",
+      *,
+      max_age_seconds: Optional[float] = DEFAULT_MAX_STALENESS_SECONDS,
+  ) -> bool:
+    """Whether the site has completed a full sync within ``max_age_seconds``."""
+
+    row = self._site_row(site_key(site_hostname, site_path))
+    if not (row and row[1]):
+      return False
+    return max_age_seconds is None or time.time() - (row[3] or 0) <= max_age_seconds
+
+  def _save_link(self, key: str, *, next_link: Optional[str] = None, delta_link: Optional[str] = None) -> None:
+    with self._lock, self._db:
+      if delta_link:
+        self._db.execute(
+            "UPDATE sites SET delta_link = ?, next_link = NULL, synced_at = ? WHERE site_key = ?",
+            (delta_link, time.time(), key),
+        )
+      else:
+        self._db.execute("UPDATE sites SET next_link = ? WHERE site_key = ?", (next_link, key))
+
+  def _reset(self, key: str) -> None:
+    """Forget the site's links and items so the next pass enumerates from scratch."""
+
+    with self._lock, self._db:
+      self._db.execute(
+          "UPDATE sites SET delta_link = NULL, next_link = NULL WHERE site_key = ?", (key,)
+      )
+      self._db.execute(
+          "DELETE FROM items_fts WHERE rowid IN (SELECT rowid FROM items WHERE site_key = ?)", (key,)
+      )
+      self._db.execute("DELETE FROM items WHERE site_key = ?", (key,))
+
+  def _stored_ctag(self, key: str, item_id: str) -> Optional[str]:
+    with self._lock:
+      row = self._db.execute(
+          "SELECT ctag FROM items WHERE site_key = ? AND item_id = ?", (key, item_id)
+      ).fetchone()
+    return row[0] if row else None
+
+  def _delete(self, key: str, item_id: str) -> bool:
+    with self._lock, self._db:
+      row = self._db.execute(
+          "SELECT rowid FROM items WHERE site_key = ? AND item_id = ?", (key, item_id)
+      ).fetchone()
+      if row is None:
+        return False
+      self._db.execute("DELETE FROM items WHERE rowid = ?", row)
+      self._db.execute("DELETE FROM items_fts WHERE rowid = ?", row)
+      return True
+
+  def _upsert(self, key: str, item: Dict[str, Any], body: Optional[str]) -> None:
+    name = item.get("name") or ""
+    extension = pathlib.PurePosixPath(name).suffix.lower().lstrip(".")
+    with self._lock, self._db:
+      row = self._db.execute(
+          "SELECT rowid FROM items WHERE site_key = ? AND item_id = ?", (key, item["id"])
+      ).fetchone()
+      values = (name, item.get("webUrl"), item.get("lastModifiedDateTime"), extension, item.get("cTag"))
+      if row is None:
+        cursor = self._db.execute(
+            "INSERT INTO items (site_key, item_id, name, web_url, last_modified, extension, ctag) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, item["id"], *values),
+        )
+        rowid = cursor.lastrowid
+      else:
+        rowid = row[0]
+        if body is None:
+          # Metadata-only change: keep the text indexed for the current content.
+          existing = self._db.execute("SELECT body FROM items_fts WHERE rowid = ?", row).fetchone()
+          body = existing[0] if existing else None
+        self._db.execute(
+            "UPDATE items SET name = ?, web_url = ?, last_modified = ?, extension = ?, ctag = ? "
+            "WHERE rowid = ?",
+            (*values, rowid),
+        )
+        self._db.execute("DELETE FROM items_fts WHERE rowid = ?", (rowid,))
+      self._db.execute(
+          "INSERT INTO items_fts (rowid, name, body) VALUES (?, ?, ?)", (rowid, name, body or "")
+      )
+
+  # -- sync ----------------------------------------------------------------
+
+  def _resolve_site_id(self, key: str, site_hostname: str, site_path: str, token: str) -> str:
+    row = self._site_row(key)
+    if row and row[0]:
+      return row[0]
+    path = site_path.strip("/")
+    resource = f"sites/{site_hostname}:/{path}" if path else f"sites/{site_hostname}"
+    site_id = self._http.get_json(resource, token=token, params={"$select": "id"})["id"]
+    with self._lock, self._db:
+      self._db.execute(
+          "INSERT OR REPLACE INTO sites (site_key, site_id) VALUES (?, ?)", (key, site_id)
+      )
+    return site_id
+
+  def _fetch_text(self, item: Dict[str, Any], key: str, token: str) -> Optional[str]:
+    name = item.get("name") or ""
+    if "file" not in item or pathlib.PurePosixPath(name).suffix.lower() not in TEXT_EXTENSIONS:
+      return None
+    if (item.get("size") or 0) > self.max_text_bytes:
+      return None
+    if item.get("cTag") and item.get("cTag") == self._stored_ctag(key, item["id"]):
+      return None
+    drive_id = (item.get("parentReference") or {}).get("driveId")
+    resource = f"drives/{drive_id}/items/{item['id']}/content" if drive_id else f"me/drive/items/{item['id']}/content"
+    try:
+      response = self._http.request("GET", resource, token=token)
+    except Exception as error:
+      LOGGER.warning("Could not download %s for the mirror: %s", name, error)
+      return None
+    return self._extract(name, response.content[: self.max_text_bytes])
+
+  def sync(self, site_hostname: str, token: str, site_path: str = "") -> SyncReport:
+    """Apply every pending change for one site, resuming an interrupted sync."""
+
+    key = site_key(site_hostname, site_path)
+    with self._lock:
+      sync_lock = self._sync_locks.setdefault(key, threading.Lock())
+    with sync_lock:
+      report = SyncReport(key)
+      site_id = self._resolve_site_id(key, site_hostname, site_path, token)
+      _, delta_link, next_link, _ = self._site_row(key)
+      report.resumed = bool(next_link)
+      start = f"sites/{site_id}/drive/root/delta"
+      url = next_link or delta_link or start
+      params = None if (next_link or delta_link) else {"$select": _DELTA_SELECT}
+
+      while url:
+        try:
+          page = self._http.get_json(url, token=token, params=params)
+        except GraphHttpError as error:
+          # 410 Gone (resyncRequired): the stored link has expired. Changes
+          # since then are unknown, so start over with a full enumeration.
+          if error.status_code != 410 or report.resynced:
+            raise
+          LOGGER.warning("Mirror delta link for %s expired; resyncing: %s", key, error)
+          self._reset(key)
+          report.resynced = True
+          url, params = start, {"$select": _DELTA_SELECT}
+          continue
+        params = None
+        report.pages += 1
+        for item in page.get("value", []):
+          if "deleted" in item:
+            report.deleted += self._delete(key, item["id"])
+          elif "folder" in item or "root" in item:
+            continue
+          else:
+            body = self._fetch_text(item, key, token)
+            report.text_indexed += body is not None
+            self._upsert(key, item, body)
+            report.upserted += 1
+        if page.get("@odata.nextLink"):
+          url = page["@odata.nextLink"]
+          self._save_link(key, next_link=url)
+        else:
+          self._save_link(key, delta_link=page.get("@odata.deltaLink"))
+          report.complete = True
+          url = None
+      LOGGER.info("Mirror sync of %s: %s", key, report.as_dict())
+      return report
+
+  # -- search --------------------------------------------------------------
+
+  def search(
+      self, site_hostname: str, query_text: str, *, site_path: str = "", limit: int = 25
+  ) -> List[Dict[str, Any]]:
+    """Return the best local matches as live-search-shaped result dicts."""
+
+    match = fts_query(query_text)
+    if not match:
+      return []
+    with self._lock:
+      rows = self._db.execute(
+          "SELECT items.name, items.web_url, items.last_modified, items.extension, "
+          "snippet(items_fts, 1, '<c0>', '</c0>', '…', 16) "
+          "FROM items_fts JOIN items ON items.rowid = items_fts.rowid "
+          "WHERE items_fts MATCH ? AND items.site_key = ? "
+          "ORDER BY bm25(items_fts, 5.0, 1.0) LIMIT ?",
+          (match, site_key(site_hostname, site_path), max(1, limit)),
+      ).fetchall()
+    return [
+        {
+            "name": name,
+            "url": url,
+            "summary": snippet or None,
+            "last_modified": last_modified,
+            "resource_type": extension or None,
+        }
+        for name, url, last_modified, extension, snippet in rows
+    ]
+
+  def stats(self) -> Dict[str, Any]:
+    with self._lock:
+      sites = self._db.execute(
+          "SELECT site_key, delta_link IS NOT NULL, synced_at FROM sites"
+      ).fetchall()
+      counts = dict(self._db.execute("SELECT site_key, COUNT(*) FROM items GROUP BY site_key").fetchall())
+    return {
+        key: {"synced": bool(synced), "synced_at": synced_at, "items": counts.get(key, 0)}
+        for key, synced, synced_at in sites
+    }
+
+
+class MirrorSyncer:
+  """Background thread that re-syncs the configured sites on an interval."""
+
+  def __init__(
+      self,
+      mirror: ContentMirror,
+      sites: List[Tuple[str, str]],
+      token_provider: Callable[[], str],
+      interval_seconds: float = DEFAULT_SYNC_INTERVAL_SECONDS,
+  ) -> None:
+    self.mirror = mirror
+    self.sites = sites
+    self._token_provider = token_provider
+    self.interval_seconds = interval_seconds
+    self._stop = threading.Event()
+    self._thread: Optional[threading.Thread] = None
+
+  def sync_once(self) -> List[SyncReport]:
+    reports: List[SyncReport] = []
+    for hostname, path in self.sites:
+      try:
+        reports.append(self.mirror.sync(hostname, self._token_provider(), site_path=path))
+      except Exception as error:
+        LOGGER.warning("Mirror sync of %s failed; it will resume next time: %s", site_key(hostname, path), error)
+    return reports
+
+  def _run(self) -> None:
+    while not self._stop.is_set():
+      self.sync_once()
+      self._stop.wait(self.interval_seconds)
+
+  def start(self) -> None:
+    if self._thread is None:
+      self._thread = threading.Thread(target=self._run, name="sharepoint-mirror-sync", daemon=True)
+      self._thread.start()
+
+  def stop(self) -> None:
+    self._stop.set()
+    if self._thread is not None:
+      self._thread.join()
+      self._thread = None
@@ -0,0 +1,329 @@
+"""Read the documents behind SharePoint search hits and return their best passages.
+
+Graph search only returns a short ``summary`` per hit, which is rarely enough
+to answer a question. :class:`DocumentReader` is the follow-up stage:
+
+* One ``$batch`` call fetches the metadata (and current ``eTag``) of the top
+  driveItems with the user's own token, so permissions are checked on every
+  call even when content comes from the cache.
+* Items whose ``eTag`` changed, or that were never seen, are downloaded
+  concurrently, their text is extracted (docx, pdf when ``pypdf`` is
+  installed, and plain-text formats) and split into overlapping chunks.
+* Chunks are cached by drive, item id and ``eTag``, so unchanged files are
+  never downloaded twice.
+* Chunks are ranked against the question locally with BM25 and only the best
+  passages are returned.
+"""
+
+from __future__ import annotations
+
+import io
+import logging
+import math
+import os
+import pathlib
+import re
+import threading
+import zipfile
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from xml.etree import ElementTree
+
+from .content_mirror import extract_plain_text
+from .graph_http import GraphHttpClient
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_FETCH_CONCURRENCY = int(os.getenv("GRAPH_PASSAGE_CONCURRENCY", "4"))
+DEFAULT_MAX_DOCUMENT_BYTES = int(os.getenv("GRAPH_PASSAGE_MAX_BYTES", str(20 * 1024 * 1024)))
+DEFAULT_CHUNK_CHARS = int(os.getenv("GRAPH_PASSAGE_CHUNK_CHARS", "1200"))
+DEFAULT_CHUNK_OVERLAP = int(os.getenv("GRAPH_PASSAGE_CHUNK_OVERLAP", "200"))
+DEFAULT_CACHE_ENTRIES = int(os.getenv("GRAPH_PASSAGE_CACHE_ENTRIES", "256"))
+# BM25 parameters for the local rerank.
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_METADATA_SELECT = "id,name,webUrl,eTag,size,file"
+_WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+def _docx_text(data: bytes) -> Optional[str]:
+  try:
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+      root = ElementTree.fromstring(archive.read("word/document.xml"))
+  except (zipfile.BadZipFile, KeyError, ElementTree.ParseError) as error:
+    LOGGER.info("Could not read a .docx document: %s", error)
+    return None
+  paragraphs = []
+  for paragraph in root.iter(f"{_WORD_NAMESPACE}p"):
+    text = "".join(node.text or "" for node in paragraph.iter(f"{_WORD_NAMESPACE}t"))
+    if text.strip():
+      paragraphs.append(text)
+  return "\n\n".join(paragraphs)
+
+
+def _pdf_text(data: bytes) -> Optional[str]:
+  try:
+    from pypdf import PdfReader
+  except ImportError:
+    LOGGER.info("Install pypdf to read passages from PDF documents.")
+    return None
+  try:
+    reader = PdfReader(io.BytesIO(data))
+    return "\n\n".join(page.extract_text() or "" for page in reader.pages)
+  except Exception as error:  # pypdf raises many different errors for broken files.
+    LOGGER.info("Could not read a PDF document: %s", error)
+    return None
+
+
+def extract_document_text(name: str, data: bytes) -> Optional[str]:
+  """Return the text of a docx, pdf or text-like file, or ``None``."""
+
+  suffix = pathlib.PurePosixPath(name).suffix.lower()
+  if suffix == ".docx":
+    return _docx_text(data)
+  if suffix == ".pdf":
+    return _pdf_text(data)
+  return extract_plain_text(name, data)
+
+
+def _windows(text: str, max_chars: int, overlap: int) -> List[str]:
+  """Split an over-long paragraph into overlapping windows on word breaks."""
+
+  windows = []
+  start = 0
+  while start < len(text):
+    end = min(len(text), start + max_chars)
+    if end < len(text):
+      space = text.rfind(" ", start + max_chars // 2, end)
+      end = space if space > 0 else end
+    windows.append(text[start:end].strip())
+    if end >= len(text):
+      break
+    start = max(end - overlap, start + 1)
+  return windows
+
+
+def chunk_text(text: str, *, max_chars: int = DEFAULT_CHUNK_CHARS, overlap: int = DEFAULT_CHUNK_OVERLAP) -> List[str]:
+  """Pack paragraphs into chunks of at most ``max_chars`` characters.
+
+  Paragraph boundaries are kept where possible; a paragraph longer than a
+  chunk is split into windows that overlap by ``overlap`` characters.
+  """
+
+  overlap = max(0, min(overlap, max_chars // 2))
+  chunks: List[str] = []
+  current = ""
+  for paragraph in _PARAGRAPH_BREAK.split(text):
+    paragraph = " ".join(paragraph.split())
+    if not paragraph:
+      continue
+    if len(paragraph) > max_chars:
+      if current:
+        chunks.append(current)
+        current = ""
+      chunks.extend(_windows(paragraph, max_chars, overlap))
+    elif len(current) + len(paragraph) + 1 > max_chars:
+      chunks.append(current)
+      current = paragraph
+    else:
+      current = f"{current}\n{paragraph}" if current else paragraph
+  if current:
+    chunks.append(current)
+  return chunks
+
+
+def _tokens(text: str) -> List[str]:
+  return [token.casefold() for token in _TOKEN.findall(text)]
+
+
+def rank_chunks(question: str, chunks: Sequence[str], limit: int) -> List[Tuple[int, float]]:
+  """Score chunks against the question with BM25; return ``(index, score)`` pairs.
+
+  Chunks that share no term with the question are left out.
+  """
+
+  terms = set(_tokens(question))
+  if not terms or not chunks:
+    return []
+  counts = [Counter(_tokens(chunk)) for chunk in chunks]
+  lengths = [sum(count.values()) for count in counts]
+  average_length = (sum(lengths) / len(lengths)) or 1.0
+  frequency = {term: sum(1 for count in counts if term in count) for term in terms}
+
+  scored = []
+  for index, (count, length) in enumerate(zip(counts, lengths)):
+    score = 0.0
+    for term in terms:
+      hits = count.get(term, 0)
+      if not hits:
+        continue
+      idf = math.log(1 + (len(chunks) - frequency[term] + 0.5) / (frequency[term] + 0.5))
+      norm = hits + BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+      score += idf * hits * (BM25_K1 + 1) / norm
+    if score > 0:
+      scored.append((index, score))
+  scored.sort(key=lambda pair: pair[1], reverse=True)
+  return scored[: max(1, limit)]
+
+
+@dataclass(frozen=True)
+class DocumentRef:
+  """A driveItem found by search."""
+
+  drive_id: str
+  item_id: str
+  name: Optional[str] = None
+  url: Optional[str] = None
+
+  @classmethod
+  def from_hit(cls, hit: Dict[str, Any]) -> Optional["DocumentRef"]:
+    """Build a reference from a Graph search hit, or ``None`` for non-files."""
+
+    resource = hit.get("resource") or {}
+    drive_id = (resource.get("parentReference") or {}).get("driveId")
+    if not drive_id or not resource.get("id") or "folder" in resource:
+      return None
+    return cls(drive_id, resource["id"], resource.get("name"), resource.get("webUrl"))
+
+  @property
+  def path(self) -> str:
+    return f"/drives/{self.drive_id}/items/{self.item_id}"
+
+
+class ChunkCache:
+  """LRU cache of document chunks keyed by drive, item id and eTag."""
+
+  def __init__(self, max_entries: int = DEFAULT_CACHE_ENTRIES) -> None:
+    self.max_entries = max(1, max_entries)
+    self._entries: "OrderedDict[Tuple[str, str], Tuple[str, List[str]]]" = OrderedDict()
+    self._lock = threading.Lock()
+
+  def get(self, ref: DocumentRef, etag: Optional[str]) -> Optional[List[str]]:
+    if not etag:
+      return None
+    with self._lock:
+      entry = self._entries.get((ref.drive_id, ref.item_id))
+      if entry is None or entry[0] != etag:
+        return None
+      self._entries.move_to_end((ref.drive_id, ref.item_id))
+      return entry[1]
+
+  def put(self, ref: DocumentRef, etag: Optional[str], chunks: List[str]) -> None:
+    if not etag:
+      return
+    with self._lock:
+      self._entries[(ref.drive_id, ref.item_id)] = (etag, chunks)
+      self._entries.move_to_end((ref.drive_id, ref.item_id))
+      while len(self._entries) > self.max_entries:
+        self._entries.popitem(last=False)
+
+  def __len__(self) -> int:
+    with self._lock:
+      return len(self._entries)
+
+
+class DocumentReader:
+  """Downloads, chunks, caches and reranks the documents behind search hits."""
+
+  def __init__(
+      self,
+      http: GraphHttpClient,
+      cache: Optional[ChunkCache] = None,
+      *,
+      max_concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+      max_bytes: int = DEFAULT_MAX_DOCUMENT_BYTES,
+      chunk_chars: int = DEFAULT_CHUNK_CHARS,
+      chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
+      text_extractor: Callable[[str, bytes], Optional[str]] = extract_document_text,
+  ) -> None:
+    self._http = http
+    self.cache = cache or ChunkCache()
+    self.max_concurrency = max(1, max_concurrency)
+    self.max_bytes = max_bytes
+    self.chunk_chars = chunk_chars
+    self.chunk_overlap = chunk_overlap
+    self._extract = text_extractor
+
+  def _metadata(self, refs: Sequence[DocumentRef], token: str) -> List[Dict[str, Any]]:
+    return self._http.batch(
+        [{"method": "GET", "url": f"{ref.path}?$select={_METADATA_SELECT}"} for ref in refs],
+        token=token,
+    )
+
+  def _download(self, ref: DocumentRef, name: str, token: str) -> List[str]:
+    response = self._http.request("GET", f"{ref.path}/content", token=token)
+    text = self._extract(name, response.content[: self.max_bytes])
+    if not text:
+      return []
+    return chunk_text(text, max_chars=self.chunk_chars, overlap=self.chunk_overlap)
+
+  def read(
+      self, refs: Sequence[DocumentRef], question: str, *, token: str, limit: int = 5
+  ) -> Dict[str, Any]:
+    """Return the ``limit`` passages that best answer ``question``.
+
+    Each document is reported with a ``status``: ``cached``, ``downloaded``,
+    ``skipped`` (no readable text or too large) or ``error``.
+    """
+
+    refs = list(dict.fromkeys(refs))
+    documents: List[Dict[str, Any]] = []
+    chunks_by_doc: Dict[int, List[str]] = {}
+    downloads: Dict[int, Tuple[DocumentRef, str, Optional[str]]] = {}
+
+    for index, (ref, response) in enumerate(zip(refs, self._metadata(refs, token) if refs else [])):
+      body = response.get("body") or {}
+      document: Dict[str, Any] = {"name": body.get("name") or ref.name, "url": body.get("webUrl") or ref.url}
+      documents.append(document)
+      status = response.get("status", 500)
+      if status >= 400:
+        document["status"] = "error"
+        document["error"] = f"HTTP {status}: {(body.get('error') or {}).get('code', 'unknown')}"
+        continue
+      name, etag = body.get("name") or ref.name or "", body.get("eTag")
+      cached = self.cache.get(ref, etag)
+      if cached is not None:
+        document["status"] = "cached"
+        chunks_by_doc[index] = cached
+      elif "file" not in body or (body.get("size") or 0) > self.max_bytes:
+        document["status"] = "skipped"
+      else:
+        downloads[index] = (ref, name, etag)
+
+    if downloads:
+      workers = min(self.max_concurrency, len(downloads))
+      with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="graph-content") as pool:
+        futures = {
+            index: pool.submit(self._download, ref, name, token)
+            for index, (ref, name, _) in downloads.items()
+        }
+        for index, future in futures.items():
+          ref, name, etag = downloads[index]
+          try:
+            chunks = future.result()
+          except Exception as error:
+            LOGGER.warning("Could not download %s: %s", name, error)
+            documents[index]["status"] = "error"
+            documents[index]["error"] = str(error)[:200]
+            continue
+          self.cache.put(ref, etag, chunks)
+          documents[index]["status"] = "downloaded" if chunks else "skipped"
+          chunks_by_doc[index] = chunks
+
+    flat = [(index, chunk) for index, chunks in chunks_by_doc.items() for chunk in chunks]
+    ranked = rank_chunks(question, [chunk for _, chunk in flat], limit)
+    passages = []
+    for position, score in ranked:
+      index, chunk = flat[position]
+      passages.append({
+          "name": documents[index]["name"],
+          "url": documents[index]["url"],
+          "text": chunk,
+          "score": round(score, 4),
+      })
+    return {"question": question, "documents": documents, "count": len(passages), "passages": passages}
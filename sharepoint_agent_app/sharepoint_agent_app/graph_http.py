@@ -0,0 +1,335 @@
+"""Shared, pooled HTTP client for Microsoft Graph.
+
+Every Graph call made by the agent goes through one :class:`GraphHttpClient`
+per process, so TLS connections to graph.microsoft.com are kept alive and
+reused across tool calls instead of being renegotiated each time.
+
+* HTTP/2 is used when ``httpx`` and ``h2`` are installed (set
+  ``GRAPH_HTTP2=off`` to disable it); otherwise a ``requests.Session`` with a
+  sized connection pool keeps HTTP/1.1 connections alive.
+* Throttling (429) and transient (502/503/504) responses are retried with
+  exponential backoff and full jitter. When Graph sends ``Retry-After``, that
+  delay is used instead. Delays longer than ``GRAPH_HTTP_MAX_RETRY_AFTER`` are
+  not slept through; the error is raised so the agent can tell the user.
+* :meth:`GraphHttpClient.batch` packs many calls into JSON ``$batch``
+  requests of up to 20, sends the batches concurrently and retries throttled
+  sub-requests.
+* Each attempt's latency is recorded; :meth:`GraphHttpClient.stats` reports
+  counts and percentiles for the recent window.
+"""
+
+from __future__ import annotations
+
+import email.utils
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, List, Mapping, Optional, Sequence, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+GRAPH_BASE_URL = os.getenv("GRAPH_BASE_URL", "https://graph.microsoft.com/v1.0")
+DEFAULT_TIMEOUT = float(os.getenv("GRAPH_HTTP_TIMEOUT", "30"))
+DEFAULT_POOL_SIZE = int(os.getenv("GRAPH_HTTP_POOL_SIZE", "10"))
+DEFAULT_MAX_RETRIES = int(os.getenv("GRAPH_HTTP_MAX_RETRIES", "4"))
+DEFAULT_BACKOFF_SECONDS = float(os.getenv("GRAPH_HTTP_BACKOFF_SECONDS", "0.5"))
+DEFAULT_MAX_BACKOFF_SECONDS = float(os.getenv("GRAPH_HTTP_MAX_BACKOFF_SECONDS", "8"))
+DEFAULT_MAX_RETRY_AFTER_SECONDS = float(os.getenv("GRAPH_HTTP_MAX_RETRY_AFTER", "60"))
+
+RETRYABLE_STATUSES = frozenset({429, 502, 503, 504})
+# Graph rejects $batch payloads with more than 20 requests.
+MAX_BATCH_SIZE = 20
+DEFAULT_BATCH_CONCURRENCY = int(os.getenv("GRAPH_BATCH_CONCURRENCY", "4"))
+_LATENCY_WINDOW = 512
+
+
+class GraphHttpError(RuntimeError):
+  """A Microsoft Graph request failed after any retries."""
+
+  def __init__(self, status_code: int, message: str, retry_after: Optional[float] = None) -> None:
+    super().__init__(f"Microsoft Graph returned HTTP {status_code}: {message}")
+    self.status_code = status_code
+    self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str], *, now: Optional[datetime] = None) -> Optional[float]:
+  """Return the delay a ``Retry-After`` header asks for, in seconds."""
+
+  if not value:
+    return None
+  value = value.strip()
+  try:
+    return max(0.0, float(value))
+  except ValueError:
+    pass
+  try:
+    moment = email.utils.parsedate_to_datetime(value)
+  except (TypeError, ValueError):
+    return None
+  if moment.tzinfo is None:
+    moment = moment.replace(tzinfo=timezone.utc)
+  return max(0.0, (moment - (now or datetime.now(timezone.utc))).total_seconds())
+
+
+def _error_message(response: Any) -> str:
+  try:
+    error = response.json().get("error", {})
+  except Exception:
+    return (getattr(response, "text", "") or "")[:200]
+  if isinstance(error, dict):
+    return f"{error.get('code', 'unknown')}: {error.get('message', '')}".strip()
+  return str(error)[:200]
+
+
+def _http2_enabled() -> bool:
+  if os.getenv("GRAPH_HTTP2", "auto").strip().lower() in {"0", "false", "off", "no"}:
+    return False
+  try:
+    import h2  # noqa: F401
+    import httpx  # noqa: F401
+  except ImportError:
+    return False
+  return True
+
+
+def _build_session(pool_size: int, timeout: float, http2: bool) -> Tuple[Any, Tuple[type, ...]]:
+  """Return a pooled session and the transport errors worth retrying."""
+
+  if http2:
+    import httpx
+
+    limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+    # requests follows redirects by default and httpx does not. Graph answers
+    # drive item /content with a 302 to a pre-authenticated download URL.
+    client = httpx.Client(http2=True, limits=limits, timeout=timeout, follow_redirects=True)
+    return client, (httpx.TransportError,)
+
+  import requests
+  from requests.adapters import HTTPAdapter
+
+  session = requests.Session()
+  adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+  session.mount("https://", adapter)
+  session.mount("http://", adapter)
+  return session, (requests.ConnectionError, requests.Timeout)
+
+
+class GraphHttpClient:
+  """Keep-alive Microsoft Graph client with throttling-aware retries."""
+
+  def __init__(
+      self,
+      *,
+      base_url: str = GRAPH_BASE_URL,
+      pool_size: int = DEFAULT_POOL_SIZE,
+      timeout: float = DEFAULT_TIMEOUT,
+      max_retries: int = DEFAULT_MAX_RETRIES,
+      backoff_seconds: float = DEFAULT_BACKOFF_SECONDS,
+      max_backoff_seconds: float = DEFAULT_MAX_BACKOFF_SECONDS,
+      max_retry_after_seconds: float = DEFAULT_MAX_RETRY_AFTER_SECONDS,
+      http2: Optional[bool] = None,
+      session: Any = None,
+      sleep: Callable[[float], None] = time.sleep,
+  ) -> None:
+    self.base_url = base_url.rstrip("/")
+    self.timeout = timeout
+    self.max_retries = max(0, max_retries)
+    self.backoff_seconds = backoff_seconds
+    self.max_backoff_seconds = max_backoff_seconds
+    self.max_retry_after_seconds = max_retry_after_seconds
+    self._sleep = sleep
+    if session is None:
+      self.http2 = _http2_enabled() if http2 is None else http2
+      self._session, self._transport_errors = _build_session(max(1, pool_size), timeout, self.http2)
+    else:
+      self.http2 = bool(http2)
+      self._session, self._transport_errors = session, (ConnectionError, TimeoutError)
+    self._lock = threading.Lock()
+    self._latencies: Deque[float] = deque(maxlen=_LATENCY_WINDOW)
+    self._counters = {"requests": 0, "attempts": 0, "retries": 0, "throttled": 0, "failures": 0}
+
+  def url_for(self, path_or_url: str) -> str:
+    if path_or_url.startswith(("https://", "http://")):
+      return path_or_url
+    return f"{self.base_url}/{path_or_url.lstrip('/')}"
+
+  def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+    if retry_after is not None:
+      return retry_after
+    ceiling = min(self.max_backoff_seconds, self.backoff_seconds * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+  def _record(self, elapsed: float, **counters: int) -> None:
+    with self._lock:
+      if elapsed >= 0:
+        self._latencies.append(elapsed)
+      for name, delta in counters.items():
+        self._counters[name] += delta
+
+  def request(
+      self,
+      method: str,
+      path_or_url: str,
+      *,
+      token: Optional[str] = None,
+      json: Any = None,
+      params: Optional[Mapping[str, Any]] = None,
+      headers: Optional[Mapping[str, str]] = None,
+  ) -> Any:
+    """Send a request, retrying throttled and transient failures.
+
+    Returns the successful response object. Raises :class:`GraphHttpError`
+    for error responses, and re-raises the last transport error when the
+    connection keeps failing.
+    """
+
+    url = self.url_for(path_or_url)
+    request_headers: Dict[str, str] = {"Accept": "application/json"}
+    if token:
+      request_headers["Authorization"] = f"Bearer {token}"
+    request_headers.update(headers or {})
+    self._record(-1, requests=1)
+
+    attempt = 0
+    while True:
+      started = time.perf_counter()
+      try:
+        response = self._session.request(
+            method, url, headers=request_headers, json=json, params=params, timeout=self.timeout
+        )
+      except self._transport_errors as error:
+        self._record(time.perf_counter() - started, attempts=1)
+        if attempt >= self.max_retries:
+          self._record(-1, failures=1)
+          raise
+        delay = self._backoff(attempt, None)
+        LOGGER.info("Graph %s %s failed (%s); retrying in %.2fs.", method, url, error, delay)
+      else:
+        elapsed = time.perf_counter() - started
+        status = response.status_code
+        self._record(elapsed, attempts=1, throttled=int(status == 429))
+        LOGGER.debug("Graph %s %s -> %s in %.1f ms", method, url, status, elapsed * 1000)
+        if status < 400:
+          return response
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        if (
+            status not in RETRYABLE_STATUSES
+            or attempt >= self.max_retries
+            or (retry_after or 0) > self.max_retry_after_seconds
+        ):
+          self._record(-1, failures=1)
+          raise GraphHttpError(status, _error_message(response), retry_after)
+        delay = self._backoff(attempt, retry_after)
+        LOGGER.info("Graph %s %s returned %s; retrying in %.2fs.", method, url, status, delay)
+
+      self._record(-1, retries=1)
+      self._sleep(delay)
+      attempt += 1
+
+  def get_json(self, path_or_url: str, *, token: Optional[str] = None, **kwargs: Any) -> Dict[str, Any]:
+    return self.request("GET", path_or_url, token=token, **kwargs).json()
+
+  def post_json(self, path_or_url: str, body: Any, *, token: Optional[str] = None, **kwargs: Any) -> Dict[str, Any]:
+    return self.request("POST", path_or_url, token=token, json=body, **kwargs).json()
+
+  def _send_batch(self, requests: Sequence[Dict[str, Any]], token: Optional[str]) -> Dict[str, Dict[str, Any]]:
+    """Send one ``$batch`` and retry throttled sub-requests; responses by id."""
+
+    responses: Dict[str, Dict[str, Any]] = {}
+    pending = list(requests)
+    attempt = 0
+    while pending:
+      payload = self.post_json("$batch", {"requests": pending}, token=token)
+      retry: List[Dict[str, Any]] = []
+      delays: List[float] = []
+      by_id = {request["id"]: request for request in pending}
+      throttled = 0
+      for response in payload.get("responses", []):
+        responses[response["id"]] = response
+        throttled += response.get("status") == 429
+        if response.get("status") in RETRYABLE_STATUSES and attempt < self.max_retries:
+          retry.append(by_id[response["id"]])
+          headers = {key.lower(): value for key, value in (response.get("headers") or {}).items()}
+          delays.append(self._backoff(attempt, parse_retry_after(headers.get("retry-after"))))
+      self._record(-1, throttled=throttled)
+      if not retry or max(delays) > self.max_retry_after_seconds:
+        break
+      self._record(-1, retries=len(retry))
+      self._sleep(max(delays))
+      pending, attempt = retry, attempt + 1
+    return responses
+
+  def batch(
+      self,
+      requests: Sequence[Dict[str, Any]],
+      *,
+      token: Optional[str] = None,
+      max_concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+  ) -> List[Dict[str, Any]]:
+    """Run Graph calls through JSON batching and return responses in order.
+
+    Each request is a ``$batch`` sub-request without an ``id``, e.g.
+    ``{"method": "POST", "url": "/search/query", "body": {...}}``. Requests
+    are packed into batches of :data:`MAX_BATCH_SIZE` that are sent
+    concurrently. Every response has ``status``, ``headers`` and ``body``;
+    sub-requests that still fail are returned with their error status rather
+    than raised.
+    """
+
+    numbered: List[Dict[str, Any]] = []
+    for index, request in enumerate(requests):
+      item = {**request, "id": str(index)}
+      if "body" in item:
+        item["headers"] = {"Content-Type": "application/json", **(item.get("headers") or {})}
+      numbered.append(item)
+    chunks = [numbered[start:start + MAX_BATCH_SIZE] for start in range(0, len(numbered), MAX_BATCH_SIZE)]
+    if not chunks:
+      return []
+    workers = max(1, min(max_concurrency, len(chunks)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="graph-batch") as pool:
+      merged: Dict[str, Dict[str, Any]] = {}
+      for responses in pool.map(lambda chunk: self._send_batch(chunk, token), chunks):
+        merged.update(responses)
+    missing = {"status": 500, "headers": {}, "body": {"error": {"code": "missingResponse"}}}
+    return [merged.get(item["id"], {**missing, "id": item["id"]}) for item in numbered]
+
+  def stats(self) -> Dict[str, Any]:
+    """Return request counters and latency percentiles for recent attempts."""
+
+    with self._lock:
+      samples = sorted(self._latencies)
+      counters = dict(self._counters)
+
+    def percentile(share: float) -> Optional[float]:
+      if not samples:
+        return None
+      return round(samples[min(len(samples) - 1, int(share * len(samples)))] * 1000, 2)
+
+    return {
+        **counters,
+        "http2": self.http2,
+        "latency_ms": {"p50": percentile(0.5), "p95": percentile(0.95), "max": percentile(1.0)},
+    }
+
+  def close(self) -> None:
+    self._session.close()
+
+
+_CLIENT: Optional[GraphHttpClient] = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def get_graph_client() -> GraphHttpClient:
+  """Return the process-wide Graph HTTP client, creating it on first use."""
+
+  global _CLIENT
+  if _CLIENT is None:
+    with _CLIENT_LOCK:
+      if _CLIENT is None:
+        _CLIENT = GraphHttpClient()
+  return _CLIENT
@@ -0,0 +1,204 @@
+"""Short-lived cache of SharePoint search results.
+
+The same searches recur within a conversation and across members of a team.
+:class:`SearchResultCache` answers them from memory:
+
+* Entries are keyed by the user, the normalized site and query and every
+  option that shapes the result. Two users never share an entry, so Graph's
+  permission trimming still applies to each of them.
+* An entry is fresh for ``ttl_seconds``. For ``stale_seconds`` after that it
+  is still returned at once, while a single background task refreshes it
+  (stale-while-revalidate). Set ``stale_seconds`` to 0 to turn this off.
+* Memory is bounded by an entry count and an approximate byte budget;
+  least-recently-used entries are evicted first.
+* Concurrent misses for the same key share one fetch.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = float(os.getenv("GRAPH_SEARCH_CACHE_TTL_SECONDS", "60"))
+DEFAULT_STALE_SECONDS = float(os.getenv("GRAPH_SEARCH_CACHE_STALE_SECONDS", "240"))
+DEFAULT_MAX_ENTRIES = int(os.getenv("GRAPH_SEARCH_CACHE_MAX_ENTRIES", "512"))
+DEFAULT_MAX_BYTES = int(os.getenv("GRAPH_SEARCH_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query_text: str) -> str:
+  return _WHITESPACE.sub(" ", query_text).strip().casefold()
+
+
+def normalize_site(site_hostname: str, site_path: str = "") -> str:
+  path = site_path.strip().strip("/").casefold()
+  host = site_hostname.strip().casefold()
+  return f"{host}/{path}" if path else host
+
+
+@dataclass
+class _Entry:
+  value: Dict[str, Any]
+  stored_at: float
+  size: int
+
+
+class SearchResultCache:
+  """Bounded TTL cache with optional stale-while-revalidate for search results."""
+
+  def __init__(
+      self,
+      *,
+      ttl_seconds: float = DEFAULT_TTL_SECONDS,
+      stale_seconds: float = DEFAULT_STALE_SECONDS,
+      max_entries: int = DEFAULT_MAX_ENTRIES,
+      max_bytes: int = DEFAULT_MAX_BYTES,
+      clock: Callable[[], float] = time.monotonic,
+  ) -> None:
+    self.ttl_seconds = ttl_seconds
+    self.stale_seconds = stale_seconds
+    self.max_entries = max(1, max_entries)
+    self.max_bytes = max_bytes
+    self._clock = clock
+    self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+    self._bytes = 0
+    self._lock = threading.Lock()
+    self._inflight: Dict[str, "asyncio.Future[Dict[str, Any]]"] = {}
+    self._refreshing: Set[str] = set()
+    self._tasks: Set["asyncio.Task[None]"] = set()
+    self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0, "refreshes": 0, "evictions": 0}
+
+  @property
+  def enabled(self) -> bool:
+    return self.ttl_seconds > 0
+
+  @staticmethod
+  def make_key(user_key: str, site_hostname: str, query_text: str, site_path: str = "", **options: Any) -> str:
+    """Key on the user, the normalized site and query, and result options."""
+
+    payload = {
+        "user": user_key,
+        "site": normalize_site(site_hostname, site_path),
+        "query": normalize_query(query_text),
+        "options": options,
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+  def lookup(self, key: str) -> Tuple[Optional[Dict[str, Any]], str]:
+    """Return ``(value, state)`` where state is ``fresh``, ``stale`` or ``miss``."""
+
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None:
+        return None, "miss"
+      age = self._clock() - entry.stored_at
+      if age < self.ttl_seconds:
+        self._entries.move_to_end(key)
+        return entry.value, "fresh"
+      if age < self.ttl_seconds + self.stale_seconds:
+        self._entries.move_to_end(key)
+        return entry.value, "stale"
+      self._drop(key)
+      return None, "miss"
+
+  def _drop(self, key: str) -> None:
+    entry = self._entries.pop(key, None)
+    if entry is not None:
+      self._bytes -= entry.size
+
+  def store(self, key: str, value: Dict[str, Any]) -> None:
+    size = len(json.dumps(value, default=str))
+    if size > self.max_bytes:
+      return
+    with self._lock:
+      self._drop(key)
+      self._entries[key] = _Entry(value, self._clock(), size)
+      self._bytes += size
+      while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+        oldest = next(iter(self._entries))
+        self._drop(oldest)
+        self._stats["evictions"] += 1
+
+  def _count(self, name: str) -> None:
+    with self._lock:
+      self._stats[name] += 1
+
+  def _refresh_in_background(self, key: str, fetch: Callable[[], Awaitable[Dict[str, Any]]]) -> None:
+    with self._lock:
+      if key in self._refreshing:
+        return
+      self._refreshing.add(key)
+
+    async def refresh() -> None:
+      try:
+        self.store(key, await fetch())
+        self._count("refreshes")
+      except Exception as error:
+        LOGGER.warning("Background refresh of a cached SharePoint search failed: %s", error)
+      finally:
+        with self._lock:
+          self._refreshing.discard(key)
+
+    task = asyncio.get_running_loop().create_task(refresh())
+    self._tasks.add(task)
+    task.add_done_callback(self._tasks.discard)
+
+  async def get_or_fetch(
+      self, key: str, fetch: Callable[[], Awaitable[Dict[str, Any]]]
+  ) -> Tuple[Dict[str, Any], str]:
+    """Return a cached value, or ``await fetch()`` and cache it.
+
+    The second element says how the value was served: ``fresh``, ``stale``,
+    ``coalesced`` (shared an in-flight fetch) or ``miss``.
+    """
+
+    if not self.enabled:
+      return await fetch(), "miss"
+    value, state = self.lookup(key)
+    if state == "fresh":
+      self._count("hits")
+      return value, state
+    if state == "stale":
+      self._count("stale_hits")
+      self._refresh_in_background(key, fetch)
+      return value, state
+
+    pending = self._inflight.get(key)
+    if pending is not None and pending.get_loop() is asyncio.get_running_loop():
+      self._count("coalesced")
+      return await asyncio.shield(pending), "coalesced"
+    self._count("misses")
+    future: "asyncio.Future[Dict[str, Any]]" = asyncio.get_running_loop().create_future()
+    self._inflight[key] = future
+    try:
+      value = await fetch()
+    except asyncio.CancelledError:
+      future.cancel()
+      raise
+    except Exception as error:
+      future.set_exception(error)
+      # Nobody else may be waiting; mark the exception as retrieved.
+      future.exception()
+      raise
+    finally:
+      self._inflight.pop(key, None)
+    future.set_result(value)
+    self.store(key, value)
+    return value, "miss"
+
+  def stats(self) -> Dict[str, Any]:
+    with self._lock:
+      return {**self._stats, "entries": len(self._entries), "bytes": self._bytes}
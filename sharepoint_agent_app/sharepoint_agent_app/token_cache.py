@@ -0,0 +1,158 @@
+"""In-memory, per-user cache of Microsoft Graph access tokens.
+
+MSAL lookups (``get_accounts`` plus ``acquire_token_silent``) and token-cache
+writes used to run on every search. :class:`GraphTokenCache` keeps each
+user's access token in memory until shortly before it expires:
+
+* A token that is still comfortably valid is returned without touching MSAL
+  or the disk.
+* Inside the refresh-ahead window, the current token is still returned
+  immediately. A background thread asks MSAL for a fresh one, without ever
+  starting an interactive sign-in.
+* Only a user with no usable token waits, and only on their own lock. Other
+  users' calls carry on.
+
+The authenticator persists MSAL's cache on change at a throttled rate, so
+disk writes also stay off the hot path.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_REFRESH_AHEAD_SECONDS = float(os.getenv("GRAPH_TOKEN_REFRESH_AHEAD_SECONDS", "300"))
+# Tokens are treated as expired this long before Graph would reject them.
+EXPIRY_SKEW_SECONDS = 30.0
+# After a failed background refresh, wait this long before trying again.
+REFRESH_RETRY_SECONDS = 30.0
+DEFAULT_USER_KEY = "default"
+
+
+def user_key_for(tool_context: Any) -> str:
+  """Return the user (or, failing that, session) behind an ADK tool context."""
+
+  if tool_context is None:
+    return DEFAULT_USER_KEY
+  user_id = getattr(tool_context, "user_id", None)
+  if user_id:
+    return str(user_id)
+  session = getattr(tool_context, "session", None)
+  session_id = getattr(session, "id", None)
+  return f"session:{session_id}" if session_id else DEFAULT_USER_KEY
+
+
+@dataclass
+class _Entry:
+  token: str
+  expires_at: float
+  refreshing: bool = False
+  next_refresh_at: float = 0.0
+
+
+class GraphTokenCache:
+  """Serve access tokens from memory and refresh them ahead of expiry.
+
+  ``acquire`` is called as ``acquire(user_key, force_refresh=..., interactive=...)``
+  and returns an MSAL token result with ``access_token`` and ``expires_in``.
+  Background refreshes pass ``interactive=False``.
+  """
+
+  def __init__(
+      self,
+      acquire: Callable[..., Dict[str, Any]],
+      *,
+      refresh_ahead_seconds: float = DEFAULT_REFRESH_AHEAD_SECONDS,
+      max_workers: int = 2,
+      clock: Callable[[], float] = time.time,
+  ) -> None:
+    self._acquire = acquire
+    self.refresh_ahead_seconds = refresh_ahead_seconds
+    self._max_workers = max(1, max_workers)
+    self._clock = clock
+    self._entries: Dict[str, _Entry] = {}
+    self._lock = threading.Lock()
+    self._user_locks: Dict[str, threading.Lock] = {}
+    self._executor: Optional[ThreadPoolExecutor] = None
+    self._stats = {"hits": 0, "acquisitions": 0, "refreshes": 0, "refresh_failures": 0}
+
+  def _user_lock(self, user_key: str) -> threading.Lock:
+    with self._lock:
+      return self._user_locks.setdefault(user_key, threading.Lock())
+
+  def _store(self, user_key: str, result: Dict[str, Any]) -> _Entry:
+    entry = _Entry(
+        token=result["access_token"],
+        expires_at=self._clock() + float(result.get("expires_in", 3600)),
+    )
+    with self._lock:
+      self._entries[user_key] = entry
+    return entry
+
+  def _usable(self, entry: Optional[_Entry], now: float) -> bool:
+    return entry is not None and now < entry.expires_at - EXPIRY_SKEW_SECONDS
+
+  def get(self, user_key: str = DEFAULT_USER_KEY) -> str:
+    """Return a valid access token for ``user_key``."""
+
+    now = self._clock()
+    with self._lock:
+      entry = self._entries.get(user_key)
+      if self._usable(entry, now):
+        self._stats["hits"] += 1
+        if (
+            now >= max(entry.expires_at - self.refresh_ahead_seconds, entry.next_refresh_at)
+            and not entry.refreshing
+        ):
+          entry.refreshing = True
+          self._schedule_refresh(user_key)
+        return entry.token
+
+    with self._user_lock(user_key):
+      with self._lock:
+        entry = self._entries.get(user_key)
+      if self._usable(entry, self._clock()):
+        return entry.token
+      result = self._acquire(user_key, force_refresh=False, interactive=True)
+      with self._lock:
+        self._stats["acquisitions"] += 1
+      return self._store(user_key, result).token
+
+  def _schedule_refresh(self, user_key: str) -> None:
+    if self._executor is None:
+      self._executor = ThreadPoolExecutor(
+          max_workers=self._max_workers, thread_name_prefix="graph-token-refresh"
+      )
+    self._executor.submit(self._refresh, user_key)
+
+  def _refresh(self, user_key: str) -> None:
+    try:
+      with self._user_lock(user_key):
+        result = self._acquire(user_key, force_refresh=True, interactive=False)
+        self._store(user_key, result)
+      with self._lock:
+        self._stats["refreshes"] += 1
+    except Exception as error:
+      LOGGER.warning("Background Graph token refresh failed for %s: %s", user_key, error)
+      with self._lock:
+        self._stats["refresh_failures"] += 1
+        entry = self._entries.get(user_key)
+        if entry is not None:
+          entry.refreshing = False
+          entry.next_refresh_at = self._clock() + REFRESH_RETRY_SECONDS
+
+  def stats(self) -> Dict[str, int]:
+    with self._lock:
+      return {**self._stats, "users": len(self._entries)}
+
+  def close(self) -> None:
+    if self._executor is not None:
+      self._executor.shutdown(wait=True)
+      self._executor = None
@@ -0,0 +1,88 @@
+"""Tests for the BigQuery data analyzer agent's chart downsampling."""
+
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("plotly")
+
+AGENTS = (
+    Path(__file__).resolve().parents[2]
+    / "GCP_Agent_Starter_Pack"
+    / "base_agent_config.py"
+    / "agents"
+)
+
+
+def _load(name: str):
+    # The agents package imports ADK base classes on import; load the module
+    # on its own.
+    spec = importlib.util.spec_from_file_location(name, AGENTS / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+chart_rendering = _load("chart_rendering")
+
+
+def test_lttb_keeps_the_ends_and_the_extremes() -> None:
+    """Peaks survive downsampling and indices stay ordered."""
+    x = np.arange(1_000)
+    y = np.sin(x / 50.0)
+    y[437] = 25.0
+    y[811] = -25.0
+
+    kept = chart_rendering.lttb_indices(x, y, 100)
+
+    assert len(kept) == 100
+    assert kept[0] == 0 and kept[-1] == 999
+    assert list(kept) == sorted(set(kept))
+    assert {437, 811} <= set(kept.tolist())
+    assert len(chart_rendering.lttb_indices(x[:50], y[:50], 100)) == 50
+
+
+def test_top_n_ranks_and_sums_the_measure_not_the_identifier() -> None:
+    """A numeric id labels the bars; only the measure is ranked and summed."""
+    rng = np.random.default_rng(7)
+    df = pd.DataFrame(
+        {
+            "customer_id": np.arange(1, 1_001),
+            "total_purchase": rng.uniform(0, 100, 1_000).round(2),
+        }
+    )
+
+    bars = chart_rendering.top_n_with_other(df, max_bars=20)
+
+    expected = df.nlargest(19, "total_purchase")
+    assert list(bars.columns) == ["total_purchase"]
+    assert len(bars) == 20
+    assert list(bars.index[:19]) == expected["customer_id"].astype(str).tolist()
+    assert bars.loc["Other", "total_purchase"] == pytest.approx(
+        df["total_purchase"].sum() - expected["total_purchase"].sum()
+    )
+    assert chart_rendering.top_n_with_other(df.head(5), max_bars=20).shape == (5, 1)
+
+
+def test_binned_density_uses_measures_and_conserves_points() -> None:
+    """Identifier columns are not binned, and every point lands in a bin."""
+    rng = np.random.default_rng(11)
+    df = pd.DataFrame(
+        {
+            "order_id": np.arange(20_000),
+            "revenue": rng.normal(100, 15, 20_000),
+            "quantity": rng.normal(10, 2, 20_000),
+        }
+    )
+
+    density = chart_rendering.binned_density(df, bins=40)
+
+    assert list(density.columns) == ["revenue", "quantity", "count"]
+    assert density["count"].sum() == len(df)
+    assert len(density) <= 40 * 40
+    assert density["revenue"].between(df["revenue"].min(), df["revenue"].max()).all()
+    one_measure = df[["order_id", "revenue"]]
+    assert chart_rendering.binned_density(one_measure) is one_measure
@@ -0,0 +1,115 @@
+"""Tests for the BigQuery data analyzer agent's parameterized query templates."""
+
+import datetime
+import importlib.util
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("yaml")
+pytest.importorskip("google.cloud.bigquery")
+
+AGENTS = (
+    Path(__file__).resolve().parents[2]
+    / "GCP_Agent_Starter_Pack"
+    / "base_agent_config.py"
+    / "agents"
+)
+
+
+def _load(name: str):
+    # The agents package imports ADK base classes on import; load the module
+    # on its own.
+    spec = importlib.util.spec_from_file_location(name, AGENTS / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+query_templates = _load("query_templates")
+
+
+@pytest.fixture
+def registry():
+    return query_templates.QueryTemplateRegistry.from_yaml(dataset="analytics")
+
+
+def test_phrasings_of_one_intent_send_identical_sql_and_values(registry) -> None:
+    """User input is bound as typed parameters, never pasted into the SQL."""
+    bound = [
+        registry.match(text)
+        for text in (
+            "Sales by month since 2024-01-01",
+            "show me sales   by month since 2024/01/01",
+            "sales by month since jan 1, 2024",
+        )
+    ]
+
+    assert {query.sql for query in bound} == {bound[0].sql}
+    assert {query.values for query in bound} == {
+        (("since", datetime.date(2024, 1, 1)),)
+    }
+    assert "2024" not in bound[0].sql
+    assert "`analytics.sales`" in bound[0].sql
+    assert bound[0].viz_type == "line"
+    assert registry.match("sales by month").values == (("since", None),)
+
+
+def test_integer_parameters_use_defaults_and_are_clamped(registry) -> None:
+    assert registry.match("top customers").values == (("limit", 20),)
+    assert registry.match("who are the top 5 customers?").values == (("limit", 5),)
+    assert registry.match("top 50000 customers").values == (("limit", 1000),)
+
+    parameters = registry.match("top 5 customers").query_parameters()
+    assert [(p.name, p.type_, p.value) for p in parameters] == [("limit", "INT64", 5)]
+
+
+def test_unconvertible_values_and_unknown_requests_do_not_match(registry) -> None:
+    """An impossible date is treated as no match rather than crashing."""
+    with pytest.raises(ValueError, match="couldn't understand"):
+        registry.match("sales by month since 2024-13-45")
+    with pytest.raises(ValueError, match="couldn't understand"):
+        registry.match("what is the weather")
+
+
+def test_validate_reports_every_rejected_template(registry) -> None:
+    """Templates are dry-run with their defaults; failures are named."""
+
+    class FakeClient:
+        def __init__(self) -> None:
+            self.configs: list[Any] = []
+
+        def query(self, sql: str, job_config: Any) -> Any:
+            self.configs.append(job_config)
+            if "orders" in sql:
+                raise RuntimeError("Not found: Table analytics.orders")
+            return SimpleNamespace(total_bytes_processed=1024)
+
+    client = FakeClient()
+    with pytest.raises(ValueError) as error:
+        registry.validate(client)
+
+    assert "all_orders" in str(error.value)
+    assert "top_customers" in str(error.value)
+    assert "sales_by_month" not in str(error.value)
+    assert all(config.dry_run for config in client.configs)
+    assert all(config.use_query_cache is False for config in client.configs)
+
+
+def test_unsupported_parameter_types_are_rejected(tmp_path: Path) -> None:
+    path = tmp_path / "templates.yaml"
+    path.write_text(
+        "templates:\n"
+        "  broken:\n"
+        "    pattern: 'anything'\n"
+        "    sql: SELECT @when\n"
+        "    parameters:\n"
+        "      when: {type: GEOGRAPHY}\n",
+        encoding="utf-8",
+    )
+
+    with pytest.raises(ValueError, match="unsupported parameter types"):
+        query_templates.QueryTemplateRegistry.from_yaml(path, dataset="analytics")
@@ -0,0 +1,99 @@
+"""Tests for the concurrent BigQuery dataset copy script."""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("google.cloud.bigquery")
+
+SCRIPT = Path(__file__).resolve().parents[2] / "scripts" / "copy_bigquery_dataset.py"
+
+
+def _load_script():
+    spec = importlib.util.spec_from_file_location("copy_bigquery_dataset", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    # Dataclasses resolve their annotations through sys.modules.
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+copy_bigquery_dataset = _load_script()
+
+
+class FakeJob:
+    """A job that finishes after a few polls, or fails in the given way."""
+
+    def __init__(self, name: str, polls: int = 2, fail: str | None = None) -> None:
+        self.job_id = name
+        self.polls = polls
+        self.fail = fail
+        self.total_bytes_processed = None
+
+    def done(self) -> bool:
+        if self.fail == "poll":
+            raise RuntimeError(f"404 job {self.job_id} not found")
+        self.polls -= 1
+        return self.polls <= 0
+
+    def result(self) -> None:
+        if self.fail == "result":
+            raise RuntimeError(f"job {self.job_id} failed")
+
+
+class FakeClient:
+    """Hands out FakeJobs and records how many were running at once."""
+
+    def __init__(self, failures: dict[str, str]) -> None:
+        self.failures = failures
+        self.jobs: list[FakeJob] = []
+
+    def _job(self, name: str) -> FakeJob:
+        table = name.rsplit(".", 1)[-1].strip("`")
+        if self.failures.get(table) == "submit":
+            raise RuntimeError(f"403 cannot copy {table}")
+        job = FakeJob(table, fail=self.failures.get(table))
+        self.jobs.append(job)
+        return job
+
+    def copy_table(self, source, destination, job_config):
+        return self._job(source)
+
+    def query(self, sql, job_config):
+        return self._job(sql)
+
+
+def test_failures_are_collected_and_the_window_keeps_draining() -> None:
+    """Poll, result and submit errors fail one table each; the rest finish."""
+    failures = {"t1": "poll", "t3": "result", "t4": "submit"}
+    client = FakeClient(failures)
+    tasks = [
+        copy_bigquery_dataset.CopyTask(
+            f"src.ds.t{index}", f"dst.ds.t{index}", is_view=index == 5
+        )
+        for index in range(7)
+    ]
+
+    result = copy_bigquery_dataset.run_tasks(
+        tasks,
+        client,
+        client,
+        overwrite=False,
+        max_in_flight=3,
+        poll_interval=0,
+    )
+
+    assert sorted(result) == ["src.ds.t1", "src.ds.t3", "src.ds.t4"]
+    assert "404" in result["src.ds.t1"]
+    assert "403" in result["src.ds.t4"]
+    assert {job.job_id for job in client.jobs} == {
+        "t0",
+        "t1",
+        "t2",
+        "t3",
+        "t5",
+        "t6",
+    }
+    assert all(job.polls <= 0 for job in client.jobs if job.fail is None)
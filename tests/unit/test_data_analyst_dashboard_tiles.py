@@ -0,0 +1,172 @@
+"""Tests for materialized dashboard tiles."""
+
+from typing import Any
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import pyarrow as pa
+
+from data_analyst_agent_app.dashboard_tiles import (
+    DashboardSpec,
+    TileMaterializer,
+    TileSpec,
+    TileStore,
+    dashboard_spec_from_plan,
+)
+
+_BAR = TileSpec("proj.ds.mailboxes", "item_count", "region", title="By region")
+_KPI = TileSpec("proj.ds.mailboxes", "item_count")
+_VIEW = TileSpec("proj.ds.mailbox_view", "item_count", "region")
+
+
+class FakeReader:
+    def __init__(self) -> None:
+        self.calls: list[str] = []
+        self.failing: set[str] = set()
+
+    def __call__(self, sql: str) -> Any:
+        self.calls.append(sql)
+        if any(table in sql for table in self.failing):
+            raise RuntimeError("quota exceeded")
+        if "GROUP BY" in sql:
+            return pa.table({"dimension": ["EU", "US"], "value": [5, 3]})
+        return pa.table({"value": [8], "row_count": [2]})
+
+
+class FakeVersions:
+    def __init__(self) -> None:
+        self.versions: dict[str, str | None] = {
+            "proj.ds.mailboxes": "100",
+            "proj.ds.mailbox_view": None,
+        }
+
+    def referenced_tables(self, sql: str, default_project: str) -> list[str]:
+        return []
+
+    def table_version(self, table_id: str) -> str | None:
+        return self.versions[table_id]
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _materializer(tmp_path, reader, versions, clock, **kwargs) -> TileMaterializer:
+    kwargs.setdefault("version_ttl_seconds", 0)
+    return TileMaterializer(
+        TileStore(tmp_path), reader, versions, clock=clock, **kwargs
+    )
+
+
+def test_spec_ids_are_stable_and_round_trip_through_the_store(tmp_path) -> None:
+    """The same tiles give the same dashboard id, and specs persist."""
+    spec = DashboardSpec("Mailbox health", (_BAR, _KPI))
+    assert (
+        spec.dashboard_id == DashboardSpec("Other wording", (_BAR, _KPI)).dashboard_id
+    )
+    assert _BAR.tile_id != _KPI.tile_id
+    assert "GROUP BY dimension" in _BAR.sql()
+    assert "COUNT(*) AS row_count" in _KPI.sql()
+
+    store = TileStore(tmp_path)
+    store.save_spec(spec)
+    assert store.load_spec(spec.dashboard_id) == spec
+    assert store.load_spec("missing") is None
+    with pytest.raises(ValueError):
+        TileSpec("ds.mailboxes", "item_count")
+
+
+def test_second_render_is_served_from_materialized_tiles(tmp_path) -> None:
+    """Unchanged sources are not queried again; a new version re-queries."""
+    reader, versions, clock = FakeReader(), FakeVersions(), Clock()
+    spec = DashboardSpec("Mailbox health", (_BAR, _KPI))
+    materializer = _materializer(tmp_path, reader, versions, clock)
+
+    first = materializer.render(spec)
+    assert [result.source for result in first] == ["bigquery", "bigquery"]
+    second = materializer.render(spec)
+    assert [result.source for result in second] == ["cache", "cache"]
+    assert second[0].table.to_pylist() == [
+        {"dimension": "EU", "value": 5},
+        {"dimension": "US", "value": 3},
+    ]
+    assert len(reader.calls) == 2
+
+    versions.versions["proj.ds.mailboxes"] = "200"
+    third = materializer.render(spec)
+    assert [result.source for result in third] == ["bigquery", "bigquery"]
+    assert materializer.stats()["cache_hits"] == 2
+
+
+def test_unversioned_sources_are_served_within_the_ttl(tmp_path) -> None:
+    """Views have no lastModifiedTime, so their tiles expire on a TTL."""
+    reader, versions, clock = FakeReader(), FakeVersions(), Clock()
+    spec = DashboardSpec("View", (_VIEW,))
+    materializer = _materializer(
+        tmp_path, reader, versions, clock, unversioned_ttl_seconds=60
+    )
+
+    materializer.render(spec)
+    clock.now += 30
+    assert materializer.render(spec)[0].source == "cache"
+    clock.now += 31
+    assert materializer.render(spec)[0].source == "bigquery"
+    assert len(reader.calls) == 2
+
+
+def test_a_failing_tile_does_not_block_the_others(tmp_path) -> None:
+    """Errors are reported per tile and the failed tile is retried later."""
+    reader, versions, clock = FakeReader(), FakeVersions(), Clock()
+    reader.failing.add("mailbox_view")
+    spec = DashboardSpec("Mixed", (_BAR, _VIEW))
+    materializer = _materializer(tmp_path, reader, versions, clock)
+
+    results = materializer.render(spec)
+    assert results[0].describe()["rows"] == 2
+    assert results[1].describe()["error"] == "quota exceeded"
+
+    reader.failing.clear()
+    again = materializer.render(spec)
+    assert [result.source for result in again] == ["cache", "bigquery"]
+
+
+def test_a_corrupt_tile_file_is_rematerialized(tmp_path) -> None:
+    """An unreadable Parquet file is treated as missing, not as a failure."""
+    reader, versions, clock = FakeReader(), FakeVersions(), Clock()
+    spec = DashboardSpec("Mailbox health", (_BAR, _KPI))
+    materializer = _materializer(tmp_path, reader, versions, clock)
+    materializer.render(spec)
+
+    (tmp_path / "tiles" / f"{_BAR.tile_id}.parquet").write_bytes(b"not parquet")
+    results = materializer.render(spec)
+
+    assert [result.source for result in results] == ["bigquery", "cache"]
+    assert results[0].error is None
+    assert materializer.render(spec)[0].source == "cache"
+
+
+def test_spec_from_plan_uses_the_recommended_dataset() -> None:
+    """Each planned visualisation becomes a fully qualified tile."""
+    plan = {
+        "objective": "Mailbox health",
+        "recommended_dataset": "ms_graph",
+        "visualisations": [
+            {
+                "table": "mailboxes",
+                "chart_type": "bar",
+                "metric": "item_count",
+                "dimension": "region",
+                "description": "Aggregate item_count by region",
+            }
+        ],
+    }
+    spec = dashboard_spec_from_plan(plan, "proj")
+    assert [tile.table_id for tile in spec.tiles] == ["proj.ms_graph.mailboxes"]
+    assert spec.tiles[0].chart_type == "bar"
+    assert dashboard_spec_from_plan({"objective": "x"}, "proj").tiles == ()
@@ -0,0 +1,113 @@
+"""Tests for the BM25 dataset and table router."""
+
+import time
+
+from data_analyst_agent_app.dataset_router import DatasetRouter, index_terms
+from data_analyst_agent_app.metadata_utils import compile_catalog
+
+
+def _catalog(extra_datasets: int = 0):
+    datasets = {
+        "gt_wf": {
+            "description": "Workforce analytics",
+            "tables": [
+                {
+                    "table": "attrition_events",
+                    "description": "Employee exits with reasons",
+                    "columns": [
+                        {"name": "termination_reason", "type": "STRING"},
+                        {"name": "exitDate", "type": "DATE"},
+                    ],
+                },
+                {
+                    "table": "hiring_pipeline",
+                    "description": "Open requisitions and candidates",
+                    "synonyms": ["recruiting", "funnel"],
+                    "columns": [{"name": "candidate_stage", "type": "STRING"}],
+                },
+            ],
+        },
+        "ms_graph": {
+            "description": "Microsoft 365 usage",
+            "tables": [
+                {
+                    "table": "mailbox_usage",
+                    "columns": [{"name": "items_sent", "type": "INT64"}],
+                }
+            ],
+        },
+        "finance": {
+            "description": "Budgets and spend",
+            "keywords": ["opex", "capex"],
+            "tables": [],
+        },
+    }
+    for index in range(extra_datasets):
+        datasets[f"domain_{index}"] = {
+            "description": f"Synthetic domain {index}",
+            "tables": [
+                {
+                    "table": f"facts_{index}_{table}",
+                    "columns": [
+                        {"name": f"metric_{index}_{column}", "type": "INT64"}
+                        for column in range(10)
+                    ],
+                }
+                for table in range(5)
+            ],
+        }
+    return compile_catalog(datasets, content_hash="test")
+
+
+def test_index_terms_fold_plurals_and_stop_words() -> None:
+    """Stop words are dropped and plurals fold onto their singular."""
+    assert index_terms("How many Vacancies were in the hiringPipelines?") == [
+        "vacancy",
+        "hiring",
+        "pipeline",
+    ]
+
+
+def test_routes_to_tables_from_metadata() -> None:
+    """Tables and datasets are ranked from columns, descriptions and synonyms."""
+    router = DatasetRouter(_catalog())
+
+    result = router.route("Top termination reasons for exits last quarter")
+    assert result.best_dataset == "gt_wf"
+    assert result.tables[0].table == "attrition_events"
+    assert "termination" in result.tables[0].matched_terms
+
+    assert (
+        router.route("recruiting funnel conversion").tables[0].table
+        == "hiring_pipeline"
+    )
+    assert router.route("Compare opex against capex").best_dataset == "finance"
+    assert router.route("emails sent per mailbox").best_dataset == "ms_graph"
+
+
+def test_legacy_keywords_still_route() -> None:
+    """The built-in keyword sets act as dataset synonyms."""
+    router = DatasetRouter(_catalog())
+    assert router.route("Teams and OneDrive adoption").best_dataset == "ms_graph"
+    assert router.route("headcount turnover").best_dataset == "gt_wf"
+
+
+def test_unmatched_question_has_no_route() -> None:
+    """Questions without indexed terms return no ranking."""
+    result = DatasetRouter(_catalog()).route("hello there")
+    assert result.best_dataset is None
+    assert "No metadata terms matched" in result.reason()
+
+
+def test_routing_scales_to_dozens_of_datasets() -> None:
+    """Routing over 50+ datasets stays well under a millisecond per question."""
+    router = DatasetRouter(_catalog(extra_datasets=50))
+    question = "metric_42_3 trend for facts_42_1"
+    assert router.route(question).tables[0].table == "facts_42_1"
+
+    iterations = 500
+    started = time.perf_counter()
+    for _ in range(iterations):
+        router.route(question)
+    per_call = (time.perf_counter() - started) / iterations
+    assert per_call < 0.001
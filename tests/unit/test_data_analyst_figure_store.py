@@ -0,0 +1,88 @@
+"""Tests for the data analyst agent's content-addressed figure pipeline."""
+
+import asyncio
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("matplotlib")
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+
+from data_analyst_agent_app.figure_store import (
+    FigurePublisher,
+    LocalDiskFigureStore,
+    figure_filename,
+    render_open_figures,
+)
+
+
+@pytest.fixture(autouse=True)
+def _close_figures() -> None:
+    yield
+    plt.close("all")
+
+
+def _draw(values: list[int], *, size: tuple[float, float] = (4, 3)) -> None:
+    _figure, axis = plt.subplots(figsize=size)
+    axis.plot(values)
+
+
+def test_identical_figures_share_one_record() -> None:
+    """Duplicate charts hash to the same digest and are rendered once."""
+    _draw([1, 2, 3])
+    _draw([1, 2, 3])
+    _draw([3, 2, 1])
+    records = render_open_figures(plt)
+    assert len(records) == 2
+    assert all(record["data"][:4] == b"\x89PNG" for record in records)
+
+
+def test_dpi_and_byte_caps_are_applied() -> None:
+    """Large figures are rendered below the configured DPI and size caps."""
+    _draw(list(range(1000)), size=(20, 15))
+    (record,) = render_open_figures(plt, max_dpi=50, max_bytes=30_000)
+    assert record["width"] <= 20 * 50
+    assert record["bytes"] <= 30_000 or record["width"] <= 20 * 40
+
+
+def test_known_hashes_skip_png_bytes() -> None:
+    """Figures the session already stored are returned without data."""
+    _draw([5, 6])
+    (first,) = render_open_figures(plt)
+    (again,) = render_open_figures(plt, known={first["sha256"]})
+    assert again["sha256"] == first["sha256"]
+    assert again["data"] is None
+
+
+class CountingStore(LocalDiskFigureStore):
+    def __init__(self, root: Path) -> None:
+        super().__init__(root)
+        self.saved: list[str] = []
+
+    async def save(self, filename: str, data: bytes) -> None:
+        self.saved.append(filename)
+        await super().save(filename, data)
+
+
+def test_publisher_uploads_each_hash_once(tmp_path: Path) -> None:
+    """Only references are returned and repeats are never re-uploaded."""
+    _draw([1, 4, 9])
+    records = render_open_figures(plt)
+    store = CountingStore(tmp_path)
+    publisher = FigurePublisher()
+
+    first = asyncio.run(publisher.publish("session", store, records))
+    second = asyncio.run(publisher.publish("session", store, records))
+
+    name = figure_filename(records[0]["sha256"])
+    assert store.saved == [name]
+    assert (tmp_path / name).read_bytes()[:4] == b"\x89PNG"
+    assert first[0]["artifact"] == name and not first[0]["reused"]
+    assert second[0]["reused"]
+    assert "data" not in first[0]
+    assert publisher.known("other-session") == set()
@@ -0,0 +1,146 @@
+"""Tests for the data analyst agent's session frame registry."""
+
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+pytest.importorskip("pyarrow")
+pytest.importorskip("pandas")
+
+import pyarrow as pa
+
+from data_analyst_agent_app.frame_registry import (
+    BigQueryArrowReader,
+    FrameRegistry,
+    SessionFrameRegistries,
+    session_key,
+)
+from data_analyst_agent_app.sandbox import SandboxExecutor
+
+
+class FakeArrowReader:
+    """Local stand-in for the BigQuery Storage Read API."""
+
+    def __init__(self, tables: dict[str, Any]) -> None:
+        self.tables = tables
+        self.calls: list[str] = []
+
+    def read(self, sql: str) -> Any:
+        self.calls.append(sql)
+        return self.tables[sql]
+
+
+def _table(rows: int) -> Any:
+    return pa.table(
+        {
+            "id": pa.array(range(rows), type=pa.int64()),
+            "score": pa.array([float(i) / 2 for i in range(rows)]),
+        }
+    )
+
+
+def test_put_records_schema_and_writes_arrow_file(tmp_path: Path) -> None:
+    """Stored frames are described by shape, not by their rows."""
+    registry = FrameRegistry(tmp_path / "session")
+    entry = registry.put("scores", _table(5_000), sql="SELECT 1")
+
+    assert entry.num_rows == 5_000
+    assert entry.columns == [
+        {"name": "id", "type": "int64"},
+        {"name": "score", "type": "double"},
+    ]
+    assert Path(registry.paths()["scores"]).exists()
+    assert "records" not in entry.describe()
+
+
+def test_lru_eviction_by_bytes(tmp_path: Path) -> None:
+    """The least recently used frame is evicted once the budget is exceeded."""
+    table = _table(1_000)
+    registry = FrameRegistry(tmp_path / "session", max_bytes=int(table.nbytes * 2.5))
+    first = registry.put("first", table)
+    registry.put("second", table)
+    registry.get("first")
+    registry.put("third", table)
+
+    assert set(registry.paths()) == {"first", "third"}
+    assert first.path.exists()
+    assert registry.total_bytes <= table.nbytes * 2.5
+
+
+def test_rejects_frames_above_budget_and_bad_handles(tmp_path: Path) -> None:
+    """Oversized results and unsafe handles are refused."""
+    registry = FrameRegistry(tmp_path / "session", max_bytes=10)
+    with pytest.raises(ValueError, match="budget"):
+        registry.put("big", _table(100))
+    with pytest.raises(ValueError, match="handles"):
+        FrameRegistry(tmp_path / "other").put("../escape", _table(1))
+
+
+def test_registries_are_scoped_per_session(tmp_path: Path) -> None:
+    """Each session sees only its own frames."""
+    registries = SessionFrameRegistries(spill_root=tmp_path)
+    registries.registry_for("a").put("shared_name", _table(3))
+    assert registries.registry_for("b").paths() == {}
+    registries.clear()
+
+
+def test_session_key_never_falls_back_to_a_shared_key() -> None:
+    """Session-less contexts are keyed on their invocation, or refused."""
+    session = SimpleNamespace(session=SimpleNamespace(id="s1"))
+    invocation = SimpleNamespace(session=None, invocation_id="e-42")
+
+    assert session_key(session) == "s1"
+    assert session_key(invocation) == "invocation-e-42"
+    with pytest.raises(ValueError):
+        session_key(object())
+
+
+def test_reader_passes_the_byte_budget_and_labels_to_the_query() -> None:
+    """BigQuery enforces the budget on the query itself, not only the guard."""
+    pytest.importorskip("google.cloud.bigquery")
+
+    class FakeClient:
+        def __init__(self) -> None:
+            self.configs: list[Any] = []
+
+        def query(self, sql: str, job_config: Any) -> Any:
+            self.configs.append(job_config)
+            table = _table(2)
+            return SimpleNamespace(
+                statement_type="SELECT",
+                result=lambda: SimpleNamespace(to_arrow=lambda **_: table),
+            )
+
+    client = FakeClient()
+    reader = BigQueryArrowReader(
+        lambda: client, maximum_bytes_billed=1024, labels={"agent": "analyst"}
+    )
+
+    assert reader.read("SELECT 1").num_rows == 2
+    dry_run, executed = client.configs
+    assert dry_run.dry_run and dry_run.labels == {"agent": "analyst"}
+    assert executed.maximum_bytes_billed == 1024
+    assert executed.labels == {"agent": "analyst"}
+
+
+def test_sandbox_reads_frames_without_prompt_round_trip(tmp_path: Path) -> None:
+    """A 5,000-row result reaches the sandbox through its handle alone."""
+    reader = FakeArrowReader({"SELECT * FROM scores": _table(5_000)})
+    registry = FrameRegistry(tmp_path / "session")
+    registry.put("scores", reader.read("SELECT * FROM scores"))
+
+    executor = SandboxExecutor(max_workers=1, timeout_seconds=30)
+    try:
+        payload = executor.run(
+            "df = frames['scores']\nprint(len(df), df['id'].sum())",
+            frames=registry.paths(),
+        )
+        missing = executor.run("frames['nope']", frames=registry.paths())
+    finally:
+        executor.shutdown()
+
+    assert payload["stdout"] == "5000 12497500\n"
+    assert "Available frames: scores" in missing["error"]
+    assert reader.calls == ["SELECT * FROM scores"]
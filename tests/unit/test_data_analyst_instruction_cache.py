@@ -0,0 +1,142 @@
+"""Tests for Gemini context caching of the static agent instruction."""
+
+import asyncio
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+pytest.importorskip("google.genai")
+
+from google.genai import types
+
+from data_analyst_agent_app.instruction_cache import StaticInstructionCache
+
+_STATIC = "You are a meticulous analyst. " * 400
+_TOOLS = [{"function_declarations": [{"name": "execute_sql", "description": "Run"}]}]
+
+
+class FakeCaches:
+    def __init__(self) -> None:
+        self.created: list[dict[str, Any]] = []
+        self.deleted: list[str] = []
+        self.fail = False
+
+    async def create(self, model: str, config: dict[str, Any]) -> Any:
+        if self.fail:
+            raise RuntimeError("quota exceeded")
+        self.created.append({"model": model, **config})
+        return SimpleNamespace(name=f"cachedContents/{len(self.created)}")
+
+    async def delete(self, name: str) -> None:
+        self.deleted.append(name)
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _request(question: str, appended: str = "") -> Any:
+    system = _STATIC + (f"\n\n{appended}" if appended else "")
+    return SimpleNamespace(
+        model="gemini-2.5-pro",
+        config=SimpleNamespace(
+            system_instruction=system,
+            tools=list(_TOOLS),
+            tool_config=None,
+            cached_content=None,
+        ),
+        contents=[types.Content(role="user", parts=[types.Part(text=question)])],
+    )
+
+
+def _cache(caches: FakeCaches, **kwargs: Any) -> StaticInstructionCache:
+    client = SimpleNamespace(aio=SimpleNamespace(caches=caches))
+    kwargs.setdefault("min_tokens", 100)
+    return StaticInstructionCache(
+        lambda: _STATIC, client_factory=lambda: client, **kwargs
+    )
+
+
+def test_requests_reference_one_cache_and_keep_dynamic_text() -> None:
+    """The static prefix and tools move to the cache; the slice stays inline."""
+    caches = FakeCaches()
+    cache = _cache(caches)
+
+    first = _request("How many mailboxes?", appended="Relevant tables: mailboxes")
+    asyncio.run(cache.before_model_callback(None, first))
+    second = _request("And per region?")
+    asyncio.run(cache.before_model_callback(None, second))
+
+    assert len(caches.created) == 1
+    assert caches.created[0]["system_instruction"] == _STATIC
+    assert caches.created[0]["tools"] == _TOOLS
+    assert caches.created[0]["ttl"] == "3600s"
+    assert first.config.cached_content == "cachedContents/1"
+    assert first.config.system_instruction is None
+    assert first.config.tools is None
+    assert [part.text for part in first.contents[-1].parts] == [
+        "Relevant tables: mailboxes",
+        "How many mailboxes?",
+    ]
+    assert second.config.cached_content == "cachedContents/1"
+    assert cache.stats()["hits"] == 1
+
+
+def test_metadata_change_and_ttl_expiry_refresh_the_cache() -> None:
+    """A new content hash or an expiring TTL creates a new cache."""
+    caches = FakeCaches()
+    clock = Clock()
+    version = {"hash": "a"}
+    cache = _cache(
+        caches, content_hash=lambda: version["hash"], ttl_seconds=600, clock=clock
+    )
+
+    asyncio.run(cache.before_model_callback(None, _request("q")))
+    version["hash"] = "b"
+    asyncio.run(cache.before_model_callback(None, _request("q")))
+    assert caches.deleted == ["cachedContents/1"]
+
+    clock.now += 600 - 30
+    refreshed = _request("q")
+    asyncio.run(cache.before_model_callback(None, refreshed))
+    assert refreshed.config.cached_content == "cachedContents/3"
+    assert cache.stats()["refreshes"] == 2
+
+
+def test_small_or_unrecognised_instructions_are_sent_in_full() -> None:
+    """Below the minimum size, or when the prefix differs, nothing changes."""
+    caches = FakeCaches()
+    small = _cache(caches, min_tokens=1_000_000)
+    request = _request("q")
+    asyncio.run(small.before_model_callback(None, request))
+    assert request.config.system_instruction.startswith(_STATIC)
+
+    other = _request("q")
+    other.config.system_instruction = "A different agent."
+    asyncio.run(_cache(caches).before_model_callback(None, other))
+    assert other.config.cached_content is None
+    assert caches.created == []
+
+
+def test_cache_failures_fall_back_and_usage_is_recorded() -> None:
+    """API errors leave the request intact; usage metadata is tallied."""
+    caches = FakeCaches()
+    caches.fail = True
+    cache = _cache(caches)
+    request = _request("q")
+    asyncio.run(cache.before_model_callback(None, request))
+    assert request.config.tools == _TOOLS
+    assert cache.stats()["failures"] == 1
+
+    response = SimpleNamespace(
+        usage_metadata=SimpleNamespace(
+            prompt_token_count=4_000, cached_content_token_count=3_000
+        )
+    )
+    asyncio.run(cache.after_model_callback(None, response))
+    assert cache.stats()["cached_token_share"] == pytest.approx(0.75)
@@ -0,0 +1,91 @@
+"""Tests for the compiled, hot-reloadable metadata catalog."""
+
+import json
+import os
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from data_analyst_agent_app import metadata_utils
+
+
+def _write_dataset(directory: Path, dataset: str, tables: int, **extra: object) -> Path:
+    payload = {
+        "dataset": dataset,
+        "tables": [
+            {
+                "table": f"project.{dataset}.table_{index}",
+                "description": f"Table {index}",
+                "row_count": index * 10,
+                "columns": [
+                    {"name": "Headcount", "type": "INT64"},
+                    {"name": "Region", "type": "STRING"},
+                ],
+            }
+            for index in range(tables)
+        ],
+        **extra,
+    }
+    path = directory / f"{dataset}_metadata.json"
+    path.write_text(json.dumps(payload), encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def metadata_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[Path]:
+    monkeypatch.setattr(metadata_utils, "_DEFAULT_METADATA_DIR", tmp_path)
+    monkeypatch.setattr(metadata_utils, "_RELOAD_INTERVAL_SECONDS", 0.0)
+    metadata_utils.reload_catalog()
+    yield tmp_path
+    metadata_utils.reload_catalog()
+
+
+def test_lookups_use_normalised_identifiers(metadata_dir: Path) -> None:
+    """Qualified and differently-cased identifiers resolve to the same table."""
+    _write_dataset(metadata_dir, "gt_wf", tables=3)
+    metadata_utils.reload_catalog()
+
+    table = metadata_utils.get_catalog().table("`proj.GT_WF`", "Table_2")
+    assert table is not None
+    assert table.row_count == 20
+    assert table.numeric_columns == ("Headcount",)
+    assert table.categorical_columns == ("Region",)
+    assert table.columns["region"].data_type == "string"
+    assert metadata_utils.get_table_metadata("gt_wf", "table_9") is None
+
+
+def test_catalog_reloads_when_files_change(metadata_dir: Path) -> None:
+    """Edits on disk are picked up without restarting the process."""
+    path = _write_dataset(metadata_dir, "gt_wf", tables=1)
+    first = metadata_utils.reload_catalog()
+
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 1_000_000))
+    assert metadata_utils.get_catalog() is first
+
+    _write_dataset(metadata_dir, "gt_wf", tables=2, description="updated")
+    second = metadata_utils.get_catalog()
+    assert second is not first
+    assert second.datasets["gt_wf"].description == "updated"
+    assert metadata_utils.get_table_metadata("gt_wf", "table_1") is not None
+
+
+def test_large_catalog_lookups_stay_fast(metadata_dir: Path) -> None:
+    """Hundreds of tables are looked up in constant time."""
+    _write_dataset(metadata_dir, "ms_graph", tables=800)
+    metadata_utils.reload_catalog()
+
+    started = time.perf_counter()
+    for index in range(800):
+        assert metadata_utils.get_table_metadata("ms_graph", f"table_{index}")
+    elapsed = time.perf_counter() - started
+    assert elapsed < 0.5
+
+    plan = metadata_utils.create_dashboard_plan(
+        "Mailbox usage", focus_tables=["table_799", "table_3"]
+    )
+    assert [table["table"] for table in plan["recommended_tables"]] == [
+        "table_799",
+        "table_3",
+    ]
@@ -0,0 +1,141 @@
+"""Tests for the compact, content-hashed metadata digest."""
+
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from data_analyst_agent_app.metadata_digest import (
+    MetadataDigest,
+    SourceHashTracker,
+    compile_digest,
+    legacy_instruction_text,
+    load_digest,
+    main,
+    source_hash,
+    write_digest,
+)
+
+_RAW_DATASET = {
+    "kind": "bigquery#dataset",
+    "etag": "+oP4y2BwoNj4L7pQLqLuCw==",
+    "datasetReference": {"datasetId": "gt_wf", "projectId": "proj"},
+    "access": [{"role": "OWNER", "userByEmail": "someone@example.com"}],
+    "location": "US",
+}
+
+_HARVESTED = {
+    "dataset": "ms_graph",
+    "project": "proj",
+    "description": "Microsoft 365 usage",
+    "tables": [
+        {
+            "table": "mailbox_usage",
+            "type": "BASE TABLE",
+            "description": "Daily mailbox activity",
+            "row_count": 125000,
+            "size_bytes": 9000000,
+            "last_modified": 1761586739806,
+            "columns": [
+                {"name": "user_id", "type": "STRING", "description": "Entra ID"},
+                {
+                    "name": "items",
+                    "type": "INT64",
+                    "profile": {"approx_distinct": 900, "null_fraction": 0.0},
+                },
+            ],
+        }
+    ],
+}
+
+
+@pytest.fixture
+def metadata_files(tmp_path: Path) -> list[Path]:
+    raw = tmp_path / "gt_wf_dataset_metadata.json"
+    raw.write_text(json.dumps(_RAW_DATASET), encoding="utf-8")
+    harvested = tmp_path / "ms_graph_dataset_metadata.json"
+    harvested.write_text(json.dumps(_HARVESTED), encoding="utf-8")
+    return [raw, harvested]
+
+
+def test_digest_keeps_only_analytical_metadata(metadata_files: list[Path]) -> None:
+    """Etags, ACLs, sizes and profiles are dropped; tables and columns stay."""
+    text = compile_digest(metadata_files).to_text()
+
+    assert text.splitlines() == [
+        "Dataset gt_wf",
+        "  (no table metadata)",
+        "Dataset ms_graph: Microsoft 365 usage",
+        "  mailbox_usage [125,000 rows]: Daily mailbox activity",
+        "    user_id STRING (Entra ID), items INT64",
+    ]
+    assert len(text) < len(legacy_instruction_text(metadata_files)) / 4
+
+
+def test_binary_round_trip_and_corruption(
+    metadata_files: list[Path], tmp_path: Path
+) -> None:
+    digest = compile_digest(metadata_files)
+    path = write_digest(digest, tmp_path / "out" / "metadata.digest")
+
+    loaded = load_digest(path)
+    assert loaded == digest
+    assert loaded.source_hash == source_hash(metadata_files)
+
+    data = bytearray(path.read_bytes())
+    data[-1] ^= 0xFF
+    with pytest.raises(ValueError):
+        MetadataDigest.from_bytes(bytes(data))
+    assert load_digest(tmp_path / "missing.digest") is None
+
+
+def test_source_edits_change_the_hashes(metadata_files: list[Path]) -> None:
+    """A stale digest is detectable from its source hash."""
+    before = compile_digest(metadata_files)
+    edited = dict(_HARVESTED, description="Microsoft 365 usage and licences")
+    metadata_files[1].write_text(json.dumps(edited), encoding="utf-8")
+    after = compile_digest(metadata_files)
+
+    assert before.source_hash != after.source_hash
+    assert before.content_hash != after.content_hash
+
+
+def test_source_hash_is_only_recomputed_when_files_change(
+    metadata_files: list[Path], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Repeated calls stat the files; they are re-read only after an edit."""
+    import data_analyst_agent_app.metadata_digest as metadata_digest
+
+    hashed: list[int] = []
+    real_source_hash = metadata_digest.source_hash
+
+    def counting_source_hash(paths):
+        hashed.append(1)
+        return real_source_hash(paths)
+
+    monkeypatch.setattr(metadata_digest, "source_hash", counting_source_hash)
+    tracker = SourceHashTracker(lambda: metadata_files)
+
+    first = tracker()
+    assert [tracker() for _ in range(5)] == [first] * 5
+    assert first == real_source_hash(metadata_files)
+    assert len(hashed) == 1
+
+    edited = dict(_HARVESTED, description="Microsoft 365 usage and licences")
+    metadata_files[1].write_text(json.dumps(edited), encoding="utf-8")
+    stat = metadata_files[1].stat()
+    os.utime(metadata_files[1], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert tracker() == real_source_hash(metadata_files) != first
+    assert len(hashed) == 2
+
+
+def test_cli_writes_the_digest_and_reports_the_reduction(
+    metadata_files: list[Path], capsys: pytest.CaptureFixture[str]
+) -> None:
+    main(["--metadata-dir", str(metadata_files[0].parent)])
+    report = json.loads(capsys.readouterr().out)
+
+    assert report["files"] == 2
+    assert report["reduction_percent"] > 50
+    assert load_digest(report["output"]).content_hash == report["content_hash"]
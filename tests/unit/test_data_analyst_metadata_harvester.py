@@ -0,0 +1,261 @@
+"""Tests for the INFORMATION_SCHEMA metadata harvester, using a fake client."""
+
+import datetime as dt
+import json
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+from data_analyst_agent_app.metadata_harvester import MetadataHarvester
+from data_analyst_agent_app.metadata_utils import _read_metadata_files, compile_catalog
+
+GIB = 1024**3
+
+
+class FakeJob:
+    def __init__(self, rows: list[dict[str, Any]]) -> None:
+        self._rows = rows
+
+    def result(self) -> list[dict[str, Any]]:
+        return self._rows
+
+
+class FakeClient:
+    """Answers the harvester's queries from an in-memory description."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.queries: list[str] = []
+        self.fail_profiles: set[str] = set()
+        self.datasets = {
+            "ms_graph": {
+                "signins": {
+                    "type": 1,
+                    "description": '"Interactive sign-ins"',
+                    "rows": 1_000,
+                    "bytes": 5 * GIB,
+                    "modified": 1_700_000_000_000,
+                    "columns": [
+                        ("event_date", "DATE", "YES", None, "Partition date"),
+                        ("user_id", "STRING", "NO", 1, "Entra object id"),
+                        ("latency_ms", "NUMERIC(10, 2)", "NO", None, None),
+                        ("tags", "ARRAY<STRING>", "NO", None, None),
+                    ],
+                },
+                "signins_vw": {
+                    "type": 2,
+                    "description": None,
+                    "rows": 0,
+                    "bytes": 0,
+                    "modified": 1_700_000_000_000,
+                    "columns": [("user_id", "STRING", "NO", None, None)],
+                },
+            },
+            "gt_wf": {
+                "headcount": {
+                    "type": 1,
+                    "description": '"Monthly headcount"',
+                    "rows": 40,
+                    "bytes": 1_024,
+                    "modified": 1_690_000_000_000,
+                    "columns": [
+                        ("month", "DATE", "YES", None, None),
+                        ("employees", "INT64", "NO", None, None),
+                    ],
+                },
+            },
+        }
+
+    def get_dataset(self, reference: str) -> Any:
+        return SimpleNamespace(
+            description=f"{reference.split('.')[1]} tables", location="US", labels={}
+        )
+
+    def list_datasets(self, project: str) -> list[Any]:
+        return [SimpleNamespace(dataset_id=name) for name in self.datasets]
+
+    def query(self, sql: str, job_config: Any = None, location: Any = None) -> FakeJob:
+        with self.lock:
+            self.queries.append(sql)
+        dataset_id = sql.split("`proj.", 1)[1].split(".", 1)[0]
+        tables = self.datasets[dataset_id]
+        if "INFORMATION_SCHEMA`.TABLES" in sql:
+            return FakeJob(
+                [
+                    {
+                        "table_name": name,
+                        "table_type": "VIEW" if table["type"] == 2 else "BASE TABLE",
+                        "description": table["description"],
+                    }
+                    for name, table in tables.items()
+                ]
+            )
+        if "__TABLES__" in sql:
+            return FakeJob(
+                [
+                    {
+                        "table_id": name,
+                        "type": table["type"],
+                        "row_count": table["rows"],
+                        "size_bytes": table["bytes"],
+                        "last_modified_time": table["modified"],
+                    }
+                    for name, table in tables.items()
+                ]
+            )
+        if "INFORMATION_SCHEMA`.COLUMNS" in sql:
+            return FakeJob(
+                [
+                    {
+                        "table_name": name,
+                        "column_name": column,
+                        "data_type": data_type,
+                        "is_partitioning_column": partitioning,
+                        "clustering_ordinal_position": clustering,
+                        "description": description,
+                    }
+                    for name, table in tables.items()
+                    for column, data_type, partitioning, clustering, description in table[
+                        "columns"
+                    ]
+                ]
+            )
+        table_name = sql.split("`proj.", 1)[1].split("`", 1)[0].split(".")[1]
+        if table_name in self.fail_profiles:
+            raise RuntimeError("bytes billed limit exceeded")
+        row: dict[str, Any] = {"_rows": 100}
+        for index in range(len(tables[table_name]["columns"])):
+            if f"AS d{index}" in sql:
+                row[f"d{index}"] = 10 + index
+                row[f"n{index}"] = 5
+            if f"AS lo{index}" in sql:
+                row[f"lo{index}"] = dt.date(2024, 1, 1)
+                row[f"hi{index}"] = dt.date(2024, 3, 1)
+        return FakeJob([row])
+
+
+def _harvester(client: FakeClient, tmp_path: Path) -> MetadataHarvester:
+    return MetadataHarvester(
+        client,
+        "proj",
+        output_dir=tmp_path,
+        max_workers=4,
+        sample_threshold_bytes=GIB,
+        job_config_factory=lambda max_bytes: {"maximum_bytes_billed": max_bytes},
+    )
+
+
+def _profile_queries(client: FakeClient) -> list[str]:
+    return [sql for sql in client.queries if "APPROX_COUNT_DISTINCT" in sql]
+
+
+def test_harvest_writes_catalog_files_metadata_utils_reads(tmp_path: Path) -> None:
+    """Tables, columns, partitioning and profiles land in the catalog."""
+    client = FakeClient()
+    report = _harvester(client, tmp_path).harvest()
+
+    assert report.datasets == 2
+    assert report.tables == 3
+    assert report.profiled == 2
+    assert not report.errors
+    datasets, _ = _read_metadata_files(sorted(tmp_path.glob("*.json")))
+    catalog = compile_catalog(datasets)
+
+    signins = catalog.table("ms_graph", "signins")
+    assert signins.description == "Interactive sign-ins"
+    assert signins.row_count == 1_000
+    assert signins.numeric_columns == ("latency_ms",)
+    assert signins.metadata["partition_column"] == "event_date"
+    assert signins.metadata["clustering_columns"] == ["user_id"]
+    columns = {column["name"]: column for column in signins.metadata["columns"]}
+    assert columns["latency_ms"]["declared_type"] == "NUMERIC(10, 2)"
+    assert columns["event_date"]["profile"] == {
+        "approx_distinct": 10,
+        "null_fraction": 0.05,
+        "min": "2024-01-01",
+        "max": "2024-03-01",
+        "sample_percent": 10.0,
+    }
+    assert "profile" not in columns["tags"]
+    assert catalog.datasets["gt_wf"].description == "gt_wf tables"
+
+
+def test_profiles_sample_large_tables_and_skip_views(tmp_path: Path) -> None:
+    """Large tables are sampled; views and empty tables are not profiled."""
+    client = FakeClient()
+    _harvester(client, tmp_path).harvest(["ms_graph", "gt_wf"])
+
+    profiles = _profile_queries(client)
+    assert len(profiles) == 2
+    signins = next(sql for sql in profiles if "signins" in sql)
+    headcount = next(sql for sql in profiles if "headcount" in sql)
+    assert "TABLESAMPLE SYSTEM (10 PERCENT)" in signins
+    assert "TABLESAMPLE" not in headcount
+    assert "`tags`" not in signins
+
+
+def test_incremental_refresh_only_reprofiles_modified_tables(tmp_path: Path) -> None:
+    """Unchanged tables keep their entries and files are not rewritten."""
+    client = FakeClient()
+    harvester = _harvester(client, tmp_path)
+    harvester.harvest()
+
+    client.queries.clear()
+    second = harvester.harvest()
+    assert _profile_queries(client) == []
+    assert second.reused == 3
+    assert second.written == []
+    assert len(second.unchanged) == 2
+
+    client.queries.clear()
+    client.datasets["gt_wf"]["headcount"]["modified"] += 1
+    client.datasets["gt_wf"]["headcount"]["rows"] = 41
+    third = harvester.harvest()
+    assert [sql for sql in _profile_queries(client) if "headcount" in sql]
+    assert len(_profile_queries(client)) == 1
+    assert third.written == [str(harvester.path_for("gt_wf"))]
+    payload = json.loads(harvester.path_for("gt_wf").read_text())
+    assert payload["tables"][0]["row_count"] == 41
+
+    client.queries.clear()
+    harvester.harvest(full=True)
+    assert len(_profile_queries(client)) == 2
+
+
+def test_profile_failures_keep_schema_entries(tmp_path: Path) -> None:
+    """A failed profile query is reported, and the table is still written."""
+    client = FakeClient()
+    client.fail_profiles.add("signins")
+    harvester = _harvester(client, tmp_path)
+    report = harvester.harvest(["ms_graph"])
+
+    assert report.profiled == 0
+    assert report.errors == ["ms_graph.signins: bytes billed limit exceeded"]
+    payload = json.loads((tmp_path / "ms_graph_dataset_metadata.json").read_text())
+    assert [table["table"] for table in payload["tables"]] == ["signins", "signins_vw"]
+
+    client.fail_profiles.clear()
+    assert harvester.harvest(["ms_graph"]).profiled == 1
+
+
+def test_profiling_run_profiles_entries_from_a_no_profile_run(tmp_path: Path) -> None:
+    """Unchanged tables harvested with --no-profile are not reused as-is."""
+    client = FakeClient()
+    unprofiled = _harvester(client, tmp_path)
+    unprofiled.profile = False
+    assert unprofiled.harvest().profiled == 0
+    assert _profile_queries(client) == []
+
+    harvester = _harvester(client, tmp_path)
+    report = harvester.harvest()
+    assert report.profiled == 2
+    assert report.reused == 1
+    payload = json.loads(harvester.path_for("ms_graph").read_text())
+    signins = next(t for t in payload["tables"] if t["table"] == "signins")
+    assert signins["profiled"] is True
+    assert any("profile" in column for column in signins["columns"])
+
+    client.queries.clear()
+    assert harvester.harvest().reused == 3
+    assert _profile_queries(client) == []
@@ -0,0 +1,142 @@
+"""Tests for question-conditioned metadata prompt slices."""
+
+import json
+from collections.abc import Iterator
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+from data_analyst_agent_app import metadata_utils
+from data_analyst_agent_app.prompt_slices import (
+    MetadataSlicer,
+    estimate_tokens,
+    inject_metadata_slice,
+    rank_tables,
+    tokenise,
+)
+
+
+def _write_dataset(directory: Path, dataset: str, tables: dict[str, list[str]]) -> None:
+    payload = {
+        "dataset": dataset,
+        "description": f"{dataset} dataset",
+        "tables": [
+            {
+                "table": name,
+                "description": f"{name.replace('_', ' ')} facts",
+                "row_count": 100,
+                "columns": [{"name": column, "type": "STRING"} for column in columns],
+            }
+            for name, columns in tables.items()
+        ],
+    }
+    (directory / f"{dataset}_metadata.json").write_text(
+        json.dumps(payload), encoding="utf-8"
+    )
+
+
+@pytest.fixture
+def metadata_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[Path]:
+    monkeypatch.setattr(metadata_utils, "_DEFAULT_METADATA_DIR", tmp_path)
+    monkeypatch.setattr(metadata_utils, "_RELOAD_INTERVAL_SECONDS", 0.0)
+    _write_dataset(
+        tmp_path,
+        "gt_wf",
+        {
+            "attrition_events": ["employee_id", "termination_reason", "exitDate"],
+            "hiring_pipeline": ["requisition_id", "candidate_stage"],
+            **{f"filler_{index}": [f"metric_{index}", "region"] for index in range(30)},
+        },
+    )
+    _write_dataset(tmp_path, "ms_graph", {"mailbox_usage": ["user_id", "items_sent"]})
+    metadata_utils.reload_catalog()
+    yield tmp_path
+    metadata_utils.reload_catalog()
+
+
+def test_tokenise_splits_identifiers() -> None:
+    """Snake, camel and dotted identifiers become separate terms."""
+    assert tokenise("gt_wf.exitDate TerminationReason") == [
+        "gt",
+        "wf",
+        "exit",
+        "date",
+        "termination",
+        "reason",
+    ]
+
+
+def test_rank_tables_prefers_matching_table(metadata_dir: Path) -> None:
+    """Tables whose names and columns match the question rank first."""
+    ranked = rank_tables(
+        "Why did attrition rise? Show termination reason", metadata_utils.get_catalog()
+    )
+    assert ranked[0].table.name == "attrition_events"
+    assert "termination_reason" in ranked[0].matched_columns
+
+
+def test_slice_fits_budget_and_saves_tokens(metadata_dir: Path) -> None:
+    """The slice stays within budget and is smaller than the full summary."""
+    slicer = MetadataSlicer(token_budget=120)
+    metadata_slice = slicer.slice_for("attrition by termination reason")
+
+    assert metadata_slice.tokens <= 120
+    assert metadata_slice.tables[0] == "gt_wf.attrition_events"
+    assert "attrition_events" in metadata_slice.text
+    assert "filler_29" not in metadata_slice.text
+    assert metadata_slice.full_tokens == estimate_tokens(
+        metadata_utils.summarise_metadata_for_prompt()
+    )
+    assert metadata_slice.saved_tokens > 0
+
+
+def test_slices_are_cached_per_question_and_catalog(metadata_dir: Path) -> None:
+    """Repeated questions hit the cache until the metadata changes."""
+    slicer = MetadataSlicer(token_budget=200)
+    first = slicer.slice_for("Attrition by region")
+    assert slicer.slice_for("attrition  by REGION?") is first
+
+    _write_dataset(metadata_dir, "ms_graph", {"teams_activity": ["user_id", "region"]})
+    metadata_utils.reload_catalog()
+    assert slicer.slice_for("Attrition by region") is not first
+
+    stats = slicer.stats()
+    assert stats["requests"] == 3
+    assert stats["cache_hits"] == 1
+    assert stats["saved_tokens"] == stats["full_summary_tokens"] - stats["slice_tokens"]
+
+
+def test_unmatched_question_lists_datasets(metadata_dir: Path) -> None:
+    """A question with no overlapping terms still names the datasets."""
+    metadata_slice = MetadataSlicer(token_budget=100).slice_for("hello there")
+    assert "Dataset `gt_wf`" in metadata_slice.text
+    assert metadata_slice.tables == ()
+
+
+def test_callback_appends_slice_for_latest_user_message(metadata_dir: Path) -> None:
+    """The before-model callback reads the user turn and appends instructions."""
+
+    class FakeRequest:
+        def __init__(self) -> None:
+            self.contents: list[Any] = []
+            self.instructions: list[str] = []
+
+        def append_instructions(self, instructions: list[str]) -> None:
+            self.instructions.extend(instructions)
+
+    content = SimpleNamespace(
+        role="user", parts=[SimpleNamespace(text="mailbox items sent")]
+    )
+    request = FakeRequest()
+    assert inject_metadata_slice(SimpleNamespace(user_content=content), request) is None
+    assert len(request.instructions) == 1
+    assert "mailbox_usage" in request.instructions[0]
+
+
+def test_small_catalog_is_injected_whole(metadata_dir: Path) -> None:
+    """When the full summary fits the budget it is used unchanged."""
+    metadata_slice = MetadataSlicer(token_budget=100_000).slice_for("attrition")
+    assert metadata_slice.text == metadata_utils.summarise_metadata_for_prompt()
+    assert metadata_slice.saved_tokens == 0
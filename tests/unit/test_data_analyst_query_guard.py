@@ -0,0 +1,156 @@
+"""Tests for the dry-run query cost guard, using a stub BigQuery client."""
+
+import asyncio
+import re
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+pytest.importorskip("google.cloud.bigquery")
+
+from data_analyst_agent_app.query_guard import QueryCostGuard
+
+GIB = 1024**3
+_AUDIT = "proj.ms_graph.audit_events"
+_USERS = "proj.ms_graph.users"
+
+
+class StubClient:
+    """Answers dry runs from a byte count per table, halved per filter."""
+
+    def __init__(self) -> None:
+        self.table_bytes = {_AUDIT: 4_000 * GIB, _USERS: 2 * GIB}
+        self.dry_runs: list[str] = []
+        self.tables = {
+            _AUDIT: SimpleNamespace(
+                time_partitioning=SimpleNamespace(field="event_time"),
+                schema=[
+                    SimpleNamespace(name="event_time", field_type="TIMESTAMP"),
+                    SimpleNamespace(name="user_id", field_type="STRING"),
+                ],
+            ),
+            _USERS: SimpleNamespace(time_partitioning=None, schema=[]),
+        }
+
+    def query(
+        self,
+        sql: str,
+        project: Any = None,
+        job_config: Any = None,
+        location: Any = None,
+    ) -> Any:
+        assert job_config.dry_run
+        self.dry_runs.append(sql)
+        referenced = [
+            table
+            for table in self.table_bytes
+            if re.search(rf"{table.rsplit('.', 1)[1]}\b", sql)
+        ]
+        total = 0
+        for table in referenced:
+            scanned = self.table_bytes[table]
+            if table == _AUDIT and "event_time >=" in sql:
+                scanned //= 1_000
+            total += scanned
+        return SimpleNamespace(
+            total_bytes_processed=total,
+            referenced_tables=[
+                SimpleNamespace(
+                    project=table.split(".")[0],
+                    dataset_id=table.split(".")[1],
+                    table_id=table.split(".")[2],
+                )
+                for table in referenced
+            ],
+        )
+
+    def get_table(self, table_id: str) -> Any:
+        return self.tables[table_id]
+
+
+def _guard(client: StubClient, budget_gib: int = 50) -> QueryCostGuard:
+    config = SimpleNamespace(maximum_bytes_billed=budget_gib * GIB, location="US")
+    return QueryCostGuard(config, lambda: client, partition_lookback_days=7)
+
+
+def test_budget_comes_from_tool_config() -> None:
+    """The tool config's maximum_bytes_billed is the default budget."""
+    assert _guard(StubClient(), budget_gib=3).max_bytes == 3 * GIB
+
+
+def test_small_query_is_allowed_with_estimate() -> None:
+    """Queries inside the budget run unchanged."""
+    decision = _guard(StubClient()).check(f"SELECT * FROM `{_USERS}`")
+    assert decision.action == "allow"
+    assert decision.estimate.as_dict()["estimated_size"] == "2.0 GiB"
+
+
+def test_unfiltered_partitioned_table_is_rewritten() -> None:
+    """A partition predicate is added to tables read without one."""
+    client = StubClient()
+    sql = (
+        f"SELECT u.user_id, COUNT(*) FROM `{_AUDIT}` a "
+        f"JOIN `{_USERS}` u ON a.user_id = u.user_id GROUP BY 1"
+    )
+    decision = _guard(client).check(sql)
+
+    assert decision.action == "rewrite"
+    assert (
+        f"FROM (SELECT * FROM `{_AUDIT}` WHERE event_time >= "
+        "TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL 7 DAY)) a" in decision.sql
+    )
+    assert f"JOIN `{_USERS}` u" in decision.sql
+    assert decision.original_estimate.bytes_processed == 4_002 * GIB
+    assert decision.estimate.within_budget
+    assert len(client.dry_runs) == 2
+
+
+def test_unaliased_reference_keeps_qualified_columns_working() -> None:
+    """The subquery is aliased with the table name when no alias was given."""
+    decision = _guard(StubClient()).check(
+        f"SELECT audit_events.user_id FROM {_AUDIT} WHERE audit_events.user_id = 'x'"
+    )
+    assert decision.action == "rewrite"
+    assert ") AS audit_events WHERE audit_events.user_id" in decision.sql
+
+
+def test_query_already_filtering_partitions_is_rejected() -> None:
+    """When a rewrite cannot help, the query is rejected with guidance."""
+    client = StubClient()
+    client.table_bytes[_AUDIT] = 900_000 * GIB
+    decision = _guard(client).check(
+        f"SELECT * FROM `{_AUDIT}` WHERE event_time >= '2020-01-01'"
+    )
+    assert decision.action == "reject"
+    assert "over the 50.0 GiB budget" in decision.message
+
+
+def test_callbacks_reject_rewrite_and_annotate() -> None:
+    """The ADK callbacks short-circuit, mutate args and report estimates."""
+    guard = _guard(StubClient())
+    tool = SimpleNamespace(name="execute_sql")
+    context = SimpleNamespace(function_call_id="call-1")
+
+    args = {"project_id": "proj", "query": f"SELECT * FROM `{_AUDIT}`"}
+    assert asyncio.run(guard.before_tool_callback(tool, args, context)) is None
+    assert "INTERVAL 7 DAY" in args["query"]
+    response = asyncio.run(
+        guard.after_tool_callback(
+            tool, args, context, {"status": "SUCCESS", "rows": []}
+        )
+    )
+    assert response["cost_estimate"]["within_budget"] is True
+    assert response["query_rewrite"]["executed_query"] == args["query"]
+
+    guard.max_bytes = 1
+    rejected = asyncio.run(
+        guard.before_tool_callback(
+            tool, {"project_id": "proj", "query": f"SELECT * FROM `{_USERS}`"}, context
+        )
+    )
+    assert rejected["status"] == "ERROR"
+    assert rejected["cost_estimate"]["within_budget"] is False
+
+    dry_run_args = {"project_id": "proj", "query": "SELECT 1", "dry_run": True}
+    assert asyncio.run(guard.before_tool_callback(tool, dry_run_args, context)) is None
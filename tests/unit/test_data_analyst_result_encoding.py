@@ -0,0 +1,122 @@
+"""Tests for the columnar ``run_python_analysis`` result encoding."""
+
+import json
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+import numpy as np
+import pandas as pd
+
+from data_analyst_agent_app.result_encoding import (
+    decode_cursor,
+    encode_cursor,
+    encode_dataframe,
+    records_from_columnar,
+)
+from data_analyst_agent_app.sandbox import SandboxExecutor
+
+
+def _frame(rows: int) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "id": np.arange(rows),
+            "score": np.linspace(0, 1, rows),
+            "region": ["EMEA", "AMER"] * (rows // 2),
+        }
+    )
+
+
+def test_small_frame_round_trips_without_truncation() -> None:
+    """Column names are listed once and values decode back to records."""
+    frame = _frame(4)
+    frame.loc[1, "score"] = np.nan
+    payload = encode_dataframe(frame)
+
+    assert [column["name"] for column in payload["columns"]] == [
+        "id",
+        "score",
+        "region",
+    ]
+    assert "truncated" not in payload
+    assert payload["head"]["values"][2] == {
+        "dictionary": ["EMEA", "AMER"],
+        "codes": [0, 1, 0, 1],
+    }
+    assert records_from_columnar(payload) == [
+        {"id": 0, "score": 0.0, "region": "EMEA"},
+        {"id": 1, "score": None, "region": "AMER"},
+        {"id": 2, "score": 2 / 3, "region": "EMEA"},
+        {"id": 3, "score": 1.0, "region": "AMER"},
+    ]
+
+
+def test_large_frame_is_sampled_within_budget() -> None:
+    """Oversized results keep head and tail rows, a summary and a cursor."""
+    payload = encode_dataframe(
+        _frame(10_000), max_rows=50, max_bytes=4_000, cursor_handle="result-1"
+    )
+
+    assert payload["truncated"] is True
+    assert payload["total_rows"] == 10_000
+    assert payload["head"]["start"] == 0
+    assert payload["tail"]["stop"] == 10_000
+    assert payload["summary"]["region"]["distinct"] == 2
+    assert len(json.dumps(payload)) < 4_000 * 1.5
+    handle, offset = decode_cursor(payload["next_cursor"])
+    assert (handle, offset) == ("result-1", payload["head"]["stop"])
+
+
+def test_paging_returns_contiguous_windows() -> None:
+    """A non-zero offset pages forward instead of sampling head and tail."""
+    frame = _frame(100)
+    page = encode_dataframe(frame.iloc[40:], max_rows=25, offset=40, cursor_handle="r")
+
+    assert (page["head"]["start"], page["head"]["stop"]) == (40, 65)
+    assert "tail" not in page
+    assert decode_cursor(page["next_cursor"]) == ("r", 65)
+    assert records_from_columnar(page)[0]["id"] == 40
+
+
+def test_wide_frames_drop_extra_columns() -> None:
+    """Columns above the limit are omitted and reported."""
+    frame = pd.DataFrame(np.ones((3, 10)), columns=[f"c{i}" for i in range(10)])
+    payload = encode_dataframe(frame, max_columns=4)
+    assert payload["total_columns"] == 10
+    assert len(payload["columns"]) == 4
+
+
+def test_cursor_rejects_garbage() -> None:
+    """Tampered cursors are reported as invalid."""
+    assert decode_cursor(encode_cursor("h", 7)) == ("h", 7)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_sandbox_spills_truncated_results(tmp_path: Path) -> None:
+    """Truncated sandbox results are written out so they can be paged."""
+    spill = tmp_path / "result.arrow"
+    executor = SandboxExecutor(max_workers=1, timeout_seconds=30)
+    try:
+        payload = executor.run(
+            "result = pd.DataFrame({'x': np.arange(5000)})",
+            result_options={
+                "max_rows": 10,
+                "cursor_handle": "result-x",
+                "spill_path": str(spill),
+            },
+        )
+        page = executor.run(
+            "result = frames['result-x'].iloc[5:]",
+            frames={"result-x": str(spill)},
+            result_options={"max_rows": 10, "offset": 5, "cursor_handle": "result-x"},
+        )
+    finally:
+        executor.shutdown()
+
+    assert payload["result"]["_spill"]["num_rows"] == 5000
+    assert spill.exists()
+    assert page["result"]["head"]["values"] == [list(range(5, 15))]
@@ -0,0 +1,66 @@
+"""Tests for the data analyst agent's pre-warmed sandbox pool."""
+
+import asyncio
+import time
+from collections.abc import Iterator
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("matplotlib")
+
+from data_analyst_agent_app.sandbox import SandboxExecutor
+
+
+@pytest.fixture(scope="module")
+def executor() -> Iterator[SandboxExecutor]:
+    pool = SandboxExecutor(max_workers=2, timeout_seconds=20, memory_limit_mb=512)
+    pool.start()
+    yield pool
+    pool.shutdown()
+
+
+def test_run_returns_stdout_and_dataframe_result(executor: SandboxExecutor) -> None:
+    """Code runs with the preloaded libraries and returns its ``result``."""
+    payload = executor.run("result = pd.DataFrame({'a': np.arange(3)})\nprint('hello')")
+    assert payload["stdout"] == "hello\n"
+    assert payload["result"]["columns"] == [{"name": "a", "type": "int64"}]
+    assert payload["result"]["head"]["values"] == [[0, 1, 2]]
+
+
+def test_errors_are_reported_not_raised(executor: SandboxExecutor) -> None:
+    """Exceptions inside the sandbox are returned as a traceback string."""
+    payload = executor.run("1 / 0")
+    assert "ZeroDivisionError" in payload["error"]
+
+
+def test_timeout_replaces_worker(executor: SandboxExecutor) -> None:
+    """A call over the wall-clock limit is killed and the pool recovers."""
+    payload = executor.run("while True:\n    pass", timeout_seconds=0.5)
+    assert "wall-clock limit" in payload["error"]
+    assert executor.run("print(1)")["stdout"] == "1\n"
+
+
+def test_memory_limit_is_enforced(executor: SandboxExecutor) -> None:
+    """Allocations beyond the configured budget fail inside the sandbox."""
+    payload = executor.run("block = np.ones(2 * 1024 ** 3 // 8)")
+    assert "error" in payload
+    assert executor.run("print(2)")["stdout"] == "2\n"
+
+
+def test_run_async_executes_concurrently(executor: SandboxExecutor) -> None:
+    """Two async calls overlap on separate workers rather than queueing."""
+    code = (
+        "deadline = pd.Timestamp.now() + pd.Timedelta(seconds=1)\n"
+        "while pd.Timestamp.now() < deadline:\n"
+        "    pass"
+    )
+
+    async def _run_pair() -> list[dict]:
+        return await asyncio.gather(executor.run_async(code), executor.run_async(code))
+
+    started = time.perf_counter()
+    payloads = asyncio.run(_run_pair())
+    elapsed = time.perf_counter() - started
+    assert all("error" not in payload for payload in payloads)
+    assert elapsed < 1.8
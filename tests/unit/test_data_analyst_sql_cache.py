@@ -0,0 +1,215 @@
+"""Tests for the data analyst agent's ``execute_sql`` result cache."""
+
+import asyncio
+import fnmatch
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+from data_analyst_agent_app.sql_cache import (
+    DiskBackend,
+    InProcessBackend,
+    RedisBackend,
+    SqlResultCache,
+    normalise_sql,
+)
+
+
+class FakeVersions:
+    """Stand-in for BigQuery dry runs and ``tables.get``."""
+
+    def __init__(self) -> None:
+        self.versions = {"p.d.sales": "2024-01-01T00:00:00", "p.d.view": None}
+        self.dry_runs = 0
+
+    def referenced_tables(self, sql: str, project_id: str) -> list[str] | None:
+        self.dry_runs += 1
+        if "DELETE" in sql.upper():
+            return None
+        return sorted(
+            table for table in self.versions if table.rsplit(".", 1)[1] in sql
+        )
+
+    def table_version(self, table_id: str) -> str | None:
+        return self.versions[table_id]
+
+
+class FakeRedis:
+    """Dictionary with the subset of the Redis client API the backend uses."""
+
+    def __init__(self) -> None:
+        self.data: dict[str, str] = {}
+        self.expiry: dict[str, int] = {}
+
+    def get(self, name: str) -> str | None:
+        return self.data.get(name)
+
+    def set(self, name: str, value: str, ex: int | None = None) -> None:
+        self.data[name] = value
+        self.expiry[name] = ex or 0
+
+    def delete(self, name: str) -> None:
+        self.data.pop(name, None)
+
+    def scan_iter(self, match: str) -> list[str]:
+        return [name for name in list(self.data) if fnmatch.fnmatch(name, match)]
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+_TOOL = SimpleNamespace(name="execute_sql")
+_RESPONSE = {"status": "SUCCESS", "rows": [{"region": "EMEA", "total": 3}]}
+
+
+def _run_query(cache: SqlResultCache, sql: str, call_id: str) -> dict[str, Any] | None:
+    """Drive the callbacks the way ADK does around a tool call."""
+    args = {"project_id": "p", "query": sql}
+    context = SimpleNamespace(function_call_id=call_id)
+    cached = asyncio.run(cache.before_tool_callback(_TOOL, args, context))
+    if cached is None:
+        asyncio.run(cache.after_tool_callback(_TOOL, args, context, dict(_RESPONSE)))
+    return cached
+
+
+def test_normalisation_ignores_layout_case_and_literal_order() -> None:
+    """Cosmetic differences map to one key, literals keep their content."""
+    first = normalise_sql(
+        "select region, sum(x) as total -- note\n"
+        "from `p.d.sales`  where region in ('b', 'a')  group by region;"
+    )
+    second = normalise_sql(
+        "SELECT region,SUM(x) AS total FROM `p.d.sales` "
+        "WHERE region IN ('a','b') GROUP BY region"
+    )
+    assert first.replace("sum", "SUM") == second
+    assert normalise_sql("SELECT 'a , b'") != normalise_sql("SELECT 'a,b'")
+    assert normalise_sql("SELECT * FROM `p.d.Sales`") != normalise_sql(
+        "SELECT * FROM `p.d.sales`"
+    )
+
+
+def test_hit_after_store_and_metrics() -> None:
+    """A repeated query is served from the cache and counted as a hit."""
+    versions = FakeVersions()
+    cache = SqlResultCache(InProcessBackend(), versions)
+
+    assert _run_query(cache, "SELECT * FROM `p.d.sales`", "1") is None
+    cached = _run_query(cache, "select *\n  from `p.d.sales`", "2")
+
+    assert cached is not None
+    assert cached["rows"] == _RESPONSE["rows"]
+    assert cached["cache"]["hit"] is True
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == pytest.approx(0.5)
+    assert stats["stores"] == 1
+
+
+def test_table_modification_invalidates_entry() -> None:
+    """A new lastModifiedTime on a referenced table evicts the entry."""
+    versions = FakeVersions()
+    cache = SqlResultCache(InProcessBackend(), versions, version_ttl_seconds=0)
+    _run_query(cache, "SELECT * FROM `p.d.sales`", "1")
+
+    versions.versions["p.d.sales"] = "2024-02-01T00:00:00"
+    assert _run_query(cache, "SELECT * FROM `p.d.sales`", "2") is None
+    assert cache.stats()["invalidations"] == 1
+    assert _run_query(cache, "SELECT * FROM `p.d.sales`", "3") is not None
+
+
+def test_ttl_expiry_and_uncacheable_queries() -> None:
+    """Entries expire, and views or non-deterministic SQL are never stored."""
+    clock = Clock()
+    cache = SqlResultCache(
+        InProcessBackend(), FakeVersions(), ttl_seconds=60, clock=clock
+    )
+    _run_query(cache, "SELECT * FROM `p.d.sales`", "1")
+    clock.now += 61
+    assert _run_query(cache, "SELECT * FROM `p.d.sales`", "2") is None
+    assert cache.stats()["expirations"] == 1
+
+    for sql in (
+        "SELECT * FROM `p.d.view`",
+        "SELECT CURRENT_DATE() FROM `p.d.sales`",
+        "DELETE FROM `p.d.sales` WHERE TRUE",
+    ):
+        _run_query(cache, sql, "x")
+        assert _run_query(cache, sql, "y") is None
+    assert cache.stats()["uncacheable"] >= 3
+
+
+def test_in_process_backend_is_lru_bounded() -> None:
+    """The least recently used entry is evicted first."""
+    backend = InProcessBackend(max_entries=2)
+    backend.set("a", {"n": 1})
+    backend.set("b", {"n": 2})
+    backend.get("a")
+    backend.set("c", {"n": 3})
+    assert backend.get("b") is None
+    assert len(backend) == 2
+
+
+@pytest.mark.parametrize("backend_name", ["disk", "redis"])
+def test_persistent_backends_share_entries(tmp_path: Path, backend_name: str) -> None:
+    """Entries written by one cache instance are served by another."""
+    redis = FakeRedis()
+
+    def make_backend() -> Any:
+        if backend_name == "disk":
+            return DiskBackend(tmp_path, max_entries=10)
+        return RedisBackend(redis, ttl_seconds=120)
+
+    _run_query(
+        SqlResultCache(make_backend(), FakeVersions()), "SELECT 1 FROM `p.d.sales`", "1"
+    )
+    other = SqlResultCache(make_backend(), FakeVersions())
+    assert _run_query(other, "SELECT 1 FROM `p.d.sales`", "2") is not None
+    if backend_name == "redis":
+        assert set(redis.expiry.values()) == {120}
+
+
+def test_dry_run_requests_pass_through() -> None:
+    """Dry runs and other tools are ignored by the callbacks."""
+    cache = SqlResultCache(InProcessBackend(), FakeVersions())
+    args = {"project_id": "p", "query": "SELECT 1", "dry_run": True}
+    assert (
+        asyncio.run(cache.before_tool_callback(_TOOL, args, SimpleNamespace())) is None
+    )
+    other = SimpleNamespace(name="list_dataset_ids")
+    assert asyncio.run(cache.before_tool_callback(other, {}, SimpleNamespace())) is None
+    assert cache.stats()["lookups"] == 0
+
+
+def test_per_user_cache_never_shares_entries_between_users() -> None:
+    """With per-user keys one user's result is never served to another."""
+    cache = SqlResultCache(InProcessBackend(), FakeVersions(), per_user=True)
+    args = {"project_id": "p", "query": "SELECT * FROM `p.d.sales`"}
+
+    def run(user_id: str | None, call_id: str) -> dict[str, Any] | None:
+        context = SimpleNamespace(function_call_id=call_id, user_id=user_id)
+        cached = asyncio.run(cache.before_tool_callback(_TOOL, args, context))
+        if cached is None:
+            asyncio.run(
+                cache.after_tool_callback(_TOOL, args, context, dict(_RESPONSE))
+            )
+        return cached
+
+    assert run("alice", "1") is None
+    assert run("bob", "2") is None
+    assert run("alice", "3") is not None
+    assert run("bob", "4") is not None
+    assert cache.stats()["stores"] == 2
+
+    # Calls without a user id bypass the cache entirely.
+    assert run(None, "5") is None
+    assert run(None, "6") is None
+    assert cache.stats()["stores"] == 2
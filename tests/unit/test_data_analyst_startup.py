@@ -0,0 +1,109 @@
+"""Cold-start regression tests for the data analyst agent."""
+
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+from data_analyst_agent_app.credentials import CredentialResolver
+
+ROOT = Path(__file__).resolve().parents[2]
+
+# Generous caps: they catch an eager heavy import, not scheduler noise.
+HELPER_IMPORT_BUDGET_SECONDS = float(
+    os.getenv("DATA_ANALYST_HELPER_IMPORT_BUDGET_SECONDS", "1.5")
+)
+AGENT_IMPORT_BUDGET_SECONDS = float(
+    os.getenv("DATA_ANALYST_AGENT_IMPORT_BUDGET_SECONDS", "10")
+)
+
+_HELPER_MODULES = (
+    "data_analyst_agent_app.credentials",
+    "data_analyst_agent_app.dashboard_tiles",
+    "data_analyst_agent_app.dataset_router",
+    "data_analyst_agent_app.figure_store",
+    "data_analyst_agent_app.frame_registry",
+    "data_analyst_agent_app.metadata_digest",
+    "data_analyst_agent_app.metadata_utils",
+    "data_analyst_agent_app.prompt_slices",
+    "data_analyst_agent_app.query_guard",
+    "data_analyst_agent_app.result_encoding",
+    "data_analyst_agent_app.sandbox",
+    "data_analyst_agent_app.sql_cache",
+)
+_DEFERRED = ("pandas", "numpy", "matplotlib", "pyarrow", "google.cloud.bigquery")
+
+
+def _import_in_subprocess(modules: tuple[str, ...], probe: str = "None") -> dict:
+    script = (
+        "import json, sys, time\n"
+        "started = time.perf_counter()\n"
+        f"for name in {modules!r}:\n"
+        "    __import__(name)\n"
+        "elapsed = time.perf_counter() - started\n"
+        f"print(json.dumps({{'seconds': elapsed, 'modules': sorted(sys.modules), "
+        f"'probe': {probe}}}))\n"
+    )
+    completed = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def test_helper_modules_import_without_heavy_libraries() -> None:
+    """Analysis libraries are only loaded when a tool first needs them."""
+    report = _import_in_subprocess(_HELPER_MODULES)
+    loaded = set(report["modules"])
+    assert [name for name in _DEFERRED if name in loaded] == []
+    assert "google.auth" not in loaded
+    assert report["seconds"] < HELPER_IMPORT_BUDGET_SECONDS
+
+
+@pytest.mark.skipif(
+    importlib.util.find_spec("google.adk") is None
+    or importlib.util.find_spec("dotenv") is None,
+    reason="google-adk and python-dotenv are required to import the agent",
+)
+def test_agent_import_defers_credentials_and_toolset() -> None:
+    """Importing the agent neither resolves credentials nor loads pandas."""
+    report = _import_in_subprocess(
+        ("data_analyst_agent_app.agent",),
+        probe="sys.modules['data_analyst_agent_app.agent']._credentials.resolved",
+    )
+    loaded = set(report["modules"])
+    assert report["probe"] is False
+    assert [name for name in ("pandas", "matplotlib") if name in loaded] == []
+    assert report["seconds"] < AGENT_IMPORT_BUDGET_SECONDS
+
+
+def test_credentials_resolve_once_on_first_use() -> None:
+    """The loader runs lazily and only once, even with concurrent callers."""
+    calls: list[int] = []
+    resolver = CredentialResolver("ADC", loader=lambda: calls.append(1) or "creds")
+    assert not resolver.resolved
+    assert calls == []
+
+    threads = [threading.Thread(target=resolver.get) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert resolver.get() == "creds"
+    assert calls == [1]
+
+
+def test_oauth_needs_no_credentials_and_unknown_types_use_adc() -> None:
+    """OAuth users sign in through the toolset; other types mean ADC."""
+    assert CredentialResolver("oauth2").get() is None
+    assert CredentialResolver("something-else").credentials_type == "ADC"
+    assert not CredentialResolver("oauth2").shared
+    assert CredentialResolver("SERVICE_ACCOUNT").shared
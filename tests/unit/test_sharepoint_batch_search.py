@@ -0,0 +1,143 @@
+"""Tests for batched multi-site SharePoint search against a local Graph stand-in."""
+
+import json
+import re
+import threading
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Any, ClassVar
+
+import pytest
+
+# Importing the package loads the agent, which needs the full agent stack.
+pytest.importorskip("msal")
+pytest.importorskip("dotenv")
+pytest.importorskip("google.adk")
+
+from sharepoint_agent_app.sharepoint_agent_app.agent import SharePointSearchClient
+from sharepoint_agent_app.sharepoint_agent_app.graph_http import GraphHttpClient
+from sharepoint_agent_app.sharepoint_agent_app.token_cache import GraphTokenCache
+
+# Documents each site returns, best first; "policy.docx" lives on both sites.
+_INDEX = {
+    "hr.contoso.com": ["policy.docx", "leave.xlsx", "onboarding.pptx"],
+    "fin.contoso.com": ["budget.xlsx", "policy.docx"],
+}
+
+
+class GraphStandIn(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    batch_sizes: ClassVar[list[int]] = []
+    throttle_once: ClassVar[set[str]] = set()
+
+    def _hits(self, query_string: str) -> list[dict[str, Any]]:
+        site = re.search(r'site:"([^":]+)', query_string).group(1)
+        return [
+            {
+                "rank": rank,
+                "summary": f"{name} on {site}",
+                "resource": {"name": name, "webUrl": f"https://docs/{name}"},
+            }
+            for rank, name in enumerate(_INDEX.get(site, []), start=1)
+        ]
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        assert self.path == "/v1.0/$batch"
+        assert self.headers["Authorization"] == "Bearer token-1"
+        type(self).batch_sizes.append(len(body["requests"]))
+        responses = []
+        for request in body["requests"]:
+            query = request["body"]["requests"][0]["query"]["queryString"]
+            if query in self.throttle_once:
+                self.throttle_once.discard(query)
+                responses.append(
+                    {
+                        "id": request["id"],
+                        "status": 429,
+                        "headers": {"Retry-After": "1"},
+                    }
+                )
+                continue
+            containers = [{"hits": self._hits(query)}]
+            responses.append(
+                {
+                    "id": request["id"],
+                    "status": 200,
+                    "body": {"value": [{"hitsContainers": containers}]},
+                }
+            )
+        payload = json.dumps({"responses": responses[::-1]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def client() -> Iterator[tuple[SharePointSearchClient, list[float]]]:
+    GraphStandIn.batch_sizes, GraphStandIn.throttle_once = [], set()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), GraphStandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    slept: list[float] = []
+    http = GraphHttpClient(
+        base_url=f"http://127.0.0.1:{server.server_address[1]}/v1.0",
+        http2=False,
+        sleep=slept.append,
+    )
+    tokens = GraphTokenCache(
+        lambda *_, **__: {"access_token": "token-1", "expires_in": 3600}
+    )
+    authenticator = SimpleNamespace(acquire_token_for=None)
+    yield SharePointSearchClient(authenticator, http, tokens), slept
+    http.close()
+    server.shutdown()
+    server.server_close()
+
+
+def test_hits_are_merged_and_ranked_across_sites(client) -> None:
+    """Documents found on several sites are deduplicated and ranked first."""
+    search_client, _ = client
+    result = search_client.search_many(
+        [
+            {"site_hostname": "hr.contoso.com", "query_text": "policy"},
+            {"site_hostname": "fin.contoso.com", "query_text": "policy"},
+        ]
+    )
+    names = [item["name"] for item in result["results"]]
+    assert names[0] == "policy.docx"
+    assert sorted(names) == sorted(
+        {*_INDEX["hr.contoso.com"], *_INDEX["fin.contoso.com"]}
+    )
+    assert result["results"][0]["sites"] == ["hr.contoso.com", "fin.contoso.com"]
+    assert [item["count"] for item in result["searches"]] == [3, 2]
+
+
+def test_searches_are_packed_into_batches_of_twenty(client) -> None:
+    """25 searches need two $batch calls; a throttled one is retried."""
+    search_client, slept = client
+    searches = [
+        {"site_hostname": "hr.contoso.com", "query_text": f"q{index}"}
+        for index in range(25)
+    ]
+    GraphStandIn.throttle_once.add('site:"hr.contoso.com" q21')
+    result = search_client.search_many(searches, limit=5)
+
+    assert sorted(GraphStandIn.batch_sizes) == [1, 5, 20]
+    assert slept == [1.0]
+    assert all("error" not in item for item in result["searches"])
+    assert len(result["results"]) == 3
+
+
+def test_empty_or_incomplete_searches_are_rejected(client) -> None:
+    """Every search needs a site and a query."""
+    search_client, _ = client
+    with pytest.raises(ValueError):
+        search_client.search_many([])
+    with pytest.raises(ValueError):
+        search_client.search_many([{"site_hostname": "", "query_text": "x"}])
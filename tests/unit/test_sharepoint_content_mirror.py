@@ -0,0 +1,225 @@
+"""Tests for the delta-synced SharePoint mirror against a fake Graph server."""
+
+import json
+import threading
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, ClassVar
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+# Importing the package loads the agent, which needs the full agent stack.
+pytest.importorskip("msal")
+pytest.importorskip("dotenv")
+pytest.importorskip("google.adk")
+
+from sharepoint_agent_app.sharepoint_agent_app.content_mirror import (
+    ContentMirror,
+    configured_sites,
+    fts_query,
+)
+from sharepoint_agent_app.sharepoint_agent_app.graph_http import (
+    GraphHttpClient,
+    GraphHttpError,
+)
+
+
+def _file(item_id: str, name: str, ctag: str) -> dict[str, Any]:
+    return {
+        "id": item_id,
+        "name": name,
+        "webUrl": f"https://contoso.sharepoint.com/docs/{name}",
+        "lastModifiedDateTime": "2025-01-01T00:00:00Z",
+        "cTag": ctag,
+        "size": 100,
+        "file": {"mimeType": "text/plain"},
+        "parentReference": {"driveId": "drive-1"},
+    }
+
+
+class FakeGraph(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    requests: ClassVar[list[str]] = []
+    fail_once: ClassVar[set[str]] = set()
+    expired: ClassVar[set[str]] = set()
+    contents: ClassVar[dict[str, bytes]] = {}
+    pages: ClassVar[dict[str, dict[str, Any]]] = {}
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        token = parse_qs(url.query).get("token", ["start"])[0]
+        self.requests.append(f"{url.path}?{token}")
+        if url.path == "/v1.0/sites/contoso.sharepoint.com":
+            self._send(200, json.dumps({"id": "site-1"}).encode(), "application/json")
+        elif url.path.endswith("/content"):
+            item_id = url.path.split("/")[-2]
+            self.requests.append(f"content:{item_id}")
+            self._send(200, self.contents[item_id], "text/plain")
+        elif token in self.expired:
+            error = {"error": {"code": "resyncRequired", "message": "Token expired"}}
+            self._send(410, json.dumps(error).encode(), "application/json")
+        elif token in self.fail_once:
+            self.fail_once.discard(token)
+            self._send(500, b"{}", "application/json")
+        else:
+            page = dict(self.pages[token])
+            base = f"http://{self.headers['Host']}/v1.0/sites/site-1/drive/root/delta"
+            for link in ("@odata.nextLink", "@odata.deltaLink"):
+                if link in page:
+                    page[link] = f"{base}?token={page[link]}"
+            self._send(200, json.dumps(page).encode(), "application/json")
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def graph() -> Iterator[GraphHttpClient]:
+    FakeGraph.requests, FakeGraph.fail_once, FakeGraph.expired = [], set(), set()
+    FakeGraph.contents = {
+        "a": b"Quarterly budget forecast for the finance team",
+        "b": b"Holiday policy and annual leave allowance",
+        "c": b"Budget variance notes",
+    }
+    FakeGraph.pages = {
+        "start": {
+            "value": [
+                {"id": "root", "root": {}, "folder": {}},
+                _file("a", "budget.txt", "c1"),
+            ],
+            "@odata.nextLink": "page2",
+        },
+        "page2": {
+            "value": [_file("b", "leave.md", "c1"), _file("x", "deck.pptx", "c1")],
+            "@odata.deltaLink": "delta1",
+        },
+        "delta1": {
+            "value": [
+                {"id": "b", "deleted": {"state": "deleted"}},
+                _file("a", "budget-2025.txt", "c1"),
+                _file("c", "variance.txt", "c1"),
+            ],
+            "@odata.deltaLink": "delta2",
+        },
+    }
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGraph)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = GraphHttpClient(
+        base_url=f"http://127.0.0.1:{server.server_address[1]}/v1.0",
+        http2=False,
+        max_retries=0,
+    )
+    yield client
+    client.close()
+    server.shutdown()
+    server.server_close()
+
+
+def test_first_sync_indexes_metadata_and_text(graph, tmp_path) -> None:
+    """A full enumeration makes the site searchable locally."""
+    mirror = ContentMirror(graph, tmp_path / "mirror.db")
+    assert not mirror.is_synced("contoso.sharepoint.com")
+
+    report = mirror.sync("contoso.sharepoint.com", token="t")
+    assert (report.pages, report.upserted, report.text_indexed) == (2, 3, 2)
+    assert report.complete
+    assert mirror.is_synced("contoso.sharepoint.com")
+
+    hits = mirror.search("contoso.sharepoint.com", "budget forecast")
+    assert [hit["name"] for hit in hits] == ["budget.txt"]
+    assert "<c0>" in hits[0]["summary"]
+    assert mirror.search("contoso.sharepoint.com", "deck")[0]["name"] == "deck.pptx"
+    assert mirror.search("other.sharepoint.com", "budget") == []
+
+
+def test_delta_sync_applies_changes_without_refetching(graph, tmp_path) -> None:
+    """Deletes and renames apply; unchanged content is not downloaded again."""
+    mirror = ContentMirror(graph, tmp_path / "mirror.db")
+    mirror.sync("contoso.sharepoint.com", token="t")
+    FakeGraph.requests.clear()
+
+    report = mirror.sync("contoso.sharepoint.com", token="t")
+    assert (report.upserted, report.deleted) == (2, 1)
+    assert "content:a" not in FakeGraph.requests
+    assert "content:c" in FakeGraph.requests
+    assert mirror.search("contoso.sharepoint.com", "leave") == []
+    renamed = mirror.search("contoso.sharepoint.com", "forecast")
+    assert renamed[0]["name"] == "budget-2025.txt"
+    names = {hit["name"] for hit in mirror.search("contoso.sharepoint.com", "budget")}
+    assert names == {"budget-2025.txt", "variance.txt"}
+
+
+def test_interrupted_sync_resumes_from_the_stored_link(graph, tmp_path) -> None:
+    """A failure mid-enumeration resumes at the failed page after a restart."""
+    FakeGraph.fail_once.add("page2")
+    path = tmp_path / "mirror.db"
+    mirror = ContentMirror(graph, path)
+    with pytest.raises(GraphHttpError):
+        mirror.sync("contoso.sharepoint.com", token="t")
+    assert not mirror.is_synced("contoso.sharepoint.com")
+    mirror.close()
+
+    FakeGraph.requests.clear()
+    reopened = ContentMirror(graph, path)
+    report = reopened.sync("contoso.sharepoint.com", token="t")
+    assert report.resumed
+    assert report.complete
+    assert FakeGraph.requests[0] == "/v1.0/sites/site-1/drive/root/delta?page2"
+    assert (
+        reopened.search("contoso.sharepoint.com", "budget")[0]["name"] == "budget.txt"
+    )
+
+
+def test_queries_and_site_configuration_are_parsed() -> None:
+    """KQL operators and filters are dropped; sites may carry a path."""
+    assert fts_query('budget AND filetype:docx "Q3 plan"') == '"budget" "Q3" "plan"'
+    assert configured_sites("a.com, b.com:/sites/hr ,") == [
+        ("a.com", ""),
+        ("b.com", "/sites/hr"),
+    ]
+
+
+def test_expired_delta_link_restarts_a_full_enumeration(graph, tmp_path) -> None:
+    """A 410 resyncRequired drops the site's items and enumerates again."""
+    mirror = ContentMirror(graph, tmp_path / "mirror.db")
+    mirror.sync("contoso.sharepoint.com", token="t")
+    # leave.md is deleted while the delta link is expired; no tombstone is seen.
+    FakeGraph.expired.add("delta1")
+    FakeGraph.pages["page2"]["value"] = [_file("x", "deck.pptx", "c1")]
+    FakeGraph.requests.clear()
+
+    report = mirror.sync("contoso.sharepoint.com", token="t")
+    assert report.resynced
+    assert report.complete
+    assert FakeGraph.requests[:2] == [
+        "/v1.0/sites/site-1/drive/root/delta?delta1",
+        "/v1.0/sites/site-1/drive/root/delta?start",
+    ]
+    assert mirror.is_synced("contoso.sharepoint.com")
+    assert mirror.search("contoso.sharepoint.com", "leave") == []
+    assert mirror.search("contoso.sharepoint.com", "budget")[0]["name"] == "budget.txt"
+
+    FakeGraph.expired.update({"delta1", "start"})
+    with pytest.raises(GraphHttpError):
+        mirror.sync("contoso.sharepoint.com", token="t")
+    assert not mirror.is_synced("contoso.sharepoint.com")
+
+
+def test_stale_mirrors_are_not_reported_as_synced(graph, tmp_path) -> None:
+    """A mirror with no recent completed sync defers to live search."""
+    mirror = ContentMirror(graph, tmp_path / "mirror.db")
+    mirror.sync("contoso.sharepoint.com", token="t")
+
+    assert mirror.is_synced("contoso.sharepoint.com", max_age_seconds=900)
+    with mirror._db:
+        mirror._db.execute("UPDATE sites SET synced_at = synced_at - 3600")
+    assert not mirror.is_synced("contoso.sharepoint.com", max_age_seconds=900)
+    assert mirror.is_synced("contoso.sharepoint.com", max_age_seconds=None)
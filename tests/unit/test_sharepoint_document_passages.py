@@ -0,0 +1,243 @@
+"""Tests for reading and reranking the documents behind SharePoint hits."""
+
+import asyncio
+import io
+import json
+import threading
+import zipfile
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Any, ClassVar
+
+import pytest
+
+# Importing the package loads the agent, which needs the full agent stack.
+pytest.importorskip("msal")
+pytest.importorskip("dotenv")
+pytest.importorskip("google.adk")
+
+from sharepoint_agent_app.sharepoint_agent_app.agent import SharePointSearchClient
+from sharepoint_agent_app.sharepoint_agent_app.document_passages import (
+    DocumentReader,
+    DocumentRef,
+    chunk_text,
+    extract_document_text,
+    rank_chunks,
+)
+from sharepoint_agent_app.sharepoint_agent_app.graph_http import GraphHttpClient
+
+
+def _docx(*paragraphs: str) -> bytes:
+    namespace = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+    body = "".join(f"<w:p><w:r><w:t>{text}</w:t></w:r></w:p>" for text in paragraphs)
+    document = f'<w:document xmlns:w="{namespace}"><w:body>{body}</w:body></w:document>'
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("word/document.xml", document)
+    return buffer.getvalue()
+
+
+class FakeGraph:
+    """Serves driveItem metadata through ``batch`` and content downloads."""
+
+    def __init__(self) -> None:
+        self.items: dict[str, dict[str, Any]] = {}
+        self.contents: dict[str, bytes] = {}
+        self.downloads: list[str] = []
+        self.barrier: threading.Barrier | None = None
+
+    def batch(self, requests: list[dict[str, Any]], *, token: str) -> list[Any]:
+        responses = []
+        for request in requests:
+            item_id = request["url"].split("/")[4].split("?")[0]
+            item = self.items.get(item_id)
+            if item is None:
+                responses.append(
+                    {"status": 403, "body": {"error": {"code": "accessDenied"}}}
+                )
+            else:
+                responses.append({"status": 200, "body": item})
+        return responses
+
+    def request(self, method: str, path: str, *, token: str) -> Any:
+        item_id = path.split("/")[4]
+        if self.barrier is not None:
+            self.barrier.wait()
+        self.downloads.append(item_id)
+        return SimpleNamespace(content=self.contents[item_id])
+
+    def add(self, item_id: str, name: str, content: bytes, etag: str = "v1") -> None:
+        self.items[item_id] = {
+            "id": item_id,
+            "name": name,
+            "webUrl": f"https://docs/{name}",
+            "eTag": etag,
+            "size": len(content),
+            "file": {},
+        }
+        self.contents[item_id] = content
+
+
+class RedirectingGraph(BaseHTTPRequestHandler):
+    """Answers ``$batch`` and redirects ``/content`` like Graph does."""
+
+    protocol_version = "HTTP/1.1"
+    graph: ClassVar[FakeGraph]
+    downloads: ClassVar[list[str]] = []
+
+    def _send(self, status: int, body: bytes, headers: dict[str, str]) -> None:
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        requests = json.loads(self.rfile.read(length))["requests"]
+        responses = [
+            {"id": request["id"], **response}
+            for request, response in zip(
+                requests, self.graph.batch(requests, token="t"), strict=True
+            )
+        ]
+        body = json.dumps({"responses": responses}).encode()
+        self._send(200, body, {"Content-Type": "application/json"})
+
+    def do_GET(self) -> None:
+        if self.path.endswith("/content"):
+            item_id = self.path.split("/")[-2]
+            location = f"/download/{item_id}?tempauth=signed"
+            self._send(302, b"", {"Location": location})
+            return
+        item_id = self.path.split("/")[2].split("?")[0]
+        self.downloads.append(item_id)
+        content = self.graph.contents[item_id]
+        self._send(200, content, {"Content-Type": "application/octet-stream"})
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def redirecting_graph(graph) -> Iterator[str]:
+    RedirectingGraph.graph, RedirectingGraph.downloads = graph, []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RedirectingGraph)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1.0"
+    server.shutdown()
+    server.server_close()
+
+
+def _ref(item_id: str) -> DocumentRef:
+    return DocumentRef("drive-1", item_id)
+
+
+@pytest.fixture
+def graph() -> FakeGraph:
+    graph = FakeGraph()
+    graph.add(
+        "policy",
+        "policy.docx",
+        _docx(
+            "Employees accrue 25 days of annual leave per year.",
+            "Unused leave may be carried over until March.",
+        ),
+    )
+    graph.add("budget", "budget.txt", b"The travel budget for 2025 is 40,000 EUR.")
+    return graph
+
+
+def test_docx_text_is_extracted_and_chunked() -> None:
+    text = extract_document_text("a.docx", _docx("First paragraph.", "Second one."))
+    assert text == "First paragraph.\n\nSecond one."
+    assert extract_document_text("a.docx", b"not a zip") is None
+
+    long_text = "alpha " * 100 + "\n\n" + "beta gamma"
+    chunks = chunk_text(long_text, max_chars=120, overlap=20)
+    assert all(len(chunk) <= 120 for chunk in chunks)
+    assert chunks[-1].endswith("beta gamma")
+    assert len(chunks) > 5
+
+
+def test_best_passages_are_returned_across_documents(graph) -> None:
+    reader = DocumentReader(graph, chunk_chars=60, chunk_overlap=0)
+    result = reader.read(
+        [_ref("policy"), _ref("budget"), _ref("secret")],
+        "How many days of annual leave?",
+        token="t",
+        limit=1,
+    )
+    assert [doc["status"] for doc in result["documents"]] == [
+        "downloaded",
+        "downloaded",
+        "error",
+    ]
+    assert result["documents"][2]["error"] == "HTTP 403: accessDenied"
+    assert result["passages"][0]["name"] == "policy.docx"
+    assert "25 days" in result["passages"][0]["text"]
+    assert "carried over" not in result["passages"][0]["text"]
+
+
+def test_unchanged_documents_are_served_from_the_chunk_cache(graph) -> None:
+    """Only a new eTag triggers another download."""
+    reader = DocumentReader(graph)
+    refs = [_ref("policy"), _ref("budget")]
+    reader.read(refs, "travel budget", token="t")
+    graph.downloads.clear()
+
+    result = reader.read(refs, "travel budget", token="t")
+    assert graph.downloads == []
+    assert {doc["status"] for doc in result["documents"]} == {"cached"}
+    assert "40,000 EUR" in result["passages"][0]["text"]
+
+    graph.add("budget", "budget.txt", b"The travel budget is now 55,000 EUR.", "v2")
+    result = reader.read(refs, "travel budget", token="t")
+    assert graph.downloads == ["budget"]
+    assert "55,000 EUR" in result["passages"][0]["text"]
+
+
+def test_documents_are_downloaded_concurrently(graph) -> None:
+    """Both downloads must be in flight at once to pass the barrier."""
+    graph.barrier = threading.Barrier(2, timeout=5)
+    reader = DocumentReader(graph, max_concurrency=2)
+    result = reader.read([_ref("policy"), _ref("budget")], "leave", token="t")
+    assert [doc["status"] for doc in result["documents"]] == ["downloaded"] * 2
+
+
+def test_search_hits_are_narrowed_to_files() -> None:
+    hits = [
+        {"resource": {"id": "f", "folder": {}, "parentReference": {"driveId": "d"}}},
+        {"resource": {"id": "l", "webUrl": "https://list/item"}},
+        {"resource": {"id": "a", "name": "a.pdf", "parentReference": {"driveId": "d"}}},
+        {"resource": {"id": "a", "name": "a.pdf", "parentReference": {"driveId": "d"}}},
+        {"resource": {"id": "b", "name": "b.txt", "parentReference": {"driveId": "d"}}},
+    ]
+    payload = {"value": [{"hitsContainers": [{"hits": hits}]}]}
+    graph = SimpleNamespace(post_json=lambda *args, **kwargs: payload)
+    tokens = SimpleNamespace(get=lambda user_key: "t")
+    client = SharePointSearchClient(SimpleNamespace(), graph, tokens)
+
+    refs = asyncio.run(client.find_documents("contoso.com", "plan", top=3))
+    assert [ref.item_id for ref in refs] == ["a", "b"]
+    assert rank_chunks("plan", ["nothing relevant"], 3) == []
+
+
+@pytest.mark.parametrize("http2", [False, True], ids=["requests", "httpx"])
+def test_passages_are_read_through_content_redirects(
+    redirecting_graph: str, http2: bool
+) -> None:
+    """/content answers 302 to a download URL; the text is still extracted."""
+    if http2:
+        pytest.importorskip("httpx")
+        pytest.importorskip("h2")
+    http = GraphHttpClient(base_url=redirecting_graph, http2=http2, max_retries=0)
+    reader = DocumentReader(http)
+    result = reader.read([_ref("policy"), _ref("budget")], "annual leave", token="t")
+    http.close()
+
+    assert [doc["status"] for doc in result["documents"]] == ["downloaded"] * 2
+    assert "25 days" in result["passages"][0]["text"]
+    assert sorted(RedirectingGraph.downloads) == ["budget", "policy"]
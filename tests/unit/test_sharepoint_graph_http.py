@@ -0,0 +1,140 @@
+"""Tests for the pooled Microsoft Graph HTTP client."""
+
+import json
+import threading
+from collections.abc import Iterator
+from datetime import UTC, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import ClassVar
+
+import pytest
+
+# Importing the package loads the agent, which needs the full agent stack.
+pytest.importorskip("msal")
+pytest.importorskip("dotenv")
+pytest.importorskip("google.adk")
+
+from sharepoint_agent_app.sharepoint_agent_app.graph_http import (
+    GraphHttpClient,
+    GraphHttpError,
+    parse_retry_after,
+)
+
+
+class GraphStandIn(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    script: ClassVar[list[tuple[int, dict[str, str]]]] = []
+    connections: ClassVar[set[int]] = set()
+    bodies: ClassVar[list[dict]] = []
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        type(self).bodies.append(json.loads(self.rfile.read(length) or b"{}"))
+        type(self).connections.add(self.client_address[1])
+        status, headers = self.script.pop(0) if self.script else (200, {})
+        payload = json.dumps(
+            {"value": []} if status < 400 else {"error": {"code": "TooManyRequests"}}
+        ).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self) -> None:
+        # Drive item content redirects to a pre-authenticated download URL.
+        if self.path.endswith("/content"):
+            self.send_response(302)
+            self.send_header("Location", "/download/report.docx?tempauth=x")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        type(self).bodies.append({"path": self.path})
+        payload = b"document bytes"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def graph() -> Iterator[str]:
+    GraphStandIn.script, GraphStandIn.connections, GraphStandIn.bodies = [], set(), []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), GraphStandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1.0"
+    server.shutdown()
+    server.server_close()
+
+
+def test_requests_reuse_one_kept_alive_connection(graph: str) -> None:
+    """Sequential calls share a pooled connection and record latency."""
+    client = GraphHttpClient(base_url=graph, http2=False)
+    for _ in range(5):
+        assert client.post_json("search/query", {"q": 1}, token="t") == {"value": []}
+    assert len(GraphStandIn.connections) == 1
+    stats = client.stats()
+    assert stats["requests"] == 5
+    assert stats["latency_ms"]["p50"] is not None
+    client.close()
+
+
+@pytest.mark.parametrize("http2", [False, True], ids=["requests", "httpx"])
+def test_content_redirects_are_followed(graph: str, http2: bool) -> None:
+    """Both backends follow the 302 that drive item /content answers with."""
+    if http2:
+        pytest.importorskip("httpx")
+        pytest.importorskip("h2")
+    client = GraphHttpClient(base_url=graph, http2=http2)
+    response = client.request("GET", "drives/d/items/i/content", token="t")
+    assert response.status_code == 200
+    assert response.content == b"document bytes"
+    assert GraphStandIn.bodies == [{"path": "/download/report.docx?tempauth=x"}]
+    client.close()
+
+
+def test_throttled_requests_honour_retry_after(graph: str) -> None:
+    """429 and 503 are retried after the delay Graph asks for."""
+    GraphStandIn.script = [(429, {"Retry-After": "2"}), (503, {})]
+    slept: list[float] = []
+    client = GraphHttpClient(
+        base_url=graph, http2=False, backoff_seconds=0.01, sleep=slept.append
+    )
+    assert client.post_json("search/query", {}, token="t") == {"value": []}
+    assert slept[0] == pytest.approx(2.0)
+    assert 0 <= slept[1] <= 0.02
+    assert client.stats()["throttled"] == 1
+    assert client.stats()["retries"] == 2
+
+
+def test_errors_are_raised_when_retries_cannot_help(graph: str) -> None:
+    """Client errors, exhausted retries and very long waits are raised."""
+    GraphStandIn.script = [(429, {"Retry-After": "3600"})]
+    client = GraphHttpClient(base_url=graph, http2=False, sleep=lambda _: None)
+    with pytest.raises(GraphHttpError) as raised:
+        client.post_json("search/query", {}, token="t")
+    assert raised.value.status_code == 429
+    assert raised.value.retry_after == 3600
+
+    GraphStandIn.script = [(403, {})]
+    with pytest.raises(GraphHttpError):
+        client.post_json("search/query", {}, token="t")
+    assert client.stats()["failures"] == 2
+
+
+def test_retry_after_accepts_seconds_and_http_dates() -> None:
+    """Both Retry-After forms are understood; anything else is ignored."""
+    now = datetime(2025, 1, 1, tzinfo=UTC)
+    assert parse_retry_after("7") == pytest.approx(7.0)
+    assert parse_retry_after("Wed, 01 Jan 2025 00:00:10 GMT", now=now) == pytest.approx(
+        10.0
+    )
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
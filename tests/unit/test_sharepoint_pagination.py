@@ -0,0 +1,97 @@
+"""Tests for lazy SharePoint search pagination and compact results."""
+
+import asyncio
+import json
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+# Importing the package loads the agent, which needs the full agent stack.
+pytest.importorskip("msal")
+pytest.importorskip("dotenv")
+pytest.importorskip("google.adk")
+
+from sharepoint_agent_app.sharepoint_agent_app.agent import SharePointSearchClient
+
+
+class FakeGraph:
+    """Serves ``total`` hits in pages, as Graph's search endpoint does."""
+
+    def __init__(self, total: int) -> None:
+        self.total = total
+        self.requests: list[tuple[int, int]] = []
+
+    def post_json(self, path: str, body: Any, *, token: str | None = None) -> Any:
+        request = body["requests"][0]
+        offset, size = request["from"], request["size"]
+        self.requests.append((offset, size))
+        hits = [
+            {
+                "summary": f"Hit {index}",
+                "resource": {
+                    "name": f"doc{index}.docx",
+                    "webUrl": f"https://docs/{index}",
+                    "lastModifiedDateTime": "2025-01-01T00:00:00Z",
+                },
+            }
+            for index in range(offset, min(offset + size, self.total))
+        ]
+        more = offset + size < self.total
+        return {
+            "value": [
+                {"hitsContainers": [{"hits": hits, "moreResultsAvailable": more}]}
+            ]
+        }
+
+
+class FakeTokens:
+    def get(self, user_key: str) -> str:
+        return "token"
+
+
+def _client(total: int) -> tuple[SharePointSearchClient, FakeGraph]:
+    graph = FakeGraph(total)
+    return SharePointSearchClient(SimpleNamespace(), graph, FakeTokens()), graph
+
+
+def test_deep_results_are_paged_until_enough_are_collected() -> None:
+    """``top`` beyond one page walks ``from`` forward and then stops."""
+    client, graph = _client(total=100)
+    result = asyncio.run(client.search_pages("contoso.com", "budget", top=60))
+    assert result["count"] == 60
+    assert graph.requests == [(0, 25), (25, 25), (50, 25)]
+    assert result["results"][-1]["name"] == "doc59.docx"
+
+
+def test_paging_stops_early_and_when_graph_runs_out() -> None:
+    """Breaking out of the generator fetches no further pages."""
+    client, graph = _client(total=100)
+
+    async def first_three() -> list[str]:
+        names = []
+        async for hit in client.iter_hits("contoso.com", "budget"):
+            names.append(hit["resource"]["name"])
+            if len(names) == 3:
+                break
+        return names
+
+    assert asyncio.run(first_three()) == ["doc0.docx", "doc1.docx", "doc2.docx"]
+    assert graph.requests == [(0, 25)]
+
+    client, graph = _client(total=30)
+    result = asyncio.run(client.search_pages("contoso.com", "budget", top=200))
+    assert result["count"] == 30
+    assert len(graph.requests) == 2
+
+
+def test_compact_results_keep_only_requested_fields() -> None:
+    """Compact mode drops the raw hits, unrequested fields and empty values."""
+    client, _ = _client(total=5)
+    full = client.search("contoso.com", "budget", top=5)
+    compact = client.search(
+        "contoso.com", "budget", top=5, compact=True, result_fields=["name", "url"]
+    )
+    assert "raw_response" not in compact
+    assert compact["results"][0] == {"name": "doc0.docx", "url": "https://docs/0"}
+    assert len(json.dumps(compact)) < len(json.dumps(full)) / 3
@@ -0,0 +1,118 @@
+"""Tests for the SharePoint search result cache."""
+
+import asyncio
+from typing import Any
+
+import pytest
+
+# Importing the package loads the agent, which needs the full agent stack.
+pytest.importorskip("msal")
+pytest.importorskip("dotenv")
+pytest.importorskip("google.adk")
+
+from sharepoint_agent_app.sharepoint_agent_app.result_cache import SearchResultCache
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class Fetcher:
+    def __init__(self, delay: float = 0.0) -> None:
+        self.calls = 0
+        self.delay = delay
+        self.fail = False
+
+    async def __call__(self) -> dict[str, Any]:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("Graph unavailable")
+        return {"results": [f"version {self.calls}"]}
+
+
+def test_keys_normalize_queries_but_separate_users() -> None:
+    """Case and spacing do not matter; the user and options do."""
+    key = SearchResultCache.make_key
+    base = key("alice", "Contoso.sharepoint.com", "Budget  2025", "/sites/Fin/")
+    assert base == key("alice", "contoso.sharepoint.com", "budget 2025", "sites/fin")
+    assert base != key("bob", "contoso.sharepoint.com", "budget 2025", "sites/fin")
+    assert base != key(
+        "alice", "contoso.sharepoint.com", "budget 2025", "sites/fin", top=10
+    )
+
+
+def test_fresh_stale_and_expired_entries() -> None:
+    """Stale entries return at once while one background refresh runs."""
+    clock = Clock()
+    cache = SearchResultCache(ttl_seconds=60, stale_seconds=120, clock=clock)
+    fetch = Fetcher()
+
+    async def scenario() -> list[tuple[Any, str]]:
+        served = [await cache.get_or_fetch("k", fetch)]
+        clock.now += 30
+        served.append(await cache.get_or_fetch("k", fetch))
+        clock.now += 60
+        served.append(await cache.get_or_fetch("k", fetch))
+        served.append(await cache.get_or_fetch("k", fetch))
+        await asyncio.sleep(0.01)
+        served.append(await cache.get_or_fetch("k", fetch))
+        clock.now += 1_000
+        served.append(await cache.get_or_fetch("k", fetch))
+        return served
+
+    served = asyncio.run(scenario())
+    assert [state for _, state in served] == [
+        "miss",
+        "fresh",
+        "stale",
+        "stale",
+        "fresh",
+        "miss",
+    ]
+    assert served[2][0] == {"results": ["version 1"]}
+    assert served[4][0] == {"results": ["version 2"]}
+    assert fetch.calls == 3
+    assert cache.stats()["refreshes"] == 1
+
+
+def test_concurrent_misses_share_one_fetch_and_errors_are_not_cached() -> None:
+    cache = SearchResultCache(ttl_seconds=60)
+    fetch = Fetcher(delay=0.02)
+
+    async def burst() -> list[str]:
+        results = await asyncio.gather(
+            *(cache.get_or_fetch("k", fetch) for _ in range(5))
+        )
+        return [state for _, state in results]
+
+    assert sorted(asyncio.run(burst())) == ["coalesced"] * 4 + ["miss"]
+    assert fetch.calls == 1
+
+    failing = Fetcher()
+    failing.fail = True
+    with pytest.raises(RuntimeError):
+        asyncio.run(cache.get_or_fetch("other", failing))
+    assert cache.lookup("other") == (None, "miss")
+
+
+def test_memory_is_bounded_by_entries_and_bytes() -> None:
+    """Least-recently-used entries are evicted first."""
+    cache = SearchResultCache(ttl_seconds=60, max_entries=2)
+    cache.store("a", {"v": 1})
+    cache.store("b", {"v": 2})
+    cache.lookup("a")
+    cache.store("c", {"v": 3})
+    assert cache.lookup("b") == (None, "miss")
+    assert cache.lookup("a")[1] == "fresh"
+
+    small = SearchResultCache(ttl_seconds=60, max_bytes=40)
+    small.store("a", {"v": "x" * 20})
+    small.store("b", {"v": "y" * 20})
+    assert small.stats()["entries"] == 1
+    small.store("huge", {"v": "z" * 100})
+    assert small.lookup("huge") == (None, "miss")
@@ -0,0 +1,108 @@
+"""Tests for the per-user Graph access token cache."""
+
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+# Importing the package loads the agent, which needs the full agent stack.
+pytest.importorskip("msal")
+pytest.importorskip("dotenv")
+pytest.importorskip("google.adk")
+
+from sharepoint_agent_app.sharepoint_agent_app.token_cache import (
+    GraphTokenCache,
+    user_key_for,
+)
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeAuthenticator:
+    def __init__(self, delay: float = 0.0) -> None:
+        self.calls: list[tuple[str, bool, bool]] = []
+        self.delay = delay
+        self.fail_silent = False
+        self._lock = threading.Lock()
+
+    def acquire(
+        self, user_key: str, *, force_refresh: bool, interactive: bool
+    ) -> dict[str, Any]:
+        time.sleep(self.delay)
+        with self._lock:
+            self.calls.append((user_key, force_refresh, interactive))
+            count = len(self.calls)
+        if self.fail_silent and not interactive:
+            raise RuntimeError("refresh token revoked")
+        return {"access_token": f"{user_key}-{count}", "expires_in": 3600}
+
+
+def test_tokens_are_served_from_memory_per_user() -> None:
+    """Concurrent first calls acquire once per user; later calls hit memory."""
+    auth = FakeAuthenticator(delay=0.05)
+    cache = GraphTokenCache(auth.acquire, clock=Clock())
+    tokens: list[str] = []
+    threads = [
+        threading.Thread(target=lambda: tokens.append(cache.get("alice")))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert set(tokens) == {"alice-1"}
+    assert cache.get("bob") == "bob-2"
+    assert cache.get("alice") == "alice-1"
+    assert [call[0] for call in auth.calls] == ["alice", "bob"]
+    assert cache.stats()["users"] == 2
+
+
+def test_tokens_are_refreshed_in_the_background_before_expiry() -> None:
+    """Inside the refresh-ahead window the old token is served meanwhile."""
+    auth = FakeAuthenticator()
+    clock = Clock()
+    cache = GraphTokenCache(auth.acquire, refresh_ahead_seconds=300, clock=clock)
+    assert cache.get("alice") == "alice-1"
+
+    clock.now += 3_600 - 200
+    assert cache.get("alice") == "alice-1"
+    cache.close()
+    assert auth.calls[-1] == ("alice", True, False)
+    assert cache.get("alice") == "alice-2"
+    assert cache.stats()["refreshes"] == 1
+
+
+def test_failed_refreshes_back_off_and_expiry_reacquires() -> None:
+    """A failed refresh keeps the old token until it actually expires."""
+    auth = FakeAuthenticator()
+    auth.fail_silent = True
+    clock = Clock()
+    cache = GraphTokenCache(auth.acquire, refresh_ahead_seconds=300, clock=clock)
+    cache.get("alice")
+
+    clock.now += 3_600 - 200
+    assert cache.get("alice") == "alice-1"
+    cache.close()
+    assert cache.get("alice") == "alice-1"
+    cache.close()
+    assert cache.stats()["refresh_failures"] == 1
+
+    clock.now += 200
+    assert cache.get("alice") == "alice-3"
+    assert auth.calls[-1] == ("alice", False, True)
+
+
+def test_user_keys_come_from_the_tool_context() -> None:
+    assert user_key_for(None) == "default"
+    assert user_key_for(SimpleNamespace(user_id="u1")) == "u1"
+    session = SimpleNamespace(id="s1")
+    assert user_key_for(SimpleNamespace(user_id=None, session=session)) == "session:s1"
@@ -0,0 +1,81 @@
+"""Tests for packaging the Winsights agent with the shared helpers wheel."""
+
+import importlib.util
+import subprocess
+import sys
+import zipfile
+from pathlib import Path
+
+import pytest
+
+SCRIPT = (
+    Path(__file__).resolve().parents[2] / "GCP_Agent_Starter_Pack" / "build_package.py"
+)
+
+
+def _load_script():
+    spec = importlib.util.spec_from_file_location("build_package", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+build_package = _load_script()
+
+
+def test_deploy_packages_installs_both_wheels_by_their_upload_path(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Wheels are named relative to ROOT in both requirements and uploads."""
+    (tmp_path / "winsights_agent").mkdir()
+    (tmp_path / "winsights_agent" / "requirements.txt").write_text(
+        "google-adk\n##New##\n\npandas\n", encoding="utf-8"
+    )
+    dist = tmp_path / "dist"
+    dist.mkdir()
+    monkeypatch.setattr(build_package, "ROOT", tmp_path)
+    monkeypatch.setattr(build_package, "DIST", dist)
+
+    with pytest.raises(FileNotFoundError, match="winsights_agent"):
+        build_package.deploy_packages()
+
+    (dist / "winsights_agent-0.1.0-py3-none-any.whl").touch()
+    with pytest.raises(FileNotFoundError, match="data_analyst_agent_app"):
+        build_package.deploy_packages()
+
+    (dist / "data_analyst_agent_app-0.1.0-py3-none-any.whl").touch()
+    requirements, wheels = build_package.deploy_packages()
+
+    assert wheels == [
+        "dist/winsights_agent-0.1.0-py3-none-any.whl",
+        "dist/data_analyst_agent_app-0.1.0-py3-none-any.whl",
+    ]
+    assert requirements == ["google-adk", "pandas", *wheels]
+
+
+def test_shared_wheel_imports_outside_the_repository(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """The agent's imports resolve from the installed wheel alone."""
+    pytest.importorskip("build")
+    monkeypatch.setattr(build_package, "SHARED_STAGE", tmp_path / "stage")
+
+    wheel = build_package.build_shared(tmp_path / "dist")
+
+    with zipfile.ZipFile(wheel) as archive:
+        archive.extractall(tmp_path / "site")
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import data_analyst_agent_app.instruction_cache, "
+            "data_analyst_agent_app.metadata_digest, "
+            "data_analyst_agent_app.query_guard as guard; print(guard.__file__)",
+        ],
+        cwd=tmp_path,
+        env={"PYTHONPATH": str(tmp_path / "site")},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.startswith(str(tmp_path / "site"))